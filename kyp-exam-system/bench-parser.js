@@ -0,0 +1,117 @@
+// Benchmark: single-pass question parser vs the old multi-strategy parser
+//
+// Usage: node bench-parser.js [--baseline <rev>] [file ...]
+// Defaults to test-questions.txt and docs/abcd.docx, plus 2000-question
+// papers built by repeating test-questions.txt (as is, and with "A." style
+// options and answer lines, which the old parser only reaches after its
+// first strategies fail) to show how each parser scales with length.
+//
+// The old parser is question-parser.js as of <rev>, read with git show
+// (needs a git checkout). The default is the commit before the rewrite.
+
+const fs = require('fs');
+const path = require('path');
+const Module = require('module');
+const { execFileSync } = require('child_process');
+const { performance } = require('perf_hooks');
+const { parseQuestionsFromText, extractText } = require('./question-parser');
+
+const TARGET_MS = 500; // Run each parser for about this long per input
+const BASELINE = '57ad7c3^'; // Last commit with the multi-strategy parser
+
+// Compile question-parser.js from an older commit as if it sat next to this file
+function loadBaseline(rev) {
+    const source = execFileSync('git', ['show', `${rev}:./question-parser.js`], { cwd: __dirname, encoding: 'utf8' });
+    const filename = path.join(__dirname, `question-parser@${rev}.js`);
+    const baseline = new Module(filename, module);
+    baseline.filename = filename;
+    baseline.paths = Module._nodeModulePaths(__dirname);
+    baseline._compile(source, filename);
+    return baseline.exports;
+}
+
+// The old parser logs every question it extracts; keep that out of the timing
+function quietly(fn) {
+    const log = console.log;
+    console.log = () => {};
+    try {
+        return fn();
+    } finally {
+        console.log = log;
+    }
+}
+
+function measure(parse, text) {
+    let questions = quietly(() => parse(text)); // Warm-up
+    let runs = 0;
+    const started = performance.now();
+    while (performance.now() - started < TARGET_MS || runs < 3) {
+        questions = quietly(() => parse(text));
+        runs++;
+    }
+    return { msPerRun: (performance.now() - started) / runs, questions: questions.length };
+}
+
+// Renumber test-questions.txt into a long paper
+function longPaper(text, count) {
+    const blocks = text.split(/\n\s*\n/).filter(block => block.trim());
+    const out = [];
+    for (let i = 0; i < count; i++) {
+        out.push(blocks[i % blocks.length].replace(/^\d+\./, `${i + 1}.`));
+    }
+    return out.join('\n\n');
+}
+
+async function loadInput(file) {
+    const ext = path.extname(file).toLowerCase();
+    if (ext === '.pdf' || ext === '.docx' || ext === '.doc') {
+        return extractText(file, file);
+    }
+    return fs.readFileSync(file, 'utf8');
+}
+
+async function main() {
+    const args = process.argv.slice(2);
+    const at = args.indexOf('--baseline');
+    const rev = at >= 0 ? args.splice(at, 2)[1] : BASELINE;
+    const legacy = loadBaseline(rev);
+    const files = args;
+    const inputs = [];
+
+    if (files.length > 0) {
+        for (const file of files) {
+            inputs.push({ name: path.basename(file), text: await loadInput(file) });
+        }
+    } else {
+        const sample = fs.readFileSync(path.join(__dirname, 'test-questions.txt'), 'utf8');
+        inputs.push({ name: 'test-questions.txt', text: sample });
+        inputs.push({ name: 'docs/abcd.docx', text: await loadInput(path.join(__dirname, 'docs', 'abcd.docx')) });
+        inputs.push({ name: '2000 questions, A)', text: longPaper(sample, 2000) });
+        inputs.push({
+            name: '2000 questions, A. + Ans',
+            text: longPaper(sample, 2000)
+                .replace(/^([A-D])\)/gm, '$1.')
+                .replace(/^D\..*$/gm, line => line + '\nAnswer: C')
+        });
+    }
+
+    console.log(`Old parser: question-parser.js at ${rev}\n`);
+    console.log('Input                      Size      Old parser             New parser             Speed-up');
+    for (const input of inputs) {
+        const before = measure(text => legacy.parseQuestionsFromText(text, 'hi'), input.text);
+        const after = measure(text => parseQuestionsFromText(text, 'hi'), input.text);
+
+        console.log(
+            input.name.padEnd(26),
+            `${(Buffer.byteLength(input.text) / 1024).toFixed(1)}KB`.padEnd(9),
+            `${before.msPerRun.toFixed(3)}ms (${before.questions}q)`.padEnd(22),
+            `${after.msPerRun.toFixed(3)}ms (${after.questions}q)`.padEnd(22),
+            `${(before.msPerRun / after.msPerRun).toFixed(1)}x`
+        );
+    }
+}
+
+main().catch(error => {
+    console.error('Benchmark failed:', error);
+    process.exit(1);
+});
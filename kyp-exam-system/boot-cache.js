@@ -0,0 +1,83 @@
+const fs = require('fs');
+const path = require('path');
+const v8 = require('v8');
+
+// Warm start after a restart
+//
+// The question papers (every subject, language and variant, gzip and
+// brotli; see paper-sets.js) and the brotli copies of public/ (see
+// static-assets.js) take seconds of CPU to build, and come out the same
+// after a restart unless questions.json or public/ changed. Once built they
+// are written to data/boot-cache.bin with v8.serialize, which keeps the
+// compressed Buffers as they are. At startup the server reads the file back
+// before it listens, so the first students get their papers straight away,
+// and only what changed since is rebuilt in the background.
+//
+// Papers are only taken from the cache when it was written for the same
+// question bank (PaperSets.bankKey()), static files are matched by content
+// hash. A cache from another FORMAT is ignored; deleting the file is always
+// safe.
+
+const FORMAT = 1;
+
+class BootCache {
+    constructor(filepath) {
+        this.filepath = filepath;
+        this.data = { format: FORMAT, papers: null, assets: new Map() };
+        this.writing = Promise.resolve();
+    }
+
+    // Read the cache; returns { bytes, ms }, or null if there is none
+    load() {
+        const started = process.hrtime.bigint();
+        let buffer;
+        try {
+            buffer = fs.readFileSync(this.filepath);
+        } catch (error) {
+            if (error.code !== 'ENOENT') {
+                console.error('Error reading boot cache:', error);
+            }
+            return null;
+        }
+
+        try {
+            const data = v8.deserialize(buffer);
+            if (!data || data.format !== FORMAT) return null;
+            this.data = data;
+        } catch (error) {
+            console.error('Error reading boot cache:', error);
+            return null;
+        }
+        return { bytes: buffer.length, ms: Number(process.hrtime.bigint() - started) / 1e6 };
+    }
+
+    // { key, sets } saved by PaperSets.exportSets(), or null
+    papers() {
+        return this.data.papers;
+    }
+
+    // Content hash (ETag) -> { gzip, br } of static files
+    assets() {
+        return this.data.assets;
+    }
+
+    // Replace some parts ({ papers }, { assets }) and write the file.
+    // Writes run one at a time; each writes everything known so far.
+    save(parts) {
+        Object.assign(this.data, parts);
+        this.writing = this.writing.then(() => this.write()).catch(error => {
+            console.error('Error writing boot cache:', error);
+        });
+        return this.writing;
+    }
+
+    async write() {
+        const buffer = v8.serialize(this.data);
+        await fs.promises.mkdir(path.dirname(this.filepath), { recursive: true });
+        const tmpFile = `${this.filepath}.${process.pid}.tmp`;
+        await fs.promises.writeFile(tmpFile, buffer);
+        await fs.promises.rename(tmpFile, this.filepath);
+    }
+}
+
+module.exports = { BootCache };
@@ -0,0 +1,398 @@
+const fs = require('fs');
+const path = require('path');
+const { promisify } = require('util');
+
+const fsWrite = promisify(fs.write);
+const fsFsync = promisify(fs.fsync);
+const fsOpen = promisify(fs.open);
+const fsClose = promisify(fs.close);
+
+// Server-side answer checkpoints
+//
+// While a student works through an exam the browser sends the answers
+// locked since its last save (a small delta) to PUT /api/checkpoints. Each
+// exam session (student + subject) keeps one compact record in memory:
+// questionId -> chosen option, the last delta number applied and the time
+// spent. The final submit only adds what is still unsent, then grades the
+// session and seals it, so the end-of-exam bell no longer carries every
+// answer of the hall at once, and an attempt on a crashed PC can be resumed
+// on another one. Once the result is saved the session is released: its
+// answers are dropped and only its result id is kept, so a second submit is
+// still refused. Released sessions are forgotten after RELEASED_KEEP_MS (or
+// beyond the newest RELEASED_MAX); by then the result has long been in the
+// results log, which the server checks too (ResultsAnalytics.submitted).
+//
+// Every change is appended to data/checkpoints/checkpoints.jsonl and
+// fsync'd before it is acknowledged; changes arriving together share one
+// write. open() replays the journal; after that, and whenever it has grown
+// past JOURNAL_MAX_BYTES, the flush loop rewrites it in the background with
+// one line per session (changes arriving meanwhile wait for the next write).
+//
+// Journal lines:
+//   { session, answers, seq, timeSpent, at }    answers saved (a delta)
+//   { session, answers, ..., sealed: resultId } submitted (with the last delta)
+//   { session, reopened: true, at }             submit failed after sealing
+//   { session, released: resultId, at }         result saved, answers dropped
+
+const JOURNAL_FILE = 'checkpoints.jsonl';
+const JOURNAL_MAX_BYTES = 8 * 1024 * 1024;
+const MAX_ANSWERS = 1000; // Per delta; far more than any paper has
+const RELEASED_KEEP_MS = 24 * 60 * 60 * 1000;
+const RELEASED_MAX = 100000;
+
+function sessionKey(studentId, subjectId) {
+    return `${studentId}|${subjectId}`;
+}
+
+function checkpointError(message, code) {
+    const error = new Error(message);
+    error.code = code;
+    return error;
+}
+
+// Keep only questionId -> option index pairs of questions not answered yet:
+// a saved answer is locked, so it can't be changed once its correct option
+// may have been shown
+function cleanAnswers(answers, saved) {
+    const clean = {};
+    if (!answers || typeof answers !== 'object' || Array.isArray(answers)) return clean;
+    let count = 0;
+    for (const [questionId, option] of Object.entries(answers)) {
+        if (Object.prototype.hasOwnProperty.call(saved, questionId)) continue;
+        if (Number.isInteger(option) && option >= 0 && count++ < MAX_ANSWERS) {
+            clean[questionId] = option;
+        }
+    }
+    return clean;
+}
+
+class CheckpointStore {
+    constructor(dir) {
+        this.dir = dir;
+        this.sessions = new Map(); // "studentId|subjectId" -> session
+        this.released = new Map(); // "studentId|subjectId" -> { resultId, at }, oldest first
+        this.fd = null;
+        this.size = 0;
+        this.rewriteAt = JOURNAL_MAX_BYTES; // Journal size that triggers a rewrite
+        this.rewriteWanted = false;
+        this.pending = [];    // { line, resolve, reject } waiting for the next flush
+        this.flushing = null;
+    }
+
+    get journalPath() {
+        return path.join(this.dir, JOURNAL_FILE);
+    }
+
+    open() {
+        fs.mkdirSync(this.dir, { recursive: true });
+        let text = '';
+        if (fs.existsSync(this.journalPath)) {
+            text = fs.readFileSync(this.journalPath, 'utf8');
+            for (const line of text.split('\n')) {
+                if (!line) continue;
+                try {
+                    this.replay(JSON.parse(line));
+                } catch (error) {
+                    // Cut off by a crash mid-append; it was never acknowledged
+                    console.warn('Checkpoints: skipping unreadable journal line');
+                }
+            }
+        }
+
+        // Drop a half-written last line before appending after it
+        const end = text.lastIndexOf('\n') + 1;
+        this.size = Buffer.byteLength(text.slice(0, end));
+        if (end < text.length) {
+            fs.truncateSync(this.journalPath, this.size);
+        }
+        this.fd = fs.openSync(this.journalPath, 'a');
+
+        // Start from a compact journal
+        this.forgetReleased(Date.now());
+        this.rewriteWanted = this.size > 0;
+        this.scheduleFlush();
+    }
+
+    replay(record) {
+        const separator = record.session.indexOf('|');
+        const studentId = record.session.slice(0, separator);
+        const subjectId = record.session.slice(separator + 1);
+        if (record.released !== undefined) {
+            this.sessions.delete(record.session);
+            this.released.delete(record.session);
+            // Lines written without a time keep it from now on
+            this.released.set(record.session, { resultId: record.released, at: record.at || Date.now() });
+            return;
+        }
+        const session = this.session(studentId, subjectId, record.at);
+        if (record.answers) {
+            Object.assign(session.answers, record.answers);
+            session.seq = Math.max(session.seq, record.seq || 0);
+            if (record.timeSpent !== undefined) session.timeSpent = record.timeSpent;
+        }
+        if (record.sealed !== undefined) session.sealed = record.sealed;
+        if (record.reopened) session.sealed = null;
+        session.updatedAt = record.at;
+        if (record.startedAt) session.startedAt = record.startedAt;
+    }
+
+    session(studentId, subjectId, now) {
+        const key = sessionKey(studentId, subjectId);
+        let session = this.sessions.get(key);
+        if (!session) {
+            session = {
+                studentId,
+                subjectId,
+                answers: {},
+                seq: 0,
+                timeSpent: null,
+                startedAt: now,
+                updatedAt: now,
+                sealed: null // resultId once submitted
+            };
+            this.sessions.set(key, session);
+        }
+        return session;
+    }
+
+    // Public view of a session, or null if there is none. A released session
+    // has no answers left.
+    get(studentId, subjectId) {
+        const key = sessionKey(studentId, subjectId);
+        if (this.released.has(key)) {
+            return {
+                studentId: String(studentId),
+                subjectId: String(subjectId),
+                answers: {},
+                answered: 0,
+                seq: 0,
+                timeSpent: null,
+                startedAt: null,
+                updatedAt: null,
+                sealed: true,
+                resultId: this.released.get(key).resultId
+            };
+        }
+        const session = this.sessions.get(key);
+        if (!session) return null;
+        return {
+            studentId: session.studentId,
+            subjectId: session.subjectId,
+            answers: { ...session.answers },
+            answered: Object.keys(session.answers).length,
+            seq: session.seq,
+            timeSpent: session.timeSpent,
+            startedAt: new Date(session.startedAt).toISOString(),
+            updatedAt: new Date(session.updatedAt).toISOString(),
+            sealed: session.sealed !== null,
+            resultId: session.sealed
+        };
+    }
+
+    // Merge answers locked since the last save; answers to questions that
+    // already have one are ignored. `seq` numbers the browser's saves; a
+    // retried or late delta (seq not above the last one) is ignored.
+    // Resolves with the session once the delta is on disk, with `locked`:
+    // the ids of the questions answered by this save.
+    async save(studentId, subjectId, { answers, seq = null, timeSpent = null } = {}) {
+        const now = Date.now();
+        const existing = this.sessions.get(sessionKey(studentId, subjectId));
+        if (this.released.has(sessionKey(studentId, subjectId)) || (existing && existing.sealed !== null)) {
+            throw checkpointError('Exam already submitted', 'SEALED');
+        }
+        if (existing && seq !== null && seq <= existing.seq) {
+            return { ...this.get(studentId, subjectId), ignored: true, locked: [] };
+        }
+
+        const session = this.session(studentId, subjectId, now);
+        const delta = cleanAnswers(answers, session.answers);
+        Object.assign(session.answers, delta);
+        if (seq !== null) session.seq = seq;
+        if (Number.isFinite(timeSpent)) session.timeSpent = timeSpent;
+        session.updatedAt = now;
+
+        await this.append({
+            session: sessionKey(studentId, subjectId),
+            answers: delta,
+            seq: session.seq,
+            timeSpent: session.timeSpent === null ? undefined : session.timeSpent,
+            at: now
+        });
+        return { ...this.get(studentId, subjectId), locked: Object.keys(delta) };
+    }
+
+    // Add the final delta (answers to questions not answered yet) and seal the session for grading. Rejects with
+    // code SEALED if it was already submitted. Resolves with the session.
+    async seal(studentId, subjectId, { answers, timeSpent = null, resultId }) {
+        const now = Date.now();
+        if (this.released.has(sessionKey(studentId, subjectId))) {
+            throw checkpointError('Exam already submitted', 'SEALED');
+        }
+        const session = this.session(studentId, subjectId, now);
+        if (session.sealed !== null) {
+            throw checkpointError('Exam already submitted', 'SEALED');
+        }
+
+        const delta = cleanAnswers(answers, session.answers);
+        Object.assign(session.answers, delta);
+        if (Number.isFinite(timeSpent)) session.timeSpent = timeSpent;
+        session.sealed = resultId;
+        session.updatedAt = now;
+
+        await this.append({
+            session: sessionKey(studentId, subjectId),
+            answers: delta,
+            seq: session.seq,
+            timeSpent: session.timeSpent === null ? undefined : session.timeSpent,
+            sealed: resultId,
+            at: now
+        });
+        return this.get(studentId, subjectId);
+    }
+
+    // Undo seal() when the result could not be saved, so the student can
+    // submit again
+    async reopen(studentId, subjectId) {
+        const session = this.sessions.get(sessionKey(studentId, subjectId));
+        if (!session || session.sealed === null) return;
+        session.sealed = null;
+        session.updatedAt = Date.now();
+        await this.append({ session: sessionKey(studentId, subjectId), reopened: true, at: session.updatedAt });
+    }
+
+    // The sealed session's result is saved: drop its answers, keeping only
+    // its result id so it stays submitted
+    async release(studentId, subjectId) {
+        const key = sessionKey(studentId, subjectId);
+        const session = this.sessions.get(key);
+        if (!session || session.sealed === null) return;
+        const now = Date.now();
+        this.sessions.delete(key);
+        this.released.set(key, { resultId: session.sealed, at: now });
+        this.forgetReleased(now);
+        await this.append({ session: key, released: session.sealed, at: now });
+    }
+
+    // Drop released sessions past RELEASED_KEEP_MS or RELEASED_MAX; the next
+    // journal rewrite leaves them out
+    forgetReleased(now) {
+        for (const [key, { at }] of this.released) {
+            if (at > now - RELEASED_KEEP_MS && this.released.size <= RELEASED_MAX) break;
+            this.released.delete(key);
+        }
+    }
+
+    append(record) {
+        if (this.fd === null) {
+            this.open();
+        }
+        return new Promise((resolve, reject) => {
+            this.pending.push({ line: JSON.stringify(record) + '\n', resolve, reject });
+            this.scheduleFlush();
+        });
+    }
+
+    scheduleFlush() {
+        if (this.flushing) return; // The running flush picks up new lines
+        this.flushing = new Promise(done => setImmediate(done))
+            .then(() => this.flushPending())
+            .finally(() => {
+                this.flushing = null;
+                // Appended after the loop saw an empty queue
+                if (this.pending.length > 0 || this.rewriteWanted) {
+                    this.scheduleFlush();
+                }
+            });
+    }
+
+    // Write queued lines in batches until the queue is empty, rewriting the
+    // journal between batches when it is due
+    async flushPending() {
+        while (this.pending.length > 0 || this.rewriteWanted) {
+            if (this.rewriteWanted) {
+                this.rewriteWanted = false;
+                try {
+                    await this.rewrite();
+                } catch (error) {
+                    console.error('Checkpoint journal rewrite failed:', error);
+                }
+                continue;
+            }
+
+            const batch = this.pending;
+            this.pending = [];
+            const buffer = Buffer.from(batch.map(item => item.line).join(''), 'utf8');
+
+            try {
+                let offset = 0;
+                while (offset < buffer.length) {
+                    const { bytesWritten } = await fsWrite(this.fd, buffer, offset, buffer.length - offset);
+                    offset += bytesWritten;
+                }
+                await fsFsync(this.fd);
+                this.size += buffer.length;
+                batch.forEach(item => item.resolve());
+            } catch (error) {
+                batch.forEach(item => item.reject(error));
+            }
+
+            if (this.size >= this.rewriteAt) {
+                this.rewriteWanted = true;
+            }
+        }
+    }
+
+    // Replace the journal with one line per session (the in-memory state).
+    // Only called from the flush loop, so no append runs meanwhile; lines
+    // queued for the next batch are replayed on top of it, which changes
+    // nothing.
+    async rewrite() {
+        const lines = [];
+        for (const [key, session] of this.sessions) {
+            const line = {
+                session: key,
+                answers: session.answers,
+                seq: session.seq,
+                timeSpent: session.timeSpent === null ? undefined : session.timeSpent,
+                startedAt: session.startedAt,
+                at: session.updatedAt
+            };
+            if (session.sealed !== null) line.sealed = session.sealed;
+            lines.push(JSON.stringify(line) + '\n');
+        }
+        this.forgetReleased(Date.now());
+        for (const [key, { resultId, at }] of this.released) {
+            lines.push(JSON.stringify({ session: key, released: resultId, at }) + '\n');
+        }
+        const text = lines.join('');
+
+        const tmpFile = this.journalPath + '.tmp';
+        const handle = await fs.promises.open(tmpFile, 'w');
+        try {
+            await handle.writeFile(text, 'utf8');
+            await handle.sync();
+        } finally {
+            await handle.close();
+        }
+        await fs.promises.rename(tmpFile, this.journalPath);
+
+        const previous = this.fd;
+        this.fd = await fsOpen(this.journalPath, 'a');
+        this.size = Buffer.byteLength(text);
+        // Sessions still open take up the journal's room: let it grow to
+        // twice their size before the next rewrite
+        this.rewriteAt = Math.max(JOURNAL_MAX_BYTES, this.size * 2);
+        if (previous !== null) {
+            await fsClose(previous);
+        }
+    }
+
+    // Wait for queued changes to reach disk (used on shutdown)
+    async drain() {
+        while (this.flushing) {
+            await this.flushing;
+        }
+    }
+}
+
+module.exports = { CheckpointStore };
@@ -0,0 +1,423 @@
+const { EventEmitter } = require('events');
+const { ResultsStore } = require('./results-store');
+const { jobSummary, MAX_FINISHED_JOBS } = require('./ingest-pool');
+const { SnapshotStore } = require('./snapshot-store');
+const { QuestionVersions } = require('./question-versions');
+const { LiveEvents } = require('./live-events');
+
+// Worker side of cluster mode (see cluster.js)
+//
+// A cluster worker serves HTTP requests but never writes a data file itself.
+// The classes here stand in for the single-process stores in server.js with
+// the same methods, and forward every change to the owner process:
+//
+//   ClusterStorage    data/*.json        reads from a local copy of the
+//                                        owner's documents, writes go to
+//                                        the owner (and are refused if
+//                                        made on an outdated copy)
+//   ResultsClient     data/results/      appends go to the owner, reads come
+//                                        straight from the log files
+//   LogClient         data/logs/         entries and queries go to the owner
+//   IngestClient      uploads            jobs run on the owner's parser
+//                                        pool; their progress is mirrored
+//   CheckpointClient  data/checkpoints/  saved answers live on the owner
+//   SnapshotClient    data/snapshots/    snapshots are taken by the owner,
+//                                        read straight from the files
+//   VersionsClient    data/question-versions/
+//                                        new versions are written by the
+//                                        owner, read straight from the files
+//   LiveClient        live events        numbered by the owner, served to
+//                                        this worker's admin tabs
+//
+// Messages to the owner are { rpc, op, args } (answered with { rpc, result }
+// or { rpc, error }) or { op, args } when no answer is needed. The owner
+// sends every change to every worker as { event, ... }, in the order it
+// applied them, so all workers end up with the owner's documents.
+
+class OwnerChannel extends EventEmitter {
+    constructor(proc = process) {
+        super();
+        this.setMaxListeners(0);
+        this.proc = proc;
+        this.nextId = 1;
+        this.calls = new Map(); // rpc id -> { resolve, reject }
+
+        proc.on('message', (message) => this.onMessage(message));
+        // Without the owner nothing can be saved
+        proc.on('disconnect', () => {
+            console.error('Storage owner process is gone, stopping worker');
+            process.exit(1);
+        });
+    }
+
+    // Run an operation on the owner; resolves with its result
+    call(op, ...args) {
+        return new Promise((resolve, reject) => {
+            const id = this.nextId++;
+            this.calls.set(id, { resolve, reject });
+            this.proc.send({ rpc: id, op, args });
+        });
+    }
+
+    // Fire-and-forget operation
+    notify(op, ...args) {
+        this.proc.send({ op, args });
+    }
+
+    onMessage(message) {
+        if (!message || typeof message !== 'object') return;
+
+        if (message.rpc !== undefined) {
+            const call = this.calls.get(message.rpc);
+            if (!call) return;
+            this.calls.delete(message.rpc);
+            if (message.error) {
+                const error = new Error(message.error.message);
+                error.code = message.error.code;
+                call.reject(error);
+            } else {
+                call.resolve(message.result);
+            }
+        } else if (message.event) {
+            this.emit(message.event, message);
+        }
+    }
+}
+
+// Stand-in for JSONStorage (storage.js)
+class ClusterStorage extends EventEmitter {
+    constructor(channel) {
+        super();
+        this.channel = channel;
+        this.workerId = require('cluster').worker.id;
+        this.docs = new Map();    // filepath -> document
+        this.versions = new Map(); // filepath -> owner's version of the last change seen
+        this.writing = new Map(); // filepath -> own writes the owner has not echoed yet
+
+        channel.on('replace', (message) => this.onReplace(message));
+        channel.on('append', (message) => this.onAppend(message));
+    }
+
+    // Fetch the owner's documents (before serving requests)
+    async preload(filepaths) {
+        // Taken as soon as it arrives, so the changes right behind it apply
+        this.channel.once('snapshot', ({ docs, versions }) => {
+            for (const filepath of filepaths) {
+                this.docs.set(filepath, docs[filepath]);
+                this.versions.set(filepath, versions[filepath]);
+            }
+        });
+        await this.channel.call('snapshot', filepaths);
+    }
+
+    // The owner is the one that cleans up after a crash
+    recover() {}
+
+    read(filepath) {
+        return this.docs.has(filepath) ? this.docs.get(filepath) : null;
+    }
+
+    // Replace a document here at once and on the owner. Resolves true once
+    // the owner has it on disk, false if the owner changed the document
+    // since the copy it was made on (the copy is then replaced by the
+    // owner's).
+    write(filepath, data) {
+        // Made on the last change seen here and our own writes before it
+        const pending = this.writing.get(filepath) || 0;
+        const base = (this.versions.get(filepath) || 0) + pending;
+        this.docs.set(filepath, data);
+        this.writing.set(filepath, pending + 1);
+        this.emit('change', filepath, data);
+        return this.channel.call('write', filepath, data, base, pending).catch(error => {
+            if (error.code === 'STALE') {
+                // The owner sent its document in place of the echo
+                console.warn('Write refused, changed meanwhile:', filepath);
+                return false;
+            }
+            // Refused by the owner, so no echo is coming
+            this.writing.set(filepath, this.writing.get(filepath) - 1);
+            if (this.writing.get(filepath) === 0) this.writing.delete(filepath);
+            console.error('Error writing file:', filepath, error);
+            return false;
+        });
+    }
+
+    update(filepath, mutate) {
+        const current = this.read(filepath);
+        const result = mutate(current);
+        return this.write(filepath, result === undefined ? current : result);
+    }
+
+    // Appends are applied by the owner, so two workers registering students
+    // at once both keep their item; it shows up here with the owner's echo
+    append(filepath, item) {
+        return this.channel.call('append', filepath, item).catch(error => {
+            console.error('Error writing file:', filepath, error);
+            return false;
+        });
+    }
+
+    appendAll(filepath, items) {
+        return this.channel.call('appendAll', filepath, items).catch(error => {
+            console.error('Error writing file:', filepath, error);
+            return false;
+        });
+    }
+
+    // Changes arriving while one of our own writes is on its way were applied
+    // by the owner before that write, which replaces them; the echo of our
+    // last write is the owner's document again
+    onReplace({ file, data, origin, version }) {
+        if (!this.docs.has(file)) return; // Not loaded yet; preload gets the owner's copy
+        this.versions.set(file, version);
+        const pending = this.writing.get(file) || 0;
+        if (origin === this.workerId) {
+            if (pending > 1) {
+                this.writing.set(file, pending - 1);
+                return;
+            }
+            this.writing.delete(file);
+        } else if (pending > 0) {
+            return;
+        }
+        this.docs.set(file, data);
+        this.emit('change', file, data);
+    }
+
+    onAppend({ file, item, items, version }) {
+        if (!this.docs.has(file)) return;
+        this.versions.set(file, version);
+        if (this.writing.has(file)) return;
+        let list = this.docs.get(file);
+        if (!Array.isArray(list)) {
+            list = [];
+            this.docs.set(file, list);
+        }
+        for (const added of items || [item]) list.push(added);
+        this.emit('change', file, list);
+    }
+
+    async flushAll() {}
+}
+
+// Stand-in for ResultsStore (results-store.js). Emits 'append' for every
+// result saved by any worker.
+class ResultsClient extends EventEmitter {
+    constructor(channel, dir, legacyFile) {
+        super();
+        this.channel = channel;
+        this.reader = new ResultsStore(dir, legacyFile); // Never opened for writing
+        channel.on('result', ({ result }) => this.emit('append', result));
+    }
+
+    open() {}
+
+    // Resolves once the owner has the result on disk
+    async append(result) {
+        await this.channel.call('results.append', result);
+    }
+
+    stream() {
+        return this.reader.stream();
+    }
+
+    async drain() {}
+}
+
+// Stand-in for LogStore (log-store.js)
+class LogClient {
+    constructor(channel) {
+        this.channel = channel;
+    }
+
+    open() {}
+
+    add(type, message, data = null) {
+        this.channel.notify('log', type, message, data);
+    }
+
+    report(options) {
+        return this.channel.call('logs.report', options);
+    }
+
+    clearAll() {
+        return this.channel.call('logs.clear');
+    }
+
+    async drain() {}
+}
+
+// Stand-in for IngestPool (ingest-pool.js): same jobs, events and status
+// views, kept up to date from the owner's pool
+class IngestClient extends EventEmitter {
+    constructor(channel) {
+        super();
+        this.setMaxListeners(0); // One listener per streaming client
+        this.channel = channel;
+        this.jobs = new Map();
+        this.waiters = new Map(); // jobId -> [resolve]
+
+        channel.on('ingest.update', ({ job }) => this.onUpdate(job));
+        channel.on('ingest.questions', ({ jobId, questions }) => {
+            const job = this.jobs.get(jobId);
+            if (!job) return;
+            job.questions.push(...questions);
+            this.emit('questions', job, questions);
+        });
+    }
+
+    // Resolves with the job once the owner has queued it
+    async submit(spec) {
+        const { id } = await this.channel.call('ingest.submit', spec);
+        return this.jobs.get(id);
+    }
+
+    onUpdate(state) {
+        let job = this.jobs.get(state.id);
+        if (!job) {
+            job = { questions: [] };
+            this.jobs.set(state.id, job);
+        }
+        const { questionsParsed, ...fields } = state;
+        Object.assign(job, fields);
+        this.emit('update', job);
+
+        if (job.status === 'done' || job.status === 'failed') {
+            (this.waiters.get(job.id) || []).forEach(resolve => resolve(job));
+            this.waiters.delete(job.id);
+            this.prune();
+        }
+    }
+
+    get(jobId) {
+        return this.jobs.get(jobId) || null;
+    }
+
+    list() {
+        return [...this.jobs.values()];
+    }
+
+    wait(jobId) {
+        const job = this.get(jobId);
+        if (!job) return Promise.resolve(null);
+        if (job.status === 'done' || job.status === 'failed') return Promise.resolve(job);
+
+        return new Promise(resolve => {
+            if (!this.waiters.has(jobId)) {
+                this.waiters.set(jobId, []);
+            }
+            this.waiters.get(jobId).push(resolve);
+        });
+    }
+
+    summary(job) {
+        return jobSummary(job);
+    }
+
+    prune() {
+        const finished = this.list().filter(job => job.finishedAt);
+        for (const job of finished.slice(0, Math.max(0, finished.length - MAX_FINISHED_JOBS))) {
+            this.jobs.delete(job.id);
+        }
+    }
+}
+
+// Stand-in for CheckpointStore (checkpoint-store.js); every method resolves
+// with the owner's answer
+class CheckpointClient {
+    constructor(channel) {
+        this.channel = channel;
+    }
+
+    open() {}
+
+    get(studentId, subjectId) {
+        return this.channel.call('checkpoints.get', studentId, subjectId);
+    }
+
+    save(studentId, subjectId, change) {
+        return this.channel.call('checkpoints.save', studentId, subjectId, change);
+    }
+
+    seal(studentId, subjectId, final) {
+        return this.channel.call('checkpoints.seal', studentId, subjectId, final);
+    }
+
+    reopen(studentId, subjectId) {
+        return this.channel.call('checkpoints.reopen', studentId, subjectId);
+    }
+
+    release(studentId, subjectId) {
+        return this.channel.call('checkpoints.release', studentId, subjectId);
+    }
+
+    async drain() {}
+}
+
+// Stand-in for SnapshotStore (snapshot-store.js): listing, diffs, exports
+// and restores read the snapshot files here
+class SnapshotClient extends SnapshotStore {
+    constructor(channel, dir) {
+        super(dir);
+        this.channel = channel;
+    }
+
+    open() {}
+
+    create(options) {
+        return this.channel.call('snapshots.create', options);
+    }
+
+    prune(reason, keep) {
+        return this.channel.call('snapshots.prune', reason, keep);
+    }
+}
+
+// Stand-in for QuestionVersions (question-versions.js)
+class VersionsClient extends QuestionVersions {
+    constructor(channel, dir) {
+        super(dir);
+        this.channel = channel;
+    }
+
+    write(hash, text) {
+        return this.channel.call('versions.write', hash, text);
+    }
+}
+
+// Stand-in for LiveEvents (live-events.js): events go to the owner, which
+// numbers them and sends every event back to every worker
+class LiveClient extends LiveEvents {
+    constructor(channel) {
+        super(null);
+        this.channel = channel;
+        channel.on('live', ({ item }) => {
+            this.nextSeq = item.seq + 1;
+            this.push(item);
+        });
+    }
+
+    // Take the owner's recent events (before serving requests)
+    async preload() {
+        const { stream, nextSeq, events } = await this.channel.call('live.recent');
+        this.stream = stream;
+        this.nextSeq = nextSeq;
+        this.buffer = events;
+    }
+
+    publish(type, data) {
+        this.channel.notify('live.publish', type, data);
+    }
+}
+
+module.exports = {
+    OwnerChannel,
+    ClusterStorage,
+    ResultsClient,
+    LogClient,
+    IngestClient,
+    CheckpointClient,
+    SnapshotClient,
+    VersionsClient,
+    LiveClient
+};
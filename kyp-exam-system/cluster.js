@@ -0,0 +1,409 @@
+const cluster = require('cluster');
+const fs = require('fs');
+const os = require('os');
+const path = require('path');
+const { JSONStorage } = require('./storage');
+const { ResultsStore } = require('./results-store');
+const { LogStore } = require('./log-store');
+const { IngestPool, jobSummary } = require('./ingest-pool');
+const { addUploadedQuestions } = require('./question-bank');
+const { DuplicateIndex } = require('./duplicate-index');
+const { CheckpointStore } = require('./checkpoint-store');
+const { SnapshotStore, scheduleSnapshots } = require('./snapshot-store');
+const { QuestionVersions } = require('./question-versions');
+const { LiveEvents } = require('./live-events');
+const metricsLib = require('./metrics');
+const { MAX_WORKERS } = require('./id-generator');
+
+// Multi-core cluster mode:  node cluster.js   (or npm run cluster)
+//
+// Starts KYP_WORKERS copies of server.js (default: one per CPU core) that
+// share the server port, so question papers, pages and grading for an exam
+// hall are served by every core instead of queuing on one event loop.
+//
+// This process is the storage owner: the only one that writes the data
+// files. Workers keep the JSON documents in memory and send every change
+// here (see cluster-client.js); this process applies them one at a time to
+// its own stores, saves them, and passes each change on to every worker.
+// Registrations and results are sent as single items (an imported roster as
+// one batch), so workers saving at the same moment never lose each other's
+// students or results. Admin edits that replace a whole document (subjects,
+// questions, deleting students) name the version of the document they were
+// made on: every change applied here bumps the file's version, and a
+// replacement made on an older one is refused (the worker gets the current
+// document back and the edit fails), so it can't undo a registration or an
+// upload saved in between.
+//
+// Question uploads are parsed on this process's ingest pool, and snapshots
+// are taken here; results, answer checkpoints, server logs and analytics
+// work the same as in single-process mode. Metrics are gathered from every
+// process when a worker is asked for them, and live events for the admin
+// panel are numbered here and passed on to every worker.
+// Workers that crash are restarted.
+
+const DATA_DIR = path.join(__dirname, 'data');
+const DATA_FILES = new Set(['subjects.json', 'questions.json', 'students.json', 'admin.json']
+    .map(name => path.join(DATA_DIR, name)));
+const QUESTIONS_FILE = path.join(DATA_DIR, 'questions.json');
+const RESULTS_FILE = path.join(DATA_DIR, 'results.json'); // Legacy, read until migrated
+const RESULTS_DIR = path.join(DATA_DIR, 'results');
+const IMAGES_DIR = path.join(DATA_DIR, 'images');
+
+const WORKERS = Math.min(parseInt(process.env.KYP_WORKERS) || os.cpus().length, MAX_WORKERS);
+const RESTART_DELAY_MS = 1000;
+const METRICS_TIMEOUT_MS = 2000; // Workers that have not answered by then are left out
+
+const dataStore = new JSONStorage();
+const resultsStore = new ResultsStore(RESULTS_DIR, RESULTS_FILE);
+const serverLogs = new LogStore(path.join(DATA_DIR, 'logs'));
+const checkpoints = new CheckpointStore(path.join(DATA_DIR, 'checkpoints'));
+const questionVersions = new QuestionVersions(path.join(DATA_DIR, 'question-versions'));
+const snapshots = new SnapshotStore(path.join(DATA_DIR, 'snapshots'), {
+    storage: dataStore,
+    documents: {
+        subjects: path.join(DATA_DIR, 'subjects.json'),
+        questions: QUESTIONS_FILE,
+        students: path.join(DATA_DIR, 'students.json')
+    },
+    resultsDir: RESULTS_DIR,
+    legacyResultsFile: RESULTS_FILE,
+    versionsDir: path.join(DATA_DIR, 'question-versions')
+});
+
+// Storage, results and upload metrics of this process (see metrics.js)
+const metrics = new metricsLib.Registry();
+metricsLib.processMetrics(metrics);
+metricsLib.storageMetrics(metrics, dataStore);
+metricsLib.resultsMetrics(metrics, resultsStore);
+
+const metricsRequests = new Map(); // id -> { waiting, sources, done }
+let nextMetricsRequest = 1;
+
+// This process's metrics and every worker's, labelled by process
+function gatherMetrics() {
+    const id = nextMetricsRequest++;
+    const workers = Object.values(cluster.workers).filter(worker => worker.isConnected());
+
+    return new Promise(resolve => {
+        const request = {
+            waiting: new Set(workers.map(worker => worker.id)),
+            sources: [{ process: 'owner', families: metrics.collect() }],
+            done: () => {
+                clearTimeout(timer);
+                metricsRequests.delete(id);
+                resolve(metricsLib.mergeFamilies(request.sources));
+            }
+        };
+        const timer = setTimeout(request.done, METRICS_TIMEOUT_MS);
+        metricsRequests.set(id, request);
+
+        if (workers.length === 0) return request.done();
+        workers.forEach(worker => worker.send({ event: 'metrics.request', id }));
+    });
+}
+
+function broadcast(message) {
+    for (const worker of Object.values(cluster.workers)) {
+        if (worker.isConnected()) worker.send(message);
+    }
+}
+
+const liveEvents = new LiveEvents();
+
+function publishLive(type, data) {
+    broadcast({ event: 'live', item: liveEvents.publish(type, data) });
+}
+
+// Server log entry, also published to the admin panel
+function addLog(type, message, data = null) {
+    publishLive('log', serverLogs.format(serverLogs.add(type, message, data)));
+}
+
+function checkFile(filepath) {
+    if (!DATA_FILES.has(filepath)) {
+        throw new Error(`Not a data file: ${filepath}`);
+    }
+}
+
+// Changes applied to each data file so far (sent with every change)
+const versions = new Map(); // filepath -> number
+// "workerId|filepath" of workers whose last write was refused: their writes
+// sent on top of it are refused as well
+const refusedWrites = new Set();
+
+function bumpVersion(filepath) {
+    const version = (versions.get(filepath) || 0) + 1;
+    versions.set(filepath, version);
+    return version;
+}
+
+// Save a whole document and hand it to every worker (origin 0: this process)
+function writeDocument(filepath, data, origin) {
+    const saved = dataStore.write(filepath, data);
+    broadcast({ event: 'replace', file: filepath, data, origin, version: bumpVersion(filepath) });
+    return saved;
+}
+
+const duplicateIndex = new DuplicateIndex(path.join(DATA_DIR, 'question-index.json'));
+
+// Uploads are committed here, the same way server.js does on its own
+async function commitIngestedQuestions(job) {
+    const allQuestions = dataStore.read(QUESTIONS_FILE) || {};
+    const preview = addUploadedQuestions(allQuestions, job.subjectId, job.language, job.questions, duplicateIndex);
+    if (!await writeDocument(QUESTIONS_FILE, allQuestions, 0)) {
+        throw new Error('Failed to save questions to database');
+    }
+    try {
+        duplicateIndex.save();
+    } catch (error) {
+        console.error('Error saving question index:', error);
+    }
+    return preview;
+}
+
+const ingestPool = new IngestPool({ commit: commitIngestedQuestions, imagesDir: IMAGES_DIR });
+metricsLib.ingestMetrics(metrics, ingestPool);
+
+ingestPool.on('update', (job) => {
+    broadcast({ event: 'ingest.update', job: { ...jobSummary(job), result: job.result, textPreview: job.textPreview } });
+    publishLive('ingest', jobSummary(job));
+});
+ingestPool.on('questions', (job, questions) => {
+    broadcast({ event: 'ingest.questions', jobId: job.id, questions });
+});
+
+// Every saved result goes to every worker's analytics
+resultsStore.on('append', (result) => {
+    broadcast({ event: 'result', result });
+});
+
+// Operations workers can ask for, applied in arrival order
+const operations = {
+    // Sent as an event, in line with the changes broadcast around it
+    snapshot(worker, filepaths) {
+        const docs = {};
+        const docVersions = {};
+        for (const filepath of filepaths) {
+            checkFile(filepath);
+            docs[filepath] = dataStore.read(filepath);
+            docVersions[filepath] = versions.get(filepath) || 0;
+        }
+        worker.send({ event: 'snapshot', docs, versions: docVersions });
+        return true;
+    },
+
+    // base: the version the worker's document was made on; after: how many
+    // of its own writes it sent before this one without seeing them back
+    write(worker, filepath, data, base, after = 0) {
+        checkFile(filepath);
+        const version = versions.get(filepath) || 0;
+        const chain = `${worker.id}|${filepath}`;
+        if (after === 0) refusedWrites.delete(chain);
+        if (base !== version || refusedWrites.has(chain)) {
+            refusedWrites.add(chain);
+            // Stands in for the echo of the write, so the worker's copy is
+            // the current document again
+            worker.send({ event: 'replace', file: filepath, data: dataStore.read(filepath), origin: worker.id, version });
+            const error = new Error(`${path.basename(filepath)} was changed meanwhile`);
+            error.code = 'STALE';
+            throw error;
+        }
+        return writeDocument(filepath, data, worker.id);
+    },
+
+    append(worker, filepath, item) {
+        checkFile(filepath);
+        const saved = dataStore.append(filepath, item);
+        broadcast({ event: 'append', file: filepath, item, origin: worker.id, version: bumpVersion(filepath) });
+        return saved;
+    },
+
+    appendAll(worker, filepath, items) {
+        checkFile(filepath);
+        const saved = dataStore.appendAll(filepath, items);
+        broadcast({ event: 'append', file: filepath, items, origin: worker.id, version: bumpVersion(filepath) });
+        return saved;
+    },
+
+    'results.append'(worker, result) {
+        return resultsStore.append(result).then(() => true);
+    },
+
+    'checkpoints.get'(worker, studentId, subjectId) {
+        return checkpoints.get(studentId, subjectId);
+    },
+
+    'checkpoints.save'(worker, studentId, subjectId, change) {
+        return checkpoints.save(studentId, subjectId, change);
+    },
+
+    'checkpoints.seal'(worker, studentId, subjectId, final) {
+        return checkpoints.seal(studentId, subjectId, final);
+    },
+
+    'checkpoints.reopen'(worker, studentId, subjectId) {
+        return checkpoints.reopen(studentId, subjectId);
+    },
+
+    'checkpoints.release'(worker, studentId, subjectId) {
+        return checkpoints.release(studentId, subjectId);
+    },
+
+    // Checked against its hash before it is written
+    'versions.write'(worker, hash, text) {
+        return questionVersions.write(hash, text);
+    },
+
+    'snapshots.create'(worker, options) {
+        return snapshots.create(options);
+    },
+
+    'snapshots.prune'(worker, reason, keep) {
+        return snapshots.prune(reason, keep);
+    },
+
+    'metrics.gather'() {
+        return gatherMetrics();
+    },
+
+    'metrics.reply'(worker, id, families) {
+        const request = metricsRequests.get(id);
+        if (!request || !request.waiting.delete(worker.id)) return;
+        request.sources.push({ process: `worker-${worker.id}`, families });
+        if (request.waiting.size === 0) request.done();
+    },
+
+    profile(worker, seconds) {
+        return metricsLib.captureCpuProfile(path.join(DATA_DIR, 'profiles'), seconds);
+    },
+
+    log(worker, type, message, data) {
+        addLog(type, message, data);
+    },
+
+    'live.publish'(worker, type, data) {
+        publishLive(type, data);
+    },
+
+    'live.recent'() {
+        return liveEvents.recent();
+    },
+
+    'logs.report'(worker, options) {
+        return serverLogs.report(options);
+    },
+
+    'logs.clear'() {
+        return serverLogs.clearAll();
+    },
+
+    'ingest.submit'(worker, spec) {
+        return jobSummary(ingestPool.submit(spec));
+    }
+};
+
+function onMessage(worker, message) {
+    if (!message || typeof message.op !== 'string') return;
+
+    const reply = (answer) => {
+        if (message.rpc !== undefined && worker.isConnected()) {
+            worker.send({ rpc: message.rpc, ...answer });
+        }
+    };
+    const replyError = (error) => {
+        console.error(`Cluster operation ${message.op} failed:`, error);
+        reply({ error: { message: error.message, code: error.code || null } });
+    };
+
+    const operation = operations[message.op];
+    if (!operation) {
+        return replyError(new Error(`Unknown operation: ${message.op}`));
+    }
+
+    // Run synchronously so changes are applied (and broadcast) in the order
+    // they arrived; only the reply waits for the disk
+    let result;
+    try {
+        result = operation(worker, ...(message.args || []));
+    } catch (error) {
+        return replyError(error);
+    }
+    Promise.resolve(result).then(value => reply({ result: value }), replyError);
+}
+
+let shuttingDown = false;
+
+// Id generator node of each running worker (see id-generator.js)
+const workerNodes = new Map(); // worker.id -> node
+
+// Start a worker on the lowest node no running worker holds, which is the
+// node of the last one that stopped
+function fork() {
+    const used = new Set(workerNodes.values());
+    let node = 1;
+    while (used.has(node)) node++;
+    const worker = cluster.fork({ KYP_CLUSTER_WORKER: '1', KYP_NODE_ID: String(node) });
+    workerNodes.set(worker.id, node);
+    return worker;
+}
+
+function start() {
+    if (!fs.existsSync(DATA_DIR)) {
+        fs.mkdirSync(DATA_DIR, { recursive: true });
+    }
+    dataStore.recover(DATA_DIR);
+    resultsStore.open();
+    checkpoints.open();
+    serverLogs.open();
+    snapshots.open();
+    scheduleSnapshots(snapshots);
+
+    cluster.setupPrimary({
+        exec: path.join(__dirname, 'server.js'),
+        serialization: 'advanced'
+    });
+    cluster.on('message', onMessage);
+
+    cluster.on('exit', (worker, code, signal) => {
+        workerNodes.delete(worker.id);
+        if (shuttingDown) return;
+        const reason = signal || `exit code ${code}`;
+        addLog('error', `Worker ${worker.process.pid} stopped (${reason}), restarting`);
+        console.error(`❌ Worker ${worker.process.pid} stopped (${reason}), restarting`);
+        setTimeout(() => {
+            if (!shuttingDown) fork();
+        }, RESTART_DELAY_MS);
+    });
+
+    // The first worker creates any missing data files before the rest start
+    console.log(`🖥️  Storage owner ${process.pid} starting ${WORKERS} workers`);
+    fork().once('listening', () => {
+        for (let i = 1; i < WORKERS; i++) {
+            fork();
+        }
+    });
+}
+
+// Stop the workers, then finish pending writes
+['SIGINT', 'SIGTERM'].forEach(signal => {
+    process.on(signal, async () => {
+        if (shuttingDown) return;
+        shuttingDown = true;
+        console.log('\nStopping workers and saving pending data...');
+
+        const workers = Object.values(cluster.workers);
+        await Promise.race([
+            Promise.all(workers.map(worker => new Promise(resolve => {
+                if (worker.isDead()) return resolve();
+                worker.once('exit', resolve);
+                worker.process.kill('SIGTERM');
+            }))),
+            new Promise(resolve => setTimeout(resolve, 5000))
+        ]);
+
+        await Promise.all([dataStore.flushAll(), resultsStore.drain(), checkpoints.drain(), serverLogs.drain()]);
+        process.exit(0);
+    });
+});
+
+start();
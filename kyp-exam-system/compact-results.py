@@ -0,0 +1,201 @@
+"""Convert stored results to the compact format that references question versions.
+
+Results used to copy every question's text and the chosen and correct
+option into a `details` list. A compact result keeps the chosen option of
+each question as an `answers` list in bank order (-1 not answered, -2
+answered but the choice was not recorded) and the hash of the question bank
+version in data/question-versions/ it was graded on (see
+question-versions.js).
+
+Results that match the subject's current questions (same ids, text and
+marks, in the same order) reference a version of the current bank. Others
+were graded on questions that have since changed; for those a version is
+rebuilt from their own details (the correct option plus the wrong answers
+students gave). A result is only converted if its details can be rebuilt
+exactly; the rest are kept as they are.
+
+Usage:
+    python compact-results.py              # convert results.json and every segment
+    python compact-results.py --dry-run    # only report what would change
+
+Stop the server before running this - it rewrites the results log.
+"""
+import argparse
+import json
+import os
+
+from kyp_data import (DATA_DIR, NOT_ANSWERED, NOT_RECORDED, RESULTS_DIR,
+                      RESULTS_FILE, build_details, iter_results, list_segments,
+                      load_json, recover_compaction, replace_segments,
+                      save_version, segment_name, version_hash)
+
+
+def file_size(path):
+    return os.path.getsize(path) if os.path.exists(path) else 0
+
+
+def matches_bank(details, bank):
+    return len(details) == len(bank) and all(
+        d.get('questionId') == q.get('id') and d.get('question') == q.get('question')
+        and d.get('totalMarks') == q.get('marks')
+        for d, q in zip(details, bank))
+
+
+def choice(detail, question):
+    """Chosen option index of a detail row, or None if it can't be told."""
+    user_answer = detail.get('userAnswer')
+    if user_answer == 'Not Answered':
+        return NOT_ANSWERED
+    if user_answer is None:
+        # Bilingual questions used to lose the choice; only right or wrong is known
+        return question.get('correct') if detail.get('isCorrect') else NOT_RECORDED
+    options = question.get('options')
+    if isinstance(options, dict):
+        options = options.get('hi') or options.get('en') or []
+    for index, option in enumerate(options or []):
+        if option == user_answer and (index == question.get('correct')) == bool(detail.get('isCorrect')):
+            return index
+    return None
+
+
+def answers_for(details, questions):
+    answers = []
+    for detail, question in zip(details, questions):
+        answer = choice(detail, question)
+        if answer is None:
+            return None
+        answers.append(answer)
+    return answers
+
+
+def rebuilds(details, questions, answers):
+    """True if the compact form gives back every stored detail field."""
+    rebuilt = build_details(questions, answers)
+    return all(all(row.get(key) == value for key, value in original.items())
+               for original, row in zip(details, rebuilt))
+
+
+def question_key(detail):
+    return json.dumps([detail.get('questionId'), detail.get('question'),
+                       detail.get('totalMarks'), detail.get('correctAnswer')],
+                      ensure_ascii=False, sort_keys=True)
+
+
+def rebuilt_questions(details, wrong_answers):
+    """Questions recovered from a result's own details, or None.
+
+    Bilingual questions used to be stored without any option text; their
+    options stay empty and only right or wrong is kept.
+    """
+    questions = []
+    for detail in details:
+        correct = detail.get('correctAnswer')
+        wrong = wrong_answers.get(question_key(detail), set())
+        if isinstance(correct, str):
+            options = [correct] + sorted(wrong - {correct})
+        elif not wrong:
+            options = []
+        else:
+            return None
+        questions.append({
+            'id': detail.get('questionId'),
+            'question': detail.get('question'),
+            'options': options,
+            'correct': 0,
+            'marks': detail.get('totalMarks'),
+        })
+    return questions
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Convert KYP results to the compact format')
+    parser.add_argument('--data-dir', default=DATA_DIR, help='data directory (default: ./data)')
+    parser.add_argument('--dry-run', action='store_true', help='report only, change nothing')
+    args = parser.parse_args()
+
+    legacy = os.path.join(args.data_dir, RESULTS_FILE)
+    results_dir = os.path.join(args.data_dir, RESULTS_DIR)
+    os.makedirs(results_dir, exist_ok=True)
+    recover_compaction(args.data_dir)
+
+    questions_path = os.path.join(args.data_dir, 'questions.json')
+    all_questions = load_json(questions_path) if os.path.exists(questions_path) else {}
+    segments = list_segments(results_dir)
+    has_legacy = os.path.exists(legacy)
+    records = list(iter_results(args.data_dir))
+
+    # Wrong answers given to each (unchanged) question, to rebuild the
+    # options of questions that have been edited since
+    wrong_answers = {}
+    for record in records:
+        for detail in record.get('details') or []:
+            user_answer = detail.get('userAnswer')
+            if isinstance(user_answer, str) and user_answer != 'Not Answered' and not detail.get('isCorrect'):
+                wrong_answers.setdefault(question_key(detail), set()).add(user_answer)
+
+    versions = {}    # version hash -> questions
+    converted = []
+    counts = {'current': 0, 'rebuilt': 0, 'compact': 0, 'kept': 0}
+
+    def save(subject_id, questions):
+        if args.dry_run:
+            digest = version_hash(subject_id, questions)
+        else:
+            digest = save_version(args.data_dir, subject_id, questions)
+        versions[digest] = questions
+        return digest
+
+    for record in records:
+        details = record.get('details')
+        if not isinstance(details, list):
+            counts['compact'] += 1
+            converted.append(record)
+            continue
+
+        subject_id = record.get('subjectId')
+        bank = all_questions.get(subject_id) or []
+        compact = None
+        for kind, questions in (('current', bank if matches_bank(details, bank) else None),
+                                ('rebuilt', rebuilt_questions(details, wrong_answers))):
+            if questions is None:
+                continue
+            answers = answers_for(details, questions)
+            if answers is not None and rebuilds(details, questions, answers):
+                compact = {key: value for key, value in record.items() if key != 'details'}
+                compact['bank'] = save(subject_id, questions)
+                compact['answers'] = answers
+                counts[kind] += 1
+                break
+
+        if compact is None:
+            counts['kept'] += 1
+            converted.append(record)
+        else:
+            converted.append(compact)
+
+    before = file_size(legacy) + sum(
+        file_size(os.path.join(results_dir, segment_name(seq))) for seq in segments)
+    lines = [json.dumps(record, ensure_ascii=False, separators=(',', ':')) + '\n' for record in converted]
+    after = sum(len(line.encode('utf-8')) for line in lines)
+
+    print(f"📊 {len(records)} results: {counts['current']} on the current questions, "
+          f"{counts['rebuilt']} on edited questions, {counts['compact']} already compact")
+    if counts['kept']:
+        print(f"⚠️  {counts['kept']} results can't be rebuilt exactly and are kept with their details")
+    print(f"   {len(versions)} question versions, {before / 1024:.1f} KB -> {after / 1024:.1f} KB")
+
+    if args.dry_run:
+        print("🔍 Dry run - nothing written")
+        return
+    if counts['current'] + counts['rebuilt'] == 0:
+        print("✅ Nothing to convert")
+        return
+
+    replace_segments(args.data_dir, 0, segments, lambda f: f.writelines(lines), legacy=has_legacy)
+    if has_legacy:
+        print(f"📦 Kept original as {RESULTS_FILE}.migrated")
+    print(f"✅ Wrote {len(converted)} results to {RESULTS_DIR}/{segment_name(0)}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,283 @@
+const crypto = require('crypto');
+const fs = require('fs');
+const path = require('path');
+
+// Near-duplicate question index (MinHash + LSH)
+//
+// Every question of questions.json gets a MinHash signature: its question
+// and option text (Hindi and English) is normalized, cut into overlapping
+// 5-character shingles, and for each of PERMUTATIONS hash functions the
+// smallest shingle hash is kept. The share of equal positions in two
+// signatures estimates how much text the questions have in common.
+// Signatures are split into BANDS bands; questions sharing any band land in
+// the same bucket, so a new question is compared with a handful of bucket
+// mates instead of the whole bank.
+//
+// The index is saved in data/question-index.json together with a SHA-1 of
+// each question's normalized text, so only new or edited questions are
+// hashed again. find-duplicates.py (kyp_dedup.py) reads and writes the same
+// file with the same hashing; keep the two in step.
+
+const INDEX_VERSION = 1;
+const PERMUTATIONS = 64;
+const BANDS = 16;
+const ROWS = PERMUTATIONS / BANDS;
+const SHINGLE = 5;
+// Flag from 60% estimated shingle overlap; with 16 bands of 4 rows a pair at
+// 0.6 becomes a candidate 89% of the time, at 0.7 99%. Text alone can't tell
+// a reworded copy from a question that differs in one key word, so matches
+// are flagged for a person to look at, never merged automatically.
+const DEFAULT_THRESHOLD = 0.6;
+
+// MurmurHash3 finalizer
+function fmix32(h) {
+    h ^= h >>> 16;
+    h = Math.imul(h, 0x85ebca6b);
+    h ^= h >>> 13;
+    h = Math.imul(h, 0xc2b2ae35);
+    h ^= h >>> 16;
+    return h >>> 0;
+}
+
+// FNV-1a over the UTF-8 bytes, then mixed
+function hashString(text) {
+    let h = 0x811c9dc5;
+    for (const byte of Buffer.from(text, 'utf8')) {
+        h ^= byte;
+        h = Math.imul(h, 16777619);
+    }
+    return fmix32(h >>> 0);
+}
+
+const SEEDS = Array.from({ length: PERMUTATIONS }, (_, i) => fmix32(Math.imul(i + 1, 0x9e3779b9) >>> 0));
+
+// Both languages of a bilingual field, once each
+function textsOf(value) {
+    if (value && typeof value === 'object' && !Array.isArray(value)) {
+        return [...new Set([value.hi, value.en].filter(text => typeof text === 'string' && text))];
+    }
+    return typeof value === 'string' && value ? [value] : [];
+}
+
+// Question and option text (options sorted, so a reshuffled copy still
+// matches), lower case, letters/digits/marks only
+function normalizedText(question) {
+    const options = question.options;
+    let lists = [];
+    if (Array.isArray(options)) {
+        lists = [options];
+    } else if (options && typeof options === 'object') {
+        lists = [options.hi, options.en].filter(Array.isArray);
+        if (lists.length === 2 && JSON.stringify(lists[0]) === JSON.stringify(lists[1])) {
+            lists.pop();
+        }
+    }
+    const optionTexts = [];
+    lists.forEach(list => list.forEach(option => optionTexts.push(...textsOf(option))));
+    return [...textsOf(question.question), ...optionTexts.sort()].join(' ')
+        .normalize('NFC')
+        .replace(/[\u200B-\u200D\uFEFF]/g, '')
+        .toLowerCase()
+        .replace(/[^\p{L}\p{N}\p{M}]+/gu, ' ')
+        .trim();
+}
+
+function fingerprint(text) {
+    return crypto.createHash('sha1').update(text, 'utf8').digest('hex');
+}
+
+function signature(text) {
+    const chars = Array.from(text);
+    const shingles = new Set();
+    if (chars.length > 0 && chars.length <= SHINGLE) {
+        shingles.add(text);
+    }
+    for (let i = 0; i + SHINGLE <= chars.length; i++) {
+        shingles.add(chars.slice(i, i + SHINGLE).join(''));
+    }
+
+    const mins = new Uint32Array(PERMUTATIONS).fill(0xffffffff);
+    for (const shingle of shingles) {
+        const h = hashString(shingle);
+        for (let i = 0; i < PERMUTATIONS; i++) {
+            const value = fmix32((h ^ SEEDS[i]) >>> 0);
+            if (value < mins[i]) mins[i] = value;
+        }
+    }
+    return mins;
+}
+
+function encodeSignature(mins) {
+    const buffer = Buffer.alloc(PERMUTATIONS * 4);
+    mins.forEach((value, i) => buffer.writeUInt32LE(value, i * 4));
+    return buffer.toString('base64');
+}
+
+function decodeSignature(encoded) {
+    const buffer = Buffer.from(encoded, 'base64');
+    const mins = new Uint32Array(PERMUTATIONS);
+    for (let i = 0; i < PERMUTATIONS; i++) {
+        mins[i] = buffer.readUInt32LE(i * 4);
+    }
+    return mins;
+}
+
+function similarity(a, b) {
+    let same = 0;
+    for (let i = 0; i < PERMUTATIONS; i++) {
+        if (a[i] === b[i]) same++;
+    }
+    return same / PERMUTATIONS;
+}
+
+function bandKeys(mins) {
+    const keys = [];
+    for (let band = 0; band < BANDS; band++) {
+        keys.push(band + ':' + Array.prototype.join.call(mins.subarray(band * ROWS, (band + 1) * ROWS), ','));
+    }
+    return keys;
+}
+
+// "subjectId/questionId" (subject ids never contain "/")
+function entryKey(subjectId, questionId) {
+    return `${subjectId}/${questionId}`;
+}
+
+class DuplicateIndex {
+    constructor(file, threshold = DEFAULT_THRESHOLD) {
+        this.file = file;
+        this.threshold = threshold;
+        this.entries = new Map(); // entry key -> { fingerprint, mins }
+        this.buckets = new Map(); // band key -> Set of entry keys
+        this.loaded = false;
+        this.dirty = false;
+    }
+
+    load() {
+        this.loaded = true;
+        if (!fs.existsSync(this.file)) return;
+        try {
+            const saved = JSON.parse(fs.readFileSync(this.file, 'utf8'));
+            if (saved.version !== INDEX_VERSION || saved.permutations !== PERMUTATIONS ||
+                saved.bands !== BANDS || saved.shingle !== SHINGLE) {
+                return; // Other settings: rebuilt by sync()
+            }
+            for (const [key, [print, encoded]] of Object.entries(saved.entries || {})) {
+                this.insert(key, { fingerprint: print, mins: decodeSignature(encoded) });
+            }
+        } catch (error) {
+            console.error('Error reading question index, rebuilding it:', error.message);
+            this.entries.clear();
+            this.buckets.clear();
+        }
+    }
+
+    insert(key, entry) {
+        this.remove(key);
+        this.entries.set(key, entry);
+        for (const band of bandKeys(entry.mins)) {
+            if (!this.buckets.has(band)) this.buckets.set(band, new Set());
+            this.buckets.get(band).add(key);
+        }
+    }
+
+    remove(key) {
+        const entry = this.entries.get(key);
+        if (!entry) return;
+        this.entries.delete(key);
+        for (const band of bandKeys(entry.mins)) {
+            const bucket = this.buckets.get(band);
+            if (!bucket) continue;
+            bucket.delete(key);
+            if (bucket.size === 0) this.buckets.delete(band);
+        }
+    }
+
+    // Signature and fingerprint of a question (not added)
+    compute(question) {
+        const text = normalizedText(question);
+        return { fingerprint: fingerprint(text), mins: signature(text) };
+    }
+
+    // Bring the index in line with questions.json: questions that are new or
+    // whose text changed are hashed, deleted ones dropped
+    sync(allQuestions) {
+        if (!this.loaded) this.load();
+        const seen = new Set();
+        for (const [subjectId, questions] of Object.entries(allQuestions || {})) {
+            if (!Array.isArray(questions)) continue;
+            for (const question of questions) {
+                const key = entryKey(subjectId, question.id);
+                seen.add(key);
+                const text = normalizedText(question);
+                const print = fingerprint(text);
+                const entry = this.entries.get(key);
+                if (entry && entry.fingerprint === print) continue;
+                this.insert(key, { fingerprint: print, mins: signature(text) });
+                this.dirty = true;
+            }
+        }
+        for (const key of [...this.entries.keys()]) {
+            if (!seen.has(key)) {
+                this.remove(key);
+                this.dirty = true;
+            }
+        }
+    }
+
+    // Indexed questions similar to this one, most similar first:
+    // [{ subjectId, id, similarity, exact }] (exact: same normalized text)
+    check(question, computed = this.compute(question)) {
+        const candidates = new Set();
+        for (const band of bandKeys(computed.mins)) {
+            const bucket = this.buckets.get(band);
+            if (bucket) bucket.forEach(key => candidates.add(key));
+        }
+
+        const matches = [];
+        for (const key of candidates) {
+            const entry = this.entries.get(key);
+            const exact = entry.fingerprint === computed.fingerprint;
+            const score = exact ? 1 : similarity(entry.mins, computed.mins);
+            if (score >= this.threshold) {
+                const separator = key.lastIndexOf('/');
+                const id = key.slice(separator + 1);
+                matches.push({
+                    subjectId: key.slice(0, separator),
+                    id: /^\d+$/.test(id) ? Number(id) : id,
+                    similarity: Math.round(score * 100) / 100,
+                    exact
+                });
+            }
+        }
+        return matches.sort((a, b) => b.similarity - a.similarity);
+    }
+
+    add(subjectId, question, computed = this.compute(question)) {
+        this.insert(entryKey(subjectId, question.id), computed);
+        this.dirty = true;
+    }
+
+    // Write the index if it changed (temp file + rename)
+    save() {
+        if (!this.dirty) return;
+        const entries = {};
+        for (const [key, entry] of this.entries) {
+            entries[key] = [entry.fingerprint, encodeSignature(entry.mins)];
+        }
+        const data = JSON.stringify({
+            version: INDEX_VERSION,
+            permutations: PERMUTATIONS,
+            bands: BANDS,
+            shingle: SHINGLE,
+            entries
+        });
+        fs.mkdirSync(path.dirname(this.file), { recursive: true });
+        const tmpFile = this.file + '.tmp';
+        fs.writeFileSync(tmpFile, data);
+        fs.renameSync(tmpFile, this.file);
+        this.dirty = false;
+    }
+}
+
+module.exports = { DuplicateIndex, normalizedText, signature, fmix32, hashString };
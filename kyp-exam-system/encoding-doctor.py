@@ -0,0 +1,236 @@
+"""Find and repair double-encoded Hindi text in the data files and sources.
+
+Text that was saved as UTF-8, read back as Windows-1252 and saved again
+turns "उत्तर" into "à¤‰à¤¤à¥à¤¤à¤°". Unlike fix-hindi-encoding.py, which
+re-decodes a whole file, this works per string: each run of such
+characters is converted back to bytes and decoded as UTF-8, and is only
+replaced when that succeeds. Correct Hindi, English and other text in the
+same file is left alone, and records without damage are written back
+byte for byte.
+
+Checked:
+    data/*.json               arrays (results.json, students.json, ...)
+                              are streamed one record at a time
+    data/results/*.jsonl      results log segments, line by line
+    *.js                      the server's own string tables and regexes
+
+Every repaired file is replaced atomically. Stop the server first.
+
+Usage:
+    python encoding-doctor.py            # repair and report
+    python encoding-doctor.py --check    # report only; exit code 1 if anything needs repair
+"""
+import argparse
+import glob
+import json
+import os
+import re
+import sys
+
+from kyp_data import (BASE_DIR, DATA_DIR, RESULTS_DIR, atomic_write, dump_json,
+                      iter_json_array, list_segments, load_json, recover_compaction,
+                      segment_name)
+
+
+def _windows_1252_bytes():
+    """Character -> byte for every character a Windows-1252 decode can produce
+    (the five undefined bytes come through as C1 control characters)."""
+    table = {}
+    for byte in range(0x80, 0x100):
+        try:
+            table[bytes([byte]).decode('cp1252')] = byte
+        except UnicodeDecodeError:
+            table[chr(byte)] = byte
+    return table
+
+
+CP1252_BYTES = _windows_1252_bytes()
+MOJIBAKE_RUN = re.compile('[' + ''.join(re.escape(ch) for ch in sorted(CP1252_BYTES)) + ']+')
+# Lead bytes of 2-4 byte UTF-8 sequences as they appear after a bad decode
+LEAD_CHARS = set('ÂÃÄÅÆÇÈÉÊËÌÍÎÏÐÑÒÓÔÕÖ×ØÙÚÛÜÝÞßàáâãäåæçèéêëìíîïðñòóôõö÷')
+
+
+class Counts:
+    def __init__(self):
+        self.records = 0
+        self.records_repaired = 0
+        self.strings = 0         # runs repaired
+        self.unrepairable = 0    # runs that look damaged but do not decode
+
+    def __str__(self):
+        return (f"{self.records} records, {self.records_repaired} repaired, "
+                f"{self.strings} strings fixed, {self.unrepairable} unrepairable")
+
+
+def repair_text(text, counts):
+    """Repair every double-encoded run in text."""
+    def repair(match):
+        run = match.group(0)
+        try:
+            fixed = bytes(CP1252_BYTES[ch] for ch in run).decode('utf-8')
+        except UnicodeDecodeError:
+            if len(run) > 1 and run[0] in LEAD_CHARS:
+                counts.unrepairable += 1
+            return run
+        counts.strings += 1
+        return fixed
+
+    return MOJIBAKE_RUN.sub(repair, text)
+
+
+def repair_value(value, counts):
+    """Repair every string (keys included) in a JSON value."""
+    if isinstance(value, str):
+        return repair_text(value, counts)
+    if isinstance(value, list):
+        return [repair_value(item, counts) for item in value]
+    if isinstance(value, dict):
+        return {repair_text(key, counts): repair_value(item, counts) for key, item in value.items()}
+    return value
+
+
+def repair_record(record, counts):
+    """(record, repaired?) for one JSON record."""
+    before = counts.strings
+    record = repair_value(record, counts)
+    counts.records += 1
+    if counts.strings > before:
+        counts.records_repaired += 1
+        return record, True
+    return record, False
+
+
+def server_json(value, indent=''):
+    """JSON.stringify(value, null, 2) output, nested at `indent`."""
+    return json.dumps(value, ensure_ascii=False, indent=2).replace('\n', '\n' + indent)
+
+
+def first_char(path):
+    with open(path, 'r', encoding='utf-8-sig') as f:
+        while True:
+            ch = f.read(1)
+            if not ch or not ch.isspace():
+                return ch
+
+
+def scan_json_array(path, write):
+    counts = Counts()
+    for record, _ in iter_json_array(path, with_text=True):
+        repair_record(record, counts)
+
+    if counts.strings and write:
+        def write_array(f):
+            f.write('[')
+            for index, (record, text) in enumerate(iter_json_array(path, with_text=True)):
+                record, repaired = repair_record(record, Counts())
+                f.write(',\n  ' if index else '\n  ')
+                f.write(server_json(record, '  ') if repaired else text)
+            f.write('\n]' if counts.records else ']')
+        atomic_write(path, write_array)
+    return counts
+
+
+def scan_json_document(path, write):
+    counts = Counts()
+    data = load_json(path)
+    if isinstance(data, dict):
+        # e.g. questions.json: { subjectId: [questions] }
+        repaired = {}
+        for key, value in data.items():
+            if isinstance(value, list):
+                value = [repair_record(record, counts)[0] for record in value]
+            else:
+                value = repair_record(value, counts)[0]
+            repaired[repair_text(key, counts)] = value
+    else:
+        repaired = repair_record(data, counts)[0]
+
+    if counts.strings and write:
+        dump_json(path, repaired)
+    return counts
+
+
+def scan_jsonl(path, write):
+    counts = Counts()
+    with open(path, 'r', encoding='utf-8') as f:
+        for line in f:
+            if line.strip():
+                repair_record(json.loads(line), counts)
+
+    if counts.strings and write:
+        def write_lines(out):
+            with open(path, 'r', encoding='utf-8') as f:
+                for line in f:
+                    if not line.strip():
+                        continue
+                    record, repaired = repair_record(json.loads(line), Counts())
+                    out.write(json.dumps(record, ensure_ascii=False) + '\n' if repaired else line)
+        atomic_write(path, write_lines)
+    return counts
+
+
+def scan_source(path, write):
+    counts = Counts()
+    with open(path, 'rb') as f:
+        raw = f.read()
+    text = raw.decode('utf-8')
+    fixed = repair_text(text, counts)
+    counts.records = 1
+    counts.records_repaired = 1 if fixed != text else 0
+
+    if counts.strings and write:
+        atomic_write(path, lambda f: f.write(fixed.encode('utf-8')), mode='wb')
+    return counts
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Repair double-encoded Hindi text in KYP data and sources')
+    parser.add_argument('--data-dir', default=DATA_DIR, help='data directory (default: ./data)')
+    parser.add_argument('--check', action='store_true', help='only report, do not change any file')
+    parser.add_argument('--no-sources', action='store_true', help='skip the server .js files')
+    args = parser.parse_args()
+
+    write = not args.check
+    if write:
+        recover_compaction(args.data_dir)
+
+    files = []
+    for path in sorted(glob.glob(os.path.join(args.data_dir, '*.json'))):
+        kind = scan_json_array if first_char(path) == '[' else scan_json_document
+        files.append((path, kind))
+    results_dir = os.path.join(args.data_dir, RESULTS_DIR)
+    for seq in list_segments(results_dir):
+        files.append((os.path.join(results_dir, segment_name(seq)), scan_jsonl))
+    if not args.no_sources:
+        for path in sorted(glob.glob(os.path.join(BASE_DIR, '*.js'))):
+            files.append((path, scan_source))
+
+    total = Counts()
+    failed = 0
+    for path, scan in files:
+        name = os.path.relpath(path, BASE_DIR) if path.startswith(BASE_DIR) else path
+        try:
+            counts = scan(path, write)
+        except (ValueError, UnicodeDecodeError) as error:
+            failed += 1
+            print(f"❌ {name}: {error}")
+            continue
+
+        total.records += counts.records
+        total.records_repaired += counts.records_repaired
+        total.strings += counts.strings
+        total.unrepairable += counts.unrepairable
+        if counts.strings or counts.unrepairable:
+            mark = '✅' if write and counts.strings else '⚠️ '
+            print(f"{mark} {name}: {counts}")
+
+    print(f"\nChecked {len(files)} files: {total}")
+    if args.check and total.strings:
+        print("Run without --check to repair.")
+        sys.exit(1)
+    if failed or total.unrepairable:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
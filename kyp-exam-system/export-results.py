@@ -0,0 +1,207 @@
+"""Export exam results to CSV or Excel without loading them all into memory.
+
+Reads the results log the same way the server does (results.json and the
+data/results/ segments) one record at a time and writes each row as soon as
+it is read. Columns match GET /api/admin/export-results.
+
+Usage:
+    python export-results.py results.xlsx
+    python export-results.py bs-cit.csv --subject bs-cit --from 2025-11-01 --to 2025-11-30
+
+The output format follows the file extension (.csv or .xlsx).
+"""
+import argparse
+import csv
+import os
+import sys
+import zipfile
+from datetime import datetime, timedelta
+from xml.sax.saxutils import escape
+
+from kyp_data import DATA_DIR, iter_results, load_json
+
+PASS_PERCENTAGE = 60
+
+COLUMNS = [
+    'Student ID', 'Name', 'Email', 'Mobile', 'Exam', 'Total Questions',
+    'Correct Answers', 'Obtained Marks', 'Total Marks', 'Percentage',
+    'Result', 'Time Spent (s)', 'Submission Date',
+]
+
+
+def parse_time(value):
+    """Submission timestamp of a result as a local naive datetime, or None."""
+    if not value:
+        return None
+    try:
+        moment = datetime.fromisoformat(str(value).replace('Z', '+00:00'))
+    except ValueError:
+        return None
+    if moment.tzinfo is not None:
+        moment = moment.astimezone().replace(tzinfo=None)
+    return moment
+
+
+def parse_day(value):
+    try:
+        return datetime.strptime(value, '%Y-%m-%d')
+    except ValueError:
+        raise argparse.ArgumentTypeError(f'expected YYYY-MM-DD, got {value!r}')
+
+
+def student_field(result, field):
+    # Old results keep the student fields at the top level
+    flat = 'student' + field[0].upper() + field[1:]
+    return result.get(flat) or (result.get('student') or {}).get(field) or 'N/A'
+
+
+def result_row(result, subject_names, submitted):
+    percentage = result.get('percentage') or 0
+    return [
+        result.get('studentId') or 'N/A',
+        student_field(result, 'name'),
+        student_field(result, 'email'),
+        student_field(result, 'mobile'),
+        subject_names.get(result.get('subjectId'), result.get('subjectId')),
+        result.get('totalQuestions'),
+        result.get('correctAnswers'),
+        result.get('obtainedMarks'),
+        result.get('totalMarks'),
+        result.get('percentage'),
+        'PASS' if percentage >= PASS_PERCENTAGE else 'FAIL',
+        result.get('timeSpent'),
+        submitted.strftime('%Y-%m-%d %H:%M:%S') if submitted else '',
+    ]
+
+
+def iter_rows(data_dir, subject=None, date_from=None, date_to=None):
+    subjects_file = os.path.join(data_dir, 'subjects.json')
+    subjects = load_json(subjects_file) if os.path.exists(subjects_file) else []
+    subject_names = {s.get('id'): s.get('name') for s in subjects}
+
+    for result in iter_results(data_dir):
+        if subject and result.get('subjectId') != subject:
+            continue
+        submitted = parse_time(result.get('submissionTime') or result.get('timestamp'))
+        if date_from or date_to:
+            if submitted is None:
+                continue
+            if date_from and submitted < date_from:
+                continue
+            if date_to and submitted >= date_to:
+                continue
+        yield result_row(result, subject_names, submitted)
+
+
+def write_csv(path, rows):
+    count = 0
+    # utf-8-sig so Excel shows Hindi names correctly
+    with open(path, 'w', encoding='utf-8-sig', newline='') as f:
+        writer = csv.writer(f)
+        writer.writerow(COLUMNS)
+        for row in rows:
+            writer.writerow(['' if value is None else value for value in row])
+            count += 1
+    return count
+
+
+# Minimal xlsx (Office Open XML) parts; the sheet itself is streamed
+XLSX_PARTS = {
+    '[Content_Types].xml': (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+        '<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+        '<Default Extension="xml" ContentType="application/xml"/>'
+        '<Override PartName="/xl/workbook.xml" ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet.main+xml"/>'
+        '<Override PartName="/xl/worksheets/sheet1.xml" ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.worksheet+xml"/>'
+        '</Types>'),
+    '_rels/.rels': (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+        '<Relationship Id="rId1" Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/officeDocument" Target="xl/workbook.xml"/>'
+        '</Relationships>'),
+    'xl/workbook.xml': (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<workbook xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main" '
+        'xmlns:r="http://schemas.openxmlformats.org/officeDocument/2006/relationships">'
+        '<sheets><sheet name="Results" sheetId="1" r:id="rId1"/></sheets>'
+        '</workbook>'),
+    'xl/_rels/workbook.xml.rels': (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+        '<Relationship Id="rId1" Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/worksheet" Target="worksheets/sheet1.xml"/>'
+        '</Relationships>'),
+}
+
+
+def column_letter(index):
+    letters = ''
+    index += 1
+    while index:
+        index, remainder = divmod(index - 1, 26)
+        letters = chr(65 + remainder) + letters
+    return letters
+
+
+def xlsx_row(number, values):
+    cells = []
+    for index, value in enumerate(values):
+        ref = f'{column_letter(index)}{number}'
+        if value is None or value == '':
+            continue
+        if isinstance(value, (int, float)) and not isinstance(value, bool):
+            cells.append(f'<c r="{ref}"><v>{value}</v></c>')
+        else:
+            cells.append(f'<c r="{ref}" t="inlineStr"><is><t>{escape(str(value))}</t></is></c>')
+    return f'<row r="{number}">' + ''.join(cells) + '</row>'
+
+
+def write_xlsx(path, rows):
+    count = 0
+    with zipfile.ZipFile(path, 'w', zipfile.ZIP_DEFLATED) as zf:
+        for name, content in XLSX_PARTS.items():
+            zf.writestr(name, content)
+        with zf.open('xl/worksheets/sheet1.xml', 'w') as sheet:
+            sheet.write(
+                b'<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+                b'<worksheet xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main">'
+                b'<sheetData>')
+            sheet.write(xlsx_row(1, COLUMNS).encode('utf-8'))
+            for row in rows:
+                count += 1
+                sheet.write(xlsx_row(count + 1, row).encode('utf-8'))
+            sheet.write(b'</sheetData></worksheet>')
+    return count
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Export KYP exam results to CSV or Excel')
+    parser.add_argument('output', help='output file (.csv or .xlsx)')
+    parser.add_argument('--data-dir', default=DATA_DIR, help='data directory (default: ./data)')
+    parser.add_argument('--subject', help='only results of this subject id')
+    parser.add_argument('--from', dest='date_from', type=parse_day, help='first day, YYYY-MM-DD')
+    parser.add_argument('--to', dest='date_to', type=parse_day, help='last day (inclusive), YYYY-MM-DD')
+    args = parser.parse_args()
+
+    extension = os.path.splitext(args.output)[1].lower()
+    if extension not in ('.csv', '.xlsx'):
+        print("❌ Output file must end in .csv or .xlsx")
+        sys.exit(1)
+
+    date_to = args.date_to + timedelta(days=1) if args.date_to else None
+    rows = iter_rows(args.data_dir, args.subject, args.date_from, date_to)
+
+    # Write next to the target and rename, so a failed export leaves no half file
+    tmp = args.output + '.tmp'
+    try:
+        count = write_csv(tmp, rows) if extension == '.csv' else write_xlsx(tmp, rows)
+        os.replace(tmp, args.output)
+    finally:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+
+    print(f"✅ Exported {count} results to {args.output}")
+
+
+if __name__ == '__main__':
+    main()
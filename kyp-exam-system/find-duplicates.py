@@ -0,0 +1,160 @@
+"""Find duplicate and near-duplicate questions in questions.json.
+
+Uses the MinHash index shared with the server (kyp_dedup.py, saved in
+data/question-index.json): only questions added or edited since the last
+run are hashed, and each question is only compared with the few that share
+an LSH bucket with it, so a run stays roughly linear in the size of the
+bank. Questions of different subjects are compared too.
+
+Similar questions are listed in groups for review. --merge deletes exact
+copies (same question and options after normalization) inside a subject,
+keeping the oldest. Near-duplicates are only deleted with --merge-near, and
+only when they are in the same subject and have the same correct answer:
+text alone can't tell a reworded copy from a question that differs in one
+key word, so look at the list first.
+
+Stop the server before merging: it keeps questions.json in memory and would
+overwrite the change with its next save.
+
+Usage:
+    python find-duplicates.py
+    python find-duplicates.py --subject bs-cit --threshold 0.7
+    python find-duplicates.py --merge --dry-run
+    python find-duplicates.py --merge-near --threshold 0.75
+"""
+import argparse
+import os
+import sys
+import time
+
+from kyp_data import DATA_DIR, dump_json, load_json
+from kyp_dedup import DEFAULT_THRESHOLD, DuplicateIndex, entry_key, split_key, texts_of
+
+
+def preview(question, width=70):
+    texts = texts_of(question.get('question'))
+    text = ' '.join((texts[0] if texts else '').split())
+    return text if len(text) <= width else text[:width - 1] + '…'
+
+
+def correct_answer(question):
+    """Text of the correct option (first language), for --merge-near."""
+    options = question.get('options')
+    if isinstance(options, dict):
+        options = options.get('hi') or options.get('en') or []
+    correct = question.get('correct')
+    if isinstance(options, list) and isinstance(correct, int) and 0 <= correct < len(options):
+        texts = texts_of(options[correct])
+        return ' '.join(texts[0].casefold().split()) if texts else None
+    return None
+
+
+class Groups:
+    """Union-find over entry keys."""
+
+    def __init__(self):
+        self.parent = {}
+
+    def find(self, key):
+        self.parent.setdefault(key, key)
+        while self.parent[key] != key:
+            self.parent[key] = self.parent[self.parent[key]]
+            key = self.parent[key]
+        return key
+
+    def union(self, a, b):
+        a, b = self.find(a), self.find(b)
+        if a != b:
+            self.parent[max(a, b)] = min(a, b)
+
+    def groups(self):
+        found = {}
+        for key in self.parent:
+            found.setdefault(self.find(key), []).append(key)
+        return [sorted(members, key=sort_key) for members in found.values() if len(members) > 1]
+
+
+def sort_key(key):
+    subject_id, question_id = split_key(key)
+    return (subject_id, question_id if isinstance(question_id, int) else 0, str(question_id))
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Find near-duplicate KYP questions')
+    parser.add_argument('--subject', help='only groups with a question of this subject')
+    parser.add_argument('--threshold', type=float, default=DEFAULT_THRESHOLD,
+                        help=f'estimated text overlap to report, 0-1 (default: {DEFAULT_THRESHOLD})')
+    parser.add_argument('--merge', action='store_true', help='delete exact copies inside a subject (keeps the oldest)')
+    parser.add_argument('--merge-near', action='store_true',
+                        help='also delete near-duplicates inside a subject that have the same correct answer')
+    parser.add_argument('--data-dir', default=DATA_DIR, help='data directory (default: ./data)')
+    parser.add_argument('--dry-run', action='store_true', help='show what --merge would delete, change nothing')
+    args = parser.parse_args()
+
+    questions_file = os.path.join(args.data_dir, 'questions.json')
+    if not os.path.exists(questions_file):
+        print(f"❌ {questions_file} not found")
+        sys.exit(1)
+    all_questions = load_json(questions_file)
+    by_key = {entry_key(subject_id, q.get('id')): q
+              for subject_id, questions in all_questions.items() if isinstance(questions, list)
+              for q in questions}
+
+    started = time.perf_counter()
+    index = DuplicateIndex(args.data_dir, threshold=args.threshold)
+    index.sync(all_questions)
+    print(f"📇 {len(index.entries)} questions indexed, {index.hashed} hashed now "
+          f"({len(index.entries) - index.hashed} reused) in {time.perf_counter() - started:.2f}s")
+
+    groups = Groups()
+    pairs = {}
+    for key in index.entries:
+        for other, score, exact in index.matches(key):
+            groups.union(key, other)
+            pairs[tuple(sorted((key, other)))] = (score, exact)
+
+    found = groups.groups()
+    if args.subject:
+        found = [members for members in found if any(split_key(key)[0] == args.subject for key in members)]
+    found.sort(key=lambda members: sort_key(members[0]))
+
+    doomed = []
+    for number, members in enumerate(found, 1):
+        subjects = sorted({split_key(key)[0] for key in members})
+        print(f"\n🔁 Group {number}: {len(members)} questions ({', '.join(subjects)})")
+        first = members[0]
+        for key in members:
+            subject_id, question_id = split_key(key)
+            if key == first:
+                label = 'oldest'
+            else:
+                # Only pairs compared directly with the oldest question count
+                score, exact = pairs.get(tuple(sorted((first, key))), (None, False))
+                label = 'same' if exact else (f'{score:.0%}' if score is not None else 'linked')
+                same_subject = subject_id == split_key(first)[0]
+                near_copy = (score is not None and
+                             correct_answer(by_key[key]) == correct_answer(by_key[first]))
+                if same_subject and ((args.merge or args.merge_near) and exact or args.merge_near and near_copy):
+                    doomed.append(key)
+                    label += ', delete'
+            print(f"   {subject_id} Q{question_id:<5} {label:<13} {preview(by_key[key])}")
+
+    print(f"\n{len(found)} groups of similar questions (threshold {args.threshold:.0%})")
+
+    if doomed and not args.dry_run:
+        doomed_set = set(doomed)
+        for subject_id, questions in all_questions.items():
+            if isinstance(questions, list):
+                all_questions[subject_id] = [q for q in questions
+                                             if entry_key(subject_id, q.get('id')) not in doomed_set]
+        dump_json(questions_file, all_questions)
+        index.sync(all_questions)
+        print(f"✅ Deleted {len(doomed)} duplicate questions from {questions_file}")
+    elif doomed:
+        print(f"Dry run: {len(doomed)} questions would be deleted")
+
+    index.save()
+
+
+if __name__ == '__main__':
+    main()
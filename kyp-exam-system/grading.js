@@ -0,0 +1,121 @@
+// Exam grading against precomputed per-subject answer tables
+//
+// buildGradingTable() runs once per subject whenever the question bank
+// changes. It keeps questionId -> (correct, marks, options) plus the subject
+// totals, and the "Not Answered" detail row of every question, which is the
+// same for every student. gradeAnswers() then only looks at the questions
+// the student actually answered.
+//
+// Results keep the chosen options as an answers array in bank order (see
+// question-versions.js); buildDetails() turns that back into the same rows.
+
+const NOT_ANSWERED = -1;
+const NOT_RECORDED = -2; // Answered, but the choice was not kept (old results)
+
+// Text of an option, from the Hindi list when the options are bilingual
+function answerText(question, index) {
+    const options = question.options;
+    const list = Array.isArray(options) ? options :
+        (options && typeof options === 'object' ? options.hi || options.en || [] : []);
+    return list[index];
+}
+
+function notAnsweredRow(question) {
+    return {
+        questionId: question.id,
+        question: question.question,
+        userAnswer: 'Not Answered',
+        correctAnswer: answerText(question, question.correct),
+        isCorrect: false,
+        marks: 0,
+        totalMarks: question.marks
+    };
+}
+
+function answeredRow(question, answer) {
+    const isCorrect = answer === question.correct;
+    return {
+        questionId: question.id,
+        question: question.question,
+        userAnswer: answer === NOT_RECORDED ? undefined : answerText(question, answer),
+        correctAnswer: answerText(question, question.correct),
+        isCorrect,
+        marks: isCorrect ? question.marks : 0,
+        totalMarks: question.marks
+    };
+}
+
+// Detail rows of a result from the questions it was graded on
+function buildDetails(questions, answers) {
+    return questions.map((question, position) => {
+        const answer = answers[position];
+        return answer === undefined || answer === NOT_ANSWERED ?
+            notAnsweredRow(question) : answeredRow(question, answer);
+    });
+}
+
+function buildGradingTable(questions) {
+    const byId = new Map();
+    const details = [];
+    let totalMarks = 0;
+
+    questions.forEach((question, position) => {
+        totalMarks += question.marks;
+
+        const key = String(question.id);
+        if (!byId.has(key)) {
+            byId.set(key, []);
+        }
+        byId.get(key).push(position);
+
+        details.push(Object.freeze(notAnsweredRow(question)));
+    });
+
+    return {
+        questions,
+        byId,
+        details,
+        totalMarks,
+        totalQuestions: questions.length
+    };
+}
+
+// Grade an { questionId: optionIndex } answer map
+function gradeAnswers(table, answers) {
+    const details = table.details.slice();
+    const positional = new Array(table.totalQuestions).fill(NOT_ANSWERED);
+    let correctAnswers = 0;
+    let obtainedMarks = 0;
+
+    for (const key of Object.keys(answers)) {
+        const positions = table.byId.get(key);
+        if (!positions) continue; // Not a question of this subject
+
+        const userAnswer = answers[key];
+        if (userAnswer === undefined) continue;
+
+        for (const position of positions) {
+            const question = table.questions[position];
+            const answer = Number.isInteger(userAnswer) && userAnswer >= 0 ? userAnswer : NOT_RECORDED;
+            positional[position] = answer;
+            details[position] = answeredRow(question, answer);
+
+            if (details[position].isCorrect) {
+                correctAnswers++;
+                obtainedMarks += question.marks;
+            }
+        }
+    }
+
+    return {
+        correctAnswers,
+        totalQuestions: table.totalQuestions,
+        obtainedMarks,
+        totalMarks: table.totalMarks,
+        percentage: Math.round((obtainedMarks / table.totalMarks) * 100),
+        answers: positional,
+        details
+    };
+}
+
+module.exports = { buildGradingTable, gradeAnswers, buildDetails, NOT_ANSWERED, NOT_RECORDED };
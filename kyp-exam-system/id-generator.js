@@ -0,0 +1,52 @@
+// Unique, time-ordered ids for students and results
+//
+// Ids used to be Date.now().toString(), so two students registering in the
+// same millisecond at the start bell (or two cluster workers saving results
+// at once) got the same id. An id is now
+//
+//   <milliseconds, 13 digits><node, 2 digits><sequence, 3 digits>
+//
+// e.g. "1760781600123" + "03" + "000". The node tells processes apart (0 in
+// single-process mode and in the Python tools, which run with the server
+// stopped; 1-99 for cluster workers) and the sequence counts ids made in the
+// same millisecond. cluster.js hands each worker a node nobody running holds
+// (KYP_NODE_ID) and gives a crashed worker's node to its replacement, which
+// starts a second later, past any id the old one made. Ids never go backwards within a process: when the clock
+// does, or more than 1000 ids are made in one millisecond, the time part
+// runs ahead of the clock until it catches up.
+//
+// Ids are still strings of digits that sort by creation time (old ids are
+// 13 digits and sort before every new one), so nothing that stores or shows
+// them changes. import-roster.py makes the same ids.
+
+const SEQUENCE_SIZE = 1000;
+const NODES = 100;
+const MAX_WORKERS = NODES - 1;
+
+class IdGenerator {
+    constructor(node = 0) {
+        this.node = String(node % NODES).padStart(2, '0');
+        this.lastTime = 0;
+        this.sequence = 0;
+    }
+
+    next() {
+        const now = Date.now();
+        if (now > this.lastTime) {
+            this.lastTime = now;
+            this.sequence = 0;
+        } else if (++this.sequence === SEQUENCE_SIZE) {
+            this.lastTime++;
+            this.sequence = 0;
+        }
+        return `${this.lastTime}${this.node}${String(this.sequence).padStart(3, '0')}`;
+    }
+}
+
+// Node number of this process: the one cluster.js gave a worker, otherwise 0
+function processNode() {
+    const cluster = require('cluster');
+    return cluster.isWorker ? parseInt(process.env.KYP_NODE_ID) || 0 : 0;
+}
+
+module.exports = { IdGenerator, processNode, MAX_WORKERS };
@@ -0,0 +1,125 @@
+const crypto = require('crypto');
+const fs = require('fs');
+const path = require('path');
+
+// Content-addressed images of uploaded question papers
+//
+// Pictures found in a DOCX or PDF paper (diagrams, circuit symbols, screen
+// shots) are saved once as data/images/<hash>.<ext>, named after the first
+// 24 hex digits of the SHA-256 of their bytes, so the same picture in two
+// papers, or an uploaded paper uploaded again, is stored once. The question
+// text keeps a small token in its place, "[image:<hash>.<ext>]", which the
+// exam and admin pages turn into an <img>; questions.json, every paper and
+// every result stay as small as before.
+//
+// Because a name always means the same bytes, GET /images/<name> is served
+// with Cache-Control: immutable and each lab PC downloads a picture once.
+// Pictures wider or taller than THUMB_SIZE also get a scaled-down copy,
+// made once when the picture is first saved, in data/images/thumbs/ (the
+// exam page shows that and links to the full picture). Scaling needs
+// @napi-rs/canvas, which pdf-parse already depends on; without it the
+// thumbnail URL serves the full picture.
+//
+// Written from the ingest worker threads (see question-parser.js); every
+// file is written to a temporary name and renamed, so two uploads saving
+// the same picture at once are harmless. Pictures are never deleted, even
+// when no question refers to them any more.
+
+const THUMB_SIZE = 640; // Longest side of a thumbnail, in pixels
+
+// Formats browsers can show (Word's EMF/WMF drawings are skipped)
+const EXTENSIONS = {
+    'image/png': '.png',
+    'image/jpeg': '.jpg',
+    'image/gif': '.gif',
+    'image/bmp': '.bmp',
+    'image/webp': '.webp'
+};
+
+const NAME_PATTERN = /^[0-9a-f]{24}\.(?:png|jpg|gif|bmp|webp)$/;
+
+function token(name) {
+    return `[image:${name}]`;
+}
+
+let canvasModule; // undefined: not tried yet, null: not available
+
+function loadCanvas() {
+    if (canvasModule === undefined) {
+        try {
+            canvasModule = require('@napi-rs/canvas');
+        } catch (error) {
+            canvasModule = null;
+        }
+    }
+    return canvasModule;
+}
+
+async function writeOnce(filepath, buffer) {
+    if (fs.existsSync(filepath)) return;
+    const tmpFile = `${filepath}.${process.pid}.${crypto.randomBytes(4).toString('hex')}.tmp`;
+    await fs.promises.writeFile(tmpFile, buffer);
+    await fs.promises.rename(tmpFile, filepath);
+}
+
+class ImageStore {
+    constructor(dir) {
+        this.dir = dir;
+        this.thumbsDir = path.join(dir, 'thumbs');
+    }
+
+    // Save a picture; resolves with its name, or null for a format
+    // browsers can't show
+    async add(buffer, contentType) {
+        const ext = EXTENSIONS[String(contentType).toLowerCase()];
+        if (!ext) return null;
+
+        const hash = crypto.createHash('sha256').update(buffer).digest('hex').slice(0, 24);
+        const name = hash + ext;
+        const filepath = path.join(this.dir, name);
+        if (fs.existsSync(filepath)) return name;
+
+        // The thumbnail first: a picture that is there has its thumbnail
+        await fs.promises.mkdir(this.thumbsDir, { recursive: true });
+        try {
+            await this.makeThumbnail(name, buffer);
+        } catch (error) {
+            console.error('Error making image thumbnail:', name, error.message);
+        }
+        await writeOnce(filepath, buffer);
+        return name;
+    }
+
+    async makeThumbnail(name, buffer) {
+        const canvas = loadCanvas();
+        if (!canvas) return;
+
+        const image = await canvas.loadImage(buffer);
+        const scale = THUMB_SIZE / Math.max(image.width, image.height);
+        if (!(scale < 1)) return; // Small enough already
+
+        const width = Math.max(1, Math.round(image.width * scale));
+        const height = Math.max(1, Math.round(image.height * scale));
+        const thumb = canvas.createCanvas(width, height);
+        thumb.getContext('2d').drawImage(image, 0, 0, width, height);
+        await writeOnce(this.thumbPath(name), await thumb.encode('png'));
+    }
+
+    thumbPath(name) {
+        return path.join(this.thumbsDir, name.replace(/\.\w+$/, '.png'));
+    }
+
+    // File to send for a picture name (thumb: the scaled-down copy if there
+    // is one), or null
+    file(name, thumb = false) {
+        if (!NAME_PATTERN.test(name)) return null;
+        if (thumb) {
+            const thumbPath = this.thumbPath(name);
+            if (fs.existsSync(thumbPath)) return thumbPath;
+        }
+        const filepath = path.join(this.dir, name);
+        return fs.existsSync(filepath) ? filepath : null;
+    }
+}
+
+module.exports = { ImageStore, token };
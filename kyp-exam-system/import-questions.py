@@ -0,0 +1,190 @@
+"""Bulk-import a directory of question papers into questions.json.
+
+Papers (.docx, .pdf, .txt) are parsed in parallel on a process pool with
+the same format rules as the admin upload (see kyp_parser.py). Questions
+already in the subject, or repeated across papers, are skipped; the rest
+get the next free ids of their subject and everything is merged into
+questions.json in one atomic write. New questions that look like a
+question already in the bank (any subject) are listed afterwards; review
+them with find-duplicates.py.
+
+Stop the server before importing: it keeps questions.json in memory and
+would overwrite the import with its next save.
+
+Usage:
+    python import-questions.py papers/ --subject bs-cit
+    python import-questions.py papers/              # one subfolder per subject id
+    python import-questions.py papers/ --subject kyp --language en --dry-run
+"""
+import argparse
+import os
+import sys
+import time
+import unicodedata
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from kyp_data import DATA_DIR, dump_json, load_json
+from kyp_dedup import DuplicateIndex, entry_key, split_key
+from kyp_parser import extract_text, parse_questions
+
+PAPER_EXTENSIONS = ('.docx', '.pdf', '.txt')
+
+
+def find_papers(root, subject):
+    """(path, subject id) for every paper under root.
+
+    Without --subject, a paper's subject is the first folder below root.
+    """
+    papers = []
+    for folder, dirs, files in os.walk(root):
+        dirs.sort()
+        for name in sorted(files):
+            if name.startswith('~$') or not name.lower().endswith(PAPER_EXTENSIONS):
+                continue
+            path = os.path.join(folder, name)
+            relative = os.path.relpath(path, root).split(os.sep)
+            if subject:
+                papers.append((path, subject))
+            elif len(relative) > 1:
+                papers.append((path, relative[0]))
+            else:
+                print(f"⚠️  Skipping {name}: not in a subject folder (or pass --subject)")
+    return papers
+
+
+def parse_paper(path, language):
+    """Runs in a worker process: (questions, bytes read, seconds)."""
+    started = time.perf_counter()
+    text = extract_text(path)
+    questions = parse_questions(text, language)
+    return questions, os.path.getsize(path), time.perf_counter() - started
+
+
+def question_key(question):
+    """Identity of a question for de-duplication: its text and options,
+    ignoring case and spacing, in either storage format."""
+    def text_of(value):
+        if isinstance(value, dict):
+            value = value.get('hi') or value.get('en') or ''
+        return ' '.join(unicodedata.normalize('NFC', str(value)).casefold().split())
+
+    options = question.get('options')
+    if isinstance(options, dict):
+        options = options.get('hi') or options.get('en') or []
+    return (text_of(question.get('question')),) + tuple(text_of(option) for option in options or [])
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Bulk-import KYP question papers')
+    parser.add_argument('papers', help='directory of .docx/.pdf/.txt papers')
+    parser.add_argument('--subject', help='subject id for every paper (default: subfolder name)')
+    parser.add_argument('--language', default='hi', choices=['hi', 'en'], help='language tag (default: hi)')
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1, help='parser processes (default: all cores)')
+    parser.add_argument('--data-dir', default=DATA_DIR, help='data directory (default: ./data)')
+    parser.add_argument('--dry-run', action='store_true', help='parse and report, but do not save')
+    args = parser.parse_args()
+
+    if not os.path.isdir(args.papers):
+        print(f"❌ Not a directory: {args.papers}")
+        sys.exit(1)
+
+    papers = find_papers(args.papers, args.subject)
+    if not papers:
+        print("❌ No papers found")
+        sys.exit(1)
+
+    questions_file = os.path.join(args.data_dir, 'questions.json')
+    all_questions = load_json(questions_file) if os.path.exists(questions_file) else {}
+    subjects_file = os.path.join(args.data_dir, 'subjects.json')
+    if os.path.exists(subjects_file):
+        known = {s.get('id') for s in load_json(subjects_file)}
+        for subject in sorted({subject for _, subject in papers} - known):
+            print(f"⚠️  Subject '{subject}' is not in subjects.json")
+
+    print(f"📦 Parsing {len(papers)} papers on {args.workers} processes...")
+    started = time.perf_counter()
+    parsed = {}
+    failures = []
+
+    with ProcessPoolExecutor(max_workers=max(1, args.workers)) as pool:
+        futures = {pool.submit(parse_paper, path, args.language): (path, subject) for path, subject in papers}
+        for future in as_completed(futures):
+            path, subject = futures[future]
+            name = os.path.relpath(path, args.papers)
+            try:
+                questions, size, seconds = future.result()
+            except Exception as error:
+                failures.append((name, error))
+                print(f"  ❌ {name}: {error}")
+                continue
+            parsed[path] = questions
+            rate = size / 1024 / seconds if seconds > 0 else 0
+            print(f"  {name}: {len(questions)} questions in {seconds * 1000:.0f}ms ({rate:.0f} KB/s)")
+            if not questions:
+                failures.append((name, 'no questions found'))
+
+    # Merge in paper order so ids do not depend on which worker finished first
+    added = {}
+    added_keys = []
+    duplicates = 0
+    seen = {}
+    for path, subject in papers:
+        questions = parsed.get(path)
+        if not questions:
+            continue
+        bank = all_questions.setdefault(subject, [])
+        if subject not in seen:
+            seen[subject] = {question_key(q) for q in bank}
+        next_id = max((q.get('id') or 0 for q in bank), default=0) + 1
+
+        for question in questions:
+            key = question_key(question)
+            if key in seen[subject]:
+                duplicates += 1
+                continue
+            seen[subject].add(key)
+            question['id'] = next_id
+            question['language'] = args.language
+            next_id += 1
+            bank.append(question)
+            added[subject] = added.get(subject, 0) + 1
+            added_keys.append(entry_key(subject, question['id']))
+
+    elapsed = time.perf_counter() - started
+    total = sum(len(questions) for questions in parsed.values())
+    print(f"\n{total} questions parsed from {len(parsed)} papers in {elapsed:.1f}s "
+          f"({total / elapsed if elapsed > 0 else 0:.0f} questions/s), {duplicates} duplicates skipped")
+    for subject, count in sorted(added.items()):
+        print(f"  {subject}: +{count} questions")
+
+    # Near-duplicates: the index only hashes what is new since its last save
+    index = DuplicateIndex(args.data_dir)
+    index.sync(all_questions)
+    similar = [(key, index.matches(key)) for key in added_keys]
+    similar = [(key, matches) for key, matches in similar if matches]
+    if similar:
+        print(f"\n🔁 {len(similar)} new questions look like questions already in the bank:")
+        for key, matches in similar:
+            other, score, _ = matches[0]
+            subject, question_id = split_key(key)
+            print(f"  {subject} Q{question_id} ~ {other.replace('/', ' Q')} ({score:.0%})")
+        print("  Run find-duplicates.py to review them")
+
+    if args.dry_run:
+        print("Dry run: questions.json not changed")
+    elif added:
+        dump_json(questions_file, all_questions)
+        index.save()
+        print(f"✅ Added {sum(added.values())} questions to {questions_file}")
+    else:
+        print("Nothing new to add")
+
+    if failures:
+        print(f"\n⚠️  {len(failures)} papers failed:")
+        for name, error in failures:
+            print(f"  {name}: {error}")
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
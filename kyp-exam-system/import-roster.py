@@ -0,0 +1,229 @@
+"""Register a student roster (CSV or XLSX) in students.json in one write.
+
+The offline twin of the admin panel's roster upload (POST
+/api/admin/students/import, see roster-import.js), for lists too big to
+upload or for setting up a centre before the server is started. The first
+row names the columns: Name, Email and Mobile are required (Student Name,
+Email ID, Phone, Mobile No, ... are recognised too), Subject (id or name)
+is optional.
+
+Rows whose email and mobile are already registered, or that reuse another
+student's email or mobile, are skipped, so running the same roster twice
+adds nobody. Imported students are marked preRegistered and start their
+exam with their own id, without registering again.
+
+Stop the server before importing: it keeps students.json in memory and
+would overwrite the import with its next save.
+
+Usage:
+    python import-roster.py roster.csv
+    python import-roster.py roster.xlsx --subject bs-cit
+    python import-roster.py roster.csv --dry-run
+"""
+import argparse
+import csv
+import os
+import posixpath
+import re
+import sys
+import zipfile
+from datetime import datetime, timezone
+from xml.etree import ElementTree
+
+from kyp_data import (DATA_DIR, IdGenerator, dump_json, load_json,
+                      normalize_email, normalize_mobile)
+
+# Column titles, compared lowercase and without spaces or punctuation
+# (same as roster-import.js)
+COLUMNS = {
+    'name': ('name', 'studentname', 'fullname', 'candidatename'),
+    'email': ('email', 'emailid', 'emailaddress', 'mail'),
+    'mobile': ('mobile', 'mobileno', 'mobilenumber', 'phone', 'phoneno', 'phonenumber', 'contact', 'contactno'),
+    'subject': ('subject', 'subjectid', 'exam', 'course'),
+}
+
+XLSX_NS = {'s': 'http://schemas.openxmlformats.org/spreadsheetml/2006/main'}
+REL_NS = '{http://schemas.openxmlformats.org/officeDocument/2006/relationships}id'
+
+
+def read_csv(path):
+    with open(path, 'r', encoding='utf-8-sig', newline='') as f:
+        return list(csv.reader(f))
+
+
+def cell_text(cell, shared):
+    kind = cell.get('t')
+    if kind == 'inlineStr':
+        return ''.join(t.text or '' for t in cell.iter(f"{{{XLSX_NS['s']}}}t"))
+    value = cell.find('s:v', XLSX_NS)
+    if value is None or value.text is None:
+        return ''
+    if kind == 's':
+        return shared[int(value.text)]
+    if kind in ('str', 'b', 'e'):
+        return value.text
+    # Numbers: a mobile typed into Excel is stored as 9876543210 or 9.87654321E9
+    number = float(value.text)
+    return str(int(number)) if number.is_integer() else value.text
+
+
+def column_index(ref):
+    letters = re.match(r'[A-Z]+', ref).group(0)
+    index = 0
+    for letter in letters:
+        index = index * 26 + ord(letter) - 64
+    return index - 1
+
+
+def read_xlsx(path):
+    """Rows of the first worksheet, read with the standard library."""
+    with zipfile.ZipFile(path) as zf:
+        shared = []
+        if 'xl/sharedStrings.xml' in zf.namelist():
+            root = ElementTree.fromstring(zf.read('xl/sharedStrings.xml'))
+            for item in root.findall('s:si', XLSX_NS):
+                shared.append(''.join(t.text or '' for t in item.iter(f"{{{XLSX_NS['s']}}}t")))
+
+        workbook = ElementTree.fromstring(zf.read('xl/workbook.xml'))
+        first = workbook.find('s:sheets/s:sheet', XLSX_NS)
+        sheet_path = 'xl/worksheets/sheet1.xml'
+        if first is not None and 'xl/_rels/workbook.xml.rels' in zf.namelist():
+            rels = ElementTree.fromstring(zf.read('xl/_rels/workbook.xml.rels'))
+            for rel in rels:
+                if rel.get('Id') == first.get(REL_NS):
+                    target = rel.get('Target')
+                    sheet_path = target.lstrip('/') if target.startswith('/') else posixpath.join('xl', target)
+
+        sheet = ElementTree.fromstring(zf.read(sheet_path))
+        rows = []
+        for row in sheet.iter(f"{{{XLSX_NS['s']}}}row"):
+            number = int(row.get('r', len(rows) + 1))
+            values = []
+            for cell in row.findall('s:c', XLSX_NS):
+                index = column_index(cell.get('r')) if cell.get('r') else len(values)
+                values.extend([''] * (index + 1 - len(values)))
+                values[index] = cell_text(cell, shared)
+            rows.extend([[]] * (number - 1 - len(rows)))
+            rows.append(values)
+        return rows
+
+
+def read_roster(path):
+    """Roster rows as dicts with line, name, email, mobile and subject."""
+    table = read_xlsx(path) if path.lower().endswith('.xlsx') else read_csv(path)
+    header = [re.sub(r'[^a-z]', '', str(title).lower()) for title in (table[0] if table else [])]
+    columns = {}
+    for field, titles in COLUMNS.items():
+        for index, title in enumerate(header):
+            if title in titles:
+                columns[field] = index
+                break
+    missing = [field for field in ('name', 'email', 'mobile') if field not in columns]
+    if missing:
+        sys.exit(f"❌ Roster has no {', '.join(missing)} column (first row must hold the column names)")
+
+    rows = []
+    for line, cells in enumerate(table[1:], start=2):
+        def value(field):
+            index = columns.get(field)
+            return str(cells[index]).strip() if index is not None and index < len(cells) else ''
+        row = {'line': line, 'name': value('name'), 'email': value('email'),
+               'mobile': value('mobile'), 'subject': value('subject')}
+        if row['name'] or row['email'] or row['mobile']:
+            rows.append(row)
+    return rows
+
+
+def plan_import(rows, students, subjects, default_subject):
+    """(new students, skipped rows) with the same rules as roster-import.js."""
+    subject_ids = {}
+    for subject in subjects:
+        subject_ids[str(subject.get('id')).lower()] = subject.get('id')
+        if subject.get('name'):
+            subject_ids[str(subject['name']).strip().lower()] = subject.get('id')
+
+    by_email = {normalize_email(s.get('email')) for s in students}
+    by_mobile = {normalize_mobile(s.get('mobile')) for s in students}
+    contacts = {(normalize_email(s.get('email')), normalize_mobile(s.get('mobile'))) for s in students}
+    emails, mobiles = set(), set()   # seen earlier in this file
+
+    ids = IdGenerator()
+    registration_time = datetime.now(timezone.utc).isoformat(timespec='milliseconds').replace('+00:00', 'Z')
+    added, skipped = [], []
+    for row in rows:
+        email = normalize_email(row['email'])
+        mobile = normalize_mobile(row['mobile'])
+        reason = None
+        if not row['name'] or not email or not mobile:
+            reason = 'Name, email and mobile are required'
+        elif '@' not in email:
+            reason = 'Invalid email'
+        elif row['subject'] and row['subject'].lower() not in subject_ids:
+            reason = f"Unknown subject \"{row['subject']}\""
+        elif email in emails and mobile in mobiles:
+            reason = 'Listed more than once'
+        elif (email, mobile) in contacts:
+            reason = 'Already registered'
+        elif email in emails or email in by_email:
+            reason = 'Email already used by another student'
+        elif mobile in mobiles or mobile in by_mobile:
+            reason = 'Mobile already used by another student'
+
+        if reason:
+            skipped.append((row['line'], reason))
+            continue
+
+        emails.add(email)
+        mobiles.add(mobile)
+        added.append({
+            'id': ids.next(),
+            'name': row['name'],
+            'email': row['email'],
+            'mobile': row['mobile'],
+            'subject': subject_ids[row['subject'].lower()] if row['subject'] else default_subject,
+            'registrationTime': registration_time,
+            'preRegistered': True,
+        })
+    return added, skipped
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Register a KYP student roster')
+    parser.add_argument('roster', help='roster file (.csv or .xlsx)')
+    parser.add_argument('--subject', default='', help='subject id for rows without one (default: any exam)')
+    parser.add_argument('--data-dir', default=DATA_DIR, help='data directory (default: ./data)')
+    parser.add_argument('--dry-run', action='store_true', help='check and report, but do not save')
+    args = parser.parse_args()
+
+    if not args.roster.lower().endswith(('.csv', '.xlsx')):
+        sys.exit("❌ Roster must be a .csv or .xlsx file")
+
+    students_path = os.path.join(args.data_dir, 'students.json')
+    subjects_path = os.path.join(args.data_dir, 'subjects.json')
+    students = load_json(students_path) if os.path.exists(students_path) else []
+    subjects = load_json(subjects_path) if os.path.exists(subjects_path) else []
+    if args.subject and not any(s.get('id') == args.subject for s in subjects):
+        sys.exit(f"❌ Subject not found: {args.subject}")
+
+    rows = read_roster(args.roster)
+    added, skipped = plan_import(rows, students, subjects, args.subject)
+
+    print(f"📋 {len(rows)} rows: {len(added)} new students, {len(skipped)} skipped")
+    for line, reason in skipped[:50]:
+        print(f"   line {line}: {reason}")
+    if len(skipped) > 50:
+        print(f"   ... and {len(skipped) - 50} more")
+
+    if args.dry_run:
+        print("🔍 Dry run - nothing written")
+        return
+    if not added:
+        print("✅ Nothing to add")
+        return
+
+    dump_json(students_path, students + added)
+    print(f"✅ Wrote {len(students) + len(added)} students to {students_path}")
+
+
+if __name__ == '__main__':
+    main()
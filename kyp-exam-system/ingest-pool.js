@@ -0,0 +1,243 @@
+const fs = require('fs');
+const os = require('os');
+const path = require('path');
+const crypto = require('crypto');
+const { EventEmitter } = require('events');
+const { Worker } = require('worker_threads');
+
+// Background ingestion of uploaded question papers
+//
+// PDF/DOCX text extraction and question parsing run on a small pool of
+// worker threads (ingest-worker.js) so a large upload never stalls exam
+// requests. Each upload becomes a job that can be polled for status and
+// progress, or followed as parsed questions arrive ('update' and
+// 'questions' events). Several uploads run in parallel up to the pool
+// size; the rest wait in a queue.
+//
+// When a worker has finished parsing, `commit(job)` (supplied by the server)
+// saves the questions on the main thread, which remains the only writer of
+// questions.json.
+
+const WORKER_FILE = path.join(__dirname, 'ingest-worker.js');
+const MAX_FINISHED_JOBS = 50; // Finished jobs kept for status queries
+
+function defaultPoolSize() {
+    return Math.max(1, Math.min(2, os.cpus().length - 1));
+}
+
+// Public view of a job (no file paths, no question bodies)
+function jobSummary(job) {
+    return {
+        id: job.id,
+        status: job.status,
+        stage: job.stage,
+        progress: job.progress,
+        fileName: job.fileName,
+        subjectId: job.subjectId,
+        language: job.language,
+        createdAt: job.createdAt,
+        startedAt: job.startedAt,
+        finishedAt: job.finishedAt,
+        questionsParsed: job.questions.length,
+        questionsAdded: job.questionsAdded,
+        bytes: job.bytes,
+        parseMs: job.parseMs,
+        saveMs: job.saveMs,
+        error: job.error
+    };
+}
+
+class IngestPool extends EventEmitter {
+    constructor(options = {}) {
+        super();
+        this.setMaxListeners(0); // One listener per streaming client
+        this.size = options.size || defaultPoolSize();
+        this.commit = options.commit;
+        this.imagesDir = options.imagesDir || null; // Pictures of the papers go here (image-store.js)
+        this.workers = [];  // { worker, job }
+        this.queue = [];    // Jobs waiting for a worker
+        this.jobs = new Map();
+        this.waiters = new Map(); // jobId -> [resolve]
+    }
+
+    // Queue an uploaded file; returns the job right away
+    submit({ filePath, originalName, subjectId, language, size = null }) {
+        const job = {
+            id: crypto.randomBytes(8).toString('hex'),
+            status: 'queued', // queued -> running -> saving -> done | failed
+            stage: 'queued',
+            progress: 0,
+            fileName: originalName,
+            subjectId,
+            language,
+            createdAt: new Date().toISOString(),
+            startedAt: null,
+            finishedAt: null,
+            bytes: size,
+            parseMs: null, // On the worker thread, from hand-off to the last question
+            saveMs: null,
+            questions: [],
+            questionsAdded: 0,
+            result: null,
+            textPreview: '',
+            error: null,
+            filePath
+        };
+
+        this.jobs.set(job.id, job);
+        this.queue.push(job);
+        this.emit('update', job);
+        this.pump();
+        return job;
+    }
+
+    get(jobId) {
+        return this.jobs.get(jobId) || null;
+    }
+
+    list() {
+        return [...this.jobs.values()];
+    }
+
+    // Resolves with the job once it is done or failed
+    wait(jobId) {
+        const job = this.get(jobId);
+        if (!job) return Promise.resolve(null);
+        if (job.status === 'done' || job.status === 'failed') return Promise.resolve(job);
+
+        return new Promise(resolve => {
+            if (!this.waiters.has(jobId)) {
+                this.waiters.set(jobId, []);
+            }
+            this.waiters.get(jobId).push(resolve);
+        });
+    }
+
+    // Public view of a job (no file paths, no question bodies)
+    summary(job) {
+        return jobSummary(job);
+    }
+
+    // Hand queued jobs to idle workers, starting workers up to the pool size
+    pump() {
+        while (this.queue.length > 0) {
+            let slot = this.workers.find(w => w.job === null);
+            if (!slot) {
+                if (this.workers.length >= this.size) return;
+                slot = this.spawn();
+            }
+
+            const job = this.queue.shift();
+            slot.job = job;
+            job.status = 'running';
+            job.stage = 'starting';
+            job.startedAt = new Date().toISOString();
+            job.parseStarted = process.hrtime.bigint();
+            this.emit('update', job);
+
+            slot.worker.postMessage({
+                jobId: job.id,
+                filePath: job.filePath,
+                originalName: job.fileName,
+                language: job.language,
+                imagesDir: this.imagesDir
+            });
+        }
+    }
+
+    spawn() {
+        const slot = { worker: new Worker(WORKER_FILE), job: null };
+
+        slot.worker.on('message', (message) => this.onMessage(slot, message));
+        slot.worker.on('error', (error) => {
+            console.error('Ingest worker error:', error);
+        });
+        slot.worker.on('exit', (code) => {
+            // A crashed worker fails its job and is replaced on the next pump()
+            this.workers = this.workers.filter(w => w !== slot);
+            if (slot.job) {
+                const job = slot.job;
+                slot.job = null;
+                this.fail(job, { message: `Ingest worker stopped unexpectedly (exit code ${code})`, code: 'WORKER_EXIT' });
+            }
+            this.pump();
+        });
+
+        this.workers.push(slot);
+        return slot;
+    }
+
+    onMessage(slot, message) {
+        const job = this.jobs.get(message.jobId);
+        if (!job || slot.job !== job) return;
+
+        if (message.type === 'progress') {
+            job.stage = message.stage;
+            job.progress = message.progress;
+            this.emit('update', job);
+        } else if (message.type === 'questions') {
+            job.questions.push(...message.questions);
+            job.progress = message.progress;
+            this.emit('questions', job, message.questions);
+            this.emit('update', job);
+        } else if (message.type === 'done') {
+            job.parseMs = Number(process.hrtime.bigint() - job.parseStarted) / 1e6;
+            job.textPreview = message.textPreview;
+            slot.job = null;
+            this.save(job);
+            this.pump();
+        } else if (message.type === 'error') {
+            job.parseMs = Number(process.hrtime.bigint() - job.parseStarted) / 1e6;
+            slot.job = null;
+            this.fail(job, { message: message.message, code: message.code });
+            this.pump();
+        }
+    }
+
+    async save(job) {
+        job.status = 'saving';
+        job.stage = 'saving';
+        job.progress = 95;
+        this.emit('update', job);
+
+        const started = process.hrtime.bigint();
+        try {
+            job.result = await this.commit(job);
+            job.saveMs = Number(process.hrtime.bigint() - started) / 1e6;
+            job.questionsAdded = job.result.filter(item => !item.skipped).length;
+            this.finish(job, 'done');
+        } catch (error) {
+            this.fail(job, { message: error.message, code: error.code || null });
+        }
+    }
+
+    fail(job, error) {
+        job.error = error;
+        this.finish(job, 'failed');
+    }
+
+    finish(job, status) {
+        job.status = status;
+        job.stage = status;
+        job.progress = 100;
+        job.finishedAt = new Date().toISOString();
+
+        // The upload is no longer needed either way
+        fs.unlink(job.filePath, () => {});
+
+        this.emit('update', job);
+        (this.waiters.get(job.id) || []).forEach(resolve => resolve(job));
+        this.waiters.delete(job.id);
+        this.prune();
+    }
+
+    // Forget the oldest finished jobs
+    prune() {
+        const finished = this.list().filter(job => job.finishedAt);
+        for (const job of finished.slice(0, Math.max(0, finished.length - MAX_FINISHED_JOBS))) {
+            this.jobs.delete(job.id);
+        }
+    }
+}
+
+module.exports = { IngestPool, jobSummary, MAX_FINISHED_JOBS };
@@ -0,0 +1,47 @@
+const { parentPort } = require('worker_threads');
+const { extractText, scanQuestions } = require('./question-parser');
+const { ImageStore } = require('./image-store');
+
+// Worker thread side of the ingestion pool (see ingest-pool.js)
+//
+// Receives one task at a time: { jobId, filePath, originalName, language,
+// imagesDir }. Pictures in the paper are saved to imagesDir (see
+// image-store.js) as they are found.
+// Reports back with 'progress', 'questions' (parsed questions in batches),
+// then 'done' or 'error'. The file itself is never modified here; saving the
+// questions is left to the main thread.
+
+const BATCH_SIZE = 25;
+
+parentPort.on('message', async (task) => {
+    const send = (type, data = {}) => parentPort.postMessage({ jobId: task.jobId, type, ...data });
+
+    try {
+        send('progress', { stage: 'extracting', progress: 5 });
+        const images = task.imagesDir ? new ImageStore(task.imagesDir) : null;
+        const text = await extractText(task.filePath, task.originalName, images);
+
+        send('progress', { stage: 'parsing', progress: 50 });
+
+        // Questions go out in batches while the rest of the text is parsed
+        let batch = [];
+        let parsed = 0;
+        const flush = () => {
+            send('questions', {
+                questions: batch,
+                progress: Math.min(90, 50 + Math.round(Math.sqrt(parsed)))
+            });
+            batch = [];
+        };
+        scanQuestions(text, task.language, (question) => {
+            batch.push(question);
+            parsed++;
+            if (batch.length === BATCH_SIZE) flush();
+        });
+        if (batch.length > 0) flush();
+
+        send('done', { textPreview: text.substring(0, 500) });
+    } catch (error) {
+        send('error', { message: error.message, code: error.code || null });
+    }
+});
@@ -0,0 +1,325 @@
+"""Shared helpers for the offline maintenance scripts.
+
+Keeps the on-disk formats used by server.js in one place so the Python
+tools read and write exactly what the server expects.
+"""
+import hashlib
+import json
+import os
+import re
+import time
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+DATA_DIR = os.path.join(BASE_DIR, 'data')
+
+# Results log layout (must match results-store.js)
+RESULTS_FILE = 'results.json'          # legacy single-array file
+RESULTS_DIR = 'results'
+SEGMENT_MAX_BYTES = 4 * 1024 * 1024
+SEGMENT_PATTERN = re.compile(r'^segment-(\d{6})\.jsonl$')
+INTENT_FILE = 'compact.intent'
+
+READ_CHUNK = 64 * 1024
+
+# Question bank versions referenced by compact results (question-versions.js)
+VERSIONS_DIR = 'question-versions'
+VERSION_FIELDS = ('id', 'question', 'options', 'correct', 'marks')
+NOT_ANSWERED = -1
+NOT_RECORDED = -2   # answered, but the choice was not kept
+
+# Student and result ids (must match id-generator.js)
+ID_SEQUENCE_SIZE = 1000
+ID_NODE = 0         # the scripts run with the server stopped
+
+
+class IdGenerator:
+    """Unique, time-ordered ids: milliseconds, 2-digit node, 3-digit sequence."""
+
+    def __init__(self, node=ID_NODE):
+        self.node = f'{node % 100:02d}'
+        self.last_time = 0
+        self.sequence = 0
+
+    def next(self):
+        now = int(time.time() * 1000)
+        if now > self.last_time:
+            self.last_time = now
+            self.sequence = 0
+        else:
+            self.sequence += 1
+            if self.sequence == ID_SEQUENCE_SIZE:
+                self.last_time += 1
+                self.sequence = 0
+        return f'{self.last_time}{self.node}{self.sequence:03d}'
+
+
+def normalize_email(email):
+    """Email as student-index.js compares it."""
+    return str(email if email is not None else '').strip().lower()
+
+
+def normalize_mobile(mobile):
+    """Mobile as student-index.js compares it."""
+    return re.sub(r'[\s-]', '', str(mobile if mobile is not None else ''))
+
+
+def segment_name(seq):
+    return f'segment-{seq:06d}.jsonl'
+
+
+def list_segments(results_dir):
+    """Sorted segment sequence numbers in a results directory."""
+    if not os.path.isdir(results_dir):
+        return []
+    seqs = []
+    for name in os.listdir(results_dir):
+        match = SEGMENT_PATTERN.match(name)
+        if match:
+            seqs.append(int(match.group(1)))
+    return sorted(seqs)
+
+
+def iter_json_array(path, with_text=False):
+    """Yield the items of a top-level JSON array without loading the whole file.
+
+    With `with_text`, yield (item, source text of the item) pairs instead.
+    """
+    decoder = json.JSONDecoder()
+    with open(path, 'r', encoding='utf-8-sig') as f:
+        buf = ''
+        pos = 0
+        started = False
+        eof = False
+
+        while True:
+            # Skip whitespace and separators between items
+            while True:
+                while pos < len(buf) and buf[pos] in ' \t\r\n,':
+                    pos += 1
+                if pos < len(buf) or eof:
+                    break
+                buf, pos = f.read(READ_CHUNK), 0
+                eof = not buf
+
+            if pos >= len(buf):
+                if started:
+                    raise ValueError(f'{path}: unexpected end of file')
+                return
+
+            if not started:
+                if buf[pos] != '[':
+                    raise ValueError(f'{path}: expected a JSON array')
+                started = True
+                pos += 1
+                continue
+
+            if buf[pos] == ']':
+                return
+
+            # Decode one item, reading more input until it is complete
+            while True:
+                try:
+                    item, end = decoder.raw_decode(buf, pos)
+                except json.JSONDecodeError:
+                    if eof:
+                        raise
+                    chunk = f.read(READ_CHUNK)
+                    eof = not chunk
+                    buf = buf[pos:] + chunk
+                    pos = 0
+                    continue
+                # A number may have been cut at the chunk boundary
+                if end == len(buf) and not eof:
+                    chunk = f.read(READ_CHUNK)
+                    eof = not chunk
+                    buf = buf[pos:] + chunk
+                    pos = 0
+                    continue
+                break
+
+            yield (item, buf[pos:end]) if with_text else item
+            pos = end
+            if pos > READ_CHUNK:
+                buf, pos = buf[pos:], 0
+
+
+def iter_jsonl(path):
+    """Yield records from a JSON Lines file, skipping unreadable lines."""
+    with open(path, 'r', encoding='utf-8') as f:
+        for lineno, line in enumerate(f, 1):
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                yield json.loads(line)
+            except json.JSONDecodeError:
+                print(f"⚠️  {os.path.basename(path)}:{lineno}: skipping unreadable line")
+
+
+def iter_results(data_dir=DATA_DIR, segments=None):
+    """Yield every stored result, oldest first, the way the server reads them.
+
+    Pass `segments` (sequence numbers) to read only those segments plus the
+    legacy file.
+    """
+    legacy = os.path.join(data_dir, RESULTS_FILE)
+    results_dir = os.path.join(data_dir, RESULTS_DIR)
+
+    if os.path.exists(legacy):
+        yield from iter_json_array(legacy)
+    for seq in list_segments(results_dir):
+        if segments is None or seq in segments:
+            yield from iter_jsonl(os.path.join(results_dir, segment_name(seq)))
+
+
+def fsync_dir(path):
+    """Persist a rename on filesystems that need the directory synced."""
+    if os.name == 'nt':
+        return
+    fd = os.open(path, os.O_RDONLY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+
+def atomic_write(path, write_fn, mode='w', encoding='utf-8'):
+    """Write a file through a temp file + rename so readers never see half of it."""
+    tmp = path + '.tmp'
+    kwargs = {} if 'b' in mode else {'encoding': encoding, 'newline': '\n'}
+    with open(tmp, mode, **kwargs) as f:
+        write_fn(f)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, path)
+    fsync_dir(os.path.dirname(os.path.abspath(path)))
+
+
+def load_json(path):
+    with open(path, 'r', encoding='utf-8-sig') as f:
+        return json.load(f)
+
+
+def dump_json(path, data, indent=2):
+    """Atomically write a JSON document in the server's format."""
+    atomic_write(path, lambda f: json.dump(data, f, ensure_ascii=False, indent=indent))
+
+
+def recover_compaction(data_dir=DATA_DIR):
+    """Finish or roll back a merge interrupted by a crash.
+
+    Same rules as recoverCompaction() in results-store.js.
+    """
+    results_dir = os.path.join(data_dir, RESULTS_DIR)
+    intent_path = os.path.join(results_dir, INTENT_FILE)
+    if not os.path.exists(intent_path):
+        return
+
+    intent = load_json(intent_path)
+    tmp = os.path.join(results_dir, segment_name(intent['target'])) + '.tmp'
+
+    if os.path.exists(tmp):
+        os.remove(tmp)
+        print("⚠️  Rolled back an unfinished compaction")
+    else:
+        for seq in intent['sources']:
+            path = os.path.join(results_dir, segment_name(seq))
+            if seq != intent['target'] and os.path.exists(path):
+                os.remove(path)
+        legacy = os.path.join(data_dir, RESULTS_FILE)
+        if intent.get('legacy') and os.path.exists(legacy):
+            os.replace(legacy, legacy + '.migrated')
+        print("⚠️  Finished an interrupted compaction")
+    os.remove(intent_path)
+
+
+def replace_segments(data_dir, target, sources, write_fn, legacy=False):
+    """Rewrite segment `target` with write_fn and drop `sources` (and the
+    legacy results.json if `legacy`), crash-safely via compact.intent."""
+    results_dir = os.path.join(data_dir, RESULTS_DIR)
+    target_path = os.path.join(results_dir, segment_name(target))
+    tmp = target_path + '.tmp'
+    intent_path = os.path.join(results_dir, INTENT_FILE)
+
+    with open(tmp, 'w', encoding='utf-8', newline='\n') as f:
+        write_fn(f)
+        f.flush()
+        os.fsync(f.fileno())
+
+    with open(intent_path, 'w', encoding='utf-8') as f:
+        json.dump({'target': target, 'sources': list(sources), 'legacy': legacy}, f)
+        f.flush()
+        os.fsync(f.fileno())
+    fsync_dir(results_dir)
+
+    os.replace(tmp, target_path)
+    for seq in sources:
+        if seq != target:
+            os.remove(os.path.join(results_dir, segment_name(seq)))
+    if legacy:
+        path = os.path.join(data_dir, RESULTS_FILE)
+        os.replace(path, path + '.migrated')
+    fsync_dir(results_dir)
+    os.remove(intent_path)
+
+
+def version_text(subject_id, questions):
+    """The bytes question-versions.js hashes and saves for a subject's questions."""
+    version = {
+        'subjectId': subject_id,
+        'questions': [{field: q[field] for field in VERSION_FIELDS if field in q}
+                      for q in questions],
+    }
+    return json.dumps(version, ensure_ascii=False, separators=(',', ':'))
+
+
+def version_hash(subject_id, questions):
+    return hashlib.sha256(version_text(subject_id, questions).encode('utf-8')).hexdigest()
+
+
+def save_version(data_dir, subject_id, questions):
+    """Save a question bank version unless it exists; returns its hash."""
+    text = version_text(subject_id, questions)
+    digest = hashlib.sha256(text.encode('utf-8')).hexdigest()
+    versions_dir = os.path.join(data_dir, VERSIONS_DIR)
+    path = os.path.join(versions_dir, digest + '.json')
+    if not os.path.exists(path):
+        os.makedirs(versions_dir, exist_ok=True)
+        atomic_write(path, lambda f: f.write(text))
+    return digest
+
+
+def answer_text(question, index):
+    """Option text the way grading.js shows it (Hindi list when bilingual)."""
+    options = question.get('options')
+    if isinstance(options, dict):
+        options = options.get('hi') or options.get('en') or []
+    if not isinstance(options, list) or not isinstance(index, int) or not 0 <= index < len(options):
+        return None
+    return options[index]
+
+
+def build_details(questions, answers):
+    """Detail rows of a compact result, as grading.js buildDetails() makes them.
+
+    Keys the server leaves out (undefined in JavaScript) are left out here too.
+    """
+    details = []
+    for position, question in enumerate(questions):
+        answer = answers[position] if position < len(answers) else NOT_ANSWERED
+        if answer == NOT_ANSWERED:
+            user_answer, is_correct = 'Not Answered', False
+        else:
+            user_answer = None if answer == NOT_RECORDED else answer_text(question, answer)
+            is_correct = answer == question.get('correct')
+        row = {
+            'questionId': question.get('id'),
+            'question': question.get('question'),
+            'userAnswer': user_answer,
+            'correctAnswer': answer_text(question, question.get('correct')),
+            'isCorrect': is_correct,
+            'marks': question.get('marks') if is_correct else 0,
+            'totalMarks': question.get('marks'),
+        }
+        details.append({key: value for key, value in row.items() if value is not None})
+    return details
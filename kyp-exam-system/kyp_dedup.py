@@ -0,0 +1,224 @@
+"""Near-duplicate question index for the offline scripts.
+
+A port of duplicate-index.js: the same text normalization, shingles,
+FNV-1a + fmix32 hashing and MinHash/LSH layout, reading and writing the
+same data/question-index.json. A signature computed here is bit-for-bit
+the one the server computes, so either side can update the index and the
+other only hashes questions that are new or edited since. Keep the two in
+step.
+"""
+import base64
+import hashlib
+import json
+import os
+import struct
+import unicodedata
+
+from kyp_data import DATA_DIR, atomic_write
+
+INDEX_FILE = 'question-index.json'
+INDEX_VERSION = 1
+PERMUTATIONS = 64
+BANDS = 16
+ROWS = PERMUTATIONS // BANDS
+SHINGLE = 5
+DEFAULT_THRESHOLD = 0.6
+
+M32 = 0xFFFFFFFF
+ZERO_WIDTH = dict.fromkeys(map(ord, '\u200b\u200c\u200d\ufeff'))
+
+
+def fmix32(h):
+    """MurmurHash3 finalizer."""
+    h ^= h >> 16
+    h = (h * 0x85EBCA6B) & M32
+    h ^= h >> 13
+    h = (h * 0xC2B2AE35) & M32
+    h ^= h >> 16
+    return h
+
+
+def hash_string(text):
+    """FNV-1a over the UTF-8 bytes, then mixed."""
+    h = 0x811C9DC5
+    for byte in text.encode('utf-8'):
+        h ^= byte
+        h = (h * 16777619) & M32
+    return fmix32(h)
+
+
+SEEDS = [fmix32(((i + 1) * 0x9E3779B9) & M32) for i in range(PERMUTATIONS)]
+
+
+def texts_of(value):
+    """Both languages of a bilingual field, once each."""
+    if isinstance(value, dict):
+        texts = [value.get('hi'), value.get('en')]
+        return list(dict.fromkeys(t for t in texts if isinstance(t, str) and t))
+    return [value] if isinstance(value, str) and value else []
+
+
+def normalized_text(question):
+    """Question and option text (options sorted), lower case, letters,
+    digits and combining marks only."""
+    options = question.get('options')
+    if isinstance(options, list):
+        lists = [options]
+    elif isinstance(options, dict):
+        lists = [l for l in (options.get('hi'), options.get('en')) if isinstance(l, list)]
+        if len(lists) == 2 and lists[0] == lists[1]:
+            lists.pop()
+    else:
+        lists = []
+    option_texts = sorted(text for l in lists for option in l for text in texts_of(option))
+
+    text = ' '.join(texts_of(question.get('question')) + option_texts)
+    text = unicodedata.normalize('NFC', text).translate(ZERO_WIDTH).lower()
+    kept = ''.join(c if unicodedata.category(c)[0] in 'LNM' else ' ' for c in text)
+    return ' '.join(kept.split())
+
+
+def fingerprint(text):
+    return hashlib.sha1(text.encode('utf-8')).hexdigest()
+
+
+def signature(text):
+    shingles = set()
+    if 0 < len(text) <= SHINGLE:
+        shingles.add(text)
+    for i in range(len(text) - SHINGLE + 1):
+        shingles.add(text[i:i + SHINGLE])
+
+    mins = [M32] * PERMUTATIONS
+    for shingle in shingles:
+        h = hash_string(shingle)
+        mins = list(map(min, mins, (fmix32(h ^ seed) for seed in SEEDS)))
+    return mins
+
+
+def encode_signature(mins):
+    return base64.b64encode(struct.pack('<%dI' % PERMUTATIONS, *mins)).decode('ascii')
+
+
+def decode_signature(encoded):
+    return list(struct.unpack('<%dI' % PERMUTATIONS, base64.b64decode(encoded)))
+
+
+def similarity(a, b):
+    return sum(1 for x, y in zip(a, b) if x == y) / PERMUTATIONS
+
+
+def band_keys(mins):
+    return ['%d:%s' % (band, ','.join(map(str, mins[band * ROWS:(band + 1) * ROWS])))
+            for band in range(BANDS)]
+
+
+def entry_key(subject_id, question_id):
+    return f'{subject_id}/{question_id}'
+
+
+def split_key(key):
+    subject_id, _, question_id = key.rpartition('/')
+    return subject_id, int(question_id) if question_id.isdigit() else question_id
+
+
+class DuplicateIndex:
+    def __init__(self, data_dir=DATA_DIR, threshold=DEFAULT_THRESHOLD):
+        self.path = os.path.join(data_dir, INDEX_FILE)
+        self.threshold = threshold
+        self.entries = {}   # entry key -> (fingerprint, signature)
+        self.buckets = {}   # band key -> set of entry keys
+        self.dirty = False
+        self.hashed = 0     # signatures computed since loading
+        self.load()
+
+    def load(self):
+        if not os.path.exists(self.path):
+            return
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                saved = json.load(f)
+        except (OSError, ValueError) as error:
+            print(f"⚠️  Could not read {self.path} ({error}), rebuilding it")
+            return
+        settings = (saved.get('version'), saved.get('permutations'), saved.get('bands'), saved.get('shingle'))
+        if settings != (INDEX_VERSION, PERMUTATIONS, BANDS, SHINGLE):
+            return
+        for key, (print_, encoded) in saved.get('entries', {}).items():
+            self.insert(key, print_, decode_signature(encoded))
+
+    def insert(self, key, print_, mins):
+        self.remove(key)
+        self.entries[key] = (print_, mins)
+        for band in band_keys(mins):
+            self.buckets.setdefault(band, set()).add(key)
+
+    def remove(self, key):
+        entry = self.entries.pop(key, None)
+        if entry is None:
+            return
+        for band in band_keys(entry[1]):
+            bucket = self.buckets.get(band)
+            if bucket is not None:
+                bucket.discard(key)
+                if not bucket:
+                    del self.buckets[band]
+
+    def compute(self, question):
+        text = normalized_text(question)
+        self.hashed += 1
+        return fingerprint(text), signature(text)
+
+    def sync(self, all_questions):
+        """Hash new or edited questions of questions.json, drop deleted ones."""
+        seen = set()
+        for subject_id, questions in all_questions.items():
+            if not isinstance(questions, list):
+                continue
+            for question in questions:
+                key = entry_key(subject_id, question.get('id'))
+                seen.add(key)
+                text = normalized_text(question)
+                print_ = fingerprint(text)
+                entry = self.entries.get(key)
+                if entry and entry[0] == print_:
+                    continue
+                self.hashed += 1
+                self.insert(key, print_, signature(text))
+                self.dirty = True
+        for key in [key for key in self.entries if key not in seen]:
+            self.remove(key)
+            self.dirty = True
+
+    def similar(self, print_, mins):
+        """Indexed questions similar to a signature:
+        [(key, similarity, exact)], most similar first."""
+        candidates = set()
+        for band in band_keys(mins):
+            candidates |= self.buckets.get(band, set())
+
+        found = []
+        for other in candidates:
+            other_print, other_mins = self.entries[other]
+            exact = other_print == print_
+            score = 1.0 if exact else similarity(mins, other_mins)
+            if score >= self.threshold:
+                found.append((other, round(score, 2), exact))
+        return sorted(found, key=lambda match: (-match[1], match[0]))
+
+    def matches(self, key):
+        """Questions similar to an indexed one (itself excluded)."""
+        return [match for match in self.similar(*self.entries[key]) if match[0] != key]
+
+    def save(self):
+        if not self.dirty:
+            return
+        data = {
+            'version': INDEX_VERSION,
+            'permutations': PERMUTATIONS,
+            'bands': BANDS,
+            'shingle': SHINGLE,
+            'entries': {key: [print_, encode_signature(mins)] for key, (print_, mins) in self.entries.items()},
+        }
+        atomic_write(self.path, lambda f: json.dump(data, f, ensure_ascii=False, separators=(',', ':')))
+        self.dirty = False
@@ -0,0 +1,222 @@
+"""Question paper parsing for the offline scripts.
+
+A line-for-line port of question-parser.js (normalizeHindiText,
+scanQuestions, extractText), so papers imported from the command line come
+out exactly as if they had been uploaded through the admin page. Keep the
+two in step when the accepted formats change.
+"""
+import os
+import re
+import unicodedata
+import zipfile
+from xml.etree import ElementTree
+
+ZERO_WIDTH = re.compile('[\u200B-\u200D\uFEFF]')
+ANSWER_LINE = re.compile(
+    r'^(?:सही\s*उत्तर|उत्तर|(?:Correct\s*)?(?:Answer|ANSWER|answer)|Ans|ANS|ans|Correct)'
+    r'\s*[:\-–.)]?\s*[(\[]?\s*([A-Da-d]|[१-४]|[कखगघ](?![\u0900-\u0963]))(?![A-Za-z])')
+META_LINE = re.compile(r'^(?:Marks|MARKS|marks|अंक|Difficulty|difficulty)\s*[:\-]')
+OPTION_LINE = re.compile(
+    r'^(?:(?:Option|विकल्प)\s*)?'
+    r'(?:\(([A-Da-dकखगघ])\)|\[([A-D])\]|\{([A-D])\}|([A-D])[).:]|([a-d])\)|([१-४कखगघ])\))\s*(.*)$')
+QUESTION_LINE = re.compile(
+    r'^(?:(?:Q|q|Question|QUESTION|प्रश्न|प्र)\s*[.:]?\s*)?([0-9]{1,4})\s*[.):]\s*(.*)$')
+INLINE_ANSWER = re.compile(
+    r'\s*(?:सही\s*उत्तर|उत्तर|Answer|Ans)\s*[:\-–]\s*[(\[]?\s*([A-Da-d]|[१-४]|[कखगघ](?![\u0900-\u0963]))(?![A-Za-z]).*$',
+    re.IGNORECASE)
+BLOCK_PREFIX = re.compile(r'^Q[0-9]+\s*:\s*(?=[0-9]{1,4}[.)]\s)', re.IGNORECASE)
+INLINE_MARKER = re.compile(
+    r'[(\[]?([A-Dकखगघ])\s*[)\]]|([0-9]{1,4})[.)](?=\s)|(?:सही\s*उत्तर|उत्तर|Answer|Ans)\s*[:\-–]')
+LIST_PREFIX = re.compile(r'^[0-9.)(\[\]]+\s*')
+DEVANAGARI_OPTIONS = '१२३४'
+DEVANAGARI_LETTERS = 'कखगघ'
+DEVANAGARI = re.compile('[\u0900-\u097F]')
+
+WORD_NS = '{http://schemas.openxmlformats.org/wordprocessingml/2006/main}'
+
+
+def normalize_hindi_text(text):
+    """Same clean-up as normalizeHindiText() in question-parser.js."""
+    if not text:
+        return ''
+    text = unicodedata.normalize('NFC', text)
+    text = ZERO_WIDTH.sub('', text)
+    text = text.replace('\r\n', '\n').replace('\r', '\n')
+    text = re.sub(r'[ \t]+', ' ', text)
+    return re.sub(r'\n{3,}', '\n\n', text)
+
+
+def option_index(letter):
+    devanagari = DEVANAGARI_OPTIONS.find(letter)
+    if devanagari >= 0:
+        return devanagari
+    devanagari_letter = DEVANAGARI_LETTERS.find(letter)
+    return devanagari_letter if devanagari_letter >= 0 else ord(letter.upper()) - 65
+
+
+def split_inline(line):
+    """Cut a flattened "1. Q? A) x B) y ..." line at its markers."""
+    if line.count(')') < 2:
+        return [line]
+
+    cuts = []
+    expected = 0  # index of the next option marker
+    for match in INLINE_MARKER.finditer(line):
+        if match.group(1):
+            if option_index(match.group(1)) != expected:
+                continue
+            if match.group(1) in DEVANAGARI_LETTERS and match.start() > 0 and DEVANAGARI.match(line[match.start() - 1]):
+                continue  # a क) ending a Hindi word, "(जनक)"
+            expected += 1
+        elif match.group(2):
+            # A question number, unless it is part of a longer number or word
+            before = line[match.start() - 1] if match.start() > 0 else ''
+            if before == '.' or before == '_' or (before.isascii() and before.isalnum()):
+                continue
+            expected = 0  # Next question
+        cuts.append(match.start())
+    if expected < 2:
+        return [line]  # Fewer than two options: not a flattened question
+
+    pieces = []
+    start = 0
+    for cut in cuts:
+        if cut > start:
+            pieces.append(line[start:cut].strip())
+            start = cut
+    pieces.append(line[start:].strip())
+    return [piece for piece in pieces if piece]
+
+
+def build_question(current, question_id, language):
+    options = current['options']
+    if options:
+        question_text = ' '.join([current['head']] + current['lines'])
+    else:
+        # No option markers: the lines after the question are the options
+        lines = list(current['lines'])
+        question_text = current['head'] or (lines.pop(0) if lines else '')
+        options = [LIST_PREFIX.sub('', line).strip() for line in lines[:4]]
+        options = [option for option in options if len(option) > 2]
+
+    question_text = question_text.strip()
+    if len(question_text) < 5 or len(options) < 2:
+        return None
+
+    correct = current['correct']
+    if correct is None or correct >= len(options):
+        correct = 0
+
+    return {
+        'id': question_id,
+        'question': {'hi': question_text, 'en': question_text},
+        'options': {'hi': options, 'en': options},
+        'correct': correct,
+        'marks': 1,
+        'difficulty': 'medium',
+    }
+
+
+def parse_questions(text, language='hi'):
+    """Questions in a paper's text, numbered from 1 (see scanQuestions())."""
+    questions = []
+    current = None
+
+    def emit():
+        question = build_question(current, len(questions) + 1, language)
+        if question:
+            questions.append(question)
+
+    text = ZERO_WIDTH.sub('', text.replace('\r\n', '\n').replace('\r', '\n'))
+
+    for line in text.split('\n'):
+        line = line.strip()
+        if not line:
+            # A blank line after the options ends the question
+            if current and len(current['options']) >= 2:
+                current['closed'] = True
+            continue
+
+        if line[0] in 'Qq':
+            line = BLOCK_PREFIX.sub('', line)
+
+        for piece in split_inline(line):
+            first = piece[0]
+
+            if first in 'AaCcउस' and (match := ANSWER_LINE.match(piece)):
+                if current:
+                    current['correct'] = option_index(match.group(1))
+            elif first in 'MmDdअ' and META_LINE.match(piece):
+                pass  # Marks/difficulty line, skipped
+            elif first in '([{ABCDabcdOव१२३४कखगघ' and (match := OPTION_LINE.match(piece)):
+                if not current:
+                    continue  # Option without a question
+                option_text = match.group(7)
+                answer = ('Ans' in option_text or 'उत्तर' in option_text) and INLINE_ANSWER.search(option_text)
+                if answer:
+                    current['correct'] = option_index(answer.group(1))
+                    option_text = option_text[:answer.start()]
+                option_text = option_text.strip()
+                if option_text:
+                    current['options'].append(option_text)
+            elif (first in '0123456789Qqप') and (match := QUESTION_LINE.match(piece)):
+                if current:
+                    emit()
+                current = {'head': match.group(2).strip(), 'lines': [], 'options': [],
+                           'correct': None, 'closed': False}
+            elif not current or current['closed'] or len(current['options']) >= 4:
+                # Unnumbered question
+                if current:
+                    emit()
+                current = {'head': piece, 'lines': [], 'options': [],
+                           'correct': None, 'closed': False}
+            elif current['options']:
+                # Plain text after the options continues the last one
+                current['options'][-1] += ' ' + piece
+            else:
+                current['lines'].append(piece)
+
+    if current:
+        emit()
+    return questions
+
+
+def docx_text(path):
+    """Raw text of a .docx, one paragraph per block like mammoth.extractRawText."""
+    with zipfile.ZipFile(path) as zf:
+        root = ElementTree.fromstring(zf.read('word/document.xml'))
+
+    paragraphs = []
+    for paragraph in root.iter(WORD_NS + 'p'):
+        parts = []
+        for node in paragraph.iter():
+            if node.tag == WORD_NS + 't':
+                parts.append(node.text or '')
+            elif node.tag == WORD_NS + 'tab':
+                parts.append('\t')
+            elif node.tag in (WORD_NS + 'br', WORD_NS + 'cr'):
+                parts.append('\n')
+        paragraphs.append(''.join(parts) + '\n\n')
+    return ''.join(paragraphs)
+
+
+def pdf_text(path):
+    try:
+        from pypdf import PdfReader
+    except ImportError:
+        raise RuntimeError('PDF papers need pypdf (pip install pypdf)')
+    reader = PdfReader(path)
+    return '\n'.join(page.extract_text() or '' for page in reader.pages)
+
+
+def extract_text(path):
+    """Text of a question paper (.docx, .pdf or plain .txt)."""
+    extension = os.path.splitext(path)[1].lower()
+    if extension == '.docx':
+        return normalize_hindi_text(docx_text(path))
+    if extension == '.pdf':
+        return pdf_text(path)
+    if extension == '.txt':
+        with open(path, 'r', encoding='utf-8-sig') as f:
+            return f.read()
+    raise ValueError(f'Unsupported file format: {extension}')
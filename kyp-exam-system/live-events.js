@@ -0,0 +1,98 @@
+// Live exam events for the admin panel (Server-Sent Events)
+//
+// Registrations, submissions (with the subject's updated score summary),
+// upload job progress and server log entries are published here as small
+// events and pushed to every admin tab on GET /api/admin/events, instead of
+// each tab polling the full logs and results.
+//
+// The most recent BUFFER_SIZE events are kept. Event ids are
+// "<stream>-<seq>": a browser that reconnects sends the last id it saw
+// (Last-Event-ID) and gets the events after it. If those are no longer
+// buffered, or the server restarted since (a new stream), it gets a
+// 'reset' event and reloads what it shows instead.
+//
+// In cluster mode the owner numbers the events: workers send theirs to it
+// and it passes every event to every worker (LiveClient in
+// cluster-client.js), so an id means the same event on any worker.
+
+const BUFFER_SIZE = parseInt(process.env.KYP_LIVE_BUFFER) || 1000;
+const HEARTBEAT_MS = 20000;  // Keeps proxies and idle timeouts from closing the stream
+const RETRY_MS = 3000;       // Browser reconnect delay
+
+class LiveEvents {
+    constructor(stream = Date.now().toString(36)) {
+        this.stream = stream;
+        this.nextSeq = 1;
+        this.buffer = [];          // Oldest first
+        this.clients = new Set();  // { res, types }
+    }
+
+    // Number and send an event; returns it
+    publish(type, data) {
+        const event = { id: `${this.stream}-${this.nextSeq}`, seq: this.nextSeq, type, time: Date.now(), data };
+        this.nextSeq++;
+        this.push(event);
+        return event;
+    }
+
+    push(event) {
+        this.buffer.push(event);
+        if (this.buffer.length > BUFFER_SIZE) {
+            this.buffer.splice(0, this.buffer.length - BUFFER_SIZE);
+        }
+        for (const client of this.clients) {
+            this.send(client, event);
+        }
+    }
+
+    // Buffered events after lastEventId, or null if some are missing
+    since(lastEventId) {
+        if (!lastEventId) return [];
+        const [stream, seqText] = String(lastEventId).split('-');
+        const seq = parseInt(seqText);
+        if (stream !== this.stream || !Number.isInteger(seq)) return null;
+
+        const first = this.buffer.length > 0 ? this.buffer[0].seq : this.nextSeq;
+        if (seq + 1 < first) return null;
+        return this.buffer.filter(event => event.seq > seq);
+    }
+
+    send(client, event) {
+        if (client.types && !client.types.has(event.type)) return;
+        client.res.write(`id: ${event.id}\nevent: ${event.type}\ndata: ${JSON.stringify({ time: event.time, ...event.data })}\n\n`);
+    }
+
+    // Serve an event stream on an HTTP response; types: optional list of
+    // event types to send
+    subscribe(req, res, { lastEventId = null, types = null } = {}) {
+        res.writeHead(200, {
+            'Content-Type': 'text/event-stream; charset=utf-8',
+            'Cache-Control': 'no-cache, no-transform',
+            'Connection': 'keep-alive',
+            'X-Accel-Buffering': 'no'
+        });
+        res.write(`retry: ${RETRY_MS}\n\n`);
+
+        const client = { res, types: types ? new Set(types) : null };
+        const missed = this.since(lastEventId);
+        if (missed === null) {
+            res.write(`event: reset\ndata: ${JSON.stringify({ reason: 'Events since the last one seen are no longer available' })}\n\n`);
+        } else {
+            missed.forEach(event => this.send(client, event));
+        }
+        this.clients.add(client);
+
+        const heartbeat = setInterval(() => res.write(': ping\n\n'), HEARTBEAT_MS);
+        req.on('close', () => {
+            clearInterval(heartbeat);
+            this.clients.delete(client);
+        });
+    }
+
+    // Events to hand a newly started cluster worker
+    recent() {
+        return { stream: this.stream, nextSeq: this.nextSeq, events: this.buffer };
+    }
+}
+
+module.exports = { LiveEvents };
@@ -0,0 +1,491 @@
+"""Load-test the exam server with a simulated exam cohort.
+
+Starts a private copy of the server on a free port, with a throwaway copy
+of data/ (the real data files are only ever read), and drives N simulated
+students through a whole exam:
+
+    POST /api/register -> GET /api/questions/:subjectId
+    -> PUT /api/checkpoints/:studentId/:subjectId every few answers
+    -> POST /api/submit
+
+Students arrive in waves (the start bell) and either submit as they finish
+or all at once (--end-bell). At the end, latency percentiles, throughput
+and errors are printed per route. Runs can be saved as named baselines in
+load-baselines/ and later runs compared against them.
+
+Answer saves are skipped when the server has no checkpoint route.
+
+Usage:
+    python load-test.py --students 300
+    python load-test.py --students 600 --waves 3 --wave-gap 5 --end-bell
+    python load-test.py --students 600 --cluster 4
+    python load-test.py --students 300 --save-baseline before
+    python load-test.py --students 300 --compare before
+"""
+import argparse
+import asyncio
+import json
+import math
+import os
+import random
+import shutil
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+from kyp_data import BASE_DIR, DATA_DIR, load_json
+
+BASELINE_DIR = os.path.join(BASE_DIR, 'load-baselines')
+ROUTES = ('register', 'questions', 'save', 'submit')
+# Not copied into the throwaway server
+COPY_IGNORE = ('node_modules', 'data', 'uploads', '.git', 'load-baselines', '__pycache__')
+READY_TIMEOUT = 60
+
+
+class Connection:
+    """One keep-alive HTTP/1.1 connection (one per simulated student)."""
+
+    def __init__(self, host, port):
+        self.host = host
+        self.port = port
+        self.reader = None
+        self.writer = None
+
+    async def request(self, method, path, body=None):
+        """(status, response body) for one request."""
+        reused = self.writer is not None
+        try:
+            return await self.exchange(method, path, body)
+        except (ConnectionError, asyncio.IncompleteReadError):
+            if not reused:
+                raise
+            # The server closed the idle connection (keep-alive timeout);
+            # a browser would retry on a new one
+            self.close()
+            return await self.exchange(method, path, body)
+
+    async def exchange(self, method, path, body):
+        if self.writer is None:
+            self.reader, self.writer = await asyncio.open_connection(self.host, self.port)
+
+        payload = b'' if body is None else json.dumps(body, ensure_ascii=False).encode('utf-8')
+        head = (f'{method} {path} HTTP/1.1\r\n'
+                f'Host: {self.host}:{self.port}\r\n'
+                'Accept-Encoding: identity\r\n')
+        if body is not None:
+            head += f'Content-Type: application/json\r\nContent-Length: {len(payload)}\r\n'
+        self.writer.write(head.encode('latin-1') + b'\r\n' + payload)
+        await self.writer.drain()
+
+        status_line = await self.reader.readline()
+        if not status_line:
+            raise ConnectionError('server closed the connection')
+        status = int(status_line.split()[1])
+
+        headers = {}
+        while True:
+            line = await self.reader.readline()
+            if line in (b'\r\n', b'\n', b''):
+                break
+            name, _, value = line.decode('latin-1').partition(':')
+            headers[name.strip().lower()] = value.strip()
+
+        if headers.get('transfer-encoding', '').lower() == 'chunked':
+            data = bytearray()
+            while True:
+                size = int((await self.reader.readline()).split(b';')[0], 16)
+                if size == 0:
+                    while (await self.reader.readline()) not in (b'\r\n', b'\n', b''):
+                        pass
+                    break
+                data += await self.reader.readexactly(size)
+                await self.reader.readline()
+        else:
+            data = await self.reader.readexactly(int(headers.get('content-length', 0)))
+
+        if headers.get('connection', '').lower() == 'close':
+            self.close()
+        return status, bytes(data)
+
+    def close(self):
+        if self.writer is not None:
+            self.writer.close()
+        self.reader = self.writer = None
+
+
+class RouteStats:
+    def __init__(self):
+        self.latencies = []  # ms
+        self.errors = 0
+        self.statuses = {}
+
+    def summary(self, duration):
+        latencies = sorted(self.latencies)
+        return {
+            'requests': len(latencies),
+            'errors': self.errors,
+            'p50': percentile(latencies, 50),
+            'p95': percentile(latencies, 95),
+            'p99': percentile(latencies, 99),
+            'max': latencies[-1] if latencies else None,
+            'rps': len(latencies) / duration if duration else 0,
+            'statuses': dict(sorted(self.statuses.items()))
+        }
+
+
+def percentile(values, p):
+    """Nearest-rank percentile of sorted values."""
+    if not values:
+        return None
+    return values[max(0, math.ceil(p / 100 * len(values)) - 1)]
+
+
+class Recorder:
+    def __init__(self):
+        self.routes = {route: RouteStats() for route in ROUTES}
+        self.completed = 0
+
+    async def call(self, route, conn, method, path, body=None):
+        """Timed request; (status, data), or (None, None) if it failed."""
+        stats = self.routes[route]
+        started = time.perf_counter()
+        try:
+            status, data = await conn.request(method, path, body)
+        except (OSError, asyncio.IncompleteReadError, ValueError, IndexError) as error:
+            conn.close()
+            stats.latencies.append((time.perf_counter() - started) * 1000)
+            stats.errors += 1
+            key = type(error).__name__
+            stats.statuses[key] = stats.statuses.get(key, 0) + 1
+            return None, None
+
+        stats.latencies.append((time.perf_counter() - started) * 1000)
+        stats.statuses[str(status)] = stats.statuses.get(str(status), 0) + 1
+        if status >= 400:
+            stats.errors += 1
+        return status, data
+
+
+class Exam:
+    """Settings and shared state of one simulated exam."""
+
+    def __init__(self, args, port, subject):
+        self.args = args
+        self.port = port
+        self.subject = subject
+        self.recorder = Recorder()
+        self.save_answers = args.save_every > 0
+        self.finished_answering = 0
+        self.end_bell = asyncio.Event()
+
+    def answered(self):
+        self.finished_answering += 1
+        if self.finished_answering == self.args.students:
+            self.end_bell.set()
+
+    async def student(self, number, rng):
+        args = self.args
+        record = self.recorder
+        conn = Connection('127.0.0.1', self.port)
+        counted = False
+        try:
+            status, data = await record.call('register', conn, 'POST', '/api/register', {
+                'name': f'Load Test {number}',
+                'email': f'load{number}@example.com',
+                'mobile': f'9{number:09d}',
+                'subject': self.subject
+            })
+            if status != 200:
+                return
+            student_id = json.loads(data)['studentId']
+
+            status, data = await record.call('questions', conn, 'GET',
+                                             f'/api/questions/{self.subject}?lang={args.lang}&student={student_id}')
+            if status != 200:
+                return
+            questions = json.loads(data)
+
+            # Like the exam page: saves carry the answers locked since the
+            # last one, and submit carries whatever is still unsaved
+            unsaved = {}
+            checkpoint = f'/api/checkpoints/{student_id}/{self.subject}'
+            for index, question in enumerate(questions, 1):
+                if args.think > 0:
+                    await asyncio.sleep(rng.expovariate(1 / args.think))
+                if question.get('options'):
+                    unsaved[str(question['id'])] = rng.randrange(len(question['options']))
+                if self.save_answers and index % args.save_every == 0:
+                    status, _ = await record.call('save', conn, 'PUT', checkpoint, {
+                        'answers': unsaved,
+                        'seq': index,
+                        'timeSpent': index * args.think
+                    })
+                    if status == 200:
+                        unsaved = {}
+
+            counted = True
+            self.answered()
+            if args.end_bell:
+                await self.end_bell.wait()
+
+            status, data = await record.call('submit', conn, 'POST', '/api/submit', {
+                'studentId': student_id,
+                'subjectId': self.subject,
+                'answers': unsaved,
+                'timeSpent': len(questions) * args.think
+            })
+            if status == 200:
+                record.completed += 1
+        finally:
+            if not counted:
+                self.answered()
+            conn.close()
+
+    async def probe_checkpoints(self):
+        """Does the server have the checkpoint route? (An unknown route is a
+        plain-text 404, not a JSON error.)"""
+        conn = Connection('127.0.0.1', self.port)
+        try:
+            status, data = await conn.request('PUT', f'/api/checkpoints/0/{self.subject}', {'answers': {}})
+        finally:
+            conn.close()
+        return not (status == 404 and not data.lstrip().startswith(b'{'))
+
+    async def run(self):
+        args = self.args
+        if self.save_answers:
+            self.save_answers = await self.probe_checkpoints()
+        rng = random.Random(args.seed)
+        per_wave = math.ceil(args.students / args.waves)
+        tasks = []
+        started = time.perf_counter()
+
+        for number in range(args.students):
+            wave = number // per_wave
+            delay = wave * args.wave_gap + (rng.uniform(0, args.spread) if args.spread else 0)
+            tasks.append(asyncio.ensure_future(
+                self.delayed(delay, number + 1, random.Random(rng.random()))))
+        await asyncio.gather(*tasks)
+        return time.perf_counter() - started
+
+    async def delayed(self, delay, number, rng):
+        if delay > 0:
+            await asyncio.sleep(delay)
+        await self.student(number, rng)
+
+
+def prepare_copy(workdir, data_dir):
+    """Copy the server and its data into workdir; returns the app folder."""
+    app_dir = os.path.join(workdir, 'app')
+    shutil.copytree(BASE_DIR, app_dir, ignore=shutil.ignore_patterns(*COPY_IGNORE))
+    shutil.copytree(data_dir, os.path.join(app_dir, 'data'), ignore=shutil.ignore_patterns('logs'))
+    return app_dir
+
+
+def free_port(port):
+    """port if nothing listens on it (0: any free port), else exit."""
+    with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as sock:
+        try:
+            sock.bind(('0.0.0.0', port))
+        except OSError:
+            sys.exit(f"❌ Port {port} is in use; pick another --port or leave it out")
+        return sock.getsockname()[1]
+
+
+def start_server(app_dir, port, workers, log):
+    env = dict(os.environ)
+    env['PORT'] = str(port)
+    # The copy has no node_modules of its own
+    env['NODE_PATH'] = os.path.join(BASE_DIR, 'node_modules')
+    entry = 'server.js'
+    if workers:
+        entry = 'cluster.js'
+        env['KYP_WORKERS'] = str(workers)
+    return subprocess.Popen(['node', entry], cwd=app_dir, env=env, stdout=log, stderr=subprocess.STDOUT)
+
+
+async def wait_ready(port, server):
+    """True once our server answers; False if it exited, timed out, or the
+    answer came from a server that was running before ours."""
+    started = time.monotonic()
+    deadline = started + READY_TIMEOUT
+    while time.monotonic() < deadline:
+        if server.poll() is not None:
+            return False
+        conn = Connection('127.0.0.1', port)
+        try:
+            status, body = await conn.request('GET', '/api/info')
+            if status == 200:
+                uptime = json.loads(body).get('uptime', 0)
+                if uptime > time.monotonic() - started + 1:
+                    print(f"❌ Another server answers on port {port}")
+                    return False
+                # Ours may still exit (e.g. the port was taken meanwhile)
+                await asyncio.sleep(0.5)
+                return server.poll() is None
+        except (OSError, asyncio.IncompleteReadError, ValueError):
+            pass
+        finally:
+            conn.close()
+        await asyncio.sleep(0.2)
+    return False
+
+
+def stop_server(server):
+    server.terminate()  # SIGTERM: the server saves pending data and exits
+    try:
+        server.wait(timeout=15)
+    except subprocess.TimeoutExpired:
+        server.kill()
+        server.wait()
+
+
+def pick_subject(data_dir, subject):
+    questions = load_json(os.path.join(data_dir, 'questions.json'))
+    if subject:
+        if not questions.get(subject):
+            sys.exit(f"❌ Subject '{subject}' has no questions")
+        return subject
+    for subject_id, items in questions.items():
+        if items:
+            return subject_id
+    sys.exit("❌ No subject with questions found; pass --subject")
+
+
+def fmt_ms(value):
+    return '-' if value is None else f'{value:.1f}'
+
+
+def print_report(report):
+    print(f"\n📊 {report['students']} students, {report['completed']} submitted, "
+          f"{report['duration']:.1f}s ({report['server']})")
+    print(f"{'Route':<10} {'Requests':>9} {'Errors':>7} {'p50 ms':>9} {'p95 ms':>9} "
+          f"{'p99 ms':>9} {'max ms':>9} {'req/s':>8}")
+    total_requests = total_errors = 0
+    for route, stats in report['routes'].items():
+        if not stats['requests']:
+            continue
+        total_requests += stats['requests']
+        total_errors += stats['errors']
+        print(f"{route:<10} {stats['requests']:>9} {stats['errors']:>7} {fmt_ms(stats['p50']):>9} "
+              f"{fmt_ms(stats['p95']):>9} {fmt_ms(stats['p99']):>9} {fmt_ms(stats['max']):>9} "
+              f"{stats['rps']:>8.1f}")
+    rate = total_errors / total_requests * 100 if total_requests else 0
+    print(f"{'total':<10} {total_requests:>9} {total_errors:>7}   "
+          f"{total_requests / report['duration']:.1f} req/s, {rate:.2f}% errors")
+    for route, stats in report['routes'].items():
+        failed = {status: count for status, count in stats['statuses'].items() if not status.startswith('2')}
+        if failed:
+            print(f"⚠️  {route}: {failed}")
+
+
+def print_comparison(baseline, report):
+    print(f"\n📈 Compared with baseline '{baseline['name']}' ({baseline['createdAt']})")
+    if baseline['settings'] != report['settings']:
+        print("⚠️  Settings differ from the baseline; numbers may not be comparable")
+    print(f"{'Route':<10} {'':<4} {'baseline':>10} {'now':>10} {'change':>9}")
+    for route, stats in report['routes'].items():
+        before = baseline['routes'].get(route)
+        if not before or not stats['requests'] or not before['requests']:
+            continue
+        for key in ('p50', 'p95', 'p99', 'rps'):
+            old, new = before[key], stats[key]
+            change = f'{(new - old) / old * 100:+.1f}%' if old else '-'
+            print(f"{route if key == 'p50' else '':<10} {key:<4} {old:>10.1f} {new:>10.1f} {change:>9}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Simulate an exam cohort against a throwaway copy of the KYP server')
+    parser.add_argument('--students', type=int, default=100, help='simulated students (default: 100)')
+    parser.add_argument('--subject', help='subject id (default: first subject with questions)')
+    parser.add_argument('--lang', default='hi', help='question language (default: hi)')
+    parser.add_argument('--waves', type=int, default=1, help='arrival waves (default: 1, everyone at once)')
+    parser.add_argument('--wave-gap', type=float, default=2.0, help='seconds between waves (default: 2)')
+    parser.add_argument('--spread', type=float, default=0.0, help='random arrival spread within a wave, seconds')
+    parser.add_argument('--think', type=float, default=0.05,
+                        help='mean seconds per answer (default: 0.05; real exams are ~30)')
+    parser.add_argument('--save-every', type=int, default=5, help='save answers every N answers (0: never)')
+    parser.add_argument('--end-bell', action='store_true', help='everyone submits at the same moment')
+    parser.add_argument('--cluster', type=int, default=0, metavar='N', help='run cluster.js with N workers')
+    parser.add_argument('--port', type=int, default=0, help='port of the throwaway server (default: a free one)')
+    parser.add_argument('--seed', type=int, default=1, help='random seed (default: 1)')
+    parser.add_argument('--data-dir', default=DATA_DIR, help='data to copy (default: ./data, never modified)')
+    parser.add_argument('--save-baseline', metavar='NAME', help='save this run as load-baselines/NAME.json')
+    parser.add_argument('--compare', metavar='NAME', help='compare with load-baselines/NAME.json')
+    parser.add_argument('--keep', action='store_true', help='keep the throwaway copy and its server log')
+    args = parser.parse_args()
+
+    if args.students < 1 or args.waves < 1:
+        sys.exit("❌ --students and --waves must be at least 1")
+
+    baseline = None
+    if args.compare:
+        baseline_path = os.path.join(BASELINE_DIR, args.compare + '.json')
+        if not os.path.exists(baseline_path):
+            sys.exit(f"❌ No baseline {baseline_path}")
+        baseline = load_json(baseline_path)
+
+    subject = pick_subject(args.data_dir, args.subject)
+    args.port = free_port(args.port)
+    workdir = tempfile.mkdtemp(prefix='kyp-load-')
+    app_dir = prepare_copy(workdir, args.data_dir)
+    log_path = os.path.join(workdir, 'server.log')
+    server_name = f'cluster, {args.cluster} workers' if args.cluster else 'single process'
+    print(f"📦 Server copy in {workdir} ({server_name}, port {args.port})")
+
+    with open(log_path, 'w', encoding='utf-8') as log:
+        server = start_server(app_dir, args.port, args.cluster, log)
+        try:
+            if not asyncio.run(wait_ready(args.port, server)):
+                print(f"❌ Server did not start, see {log_path}")
+                args.keep = True
+                sys.exit(1)
+
+            print(f"🎓 {args.students} students taking '{subject}' in {args.waves} wave(s)...")
+            exam = Exam(args, args.port, subject)
+            duration = asyncio.run(exam.run())
+        finally:
+            stop_server(server)
+
+    settings = {key: getattr(args, key) for key in
+                ('students', 'subject', 'lang', 'waves', 'wave_gap', 'spread', 'think',
+                 'save_every', 'end_bell', 'cluster', 'seed')}
+    settings['subject'] = subject
+    report = {
+        'students': args.students,
+        'completed': exam.recorder.completed,
+        'duration': duration,
+        'server': server_name,
+        'settings': settings,
+        'routes': {route: stats.summary(duration) for route, stats in exam.recorder.routes.items()}
+    }
+    print_report(report)
+    if not exam.save_answers and args.save_every > 0:
+        print("⚠️  This server has no checkpoint route; answer saves were skipped")
+
+    if baseline:
+        print_comparison(baseline, report)
+
+    if args.save_baseline:
+        os.makedirs(BASELINE_DIR, exist_ok=True)
+        path = os.path.join(BASELINE_DIR, args.save_baseline + '.json')
+        report['name'] = args.save_baseline
+        report['createdAt'] = datetime.now().isoformat(timespec='seconds')
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+        print(f"✅ Baseline saved to {os.path.relpath(path, BASE_DIR)}")
+
+    if args.keep:
+        print(f"📁 Kept {workdir}")
+    else:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    total_errors = sum(stats['errors'] for stats in report['routes'].values())
+    sys.exit(1 if total_errors else 0)
+
+
+if __name__ == '__main__':
+    main()
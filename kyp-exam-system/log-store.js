@@ -0,0 +1,312 @@
+const fs = require('fs');
+const path = require('path');
+
+// Server log (admin "Server Logs" tab)
+//
+// Entries live in a fixed-capacity ring buffer: adding one is O(1) and never
+// shifts an array. An entry keeps the caller's `data` object as is and only
+// turns it into text when the entry is read (query()) or written to disk,
+// so logging costs almost nothing where it happens. Callers must not mutate
+// `data` after logging it.
+//
+// Every entry is also appended to data/logs/log-000001.jsonl, ... in batches
+// off the request path; a file is rotated at MAX_FILE_BYTES and only the
+// newest MAX_FILES are kept. open() refills the buffer from those files, so
+// the log survives restarts.
+//
+// query() finds the time range by binary search over the buffer (entries
+// are in time order) and walks a per-type index of sequence numbers, so a
+// filtered query only touches the entries it returns.
+
+const DEFAULT_CAPACITY = 1000;
+const MAX_FILE_BYTES = 1024 * 1024; // 1MB per log file
+const MAX_FILES = 5;
+const FLUSH_DELAY_MS = 200;
+const FILE_PATTERN = /^log-(\d{6})\.jsonl$/;
+
+function fileName(seq) {
+    return `log-${String(seq).padStart(6, '0')}.jsonl`;
+}
+
+function serializeData(data) {
+    if (data === null || data === undefined) return null;
+    if (typeof data === 'string') return data;
+    try {
+        return JSON.stringify(data, null, 2);
+    } catch (error) {
+        return String(data);
+    }
+}
+
+// Sequence numbers of one log type, oldest first
+class SeqIndex {
+    constructor() {
+        this.seqs = [];
+        this.start = 0;
+    }
+
+    get length() {
+        return this.seqs.length - this.start;
+    }
+
+    push(seq) {
+        this.seqs.push(seq);
+    }
+
+    // Forget sequence numbers below `oldest` (evicted from the buffer)
+    trim(oldest) {
+        while (this.start < this.seqs.length && this.seqs[this.start] < oldest) {
+            this.start++;
+        }
+        if (this.start > 1024 && this.start * 2 > this.seqs.length) {
+            this.seqs = this.seqs.slice(this.start);
+            this.start = 0;
+        }
+    }
+
+    // Position of the first seq >= value
+    lowerBound(value) {
+        let lo = this.start;
+        let hi = this.seqs.length;
+        while (lo < hi) {
+            const mid = (lo + hi) >>> 1;
+            if (this.seqs[mid] < value) lo = mid + 1; else hi = mid;
+        }
+        return lo;
+    }
+}
+
+class LogStore {
+    constructor(dir, options = {}) {
+        this.dir = dir;
+        this.capacity = options.capacity || DEFAULT_CAPACITY;
+        this.clear();
+        this.pending = [];    // Entries not yet written to disk
+        this.flushTimer = null;
+        this.flushing = null;
+        this.fileSeq = 0;
+        this.fileBytes = 0;
+    }
+
+    clear() {
+        this.buffer = new Array(this.capacity);
+        this.nextSeq = this.nextSeq || 0; // Sequence numbers keep counting
+        this.firstSeq = this.nextSeq;     // Oldest entry still in the buffer
+        this.byType = new Map();
+    }
+
+    get size() {
+        return this.nextSeq - this.firstSeq;
+    }
+
+    // Load the newest entries from disk (call once at startup)
+    open() {
+        fs.mkdirSync(this.dir, { recursive: true });
+        const files = this.listFiles();
+        this.fileSeq = files.length > 0 ? files[files.length - 1] : 1;
+        try {
+            this.fileBytes = fs.statSync(this.filePath(this.fileSeq)).size;
+        } catch (error) {
+            this.fileBytes = 0;
+        }
+
+        // Newest files first until the buffer would be full
+        const lines = [];
+        for (let i = files.length - 1; i >= 0 && lines.length < this.capacity; i--) {
+            const text = fs.readFileSync(this.filePath(files[i]), 'utf8');
+            const fileLines = text.split('\n').filter(line => line);
+            lines.unshift(...fileLines.slice(-(this.capacity - lines.length)));
+        }
+
+        for (const line of lines) {
+            try {
+                const stored = JSON.parse(line);
+                this.insert({
+                    time: Date.parse(stored.timestamp) || 0,
+                    type: stored.type,
+                    message: stored.message,
+                    data: stored.data,
+                    text: stored.data // Already serialized
+                });
+            } catch (error) {
+                // Unreadable line (e.g. cut off by a crash), skip it
+            }
+        }
+    }
+
+    listFiles() {
+        if (!fs.existsSync(this.dir)) return [];
+        return fs.readdirSync(this.dir)
+            .map(name => FILE_PATTERN.exec(name))
+            .filter(Boolean)
+            .map(match => parseInt(match[1], 10))
+            .sort((a, b) => a - b);
+    }
+
+    filePath(seq) {
+        return path.join(this.dir, fileName(seq));
+    }
+
+    // Record an entry; disk writes happen later in the background
+    add(type, message, data = null) {
+        const entry = { time: Date.now(), type, message, data, text: undefined };
+        this.insert(entry);
+        this.pending.push(entry);
+        if (!this.flushTimer && !this.flushing) {
+            this.flushTimer = setTimeout(() => this.flush(), FLUSH_DELAY_MS);
+            this.flushTimer.unref();
+        }
+        return entry;
+    }
+
+    insert(entry) {
+        if (this.size === this.capacity) {
+            const evicted = this.buffer[this.firstSeq % this.capacity];
+            this.firstSeq++;
+            const index = this.byType.get(evicted.type);
+            if (index) index.trim(this.firstSeq);
+        }
+
+        entry.seq = this.nextSeq++;
+        this.buffer[entry.seq % this.capacity] = entry;
+
+        if (!this.byType.has(entry.type)) {
+            this.byType.set(entry.type, new SeqIndex());
+        }
+        this.byType.get(entry.type).push(entry.seq);
+    }
+
+    entry(seq) {
+        return this.buffer[seq % this.capacity];
+    }
+
+    // First seq whose entry is at or after `time`
+    seqAtTime(time) {
+        let lo = this.firstSeq;
+        let hi = this.nextSeq;
+        while (lo < hi) {
+            const mid = Math.floor((lo + hi) / 2);
+            if (this.entry(mid).time < time) lo = mid + 1; else hi = mid;
+        }
+        return lo;
+    }
+
+    // Public (and on-disk) form of an entry
+    format(entry) {
+        if (entry.text === undefined) {
+            entry.text = serializeData(entry.data);
+        }
+        return {
+            timestamp: new Date(entry.time).toISOString(),
+            type: entry.type,
+            message: entry.message,
+            data: entry.text
+        };
+    }
+
+    // Newest entries first. `from`/`to` are times in ms (inclusive/exclusive).
+    query({ type = null, from = null, to = null, limit = 100 } = {}) {
+        const low = from === null ? this.firstSeq : this.seqAtTime(from);
+        const high = to === null ? this.nextSeq : this.seqAtTime(to);
+        const logs = [];
+
+        if (type) {
+            const index = this.byType.get(type);
+            if (index) {
+                const first = index.lowerBound(low);
+                for (let i = index.lowerBound(high) - 1; i >= first && logs.length < limit; i--) {
+                    logs.push(this.format(this.entry(index.seqs[i])));
+                }
+            }
+        } else {
+            for (let seq = high - 1; seq >= low && logs.length < limit; seq--) {
+                logs.push(this.format(this.entry(seq)));
+            }
+        }
+
+        return logs;
+    }
+
+    // Entries per type currently in the buffer
+    counts() {
+        const counts = {};
+        for (const [type, index] of this.byType) {
+            if (index.length > 0) counts[type] = index.length;
+        }
+        return counts;
+    }
+
+    // query() plus the buffer size and per-type counts (GET /api/admin/logs)
+    report(options) {
+        return { logs: this.query(options), total: this.size, types: this.counts() };
+    }
+
+    async flush() {
+        this.flushTimer = null;
+        if (this.flushing || this.pending.length === 0) return;
+
+        const entries = this.pending;
+        this.pending = [];
+        this.flushing = this.writeEntries(entries)
+            .catch(error => process.stderr.write(`Log file write failed: ${error.message}\n`))
+            .finally(() => {
+                this.flushing = null;
+                if (this.pending.length > 0) this.flush();
+            });
+        await this.flushing;
+    }
+
+    async writeEntries(entries) {
+        let chunk = '';
+        for (const entry of entries) {
+            chunk += JSON.stringify(this.format(entry)) + '\n';
+            if (this.fileBytes + Buffer.byteLength(chunk) >= MAX_FILE_BYTES) {
+                await this.append(chunk);
+                chunk = '';
+                await this.rotate();
+            }
+        }
+        if (chunk) await this.append(chunk);
+    }
+
+    async append(chunk) {
+        await fs.promises.appendFile(this.filePath(this.fileSeq), chunk, 'utf8');
+        this.fileBytes += Buffer.byteLength(chunk);
+    }
+
+    async rotate() {
+        this.fileSeq++;
+        this.fileBytes = 0;
+        const files = this.listFiles();
+        for (const seq of files.slice(0, Math.max(0, files.length - (MAX_FILES - 1)))) {
+            await fs.promises.unlink(this.filePath(seq)).catch(() => {});
+        }
+    }
+
+    // Drop every entry, in memory and on disk
+    async clearAll() {
+        const cleared = this.size;
+        this.clear();
+        this.pending = [];
+        if (this.flushing) await this.flushing;
+        for (const seq of this.listFiles()) {
+            await fs.promises.unlink(this.filePath(seq)).catch(() => {});
+        }
+        this.fileSeq++;
+        this.fileBytes = 0;
+        return cleared;
+    }
+
+    // Write out anything still pending (shutdown)
+    async drain() {
+        if (this.flushTimer) {
+            clearTimeout(this.flushTimer);
+            this.flushTimer = null;
+        }
+        while (this.flushing || this.pending.length > 0) {
+            await (this.flushing || this.flush());
+        }
+    }
+}
+
+module.exports = { LogStore };
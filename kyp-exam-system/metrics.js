@@ -0,0 +1,390 @@
+const fs = require('fs');
+const path = require('path');
+const { monitorEventLoopDelay } = require('perf_hooks');
+
+// Runtime metrics in the Prometheus text format
+//
+// A small registry of counters, gauges and histograms, filled by:
+//   - httpMetrics()     every request, by method and Express route
+//                       ("/api/questions/:subjectId", never the raw URL)
+//   - storageMetrics()  JSON data files: loads and flushes (storage.js
+//                       'load' and 'flush' events) with their sizes, plus
+//                       the time from writeJSONFile() until the change is
+//                       on disk
+//   - resultsMetrics()  results log flushes (one write + fsync per batch)
+//   - ingestMetrics()   upload parsing and saving times per file type
+//   - processMetrics()  event-loop delay, heap, RSS and CPU time, read when
+//                       scraped
+//
+// GET /api/admin/metrics renders them. In cluster mode every process keeps
+// its own registry; the worker that gets the request asks the owner to
+// gather all of them and every series gets a process="owner|worker-N"
+// label. Event-loop delay quantiles cover the time since the previous
+// scrape.
+
+// Seconds; from a cached paper (~1ms) to a big ExcelJS export
+const DURATION_BUCKETS = [0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30];
+const BATCH_BUCKETS = [1, 2, 5, 10, 25, 50, 100, 250, 500];
+
+function labelKey(labels) {
+    return JSON.stringify(labels || {});
+}
+
+function escapeLabel(value) {
+    return String(value).replace(/\\/g, '\\\\').replace(/"/g, '\\"').replace(/\n/g, '\\n');
+}
+
+function formatLabels(labels) {
+    const entries = Object.entries(labels || {});
+    if (entries.length === 0) return '';
+    return '{' + entries.map(([name, value]) => `${name}="${escapeLabel(value)}"`).join(',') + '}';
+}
+
+function formatValue(value) {
+    if (value === Infinity) return '+Inf';
+    if (value === -Infinity) return '-Inf';
+    return Number.isFinite(value) ? String(value) : 'NaN';
+}
+
+class Counter {
+    constructor(name, help) {
+        this.name = name;
+        this.help = help;
+        this.type = 'counter';
+        this.series = new Map(); // label key -> { labels, value }
+    }
+
+    inc(labels = {}, amount = 1) {
+        const key = labelKey(labels);
+        const series = this.series.get(key);
+        if (series) {
+            series.value += amount;
+        } else {
+            this.series.set(key, { labels, value: amount });
+        }
+    }
+
+    collect() {
+        return [...this.series.values()].map(({ labels, value }) => ({ labels, value }));
+    }
+}
+
+class Gauge extends Counter {
+    // read: optional () => [{ labels, value }], called on every scrape
+    constructor(name, help, read = null) {
+        super(name, help);
+        this.type = 'gauge';
+        this.read = read;
+    }
+
+    set(labels, value) {
+        this.series.set(labelKey(labels), { labels, value });
+    }
+
+    collect() {
+        return this.read ? this.read() : super.collect();
+    }
+}
+
+class Histogram {
+    constructor(name, help, buckets = DURATION_BUCKETS) {
+        this.name = name;
+        this.help = help;
+        this.type = 'histogram';
+        this.buckets = buckets;
+        this.series = new Map(); // label key -> { labels, counts, sum, count }
+    }
+
+    observe(labels, value) {
+        const key = labelKey(labels);
+        let series = this.series.get(key);
+        if (!series) {
+            series = { labels, counts: new Array(this.buckets.length).fill(0), sum: 0, count: 0 };
+            this.series.set(key, series);
+        }
+        const bucket = this.buckets.findIndex(bound => value <= bound);
+        if (bucket !== -1) series.counts[bucket]++;
+        series.sum += value;
+        series.count++;
+    }
+
+    // Returns a function that observes the seconds since the call
+    startTimer(labels) {
+        const started = process.hrtime.bigint();
+        return (moreLabels) => {
+            this.observe({ ...labels, ...moreLabels }, Number(process.hrtime.bigint() - started) / 1e9);
+        };
+    }
+
+    collect() {
+        return [...this.series.values()].map(({ labels, counts, sum, count }) => ({
+            labels,
+            buckets: this.buckets,
+            counts: [...counts],
+            sum,
+            count
+        }));
+    }
+}
+
+class Registry {
+    constructor() {
+        this.metrics = new Map();
+    }
+
+    add(metric) {
+        if (!this.metrics.has(metric.name)) {
+            this.metrics.set(metric.name, metric);
+        }
+        return this.metrics.get(metric.name);
+    }
+
+    counter(name, help) {
+        return this.add(new Counter(name, help));
+    }
+
+    gauge(name, help, read) {
+        return this.add(new Gauge(name, help, read));
+    }
+
+    histogram(name, help, buckets) {
+        return this.add(new Histogram(name, help, buckets));
+    }
+
+    // Plain data (sent between cluster processes): [{ name, help, type, series }]
+    collect() {
+        return [...this.metrics.values()].map(metric => ({
+            name: metric.name,
+            help: metric.help,
+            type: metric.type,
+            series: metric.collect()
+        }));
+    }
+}
+
+// Families of several processes as one list, each series labelled with its
+// process: sources is [{ process, families }]
+function mergeFamilies(sources) {
+    const merged = new Map();
+    for (const { process: name, families } of sources) {
+        for (const family of families) {
+            if (!merged.has(family.name)) {
+                merged.set(family.name, { ...family, series: [] });
+            }
+            for (const series of family.series) {
+                merged.get(family.name).series.push({ ...series, labels: { process: name, ...series.labels } });
+            }
+        }
+    }
+    return [...merged.values()];
+}
+
+// Prometheus text exposition format 0.0.4
+function render(families) {
+    const lines = [];
+    for (const family of families) {
+        lines.push(`# HELP ${family.name} ${family.help}`);
+        lines.push(`# TYPE ${family.name} ${family.type}`);
+        for (const series of family.series) {
+            if (family.type === 'histogram') {
+                let cumulative = 0;
+                series.buckets.forEach((bound, i) => {
+                    cumulative += series.counts[i];
+                    lines.push(`${family.name}_bucket${formatLabels({ ...series.labels, le: bound })} ${cumulative}`);
+                });
+                lines.push(`${family.name}_bucket${formatLabels({ ...series.labels, le: '+Inf' })} ${series.count}`);
+                lines.push(`${family.name}_sum${formatLabels(series.labels)} ${formatValue(series.sum)}`);
+                lines.push(`${family.name}_count${formatLabels(series.labels)} ${series.count}`);
+            } else {
+                lines.push(`${family.name}${formatLabels(series.labels)} ${formatValue(series.value)}`);
+            }
+        }
+    }
+    return lines.join('\n') + '\n';
+}
+
+// Express middleware timing every request by route; mount it first
+function httpMetrics(registry) {
+    const requests = registry.counter('kyp_http_requests_total', 'HTTP requests by route and status code');
+    const durations = registry.histogram('kyp_http_request_duration_seconds', 'Time to answer an HTTP request');
+
+    return (req, res, next) => {
+        const stop = durations.startTimer();
+        res.on('close', () => {
+            // req.route is the matched Express route; pages and assets have none
+            const route = req.route ? (req.baseUrl || '') + req.route.path :
+                (res.statusCode === 404 ? 'unmatched' : 'static');
+            const status = res.writableFinished ? String(res.statusCode) : 'aborted';
+            requests.inc({ method: req.method, route, status });
+            stop({ method: req.method, route });
+        });
+        next();
+    };
+}
+
+// Times another middleware (the JSON body parser) when it did any work
+function timeMiddleware(histogram, middleware) {
+    return (req, res, next) => {
+        const stop = histogram.startTimer();
+        middleware(req, res, (error) => {
+            if (req._body) stop();
+            next(error);
+        });
+    };
+}
+
+function storageMetrics(registry, storage) {
+    const file = (filepath) => ({ file: path.basename(filepath) });
+    const loads = registry.histogram('kyp_storage_load_seconds', 'Time to read and parse a JSON data file');
+    const flushes = registry.histogram('kyp_storage_flush_seconds', 'Time to serialize, write and fsync a JSON data file');
+    const flushedBytes = registry.counter('kyp_storage_flushed_bytes_total', 'Bytes written to JSON data files');
+    const failures = registry.counter('kyp_storage_flush_failures_total', 'JSON data file writes that failed');
+    const sizes = registry.gauge('kyp_storage_file_bytes', 'Size of a JSON data file when last loaded or written');
+
+    storage.on('load', ({ filepath, bytes, durationMs }) => {
+        loads.observe(file(filepath), durationMs / 1000);
+        sizes.set(file(filepath), bytes);
+    });
+    storage.on('flush', ({ filepath, bytes, ok, durationMs }) => {
+        flushes.observe(file(filepath), durationMs / 1000);
+        if (ok) {
+            flushedBytes.inc(file(filepath), bytes);
+            sizes.set(file(filepath), bytes);
+        } else {
+            failures.inc(file(filepath));
+        }
+    });
+
+    const reads = registry.counter('kyp_storage_reads_total', 'readJSONFile() calls (served from memory)');
+    const writes = registry.histogram('kyp_storage_write_seconds', 'Time from writeJSONFile() until the change is on disk');
+    return {
+        read(filepath) {
+            reads.inc(file(filepath));
+        },
+        // Wraps the promise of a write; resolves with the same value
+        write(filepath, saved) {
+            const stop = writes.startTimer(file(filepath));
+            return saved.then(ok => {
+                stop();
+                return ok;
+            });
+        }
+    };
+}
+
+function resultsMetrics(registry, resultsStore) {
+    const flushes = registry.histogram('kyp_results_flush_seconds', 'Time to write and fsync a batch of results');
+    const batches = registry.histogram('kyp_results_flush_batch_size', 'Results written per flush', BATCH_BUCKETS);
+    const appended = registry.counter('kyp_results_appended_total', 'Results saved to the results log');
+    const failures = registry.counter('kyp_results_flush_failures_total', 'Results log flushes that failed');
+
+    resultsStore.on('flush', ({ results, ok, durationMs }) => {
+        flushes.observe({}, durationMs / 1000);
+        batches.observe({}, results);
+        if (ok) {
+            appended.inc({}, results);
+        } else {
+            failures.inc();
+        }
+    });
+}
+
+function ingestMetrics(registry, ingestPool) {
+    const parses = registry.histogram('kyp_ingest_parse_seconds', 'Time to extract and parse an uploaded paper on a worker thread');
+    const saves = registry.histogram('kyp_ingest_save_seconds', 'Time to save the questions of an upload');
+    const jobs = registry.counter('kyp_ingest_jobs_total', 'Finished upload jobs by file type and status');
+    const bytes = registry.counter('kyp_ingest_bytes_total', 'Bytes of uploaded papers parsed');
+
+    ingestPool.on('update', (job) => {
+        if (job.status !== 'done' && job.status !== 'failed') return;
+        const type = path.extname(job.fileName || '').slice(1).toLowerCase() || 'unknown';
+        jobs.inc({ type, status: job.status });
+        if (job.parseMs !== null && job.parseMs !== undefined) {
+            parses.observe({ type }, job.parseMs / 1000);
+            bytes.inc({ type }, job.bytes || 0);
+        }
+        if (job.saveMs !== null && job.saveMs !== undefined) {
+            saves.observe({ type }, job.saveMs / 1000);
+        }
+    });
+}
+
+function processMetrics(registry) {
+    const delay = monitorEventLoopDelay({ resolution: 10 });
+    delay.enable();
+
+    registry.gauge('kyp_event_loop_delay_seconds', 'Event-loop delay since the previous scrape', () => {
+        const samples = [0.5, 0.9, 0.99].map(quantile => ({
+            labels: { quantile },
+            value: delay.percentile(quantile * 100) / 1e9
+        }));
+        samples.push({ labels: { quantile: 'max' }, value: delay.max / 1e9 });
+        delay.reset();
+        return samples;
+    });
+    registry.gauge('kyp_heap_bytes', 'V8 heap', () => {
+        const memory = process.memoryUsage();
+        return [
+            { labels: { kind: 'used' }, value: memory.heapUsed },
+            { labels: { kind: 'total' }, value: memory.heapTotal },
+            { labels: { kind: 'external' }, value: memory.external }
+        ];
+    });
+    registry.gauge('kyp_resident_memory_bytes', 'Resident set size', () => [{ labels: {}, value: process.memoryUsage().rss }]);
+    registry.counter('kyp_cpu_seconds_total', 'CPU time used').collect = () => {
+        const usage = process.cpuUsage();
+        return [
+            { labels: { mode: 'user' }, value: usage.user / 1e6 },
+            { labels: { mode: 'system' }, value: usage.system / 1e6 }
+        ];
+    };
+    registry.gauge('kyp_uptime_seconds', 'Seconds since the process started', () => [{ labels: {}, value: process.uptime() }]);
+}
+
+// Opt-in CPU profile of this process (KYP_PROFILING=1). Resolves with the
+// path of the .cpuprofile file, which Chrome DevTools and VS Code open.
+let profiling = false;
+
+async function captureCpuProfile(dir, seconds) {
+    if (profiling) {
+        const error = new Error('A CPU profile is already being recorded');
+        error.code = 'PROFILE_RUNNING';
+        throw error;
+    }
+    profiling = true;
+    const inspector = require('inspector');
+    const session = new inspector.Session();
+    const post = (method, params) => new Promise((resolve, reject) => {
+        session.post(method, params, (error, result) => (error ? reject(error) : resolve(result)));
+    });
+
+    session.connect();
+    try {
+        await post('Profiler.enable');
+        await post('Profiler.start');
+        await new Promise(resolve => setTimeout(resolve, seconds * 1000));
+        const { profile } = await post('Profiler.stop');
+
+        await fs.promises.mkdir(dir, { recursive: true });
+        const stamp = new Date().toISOString().replace(/[:.]/g, '-');
+        const file = path.join(dir, `cpu-${stamp}-${process.pid}.cpuprofile`);
+        await fs.promises.writeFile(file, JSON.stringify(profile));
+        return file;
+    } finally {
+        session.disconnect();
+        profiling = false;
+    }
+}
+
+module.exports = {
+    Registry,
+    mergeFamilies,
+    render,
+    httpMetrics,
+    timeMiddleware,
+    storageMetrics,
+    resultsMetrics,
+    ingestMetrics,
+    processMetrics,
+    captureCpuProfile
+};
@@ -0,0 +1,73 @@
+"""Convert data/results.json into the append-only results log and compact it.
+
+Usage:
+    python migrate-results.py             # migrate results.json into data/results/
+    python migrate-results.py --compact   # also merge every segment into one
+
+Stop the server before running this - it appends to the same files.
+"""
+import argparse
+import json
+import os
+
+from kyp_data import (DATA_DIR, RESULTS_DIR, RESULTS_FILE, iter_results,
+                      list_segments, recover_compaction, replace_segments,
+                      segment_name)
+
+
+def file_size(path):
+    return os.path.getsize(path) if os.path.exists(path) else 0
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Migrate and compact the KYP results log')
+    parser.add_argument('--data-dir', default=DATA_DIR, help='data directory (default: ./data)')
+    parser.add_argument('--compact', action='store_true',
+                        help='merge all segments into one (server must be stopped)')
+    args = parser.parse_args()
+
+    legacy = os.path.join(args.data_dir, RESULTS_FILE)
+    results_dir = os.path.join(args.data_dir, RESULTS_DIR)
+    os.makedirs(results_dir, exist_ok=True)
+    recover_compaction(args.data_dir)
+
+    segments = list_segments(results_dir)
+    has_legacy = os.path.exists(legacy)
+
+    if not has_legacy and not args.compact:
+        print("results.json not found - nothing to migrate")
+        return
+
+    # Without --compact only the legacy file and an existing base segment are
+    # rewritten; segments the server is appending to are left alone.
+    if args.compact:
+        merged = segments
+    else:
+        merged = [seq for seq in segments if seq == 0]
+
+    before = file_size(legacy) + sum(
+        file_size(os.path.join(results_dir, segment_name(seq))) for seq in merged)
+
+    count = 0
+
+    def write(f):
+        nonlocal count
+        for record in iter_results(args.data_dir, segments=merged):
+            f.write(json.dumps(record, ensure_ascii=False, separators=(',', ':')) + '\n')
+            count += 1
+
+    replace_segments(args.data_dir, 0, merged, write, legacy=has_legacy)
+    target = os.path.join(results_dir, segment_name(0))
+
+    if has_legacy:
+        print(f"📦 Kept original as {RESULTS_FILE}.migrated")
+
+    after = file_size(target)
+    print(f"✅ Wrote {count} results to {RESULTS_DIR}/{segment_name(0)}")
+    print(f"   {before / 1024:.1f} KB -> {after / 1024:.1f} KB")
+    if args.compact and len(merged) > 1:
+        print(f"   Merged {len(merged)} segments")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,256 @@
+const crypto = require('crypto');
+const zlib = require('zlib');
+const { promisify } = require('util');
+const { projectQuestion } = require('./question-bank');
+const { sendAsset } = require('./static-assets');
+
+const gzip = promisify(zlib.gzip);
+const brotliCompress = promisify(zlib.brotliCompress);
+
+// Seeded question paper variants
+//
+// Instead of shuffling the question list for every student, each subject
+// and language gets VARIANTS ready-made papers. In every paper the question
+// order and the option order of each question are permuted from a seed, and
+// the paper is serialized without the answers and compressed once (gzip and
+// brotli). A student always gets variant hash(studentId) % VARIANTS, so
+// GET /api/questions is a byte copy with an ETag, and a student who reloads
+// or continues on another PC gets the same paper again.
+//
+// The answer key stays here. The page only ever sees positions on its own
+// paper; answers coming in are turned into positions in questions.json
+// before they are saved or graded (toBank), and saved answers or correct
+// options going out are turned back into paper positions (toPaper,
+// answerKey).
+//
+// The option order of a question depends only on the variant, the question
+// id and the number of options in the paper's language (the two languages
+// of a question may have different counts), not on the rest of the bank, so answers
+// from a paper built before an admin edit still map back correctly. Papers
+// are rebuilt after the question bank changes (invalidate() + warm()), and
+// kept across restarts in the boot cache (exportSets() / restore(), see
+// boot-cache.js).
+
+const VARIANTS = Math.max(1, parseInt(process.env.KYP_PAPER_VARIANTS) || 8);
+const LANGUAGES = ['hi', 'en'];
+const MAX_CACHED_SETS = 256; // Guards against arbitrary ?lang= values
+const PAPER_FORMAT = 1;      // Bump when papers are built differently
+
+// 32-bit seed from a string
+function seedOf(text) {
+    return crypto.createHash('sha1').update(text).digest().readUInt32LE(0);
+}
+
+// Small seeded PRNG (mulberry32); floats in [0, 1)
+function seededRandom(seed) {
+    let state = seed >>> 0;
+    return () => {
+        state = (state + 0x6D2B79F5) >>> 0;
+        let t = state;
+        t = Math.imul(t ^ (t >>> 15), t | 1);
+        t ^= t + Math.imul(t ^ (t >>> 7), t | 61);
+        return ((t ^ (t >>> 14)) >>> 0) / 4294967296;
+    };
+}
+
+// Fisher-Yates driven by a seed instead of Math.random
+function seededShuffle(array, seed) {
+    const random = seededRandom(seed);
+    const shuffled = [...array];
+    for (let i = shuffled.length - 1; i > 0; i--) {
+        const j = Math.floor(random() * (i + 1));
+        [shuffled[i], shuffled[j]] = [shuffled[j], shuffled[i]];
+    }
+    return shuffled;
+}
+
+function variantFor(studentId, variants = VARIANTS) {
+    return seedOf(`student|${studentId}`) % variants;
+}
+
+// order[paperPosition] = option index in questions.json
+function optionOrder(variant, questionId, count) {
+    const indices = Array.from({ length: count }, (_, i) => i);
+    return seededShuffle(indices, seedOf(`options|${variant}|${questionId}`));
+}
+
+// Papers are rebuilt after every question edit, so brotli runs at a middle
+// quality: within a few percent of the smallest output at a tenth of the time
+const BROTLI_QUALITY = 7;
+
+async function packPaper(paper) {
+    const identity = Buffer.from(JSON.stringify(paper), 'utf8');
+    const [gz, br] = await Promise.all([
+        gzip(identity, { level: zlib.constants.Z_BEST_COMPRESSION }),
+        brotliCompress(identity, {
+            params: {
+                [zlib.constants.BROTLI_PARAM_QUALITY]: BROTLI_QUALITY,
+                [zlib.constants.BROTLI_PARAM_MODE]: zlib.constants.BROTLI_MODE_TEXT,
+                [zlib.constants.BROTLI_PARAM_SIZE_HINT]: identity.length
+            }
+        })
+    ]);
+    const hash = crypto.createHash('sha1').update(identity).digest('hex').slice(0, 16);
+    return {
+        type: 'application/json; charset=utf-8',
+        etag: `"${hash}"`,
+        identity,
+        gzip: gz.length < identity.length ? gz : null,
+        br: br.length < identity.length ? br : null,
+        questions: paper.length
+    };
+}
+
+class PaperSets {
+    constructor(questionBank, variants = VARIANTS) {
+        this.questionBank = questionBank;
+        this.variants = variants;
+        this.sets = new Map(); // "subjectId\0lang" -> Promise<papers | null>
+    }
+
+    // Forget the papers of the old question bank
+    invalidate() {
+        this.sets = new Map();
+    }
+
+    // Identifies the papers this bank gives: saved papers of another key
+    // are stale
+    bankKey() {
+        const bank = JSON.stringify(this.questionBank.getAll() || {});
+        const hash = crypto.createHash('sha1').update(bank).digest('hex');
+        return `${PAPER_FORMAT}|${this.variants}|${hash}`;
+    }
+
+    // The built papers, to save and restore() after a restart
+    async exportSets() {
+        const key = this.bankKey();
+        const sets = [];
+        for (const [setKey, built] of this.sets) {
+            sets.push([setKey, await built]);
+        }
+        return { key, sets };
+    }
+
+    // Take papers saved by exportSets() if they were built from the current
+    // bank; returns the number of paper sets taken
+    restore(saved) {
+        if (!saved || saved.key !== this.bankKey()) return 0;
+        for (const [setKey, papers] of saved.sets) {
+            if (!this.sets.has(setKey)) {
+                this.sets.set(setKey, Promise.resolve(papers));
+            }
+        }
+        return saved.sets.length;
+    }
+
+    // Build every subject's papers in both languages before students ask
+    warm() {
+        const builds = [];
+        for (const subjectId of Object.keys(this.questionBank.getAll() || {})) {
+            for (const lang of LANGUAGES) {
+                builds.push(this.getSet(subjectId, lang));
+            }
+        }
+        return Promise.all(builds);
+    }
+
+    getSet(subjectId, lang) {
+        const key = subjectId + '\u0000' + lang;
+        if (!this.sets.has(key)) {
+            if (this.sets.size >= MAX_CACHED_SETS) {
+                this.sets.clear();
+            }
+            this.sets.set(key, this.build(subjectId, lang));
+        }
+        return this.sets.get(key);
+    }
+
+    async build(subjectId, lang) {
+        const questions = this.questionBank.getClientQuestions(subjectId, lang);
+        if (!questions) {
+            return null;
+        }
+
+        const papers = [];
+        for (let variant = 0; variant < this.variants; variant++) {
+            const order = seededShuffle(questions, seedOf(`questions|${subjectId}|${lang}|${variant}`));
+            const paper = order.map(q => ({
+                id: q.id,
+                question: q.question,
+                options: optionOrder(variant, q.id, q.options.length).map(i => q.options[i]),
+                marks: q.marks
+            }));
+            papers.push(await packPaper(paper));
+        }
+        return papers;
+    }
+
+    // The student's paper, or null when the subject has no questions
+    async getPaper(subjectId, lang, studentId) {
+        const papers = await this.getSet(subjectId, lang);
+        return papers ? papers[variantFor(studentId, this.variants)] : null;
+    }
+
+    // Always revalidated: the paper changes when the question bank does
+    send(req, res, paper) {
+        sendAsset(req, res, paper, 'private, no-cache');
+    }
+
+    // Bank questions of a subject by id (the subject's grading table)
+    bankQuestions(subjectId, questionId) {
+        const table = this.questionBank.getGradingTable(subjectId);
+        const positions = table && table.byId.get(String(questionId));
+        return positions ? positions.map(position => table.questions[position]) : [];
+    }
+
+    // Option order of a question on the student's paper in `lang`
+    order(subjectId, studentId, questionId, lang = LANGUAGES[0]) {
+        const [question] = this.bankQuestions(subjectId, questionId);
+        if (!question) return null;
+        const count = projectQuestion(question, lang).options.length;
+        return optionOrder(variantFor(studentId, this.variants), question.id, count);
+    }
+
+    // { questionId: paper position } -> { questionId: option in questions.json }.
+    // Answers to unknown questions or options are dropped.
+    toBank(subjectId, studentId, answers, lang) {
+        const mapped = {};
+        if (!answers || typeof answers !== 'object') return mapped;
+        for (const [questionId, position] of Object.entries(answers)) {
+            const order = this.order(subjectId, studentId, questionId, lang);
+            if (order && Number.isInteger(position) && order[position] !== undefined) {
+                mapped[questionId] = order[position];
+            }
+        }
+        return mapped;
+    }
+
+    // The other way round, for answers saved with toBank()
+    toPaper(subjectId, studentId, answers, lang) {
+        const mapped = {};
+        for (const [questionId, option] of Object.entries(answers || {})) {
+            const order = this.order(subjectId, studentId, questionId, lang);
+            const position = order ? order.indexOf(option) : -1;
+            if (position !== -1) {
+                mapped[questionId] = position;
+            }
+        }
+        return mapped;
+    }
+
+    // Paper positions of the correct options of some questions
+    answerKey(subjectId, studentId, questionIds, lang) {
+        const key = {};
+        for (const questionId of questionIds) {
+            const [question] = this.bankQuestions(subjectId, questionId);
+            const order = this.order(subjectId, studentId, questionId, lang);
+            const position = question && order ? order.indexOf(question.correct) : -1;
+            if (position !== -1) {
+                key[questionId] = position;
+            }
+        }
+        return key;
+    }
+}
+
+module.exports = { PaperSets, variantFor, optionOrder, seededShuffle, LANGUAGES };
@@ -0,0 +1,173 @@
+const { buildGradingTable } = require('./grading');
+
+// Process-wide question bank
+//
+// questions.json is parsed once and kept in memory until an admin write
+// invalidates it. For each subject/language pair the client payload (language
+// filter + bilingual projection, no per-request work) is built on first use
+// and reused; the seeded paper variants served by GET /api/questions are
+// built from it (see paper-sets.js). Grading tables for /api/submit are
+// cached the same way.
+
+const MAX_CACHED_PAYLOADS = 64; // Guards against arbitrary ?lang= values
+
+// Pick the text for one language out of a question in either the bilingual
+// ({ hi, en }) or the old plain-string format
+function projectQuestion(q, lang) {
+    let question, options;
+
+    if (typeof q.question === 'object' && q.question !== null) {
+        // Bilingual format
+        question = q.question[lang] || q.question.hi || q.question.en || 'Question text not available';
+    } else {
+        // Old format - plain string
+        question = q.question;
+    }
+
+    if (typeof q.options === 'object' && !Array.isArray(q.options) && q.options !== null) {
+        // Bilingual format - options is an object with lang keys
+        options = q.options[lang] || q.options.hi || q.options.en || [];
+    } else if (Array.isArray(q.options)) {
+        // Old format - options is already an array
+        options = q.options;
+    } else {
+        options = [];
+    }
+
+    return {
+        id: q.id,
+        question: question,
+        options: options,
+        marks: q.marks,
+        correct: q.correct
+    };
+}
+
+class QuestionBank {
+    constructor(load) {
+        this.load = load; // () => parsed questions.json (or null)
+        this.invalidate();
+    }
+
+    // Drop everything derived from questions.json; the next read reloads it
+    invalidate() {
+        this.questions = null;
+        this.version = (this.version || 0) + 1;
+        this.payloads = new Map();
+        this.gradingTables = new Map();
+    }
+
+    getAll() {
+        if (this.questions === null) {
+            this.questions = this.load() || null;
+        }
+        return this.questions;
+    }
+
+    getSubject(subjectId) {
+        const all = this.getAll();
+        return all && Object.prototype.hasOwnProperty.call(all, subjectId) ? all[subjectId] : null;
+    }
+
+    // Client-ready questions for a subject in one language, in bank order.
+    // Returns null when the subject has no question list.
+    getClientQuestions(subjectId, lang) {
+        const key = subjectId + '\u0000' + lang;
+        if (this.payloads.has(key)) {
+            return this.payloads.get(key);
+        }
+
+        const subjectQuestions = this.getSubject(subjectId);
+        if (!subjectQuestions) {
+            return null;
+        }
+
+        // Questions tagged with a language only go to that language;
+        // untagged (bilingual) questions go to every language
+        const payload = subjectQuestions
+            .filter(q => !q.language || q.language === lang)
+            .map(q => projectQuestion(q, lang));
+
+        if (this.payloads.size >= MAX_CACHED_PAYLOADS) {
+            this.payloads.clear();
+        }
+        this.payloads.set(key, payload);
+        return payload;
+    }
+
+    // Answer table used to grade submissions for a subject (see grading.js)
+    getGradingTable(subjectId) {
+        if (this.gradingTables.has(subjectId)) {
+            return this.gradingTables.get(subjectId);
+        }
+
+        const subjectQuestions = this.getSubject(subjectId);
+        if (!subjectQuestions) {
+            return null;
+        }
+
+        const table = buildGradingTable(subjectQuestions);
+        this.gradingTables.set(subjectId, table);
+        return table;
+    }
+}
+
+// Add the questions parsed from an uploaded paper to a subject of
+// questions.json (in place), numbering them after the subject's highest id.
+// With a DuplicateIndex (duplicate-index.js), exact copies of a question
+// already in the subject are skipped and near-duplicates anywhere in the bank
+// are flagged with duplicateOf (the caller saves the index). Returns the preview
+// list shown after an upload.
+function addUploadedQuestions(allQuestions, subjectId, language, parsedQuestions, duplicates = null) {
+    if (parsedQuestions.length === 0) {
+        const error = new Error('No questions found in the document. Please check the format.');
+        error.code = 'NO_QUESTIONS';
+        throw error;
+    }
+
+    if (!allQuestions[subjectId]) {
+        allQuestions[subjectId] = [];
+    }
+    if (duplicates) {
+        duplicates.sync(allQuestions);
+    }
+    
+    // Add new questions with unique IDs
+    let nextId = allQuestions[subjectId].length > 0 ? 
+        Math.max(...allQuestions[subjectId].map(q => q.id)) + 1 : 1;
+    
+    const preview = parsedQuestions.map(question => {
+        const item = {
+            id: null,
+            question: typeof question.question === 'object' ? question.question[language] : question.question,
+            optionsCount: Array.isArray(question.options) ? question.options.length : 
+                          (typeof question.options === 'object' ? question.options[language]?.length || 0 : 0)
+        };
+
+        const computed = duplicates ? duplicates.compute(question) : null;
+        const matches = duplicates ? duplicates.check(question, computed) : [];
+        const copy = matches.find(match => match.exact && match.subjectId === subjectId);
+        const closest = copy || matches[0];
+        if (closest) {
+            item.duplicateOf = { subjectId: closest.subjectId, id: closest.id, similarity: closest.similarity };
+        }
+        if (copy) {
+            item.skipped = true;
+            return item;
+        }
+
+        question.id = nextId++;
+        // Add language tag based on selected language
+        question.language = language;
+        allQuestions[subjectId].push(question);
+        if (duplicates) {
+            duplicates.add(subjectId, question, computed);
+        }
+        item.id = question.id;
+        return item;
+    });
+
+    return preview;
+}
+
+module.exports = { QuestionBank, projectQuestion, addUploadedQuestions };
@@ -0,0 +1,363 @@
+const fs = require('fs');
+const path = require('path');
+const { token } = require('./image-store');
+
+// Question paper parsing
+//
+// Turns the text of an uploaded PDF/DOCX question paper into question
+// objects. Used by the ingestion workers (ingest-worker.js), so none of this
+// runs on the server's request thread.
+
+// Function to normalize Hindi text from different fonts/encodings
+function normalizeHindiText(text) {
+    if (!text) return '';
+    
+    // Ensure the text is properly decoded as UTF-8
+    // This helps with Mangal, Devanagari Unicode fonts
+    try {
+        // Normalize Unicode characters (NFC normalization)
+        text = text.normalize('NFC');
+        
+        // Remove any zero-width characters that might cause issues
+        text = text.replace(/[\u200B-\u200D\uFEFF]/g, '');
+        
+        // Normalize common Hindi punctuation variations
+        text = text.replace(/।/g, '।'); // Devanagari Danda
+        text = text.replace(/॥/g, '॥'); // Devanagari Double Danda
+        
+        // Handle any BOMs or special markers
+        text = text.replace(/^\uFEFF/, '');
+        
+        // Normalize whitespace but preserve structure
+        text = text.replace(/\r\n/g, '\n');
+        text = text.replace(/\r/g, '\n');
+        
+        // Remove excessive spaces but keep single spaces
+        text = text.replace(/[ \t]+/g, ' ');
+        
+        // Preserve line breaks for structure
+        text = text.replace(/\n{3,}/g, '\n\n');
+        
+    } catch (error) {
+        console.error('Text normalization error:', error);
+    }
+    
+    return text;
+}
+
+// Single-pass question parser
+//
+// The text is read once, line by line. Each line's first character narrows it
+// down to (usually) one of these line types, which is then confirmed by a
+// single anchored regex:
+//   answer    "Answer: C", "Ans: b", "उत्तर: A", "सही उत्तर (B)", "उत्तर: ग"
+//   meta      "Marks: 2", "अंक: 1", "Difficulty: easy" (skipped)
+//   option    A) (A) [A] {A} A. A: a) (a) १) क) (क) "Option A)" "विकल्प A)"
+//   question  1. 1) Q1. Q1: "Question 1:" "प्रश्न 1." (a "Q1:" block
+//             prefix in front of "1." is dropped)
+//   text      anything else: question text before the options, the
+//             continuation of the last option after them
+// A line holding several option markers (Word/PDF text often comes out as
+// "A) वाहनB) खाना बनाने की मशीनC) ...D) ...Answer: C") is first cut at its
+// question, option and answer markers and the pieces are classified as lines.
+//
+// Questions are emitted as soon as the next one starts. A question with no
+// marked options takes its following plain lines as options (up to 4), the
+// "simple list" format of format-guide.html.
+
+const ZERO_WIDTH = /[\u200B-\u200D\uFEFF]/g;
+const ANSWER_LINE = /^(?:सही\s*उत्तर|उत्तर|(?:Correct\s*)?(?:Answer|ANSWER|answer)|Ans|ANS|ans|Correct)\s*[:\-–.)]?\s*[(\[]?\s*([A-Da-d]|[१-४]|[कखगघ](?![\u0900-\u0963]))(?![A-Za-z])/;
+const META_LINE = /^(?:Marks|MARKS|marks|अंक|Difficulty|difficulty)\s*[:\-]/;
+const OPTION_LINE = /^(?:(?:Option|विकल्प)\s*)?(?:\(([A-Da-dकखगघ])\)|\[([A-D])\]|\{([A-D])\}|([A-D])[).:]|([a-d])\)|([१-४कखगघ])\))\s*(.*)$/;
+const QUESTION_LINE = /^(?:(?:Q|q|Question|QUESTION|प्रश्न|प्र)\s*[.:]?\s*)?(\d{1,4})\s*[.):]\s*(.*)$/;
+const INLINE_ANSWER = /\s*(?:सही\s*उत्तर|उत्तर|Answer|Ans)\s*[:\-–]\s*[(\[]?\s*([A-Da-d]|[१-४]|[कखगघ](?![\u0900-\u0963]))(?![A-Za-z]).*$/i;
+const BLOCK_PREFIX = /^Q\d+\s*:\s*(?=\d{1,4}[.)]\s)/i;
+const INLINE_MARKER = /[(\[]?([A-Dकखगघ])\s*[)\]]|(\d{1,4})[.)](?=\s)|(?:सही\s*उत्तर|उत्तर|Answer|Ans)\s*[:\-–]/g;
+const LIST_PREFIX = /^[\d.)(\[\]]+\s*/;
+const DEVANAGARI_OPTIONS = '१२३४';
+const DEVANAGARI_LETTERS = 'कखगघ';
+const DEVANAGARI = /[\u0900-\u097F]/;
+const IMAGE_LINE = /^(?:\[image:[^\]\s]+\]\s*)+$/; // Only pictures, see image-store.js
+
+function optionIndex(letter) {
+    const devanagari = DEVANAGARI_OPTIONS.indexOf(letter);
+    if (devanagari >= 0) return devanagari;
+    const devanagariLetter = DEVANAGARI_LETTERS.indexOf(letter);
+    return devanagariLetter >= 0 ? devanagariLetter : letter.toUpperCase().charCodeAt(0) - 65;
+}
+
+// Cut a flattened "1. Q? A) x B) y ..." line at its markers. Option markers
+// only count in A, B, C, D (or क, ख, ग, घ) order, so a stray "(B)" inside an
+// option is kept; a क) ending a Hindi word ("(जनक)") is not a marker.
+function splitInline(line) {
+    const first = line.indexOf(')');
+    if (first < 0 || line.indexOf(')', first + 1) < 0) return [line];
+
+    const cuts = [];
+    let expected = 0; // Index of the next option marker
+    INLINE_MARKER.lastIndex = 0;
+    let match;
+    while ((match = INLINE_MARKER.exec(line))) {
+        if (match[1]) {
+            if (optionIndex(match[1]) !== expected) continue;
+            if (DEVANAGARI_LETTERS.includes(match[1]) && DEVANAGARI.test(line[match.index - 1] || '')) continue;
+            expected++;
+        } else if (match[2]) {
+            // A question number, unless it is part of a longer number or word
+            const before = line.charCodeAt(match.index - 1);
+            if (before === 46 || before >= 48 && before <= 57 || before >= 65 && before <= 90 ||
+                before >= 97 && before <= 122 || before === 95) continue;
+            expected = 0; // Next question
+        }
+        cuts.push(match.index);
+    }
+    if (expected < 2) return [line]; // Fewer than two options: not a flattened question
+
+    const pieces = [];
+    let start = 0;
+    for (const cut of cuts) {
+        if (cut > start) {
+            pieces.push(line.slice(start, cut).trim());
+            start = cut;
+        }
+    }
+    pieces.push(line.slice(start).trim());
+    return pieces.filter(piece => piece.length > 0);
+}
+
+function buildQuestion(current, id, language) {
+    let questionText;
+    let options = current.options;
+
+    if (options.length > 0) {
+        questionText = current.lines.length > 0 ? [current.head, ...current.lines].join(' ') : current.head;
+    } else {
+        // No option markers: the lines after the question are the options
+        const lines = current.lines.slice();
+        questionText = current.head || lines.shift() || '';
+        options = lines.slice(0, 4)
+            .map(line => line.replace(LIST_PREFIX, '').trim())
+            .filter(line => line.length > 2);
+    }
+
+    questionText = questionText.trim();
+    if (questionText.length < 5 || options.length < 2) {
+        return null;
+    }
+
+    const correct = current.correct !== null && current.correct < options.length ? current.correct : 0;
+
+    return {
+        id: id,
+        question: language === 'en' ? 
+            { hi: questionText, en: questionText } : 
+            { hi: questionText, en: questionText },
+        options: language === 'en' ? 
+            { hi: options, en: options } : 
+            { hi: options, en: options },
+        correct: correct,
+        marks: 1,
+        difficulty: 'medium'
+    };
+}
+
+// Calls onQuestion(question) for each question as soon as it is complete
+function scanQuestions(text, language, onQuestion) {
+    let current = null;
+    let nextId = 1;
+    let pictures = []; // Picture lines between questions, for the next one
+
+    const emit = () => {
+        const question = buildQuestion(current, nextId, language);
+        if (question) {
+            nextId++;
+            onQuestion(question);
+        }
+        current = null;
+    };
+    const startQuestion = (head) => {
+        if (current) emit();
+        if (pictures.length > 0) {
+            head = [...pictures, head].join(' ');
+            pictures = [];
+        }
+        current = { head, lines: [], options: [], correct: null, closed: false };
+    };
+
+    if (text.includes('\r')) {
+        text = text.replace(/\r\n?/g, '\n');
+    }
+    const hasZeroWidth = ZERO_WIDTH.test(text);
+    ZERO_WIDTH.lastIndex = 0;
+
+    for (const rawLine of text.split('\n')) {
+        const line = (hasZeroWidth ? rawLine.replace(ZERO_WIDTH, '') : rawLine).trim();
+
+        if (!line) {
+            // A blank line after the options ends the question
+            if (current && current.options.length >= 2) current.closed = true;
+            continue;
+        }
+
+        const pieces = splitInline(line.charCodeAt(0) === 81 || line.charCodeAt(0) === 113 ? line.replace(BLOCK_PREFIX, '') : line);
+        for (let i = 0; i < pieces.length; i++) {
+            const piece = pieces[i];
+            const first = piece[0];
+            let match;
+
+            // The first character decides which line types are possible
+            if ('AaCcउस'.includes(first) && (match = ANSWER_LINE.exec(piece))) {
+                if (current) current.correct = optionIndex(match[1]);
+            } else if ('MmDdअ'.includes(first) && META_LINE.test(piece)) {
+                // Marks/difficulty line, skipped
+            } else if ('([{ABCDabcdOव१२३४कखगघ'.includes(first) && (match = OPTION_LINE.exec(piece))) {
+                if (!current) continue; // Option without a question
+                let optionText = match[7];
+                if (optionText.includes('Ans') || optionText.includes('उत्तर')) {
+                    const answer = INLINE_ANSWER.exec(optionText);
+                    if (answer) {
+                        current.correct = optionIndex(answer[1]);
+                        optionText = optionText.slice(0, answer.index);
+                    }
+                }
+                optionText = optionText.trim();
+                if (optionText.length > 0) {
+                    current.options.push(optionText);
+                }
+            } else if ((first <= '9' && first >= '0' || 'Qqप'.includes(first)) && (match = QUESTION_LINE.exec(piece))) {
+                startQuestion(match[2].trim());
+            } else if (!current || current.closed || current.options.length >= 4) {
+                if (first === '[' && IMAGE_LINE.test(piece)) {
+                    pictures.push(piece); // A figure above the next question
+                } else {
+                    startQuestion(piece); // Unnumbered question
+                }
+            } else if (current.options.length > 0) {
+                // Plain text after the options continues the last one
+                current.options[current.options.length - 1] += ' ' + piece;
+            } else {
+                current.lines.push(piece);
+            }
+        }
+    }
+
+    if (current) emit();
+}
+
+function parseQuestionsFromText(text, language = 'hi') {
+    const questions = [];
+    scanQuestions(text, language, question => questions.push(question));
+    return questions;
+}
+
+// Text of a DOCX as mammoth.extractRawText() gives it, with \0<n>\0 where
+// picture n (pushed to `pictures`) was
+function docxText(element, pictures) {
+    if (element.type === 'text') {
+        return element.value;
+    } else if (element.type === 'tab') {
+        return '\t';
+    } else if (element.type === 'image') {
+        pictures.push(element);
+        return `\u0000${pictures.length - 1}\u0000`;
+    }
+    const tail = element.type === 'paragraph' ? '\n\n' : '';
+    return (element.children || []).map(child => docxText(child, pictures)).join('') + tail;
+}
+
+// Replace \0<n>\0 markers with the tokens of the saved pictures
+function placePictures(text, names) {
+    return text.replace(/\u0000(\d+)\u0000/g, (marker, index) => names[index] ? ` ${token(names[index])} ` : '');
+}
+
+async function extractPdf(filePath, images) {
+    const dataBuffer = fs.readFileSync(filePath);
+    const pdfParse = require('pdf-parse');
+    if (typeof pdfParse === 'function') {
+        // pdf-parse 1.x (text only)
+        const pdfData = await pdfParse(dataBuffer);
+        return pdfData.text;
+    }
+    const parser = new pdfParse.PDFParse({ data: dataBuffer });
+    try {
+        const pdfData = await parser.getText();
+        if (!images) return pdfData.text;
+
+        // Pictures have no position on the page, so each page's pictures go
+        // before its text and end up with the first question on that page
+        let found;
+        try {
+            found = await parser.getImage({ imageThreshold: 50, imageDataUrl: false });
+        } catch (error) {
+            // Needs @napi-rs/canvas to encode the pictures
+            console.error('Could not read PDF images:', error.message);
+            return pdfData.text;
+        }
+        const pageTokens = new Map();
+        for (const page of found.pages) {
+            const names = [];
+            for (const image of page.images) {
+                const name = await images.add(Buffer.from(image.data), 'image/png');
+                if (name) names.push(token(name));
+            }
+            pageTokens.set(page.pageNumber, names);
+        }
+        if ([...pageTokens.values()].every(names => names.length === 0)) {
+            return pdfData.text;
+        }
+        return pdfData.pages
+            .map(page => [...(pageTokens.get(page.num) || []), page.text].join('\n\n'))
+            .join('\n\n');
+    } finally {
+        await parser.destroy();
+    }
+}
+
+async function extractDocx(filePath, images) {
+    const mammoth = require('mammoth');
+    if (!images) {
+        return (await mammoth.extractRawText({ path: filePath })).value;
+    }
+
+    // extractRawText drops pictures, so the document tree is taken from a
+    // conversion (its HTML is not used) and turned into text here
+    let document = null;
+    await mammoth.convertToHtml({ path: filePath }, {
+        transformDocument: (element) => (document = element),
+        convertImage: mammoth.images.imgElement(() => ({ src: '' }))
+    });
+    const pictures = [];
+    const text = docxText(document, pictures);
+    const names = [];
+    for (const picture of pictures) {
+        names.push(await images.add(await picture.read(), picture.contentType));
+    }
+    return placePictures(text, names);
+}
+
+// Raw text of a PDF or DOCX question paper. With an ImageStore
+// (image-store.js) the pictures are saved there and marked in the text;
+// without one they are dropped.
+async function extractText(filePath, originalName, images = null) {
+    const fileExtension = path.extname(originalName).toLowerCase();
+
+    if (fileExtension === '.pdf') {
+        return extractPdf(filePath, images);
+    }
+
+    if (fileExtension === '.docx' || fileExtension === '.doc') {
+        // Normalize text to handle different encodings (Kruti Dev, Mangal, etc.)
+        return normalizeHindiText(await extractDocx(filePath, images));
+    }
+
+    const error = new Error('Unsupported file format');
+    error.code = 'UNSUPPORTED_FORMAT';
+    throw error;
+}
+
+module.exports = {
+    normalizeHindiText,
+    scanQuestions,
+    parseQuestionsFromText,
+    extractText
+};
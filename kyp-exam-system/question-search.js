@@ -0,0 +1,220 @@
+// Searchable, paginated view of the question bank for the admin panel
+//
+// An inverted index from words to questions, covering the question and
+// option text in both languages. Words are letters, combining marks and
+// digits, so Devanagari words keep their matras and viramas; text is
+// NFC-normalized and lower-cased, and the nukta and chandrabindu are folded
+// (क़ -> क, ँ -> ं) because admins type both spellings. Every search word
+// matches as a prefix ("कंप्यूटर" finds "कंप्यूटरों"), and a question must match
+// all of them.
+//
+// The index is built on the first search and afterwards kept in step with
+// every write to questions.json: only questions that are new, edited or
+// deleted are re-indexed. Results are ordered by subject and question id;
+// the cursor names the last question of a page, so paging stays correct
+// while questions are added or deleted.
+
+const DEFAULT_LIMIT = 50;
+const MAX_LIMIT = 200;
+
+function normalize(text) {
+    return text.normalize('NFC')
+        .replace(/[\u200B-\u200D\uFEFF]/g, '')
+        .toLowerCase()
+        .replace(/\u093C/g, '')        // Nukta
+        .replace(/\u0901/g, '\u0902'); // Chandrabindu -> anusvara
+}
+
+function tokenize(text) {
+    return normalize(text).match(/[\p{L}\p{M}\p{N}]+/gu) || [];
+}
+
+// Question and option text in every language
+function textsOf(question) {
+    const texts = [];
+    const add = (value) => {
+        if (typeof value === 'string') {
+            texts.push(value);
+        } else if (Array.isArray(value)) {
+            value.forEach(add);
+        } else if (value && typeof value === 'object') {
+            add(value.hi);
+            add(value.en);
+        }
+    };
+    add(question.question);
+    add(question.options);
+    return texts;
+}
+
+function compareKeys(a, b) {
+    if (a.subjectId !== b.subjectId) return a.subjectId < b.subjectId ? -1 : 1;
+    return Number(a.id) - Number(b.id);
+}
+
+function encodeCursor(entry) {
+    return Buffer.from(JSON.stringify([entry.subjectId, entry.id])).toString('base64url');
+}
+
+function decodeCursor(cursor) {
+    try {
+        const [subjectId, id] = JSON.parse(Buffer.from(cursor, 'base64url').toString('utf8'));
+        if (typeof subjectId === 'string' && id !== undefined) return { subjectId, id };
+    } catch (error) {
+        // Reported below
+    }
+    const error = new Error('Invalid cursor');
+    error.code = 'INVALID_CURSOR';
+    throw error;
+}
+
+class QuestionSearch {
+    constructor(load) {
+        this.load = load; // () => parsed questions.json (or null)
+        this.built = false;
+        this.entries = new Map();  // "subjectId\0id" -> { subjectId, id, question, text, tokens }
+        this.postings = new Map(); // word -> Set of entry keys
+        this.vocabulary = null;    // Sorted words, rebuilt after the word list changes
+        this.ordered = null;       // Entries by subject and id, rebuilt after changes
+    }
+
+    // Bring the index in line with questions.json (called on every write;
+    // nothing to do until the first search builds it)
+    update(allQuestions) {
+        if (this.built) this.sync(allQuestions);
+    }
+
+    sync(allQuestions) {
+        const seen = new Set();
+        for (const [subjectId, questions] of Object.entries(allQuestions || {})) {
+            if (!Array.isArray(questions)) continue;
+            for (const question of questions) {
+                const key = subjectId + '\u0000' + question.id;
+                seen.add(key);
+                const entry = this.entries.get(key);
+                if (entry && entry.question === question) continue;
+
+                // Same text as indexed (a copy from another process or an
+                // edit of marks or answer): only the stored question changes
+                const text = textsOf(question).join('\n');
+                if (entry && entry.text === text) {
+                    entry.question = question;
+                    continue;
+                }
+                this.remove(key);
+                this.insert(key, { subjectId, id: question.id, question, text, tokens: new Set(tokenize(text)) });
+            }
+        }
+        for (const key of [...this.entries.keys()]) {
+            if (!seen.has(key)) this.remove(key);
+        }
+        this.built = true;
+    }
+
+    insert(key, entry) {
+        this.entries.set(key, entry);
+        for (const token of entry.tokens) {
+            if (!this.postings.has(token)) {
+                this.postings.set(token, new Set());
+                this.vocabulary = null;
+            }
+            this.postings.get(token).add(key);
+        }
+        this.ordered = null;
+    }
+
+    remove(key) {
+        const entry = this.entries.get(key);
+        if (!entry) return;
+        this.entries.delete(key);
+        for (const token of entry.tokens) {
+            const keys = this.postings.get(token);
+            keys.delete(key);
+            if (keys.size === 0) {
+                this.postings.delete(token);
+                this.vocabulary = null;
+            }
+        }
+        this.ordered = null;
+    }
+
+    // Keys of the questions with a word starting with prefix
+    matchPrefix(prefix) {
+        if (!this.vocabulary) {
+            this.vocabulary = [...this.postings.keys()].sort();
+        }
+        const words = this.vocabulary;
+        let low = 0;
+        let high = words.length;
+        while (low < high) {
+            const mid = (low + high) >>> 1;
+            if (words[mid] < prefix) low = mid + 1; else high = mid;
+        }
+        const keys = new Set();
+        for (let i = low; i < words.length && words[i].startsWith(prefix); i++) {
+            this.postings.get(words[i]).forEach(key => keys.add(key));
+        }
+        return keys;
+    }
+
+    // One page of questions: { total, questions, nextCursor, counts }
+    //   q           words to look for (all must match)
+    //   subjectId   one subject only
+    //   language    'hi' or 'en': questions shown in that language
+    //   difficulty  easy | medium | hard
+    //   cursor      nextCursor of the previous page
+    //   limit       page size (default 50, at most 200)
+    query({ q = '', subjectId = null, language = null, difficulty = null, cursor = null, limit = DEFAULT_LIMIT } = {}) {
+        if (!this.built) this.sync(this.load());
+        if (!this.ordered) {
+            this.ordered = [...this.entries.values()].sort(compareKeys);
+        }
+
+        let matches = null;
+        const terms = [...new Set(tokenize(String(q)))];
+        if (terms.length > 0) {
+            // Smallest set first, so the intersection stays small
+            const sets = terms.map(term => this.matchPrefix(term)).sort((a, b) => a.size - b.size);
+            matches = sets[0];
+            for (const set of sets.slice(1)) {
+                matches = new Set([...matches].filter(key => set.has(key)));
+            }
+        }
+
+        const after = cursor ? decodeCursor(cursor) : null;
+        const pageSize = Math.min(Math.max(parseInt(limit) || DEFAULT_LIMIT, 1), MAX_LIMIT);
+        const questions = [];
+        let total = 0;
+        let more = false;
+
+        for (const entry of this.ordered) {
+            if (subjectId && entry.subjectId !== subjectId) continue;
+            if (matches && !matches.has(entry.subjectId + '\u0000' + entry.id)) continue;
+            const question = entry.question;
+            if (language && question.language && question.language !== language) continue;
+            if (difficulty && (question.difficulty || 'medium') !== difficulty) continue;
+
+            total++;
+            if (after && compareKeys(entry, after) <= 0) continue;
+            if (questions.length < pageSize) {
+                questions.push({ ...question, subjectId: entry.subjectId });
+            } else {
+                more = true;
+            }
+        }
+
+        const counts = {};
+        for (const [subject, questionList] of Object.entries(this.load() || {})) {
+            counts[subject] = Array.isArray(questionList) ? questionList.length : 0;
+        }
+
+        return {
+            total,
+            questions,
+            nextCursor: more ? encodeCursor(questions[questions.length - 1]) : null,
+            counts
+        };
+    }
+}
+
+module.exports = { QuestionSearch, tokenize };
@@ -0,0 +1,148 @@
+const crypto = require('crypto');
+const fs = require('fs');
+const path = require('path');
+const { buildDetails } = require('./grading');
+
+// Immutable, content-addressed versions of each subject's question bank
+//
+// A result no longer copies the text of every question it was graded on.
+// It keeps the chosen option of each question (answers, in bank order; -1
+// not answered, -2 answered but the choice was not recorded) and the hash
+// of the bank it was graded against. That bank is saved once as
+// data/question-versions/<sha256>.json holding the subject and, per
+// question, only what grading and review need: id, question, options,
+// correct, marks. Editing a question makes a new version; the old file
+// stays, so older results still show what their students saw.
+//
+// details(result) rebuilds the per-question rows the old results stored,
+// for review screens and analytics, and reads each version once.
+// compact-results.py (kyp_data.py) writes the same files with the same
+// hashing; keep the two in step.
+
+const MAX_CACHED_VERSIONS = 32;
+
+// The bytes that are hashed and saved for a subject's questions
+function versionText(subjectId, questions) {
+    return JSON.stringify({
+        subjectId,
+        questions: questions.map(question => ({
+            id: question.id,
+            question: question.question,
+            options: question.options,
+            correct: question.correct,
+            marks: question.marks
+        }))
+    });
+}
+
+function hashText(text) {
+    return crypto.createHash('sha256').update(text, 'utf8').digest('hex');
+}
+
+class QuestionVersions {
+    constructor(dir) {
+        this.dir = dir;
+        this.saved = new WeakMap(); // grading table -> Promise of its version hash
+        this.cache = new Map();     // hash -> parsed version, most recently used last
+        this.writing = new Map();   // hash -> Promise of the write in progress
+    }
+
+    versionPath(hash) {
+        return path.join(this.dir, hash + '.json');
+    }
+
+    // Hash of the version a subject's grading table (grading.js) was built
+    // from, saved first if it is new. Resolves once the file is on disk, so
+    // a result never refers to a missing version.
+    save(subjectId, table) {
+        if (!this.saved.has(table)) {
+            const text = versionText(subjectId, table.questions);
+            const hash = hashText(text);
+            const saved = this.write(hash, text).then(() => hash);
+            saved.catch(() => this.saved.delete(table)); // Retried by the next result
+            this.saved.set(table, saved);
+        }
+        return this.saved.get(table);
+    }
+
+    // Write a version file unless it exists; the same hash always has the
+    // same content, so a file that is there is never rewritten. Writes of
+    // the same hash at once (in cluster mode, from several workers) share
+    // one.
+    write(hash, text) {
+        if (hashText(text) !== hash) {
+            return Promise.reject(new Error(`Question version does not match its hash: ${hash}`));
+        }
+        if (!this.writing.has(hash)) {
+            const writing = this.writeFile(hash, text).finally(() => this.writing.delete(hash));
+            this.writing.set(hash, writing);
+        }
+        return this.writing.get(hash);
+    }
+
+    async writeFile(hash, text) {
+        const filepath = this.versionPath(hash);
+        if (fs.existsSync(filepath)) return;
+
+        await fs.promises.mkdir(this.dir, { recursive: true });
+        const tmpFile = `${filepath}.${process.pid}.${crypto.randomBytes(4).toString('hex')}.tmp`;
+        try {
+            const handle = await fs.promises.open(tmpFile, 'w');
+            try {
+                await handle.writeFile(text, 'utf8');
+                await handle.sync();
+            } finally {
+                await handle.close();
+            }
+            await fs.promises.rename(tmpFile, filepath);
+        } catch (error) {
+            await fs.promises.unlink(tmpFile).catch(() => {});
+            // Saved by another process in the meantime: same hash, same bytes
+            if (fs.existsSync(filepath)) return;
+            throw error;
+        }
+    }
+
+    // { subjectId, questions } of a version, or null if it is missing
+    get(hash) {
+        if (typeof hash !== 'string' || !/^[0-9a-f]{64}$/.test(hash)) return null;
+        if (this.cache.has(hash)) {
+            const version = this.cache.get(hash);
+            this.cache.delete(hash);
+            this.cache.set(hash, version);
+            return version;
+        }
+
+        let version;
+        try {
+            version = JSON.parse(fs.readFileSync(this.versionPath(hash), 'utf8'));
+        } catch (error) {
+            if (error.code !== 'ENOENT') {
+                console.error('Error reading question version:', hash, error);
+            }
+            return null;
+        }
+        if (this.cache.size >= MAX_CACHED_VERSIONS) {
+            this.cache.delete(this.cache.keys().next().value);
+        }
+        this.cache.set(hash, version);
+        return version;
+    }
+
+    // Per-question rows of a result: stored ones for results saved before
+    // versions existed, rebuilt from the version otherwise (null if the
+    // version is missing)
+    details(result) {
+        if (Array.isArray(result.details)) return result.details;
+        if (!result.bank || !Array.isArray(result.answers)) return null;
+        const version = this.get(result.bank);
+        return version ? buildDetails(version.questions, result.answers) : null;
+    }
+
+    // A result with its details, for review screens
+    expand(result) {
+        return { ...result, details: this.details(result) };
+    }
+}
+
+module.exports = { QuestionVersions, versionText, hashText };
@@ -0,0 +1,225 @@
+// Incremental results analytics
+//
+// Aggregates are kept per subject and per question and updated with every
+// submitted result, so the admin summary endpoints cost O(subjects +
+// questions) instead of re-reading every result and its details. At startup
+// the existing results log is streamed through add() once (load()); results
+// submitted before or while that runs are held back and applied after it,
+// skipping any the stream has already seen.
+
+const PASS_PERCENTAGE = 60;    // Same cut-off as the results export
+const HISTOGRAM_BUCKETS = 10;  // 0-9%, 10-19%, ..., 90-100%
+const NOT_ANSWERED = 'Not Answered';
+const LOAD_YIELD_EVERY = 500;  // Let requests through while loading
+
+function resultKey(result) {
+    return `${result.id}|${result.studentId}|${result.submissionTime}`;
+}
+
+function emptySubject(subjectId) {
+    return {
+        subjectId,
+        results: 0,
+        passed: 0,
+        percentageSum: 0,
+        timeSpentSum: 0,
+        timed: 0,
+        histogram: new Array(HISTOGRAM_BUCKETS).fill(0),
+        students: new Set(),
+        lastSubmission: null,
+        questions: new Map() // questionId -> per-question aggregate
+    };
+}
+
+function round(value, digits = 1) {
+    const factor = Math.pow(10, digits);
+    return Math.round(value * factor) / factor;
+}
+
+class ResultsAnalytics {
+    // details: result => its per-question rows (see question-versions.js);
+    // by default the rows stored in the result
+    constructor(options = {}) {
+        this.detailsOf = options.details || (result => result.details);
+        this.subjects = new Map();
+        this.students = new Set();
+        this.total = 0;
+        this.loading = false;
+        this.ready = false;
+        this.pending = new Map(); // key -> result, submitted before load() finished
+    }
+
+    // Stream every stored result into the aggregates (call once at startup)
+    async load(records) {
+        this.loading = true;
+        let count = 0;
+
+        try {
+            for await (const result of records) {
+                const key = resultKey(result);
+                if (this.pending.has(key)) continue; // Will be added from pending
+                this.apply(result);
+                if (++count % LOAD_YIELD_EVERY === 0) {
+                    await new Promise(resolve => setImmediate(resolve));
+                }
+            }
+        } finally {
+            for (const result of this.pending.values()) {
+                this.apply(result);
+            }
+            this.pending = null;
+            this.loading = false;
+            this.ready = true;
+        }
+        return count;
+    }
+
+    // Count a newly submitted result
+    add(result) {
+        if (!this.ready) {
+            this.pending.set(resultKey(result), result);
+            return;
+        }
+        this.apply(result);
+    }
+
+    // Whether the student has a result in the subject, counting results
+    // still held back by load()
+    submitted(studentId, subjectId) {
+        const subject = this.subjects.get(subjectId);
+        if (subject && subject.students.has(studentId)) return true;
+        if (!this.pending) return false;
+        for (const result of this.pending.values()) {
+            if (result.studentId === studentId && result.subjectId === subjectId) return true;
+        }
+        return false;
+    }
+
+    apply(result) {
+        const subjectId = result.subjectId;
+        if (!this.subjects.has(subjectId)) {
+            this.subjects.set(subjectId, emptySubject(subjectId));
+        }
+        const subject = this.subjects.get(subjectId);
+        const percentage = Number(result.percentage) || 0;
+
+        this.total++;
+        subject.results++;
+        subject.percentageSum += percentage;
+        if (percentage >= PASS_PERCENTAGE) subject.passed++;
+
+        const bucket = Math.min(HISTOGRAM_BUCKETS - 1, Math.max(0, Math.floor(percentage / (100 / HISTOGRAM_BUCKETS))));
+        subject.histogram[bucket]++;
+
+        const timeSpent = Number(result.timeSpent);
+        if (Number.isFinite(timeSpent) && timeSpent > 0) {
+            subject.timeSpentSum += timeSpent;
+            subject.timed++;
+        }
+
+        if (result.studentId) {
+            subject.students.add(result.studentId);
+            this.students.add(result.studentId);
+        }
+
+        const submitted = result.submissionTime || result.timestamp || null;
+        if (submitted && (!subject.lastSubmission || submitted > subject.lastSubmission)) {
+            subject.lastSubmission = submitted;
+        }
+
+        for (const detail of this.detailsOf(result) || []) {
+            const questionId = String(detail.questionId);
+            let question = subject.questions.get(questionId);
+            if (!question) {
+                question = {
+                    questionId: detail.questionId,
+                    question: detail.question,
+                    correctAnswer: detail.correctAnswer,
+                    attempts: 0,
+                    answered: 0,
+                    correct: 0,
+                    choices: new Map() // option text -> times chosen
+                };
+                subject.questions.set(questionId, question);
+            } else {
+                // Keep the latest wording if the question was edited
+                question.question = detail.question;
+                question.correctAnswer = detail.correctAnswer;
+            }
+
+            question.attempts++;
+            if (detail.userAnswer === NOT_ANSWERED) continue;
+            question.answered++;
+            if (detail.isCorrect) question.correct++;
+            if (detail.userAnswer === undefined) continue; // Choice not recorded
+            const choice = String(detail.userAnswer);
+            question.choices.set(choice, (question.choices.get(choice) || 0) + 1);
+        }
+    }
+
+    subjectSummary(subject) {
+        return {
+            subjectId: subject.subjectId,
+            results: subject.results,
+            students: subject.students.size,
+            passed: subject.passed,
+            passRate: subject.results ? round((subject.passed / subject.results) * 100) : 0,
+            averagePercentage: subject.results ? round(subject.percentageSum / subject.results) : 0,
+            averageTimeSpent: subject.timed ? Math.round(subject.timeSpentSum / subject.timed) : null,
+            histogram: subject.histogram.slice(),
+            questionsSeen: subject.questions.size,
+            lastSubmission: subject.lastSubmission
+        };
+    }
+
+    // Summary of one subject (no questions); null if it has no results yet
+    subjectOverview(subjectId) {
+        const subject = this.subjects.get(subjectId);
+        return subject ? this.subjectSummary(subject) : null;
+    }
+
+    totals() {
+        return { totalResults: this.total, totalStudents: this.students.size };
+    }
+
+    // Totals plus one summary per subject
+    summary() {
+        return {
+            ready: this.ready,
+            ...this.totals(),
+            passPercentage: PASS_PERCENTAGE,
+            histogramBuckets: HISTOGRAM_BUCKETS,
+            subjects: [...this.subjects.values()].map(subject => this.subjectSummary(subject))
+        };
+    }
+
+    // Subject summary with per-question difficulty, hardest first; null if
+    // no results for the subject yet
+    subject(subjectId) {
+        const subject = this.subjects.get(subjectId);
+        if (!subject) return null;
+
+        const questions = [...subject.questions.values()].map(question => {
+            const distractors = [...question.choices]
+                .filter(([choice]) => choice !== question.correctAnswer)
+                .map(([choice, count]) => ({ choice, count }))
+                .sort((a, b) => b.count - a.count);
+
+            return {
+                questionId: question.questionId,
+                question: question.question,
+                correctAnswer: question.correctAnswer,
+                attempts: question.attempts,
+                answered: question.answered,
+                correct: question.correct,
+                fractionCorrect: question.attempts ? round(question.correct / question.attempts, 3) : 0,
+                distractors
+            };
+        });
+        questions.sort((a, b) => a.fractionCorrect - b.fractionCorrect);
+
+        return { ready: this.ready, ...this.subjectSummary(subject), questions };
+    }
+}
+
+module.exports = { ResultsAnalytics, PASS_PERCENTAGE };
@@ -0,0 +1,165 @@
+
+// Streaming Excel exports of exam results
+//
+// Rows are read one at a time from the results log (ResultsStore.stream())
+// and written through ExcelJS's streaming WorkbookWriter straight into the
+// HTTP response, so an export never holds all results or the whole workbook
+// in memory and the download starts with the first matching row.
+// export-results.py writes the same columns offline.
+
+const HEADER_STYLE = {
+    font: { color: { argb: 'FFFFFFFF' }, bold: true },
+    fill: { type: 'pattern', pattern: 'solid', fgColor: { argb: 'FF4472C4' } }
+};
+
+const PASS_PERCENTAGE = 60; // Same cut-off as the admin page CSV export
+
+// Columns of the general results export
+const RESULT_COLUMNS = [
+    { header: 'Student ID', key: 'studentId', width: 15 },
+    { header: 'Name', key: 'name', width: 25 },
+    { header: 'Email', key: 'email', width: 30 },
+    { header: 'Mobile', key: 'mobile', width: 15 },
+    { header: 'Exam', key: 'subject', width: 25 },
+    { header: 'Total Questions', key: 'totalQuestions', width: 16 },
+    { header: 'Correct Answers', key: 'correctAnswers', width: 16 },
+    { header: 'Obtained Marks', key: 'obtainedMarks', width: 15 },
+    { header: 'Total Marks', key: 'totalMarks', width: 12 },
+    { header: 'Percentage', key: 'percentage', width: 12 },
+    { header: 'Result', key: 'result', width: 10 },
+    { header: 'Time Spent (s)', key: 'timeSpent', width: 15 },
+    { header: 'Submission Date', key: 'submittedAt', width: 22, style: { numFmt: 'dd-mmm-yyyy hh:mm:ss' } }
+];
+
+// Old results keep the student fields at the top level
+function studentField(result, field, fallback) {
+    const flat = 'student' + field.charAt(0).toUpperCase() + field.slice(1);
+    return result[flat] || (result.student && result.student[field]) || fallback;
+}
+
+function submissionDate(result) {
+    const value = result.submissionTime || result.timestamp;
+    const date = value ? new Date(value) : null;
+    return date && !isNaN(date) ? date : null;
+}
+
+function resultRow(result, subjectNames) {
+    return {
+        studentId: result.studentId || 'N/A',
+        name: studentField(result, 'name', 'N/A'),
+        email: studentField(result, 'email', 'N/A'),
+        mobile: studentField(result, 'mobile', 'N/A'),
+        subject: subjectNames.get(result.subjectId) || result.subjectId,
+        totalQuestions: result.totalQuestions,
+        correctAnswers: result.correctAnswers,
+        obtainedMarks: result.obtainedMarks,
+        totalMarks: result.totalMarks,
+        percentage: result.percentage,
+        result: result.percentage >= PASS_PERCENTAGE ? 'PASS' : 'FAIL',
+        timeSpent: result.timeSpent,
+        submittedAt: submissionDate(result)
+    };
+}
+
+// Parse ?subjectId=&from=&to= into a filter. A YYYY-MM-DD date means that
+// whole day in server local time; anything else Date can parse is used as is.
+function parseDateParam(name, value, endOfDay) {
+    const day = /^(\d{4})-(\d{2})-(\d{2})$/.exec(value);
+    const date = day
+        ? new Date(Number(day[1]), Number(day[2]) - 1, Number(day[3]) + (endOfDay ? 1 : 0), 0, 0, 0, endOfDay ? -1 : 0)
+        : new Date(value);
+    if (isNaN(date)) {
+        throw new Error(`Invalid "${name}" date: ${value}`);
+    }
+    return date;
+}
+
+function parseResultFilter(query) {
+    return {
+        subjectId: query.subjectId || null,
+        from: query.from ? parseDateParam('from', query.from, false) : null,
+        to: query.to ? parseDateParam('to', query.to, true) : null
+    };
+}
+
+function matchesFilter(result, filter) {
+    if (filter.subjectId && result.subjectId !== filter.subjectId) return false;
+    if (filter.from || filter.to) {
+        const date = submissionDate(result);
+        if (!date) return false;
+        if (filter.from && date < filter.from) return false;
+        if (filter.to && date > filter.to) return false;
+    }
+    return true;
+}
+
+function waitForDrain(res) {
+    return new Promise(resolve => {
+        const done = () => {
+            res.off('drain', done);
+            res.off('close', done);
+            resolve();
+        };
+        res.on('drain', done);
+        res.on('close', done);
+    });
+}
+
+// Stream the results accepted by `filter` into an xlsx download.
+// Nothing is sent when no result matches, so the caller can still answer
+// 404; resolves to the number of rows written.
+async function streamResultsWorkbook(res, records, { filename, sheetName, columns, filter, toRow }) {
+    const iterator = records[Symbol.asyncIterator]();
+    let next = await iterator.next();
+    while (!next.done && !filter(next.value)) {
+        next = await iterator.next();
+    }
+    if (next.done) {
+        return 0;
+    }
+
+    res.setHeader('Content-Type', 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet');
+    res.setHeader('Content-Disposition', `attachment; filename=${filename}`);
+
+    const ExcelJS = require('exceljs'); // Loaded with the first export, not at startup
+    const workbook = new ExcelJS.stream.xlsx.WorkbookWriter({ stream: res, useStyles: true });
+    const worksheet = workbook.addWorksheet(sheetName);
+    worksheet.columns = columns;
+
+    const header = worksheet.getRow(1);
+    header.font = HEADER_STYLE.font;
+    header.fill = HEADER_STYLE.fill;
+    header.commit();
+
+    let count = 0;
+    try {
+        for (; !next.done; next = await iterator.next()) {
+            if (!filter(next.value)) continue;
+            worksheet.addRow(toRow(next.value)).commit();
+            count++;
+
+            // Let a slow client catch up instead of buffering the workbook
+            if (res.writableNeedDrain) {
+                await waitForDrain(res);
+            }
+            if (res.destroyed) {
+                return count; // Client went away
+            }
+        }
+    } finally {
+        await iterator.return(); // Close the segment being read on early exit
+    }
+
+    worksheet.commit();
+    await workbook.commit();
+    return count;
+}
+
+module.exports = {
+    RESULT_COLUMNS,
+    resultRow,
+    studentField,
+    parseResultFilter,
+    matchesFilter,
+    streamResultsWorkbook
+};
@@ -0,0 +1,441 @@
+const fs = require('fs');
+const path = require('path');
+const readline = require('readline');
+const { EventEmitter } = require('events');
+const { promisify } = require('util');
+
+const fsWrite = promisify(fs.write);
+const fsFsync = promisify(fs.fsync);
+
+// Append-only results log
+//
+// Results are stored as JSON Lines segments in data/results/
+// (segment-000001.jsonl, segment-000002.jsonl, ...). A submit appends one
+// compact line to the active segment and fsyncs it, so saving a result no
+// longer rewrites every earlier result. Appends that arrive together (the end
+// of exam bell) share one write and one fsync, done off the event loop.
+//
+// When the active segment grows past SEGMENT_MAX_BYTES it is sealed and a new
+// one is started; once enough sealed segments pile up they are merged into
+// one by compact(), in the background: the merged copy is written with
+// async I/O while submits carry on. A merge (and migrate-results.py) first
+// records what it is about to replace in compact.intent, so a crash halfway
+// is finished or rolled back by the next open() instead of leaving results
+// on disk twice.
+//
+// stream() opens every segment when it starts and reads those files to the
+// end, so an export or results page running meanwhile sees each result
+// exactly once. A merge swaps its copy in as soon as it is written and
+// renames the segments it replaces to *.retired, which no new stream lists;
+// they are deleted once the last stream started before the merge has
+// finished (or by the next open()). A cluster worker streams through a store
+// of its own: the segments it already holds open stay readable to the end.
+//
+// The old data/results.json (one big array) is still read as the oldest
+// segment, one result at a time, until migrate-results.py has converted it.
+//
+// Every result is emitted as 'append' once it is on disk, and every batch
+// as 'flush' with its size and write time.
+
+const SEGMENT_MAX_BYTES = 4 * 1024 * 1024; // 4MB per segment
+const COMPACT_MIN_SEGMENTS = 8;            // Merge once this many segments are sealed
+const COMPACT_BATCH_LINES = 1000;          // Results per write while merging
+const SEGMENT_PATTERN = /^segment-(\d{6})\.jsonl$/;
+const INTENT_FILE = 'compact.intent';
+const RETIRED_SUFFIX = '.retired';
+
+function segmentName(seq) {
+    return `segment-${String(seq).padStart(6, '0')}.jsonl`;
+}
+
+function writeFileDurable(filepath, text) {
+    const fd = fs.openSync(filepath, 'w');
+    try {
+        fs.writeSync(fd, text);
+        fs.fsyncSync(fd);
+    } finally {
+        fs.closeSync(fd);
+    }
+}
+
+class ResultsStore extends EventEmitter {
+    constructor(dir, legacyFile) {
+        super();
+        this.dir = dir;
+        this.legacyFile = legacyFile;
+        this.fd = null;
+        this.activeSeq = 0;
+        this.activeSize = 0;
+        this.pending = [];     // { line, resolve, reject } waiting for the next flush
+        this.flushing = null;  // Promise of the running flush loop
+        this.compacting = null; // Promise of the running merge
+        this.generation = 0;   // Merges swapped in so far
+        this.readers = new Map(); // generation -> open stream()s started in it
+        this.retired = [];     // { generation, files } replaced by a merge, still being read
+    }
+
+    // Sorted list of segment sequence numbers on disk
+    listSegments() {
+        if (!fs.existsSync(this.dir)) return [];
+        return fs.readdirSync(this.dir)
+            .map(name => SEGMENT_PATTERN.exec(name))
+            .filter(Boolean)
+            .map(match => parseInt(match[1], 10))
+            .sort((a, b) => a - b);
+    }
+
+    segmentPath(seq) {
+        return path.join(this.dir, segmentName(seq));
+    }
+
+    open() {
+        if (!fs.existsSync(this.dir)) {
+            fs.mkdirSync(this.dir, { recursive: true });
+        }
+        this.recoverCompaction();
+        // Replaced by a merge before the last shutdown; nothing reads them now
+        for (const name of fs.readdirSync(this.dir)) {
+            if (name.endsWith(RETIRED_SUFFIX)) fs.unlinkSync(path.join(this.dir, name));
+        }
+
+        const segments = this.listSegments();
+        const last = segments.length > 0 ? segments[segments.length - 1] : 0;
+
+        // Segment 0 is reserved for migrated/compacted history, never appended to
+        if (last > 0 && fs.statSync(this.segmentPath(last)).size < SEGMENT_MAX_BYTES) {
+            this.activeSeq = last;
+            this.repairTail(this.segmentPath(last));
+        } else {
+            this.activeSeq = last + 1;
+        }
+
+        this.fd = fs.openSync(this.segmentPath(this.activeSeq), 'a');
+        this.activeSize = fs.fstatSync(this.fd).size;
+    }
+
+    // Finish or roll back a merge interrupted by a crash. The intent file
+    // holds { target, sources, legacy } (see compact() and migrate-results.py).
+    recoverCompaction() {
+        const intentPath = path.join(this.dir, INTENT_FILE);
+        if (!fs.existsSync(intentPath)) return;
+
+        const intent = JSON.parse(fs.readFileSync(intentPath, 'utf8'));
+        const tmpFile = this.segmentPath(intent.target) + '.tmp';
+
+        if (fs.existsSync(tmpFile)) {
+            // The merged file never replaced the target, so the sources are intact
+            fs.unlinkSync(tmpFile);
+            console.warn('Results log: rolled back an unfinished compaction');
+        } else {
+            // The merged file is in place; drop what it replaced
+            for (const seq of intent.sources) {
+                if (seq !== intent.target && fs.existsSync(this.segmentPath(seq))) {
+                    fs.unlinkSync(this.segmentPath(seq));
+                }
+            }
+            if (intent.legacy && this.legacyFile && fs.existsSync(this.legacyFile)) {
+                fs.renameSync(this.legacyFile, this.legacyFile + '.migrated');
+            }
+            console.warn('Results log: finished an interrupted compaction');
+        }
+        fs.unlinkSync(intentPath);
+    }
+
+    // Drop a half-written last line left behind by a crash mid-append
+    repairTail(filepath) {
+        const content = fs.readFileSync(filepath);
+        if (content.length === 0 || content[content.length - 1] === 0x0A) return;
+
+        const lastNewline = content.lastIndexOf(0x0A);
+        fs.truncateSync(filepath, lastNewline + 1);
+        console.warn(`Results log: dropped incomplete record at end of ${path.basename(filepath)}`);
+    }
+
+    // Resolves once the result is on disk
+    append(result) {
+        if (this.fd === null) {
+            this.open();
+        }
+
+        return new Promise((resolve, reject) => {
+            this.pending.push({ result, line: JSON.stringify(result) + '\n', resolve, reject });
+            this.scheduleFlush();
+        });
+    }
+
+    scheduleFlush() {
+        if (this.flushing) return; // The running flush picks up new lines
+        this.flushing = new Promise(done => setImmediate(done))
+            .then(() => this.flushPending())
+            .finally(() => {
+                this.flushing = null;
+                // Appended after the loop saw an empty queue
+                if (this.pending.length > 0) {
+                    this.scheduleFlush();
+                }
+            });
+    }
+
+    // Write queued lines in batches until the queue is empty
+    async flushPending() {
+        while (this.pending.length > 0) {
+            const batch = this.pending;
+            this.pending = [];
+            const buffer = Buffer.from(batch.map(item => item.line).join(''), 'utf8');
+            const started = process.hrtime.bigint();
+            let ok = true;
+
+            try {
+                let offset = 0;
+                while (offset < buffer.length) {
+                    const { bytesWritten } = await fsWrite(this.fd, buffer, offset, buffer.length - offset);
+                    offset += bytesWritten;
+                }
+                await fsFsync(this.fd);
+                this.activeSize += buffer.length;
+                batch.forEach(item => {
+                    this.emit('append', item.result);
+                    item.resolve();
+                });
+            } catch (error) {
+                ok = false;
+                batch.forEach(item => item.reject(error));
+            }
+
+            this.emit('flush', {
+                results: batch.length,
+                bytes: buffer.length,
+                ok,
+                durationMs: Number(process.hrtime.bigint() - started) / 1e6
+            });
+
+            if (this.activeSize >= SEGMENT_MAX_BYTES) {
+                this.rotate();
+            }
+        }
+    }
+
+    // Wait for queued appends to reach disk (used on shutdown)
+    async drain() {
+        while (this.flushing) {
+            await this.flushing;
+        }
+    }
+
+    // Seal the active segment and start a new one
+    rotate() {
+        fs.closeSync(this.fd);
+        this.activeSeq++;
+        this.fd = fs.openSync(this.segmentPath(this.activeSeq), 'a');
+        this.activeSize = 0;
+
+        const sealed = this.listSegments().filter(seq => seq < this.activeSeq);
+        if (sealed.length >= COMPACT_MIN_SEGMENTS && !this.compacting) {
+            this.compacting = this.compact()
+                .catch(error => console.error('Results log compaction failed:', error))
+                .finally(() => { this.compacting = null; });
+        }
+    }
+
+    // Merge all sealed segments into the lowest one; resolves with the
+    // number of results merged
+    async compact() {
+        const sealed = this.listSegments().filter(seq => seq < this.activeSeq);
+        if (sealed.length < 2) return 0;
+
+        const target = this.segmentPath(sealed[0]);
+        const tmpFile = target + '.tmp';
+        const handle = await fs.promises.open(tmpFile, 'w');
+        let merged = 0;
+
+        try {
+            for (const seq of sealed) {
+                let lines = [];
+                for await (const record of this.records(this.segmentPath(seq))) {
+                    lines.push(JSON.stringify(record) + '\n');
+                    merged++;
+                    if (lines.length >= COMPACT_BATCH_LINES) {
+                        await handle.writeFile(lines.join(''), 'utf8');
+                        lines = [];
+                    }
+                }
+                if (lines.length > 0) {
+                    await handle.writeFile(lines.join(''), 'utf8');
+                }
+            }
+            await handle.sync();
+        } catch (error) {
+            await handle.close();
+            await fs.promises.unlink(tmpFile).catch(() => {});
+            throw error;
+        }
+        await handle.close();
+
+        // Swap in the merged copy without yielding, so every stream starts
+        // either before (on the old segments) or after (on the new ones)
+        const intentPath = path.join(this.dir, INTENT_FILE);
+        writeFileDurable(intentPath, JSON.stringify({ target: sealed[0], sources: sealed, legacy: false }));
+        fs.renameSync(tmpFile, target);
+        const files = sealed.slice(1).map(seq => {
+            const retired = this.segmentPath(seq) + RETIRED_SUFFIX;
+            fs.renameSync(this.segmentPath(seq), retired);
+            return retired;
+        });
+        fs.unlinkSync(intentPath);
+        this.retired.push({ generation: this.generation++, files });
+        this.deleteRetired();
+
+        console.log(`Results log: compacted ${sealed.length} segments (${merged} results)`);
+        return merged;
+    }
+
+    // Delete segments replaced by merges once no stream started before
+    // the merge is reading them
+    deleteRetired() {
+        const oldest = this.readers.size > 0 ? Math.min(...this.readers.keys()) : this.generation;
+        while (this.retired.length > 0 && this.retired[0].generation < oldest) {
+            for (const file of this.retired.shift().files) {
+                fs.unlink(file, (error) => {
+                    if (error) console.error('Results log: could not delete', path.basename(file), error.message);
+                });
+            }
+        }
+    }
+
+    // Items of the legacy results.json, parsed one at a time as the file is
+    // read instead of all at once
+    async *legacyRecords() {
+        if (!this.legacyFile || !fs.existsSync(this.legacyFile)) return;
+        const input = fs.createReadStream(this.legacyFile, { encoding: 'utf8' });
+        const parse = (text) => {
+            text = text.trim();
+            if (!text) return [];
+            try {
+                return [JSON.parse(text)];
+            } catch (error) {
+                console.error('Error reading legacy results file: skipping an unreadable result');
+                return [];
+            }
+        };
+        let depth = 0;
+        let inString = false;
+        let escaped = false;
+        let item = null; // Text of the current item so far (null: not in the array)
+        let first = true;
+
+        try {
+            for await (let chunk of input) {
+                if (first) {
+                    chunk = chunk.replace(/^\uFEFF/, '');
+                    first = false;
+                }
+                let start = item !== null ? 0 : -1;
+                for (let i = 0; i < chunk.length; i++) {
+                    const char = chunk[i];
+                    if (inString) {
+                        if (escaped) escaped = false;
+                        else if (char === '\\') escaped = true;
+                        else if (char === '"') inString = false;
+                    } else if (char === '"') {
+                        inString = true;
+                    } else if (char === '[' || char === '{') {
+                        if (depth++ === 0) {
+                            if (char !== '[') {
+                                console.error('Error reading legacy results file: not a JSON array', this.legacyFile);
+                                return;
+                            }
+                            item = '';
+                            start = i + 1;
+                        }
+                    } else if (char === ']' || char === '}') {
+                        if (--depth === 0) {
+                            yield* parse(item + chunk.slice(start, i));
+                            return; // End of the array
+                        }
+                    } else if (char === ',' && depth === 1) {
+                        yield* parse(item + chunk.slice(start, i));
+                        item = '';
+                        start = i + 1;
+                    }
+                }
+                if (item !== null) item += chunk.slice(start);
+            }
+        } finally {
+            input.destroy();
+        }
+    }
+
+    // Records of a segment file (or of an open fd of it, which is closed
+    // when done), read line by line
+    async *records(filepath, fd = null) {
+        const input = fs.createReadStream(filepath, { fd, encoding: 'utf8' });
+        const lines = readline.createInterface({ input, crlfDelay: Infinity });
+        try {
+            for await (const line of lines) {
+                if (!line) continue;
+                let record;
+                try {
+                    record = JSON.parse(line);
+                } catch (error) {
+                    console.error('Results log: skipping unreadable line in', path.basename(filepath));
+                    continue;
+                }
+                yield record;
+            }
+        } finally {
+            lines.close();
+            input.destroy();
+        }
+    }
+
+    // Open every segment there is now. A segment merged away by another
+    // process (a cluster owner) between listing and opening: list again.
+    openSegments() {
+        for (;;) {
+            const opened = [];
+            try {
+                for (const seq of this.listSegments()) {
+                    opened.push({ seq, fd: fs.openSync(this.segmentPath(seq), 'r') });
+                }
+                return opened;
+            } catch (error) {
+                opened.forEach(({ fd }) => fs.closeSync(fd));
+                if (error.code !== 'ENOENT') throw error;
+            }
+        }
+    }
+
+    // All results, oldest first, read line by line so callers that stream
+    // (exports) never hold the whole log in memory. Stopping early (break)
+    // closes the files.
+    async *stream() {
+        const generation = this.generation;
+        this.readers.set(generation, (this.readers.get(generation) || 0) + 1);
+        const segments = this.openSegments();
+        try {
+            yield* this.legacyRecords();
+            while (segments.length > 0) {
+                const { seq, fd } = segments.shift();
+                yield* this.records(this.segmentPath(seq), fd);
+            }
+        } finally {
+            segments.forEach(({ fd }) => fs.close(fd, () => {}));
+            const left = this.readers.get(generation) - 1;
+            if (left > 0) {
+                this.readers.set(generation, left);
+            } else {
+                this.readers.delete(generation);
+                this.deleteRetired();
+            }
+        }
+    }
+
+    close() {
+        if (this.fd !== null) {
+            fs.closeSync(this.fd);
+            this.fd = null;
+        }
+    }
+}
+
+module.exports = { ResultsStore, SEGMENT_MAX_BYTES, INTENT_FILE, segmentName };
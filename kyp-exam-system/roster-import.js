@@ -0,0 +1,195 @@
+const { normalizeEmail, normalizeMobile } = require('./student-index');
+
+// Bulk roster import: POST /api/admin/students/import
+//
+// A centre's student list (CSV, or XLSX saved from Excel) is registered in
+// one go before the exam, instead of every student filling in the
+// registration form at the start bell. The first row names the columns;
+// these are recognised, in any order and case:
+//
+//   name      Name, Student Name, Full Name, Candidate Name
+//   email     Email, Email ID, E-mail, Email Address
+//   mobile    Mobile, Mobile No, Phone, Phone Number, Contact
+//   subject   Subject, Subject ID, Exam, Course   (optional)
+//
+// The subject may be given by id or by name; a row without one gets the
+// subject chosen for the whole upload, if any, and otherwise can be used for
+// any exam. Rows are checked against the roster's email and mobile indexes
+// (see student-index.js) and against the rows before them, so importing the
+// same file twice adds nobody. Every new student is written in one batch.
+//
+// Imported students are marked preRegistered: when one of them registers
+// for an exam with the same email and mobile, POST /api/register hands back
+// their id without writing anything (see server.js). import-roster.py does
+// the same offline.
+
+const MAX_ROWS = parseInt(process.env.KYP_ROSTER_MAX_ROWS) || 20000;
+
+const COLUMNS = {
+    name: ['name', 'studentname', 'fullname', 'candidatename'],
+    email: ['email', 'emailid', 'emailaddress', 'mail'],
+    mobile: ['mobile', 'mobileno', 'mobilenumber', 'phone', 'phoneno', 'phonenumber', 'contact', 'contactno'],
+    subject: ['subject', 'subjectid', 'exam', 'course']
+};
+
+function rosterError(message) {
+    const error = new Error(message);
+    error.code = 'BAD_ROSTER';
+    return error;
+}
+
+// Rows of a CSV file (quoted fields may hold commas, quotes and line breaks)
+function parseCsv(text) {
+    const rows = [];
+    let row = [];
+    let field = '';
+    let quoted = false;
+
+    for (let i = 0; i < text.length; i++) {
+        const char = text[i];
+        if (quoted) {
+            if (char === '"' && text[i + 1] === '"') {
+                field += '"';
+                i++;
+            } else if (char === '"') {
+                quoted = false;
+            } else {
+                field += char;
+            }
+        } else if (char === '"') {
+            quoted = true;
+        } else if (char === ',') {
+            row.push(field);
+            field = '';
+        } else if (char === '\n' || char === '\r') {
+            if (char === '\r' && text[i + 1] === '\n') i++;
+            row.push(field);
+            rows.push(row);
+            row = [];
+            field = '';
+        } else {
+            field += char;
+        }
+    }
+    if (field !== '' || row.length > 0) {
+        row.push(field);
+        rows.push(row);
+    }
+    return rows;
+}
+
+// Rows of the first worksheet of an XLSX file
+async function parseXlsx(buffer) {
+    const ExcelJS = require('exceljs'); // Loaded with the first import, not at startup
+    const workbook = new ExcelJS.Workbook();
+    await workbook.xlsx.load(buffer);
+    const sheet = workbook.worksheets[0];
+    if (!sheet) return [];
+
+    const rows = [];
+    sheet.eachRow({ includeEmpty: true }, (sheetRow, number) => {
+        const row = [];
+        // cell.text gives what Excel shows, also for numbers, links and rich text
+        sheetRow.eachCell({ includeEmpty: true }, (cell, column) => {
+            row[column - 1] = cell.text;
+        });
+        rows[number - 1] = Array.from(row, value => value === undefined ? '' : value);
+    });
+    return Array.from(rows, row => row || []);
+}
+
+// Roster rows as { line, name, email, mobile, subject }; throws a
+// BAD_ROSTER error if the file can't be used
+async function readRoster(buffer, filename) {
+    let table;
+    if (/\.xlsx$/i.test(filename)) {
+        table = await parseXlsx(buffer);
+    } else if (/\.csv$/i.test(filename)) {
+        table = parseCsv(buffer.toString('utf8').replace(/^\uFEFF/, ''));
+    } else {
+        throw rosterError('Only CSV and XLSX rosters are supported');
+    }
+
+    const header = (table[0] || []).map(title => String(title).toLowerCase().replace(/[^a-z]/g, ''));
+    const columns = {};
+    for (const [field, titles] of Object.entries(COLUMNS)) {
+        const index = header.findIndex(title => titles.includes(title));
+        if (index !== -1) columns[field] = index;
+    }
+    const missing = ['name', 'email', 'mobile'].filter(field => columns[field] === undefined);
+    if (missing.length > 0) {
+        throw rosterError(`Roster has no ${missing.join(', ')} column (first row must hold the column names)`);
+    }
+    if (table.length - 1 > MAX_ROWS) {
+        throw rosterError(`Roster has more than ${MAX_ROWS} rows`);
+    }
+
+    const rows = [];
+    for (let i = 1; i < table.length; i++) {
+        const cells = table[i];
+        const value = field => columns[field] === undefined ? '' : String(cells[columns[field]] || '').trim();
+        const row = { line: i + 1, name: value('name'), email: value('email'), mobile: value('mobile'), subject: value('subject') };
+        if (row.name || row.email || row.mobile) rows.push(row); // Blank lines
+    }
+    return rows;
+}
+
+// Split roster rows into new students and skipped rows ({ line, reason }).
+// index: the StudentIndex of the current roster; nextId: () => a new id
+function planImport(rows, { index, subjects = [], defaultSubject = '', nextId, now = new Date() }) {
+    const subjectIds = new Map();
+    for (const subject of subjects) {
+        subjectIds.set(String(subject.id).toLowerCase(), subject.id);
+        if (subject.name) subjectIds.set(String(subject.name).trim().toLowerCase(), subject.id);
+    }
+
+    const emails = new Set();   // Seen earlier in this file
+    const mobiles = new Set();
+    const students = [];
+    const skipped = [];
+    const registrationTime = now.toISOString();
+
+    for (const row of rows) {
+        const email = normalizeEmail(row.email);
+        const mobile = normalizeMobile(row.mobile);
+        let reason = null;
+        let subject = defaultSubject;
+
+        if (!row.name || !email || !mobile) {
+            reason = 'Name, email and mobile are required';
+        } else if (!email.includes('@')) {
+            reason = 'Invalid email';
+        } else if (row.subject && !subjectIds.has(row.subject.toLowerCase())) {
+            reason = `Unknown subject "${row.subject}"`;
+        } else if (emails.has(email) && mobiles.has(mobile)) {
+            reason = 'Listed more than once';
+        } else if (index.findByContact(email, mobile).length > 0) {
+            reason = 'Already registered';
+        } else if (emails.has(email) || index.hasEmail(email)) {
+            reason = 'Email already used by another student';
+        } else if (mobiles.has(mobile) || index.hasMobile(mobile)) {
+            reason = 'Mobile already used by another student';
+        }
+
+        if (reason) {
+            skipped.push({ line: row.line, reason });
+            continue;
+        }
+        if (row.subject) subject = subjectIds.get(row.subject.toLowerCase());
+
+        emails.add(email);
+        mobiles.add(mobile);
+        students.push({
+            id: nextId(),
+            name: row.name,
+            email: row.email,
+            mobile: row.mobile,
+            subject,
+            registrationTime,
+            preRegistered: true
+        });
+    }
+    return { students, skipped };
+}
+
+module.exports = { readRoster, planImport };
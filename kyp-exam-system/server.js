@@ -1,32 +1,66 @@
 const express = require('express');
-const ExcelJS = require('exceljs');
 const fs = require('fs');
 const path = require('path');
-const multer = require('multer');
-const pdfParse = require('pdf-parse');
-const mammoth = require('mammoth');
+const { Readable, pipeline } = require('stream');
+const { ResultsStore } = require('./results-store');
+const { QuestionBank, addUploadedQuestions } = require('./question-bank');
+const { StudentIndex } = require('./student-index');
+const { gradeAnswers } = require('./grading');
+const { JSONStorage } = require('./storage');
+const { IngestPool } = require('./ingest-pool');
+const { ResultsAnalytics } = require('./results-analytics');
+const { LogStore } = require('./log-store');
+const { StaticAssets } = require('./static-assets');
+const { CheckpointStore } = require('./checkpoint-store');
+const { PaperSets, LANGUAGES: PAPER_LANGUAGES } = require('./paper-sets');
+const { DuplicateIndex } = require('./duplicate-index');
+const { QuestionSearch } = require('./question-search');
+const { QuestionVersions } = require('./question-versions');
+const { LiveEvents } = require('./live-events');
+const { SnapshotStore, batched, scheduleSnapshots } = require('./snapshot-store');
+const { BootCache } = require('./boot-cache');
+const { ImageStore } = require('./image-store');
+const { IdGenerator, processNode } = require('./id-generator');
+const { readRoster, planImport } = require('./roster-import');
+const metricsLib = require('./metrics');
+const {
+    OwnerChannel,
+    ClusterStorage,
+    ResultsClient,
+    LogClient,
+    IngestClient,
+    CheckpointClient,
+    SnapshotClient,
+    VersionsClient,
+    LiveClient
+} = require('./cluster-client');
+const {
+    RESULT_COLUMNS,
+    resultRow,
+    studentField,
+    parseResultFilter,
+    matchesFilter,
+    streamResultsWorkbook
+} = require('./results-export');
 const app = express();
-const PORT = 8080;
+const PORT = parseInt(process.env.PORT) || 8080;
 
-// Server logs storage (in-memory for now)
-const serverLogs = [];
-const MAX_LOGS = 1000; // Keep last 1000 logs
+// Started by cluster.js: one of several HTTP workers, and all saving is done
+// by the storage owner process (see cluster-client.js)
+const owner = process.env.KYP_CLUSTER_WORKER === '1' && process.send ? new OwnerChannel() : null;
+
+// Server logs (see log-store.js), kept on disk in data/logs
+const serverLogs = owner ? new LogClient(owner) : new LogStore(path.join(__dirname, 'data', 'logs'));
+
+// Live events for admin tabs (see live-events.js)
+const liveEvents = owner ? new LiveClient(owner) : new LiveEvents();
 
 // Custom logging function
 function logToConsole(type, message, data = null) {
-    const timestamp = new Date().toISOString();
-    const logEntry = {
-        timestamp,
-        type, // 'info', 'error', 'warn', 'success', 'delete'
-        message,
-        data: data ? JSON.stringify(data, null, 2) : null
-    };
-    
-    // Add to in-memory logs
-    serverLogs.push(logEntry);
-    if (serverLogs.length > MAX_LOGS) {
-        serverLogs.shift(); // Remove oldest log
-    }
+    // 'info', 'error', 'warn', 'success', 'delete'
+    const entry = serverLogs.add(type, message, data);
+    // In cluster mode the owner publishes the entries it stores
+    if (!owner) liveEvents.publish('log', serverLogs.format(entry));
     
     // Also log to console
     const emoji = {
@@ -43,31 +77,28 @@ function logToConsole(type, message, data = null) {
     }
 }
 
-// Override console.log for delete operations
-const originalConsoleLog = console.log;
-console.log = function(...args) {
-    originalConsoleLog.apply(console, args);
-    
-    // Capture DELETE ALL logs
-    const message = args.join(' ');
-    if (message.includes('[DELETE ALL]')) {
-        const logType = message.includes('Successfully') ? 'success' : 
-                       message.includes('Error') || message.includes('Failed') ? 'error' : 'info';
-        serverLogs.push({
-            timestamp: new Date().toISOString(),
-            type: logType,
-            message: message,
-            data: null
-        });
-        if (serverLogs.length > MAX_LOGS) {
-            serverLogs.shift();
-        }
+// Pages and assets of public/, precompressed in memory (see static-assets.js)
+const PUBLIC_DIR = path.join(__dirname, 'public');
+const staticAssets = new StaticAssets(PUBLIC_DIR);
+
+function sendPublicFile(req, res, name) {
+    if (!staticAssets.send(req, res, '/' + name)) {
+        res.sendFile(path.join(PUBLIC_DIR, name));
     }
-};
+}
+
+// Runtime metrics for GET /api/admin/metrics (see metrics.js)
+const metrics = new metricsLib.Registry();
+metricsLib.processMetrics(metrics);
 
 // Middleware
-app.use(express.json());
-app.use(express.static('public'));
+app.use(metricsLib.httpMetrics(metrics));
+app.use(metricsLib.timeMiddleware(
+    metrics.histogram('kyp_http_body_parse_seconds', 'Time to receive and parse a JSON request body'),
+    express.json()
+));
+app.use(staticAssets.middleware());
+app.use(express.static(PUBLIC_DIR));
 
 // Request logging middleware
 app.use((req, res, next) => {
@@ -79,404 +110,123 @@ app.use((req, res, next) => {
     next();
 });
 
-// Set UTF-8 encoding for all responses
+// Set UTF-8 encoding for API responses (pages and assets get theirs from
+// the static file handlers)
 app.use((req, res, next) => {
     if (req.path.startsWith('/api/')) {
         res.setHeader('Content-Type', 'application/json; charset=utf-8');
-    } else {
-        res.setHeader('Content-Type', 'text/html; charset=utf-8');
     }
     next();
 });
 
-// Multer configuration for file uploads
-const storage = multer.diskStorage({
-    destination: function (req, file, cb) {
-        const uploadDir = path.join(__dirname, 'uploads');
-        if (!fs.existsSync(uploadDir)) {
-            fs.mkdirSync(uploadDir, { recursive: true });
+// Multer configuration for file uploads. multer is loaded with the first
+// upload, not at startup.
+let upload = null;
+
+function createUpload() {
+    const multer = require('multer');
+    const storage = multer.diskStorage({
+        destination: function (req, file, cb) {
+            const uploadDir = path.join(__dirname, 'uploads');
+            if (!fs.existsSync(uploadDir)) {
+                fs.mkdirSync(uploadDir, { recursive: true });
+            }
+            cb(null, uploadDir);
+        },
+        filename: function (req, file, cb) {
+            cb(null, Date.now() + '-' + file.originalname);
         }
-        cb(null, uploadDir);
-    },
-    filename: function (req, file, cb) {
-        cb(null, Date.now() + '-' + file.originalname);
-    }
-});
+    });
 
-const upload = multer({
-    storage: storage,
-    fileFilter: (req, file, cb) => {
-        // Allow PDF and DOC/DOCX files
-        if (file.mimetype === 'application/pdf' || 
-            file.mimetype === 'application/vnd.openxmlformats-officedocument.wordprocessingml.document' ||
-            file.mimetype === 'application/msword') {
-            cb(null, true);
-        } else {
-            cb(new Error('Only PDF and DOC/DOCX files are allowed!'), false);
+    return multer({
+        storage: storage,
+        fileFilter: (req, file, cb) => {
+            // Allow PDF and DOC/DOCX files
+            if (file.mimetype === 'application/pdf' || 
+                file.mimetype === 'application/vnd.openxmlformats-officedocument.wordprocessingml.document' ||
+                file.mimetype === 'application/msword') {
+                cb(null, true);
+            } else {
+                cb(new Error('Only PDF and DOC/DOCX files are allowed!'), false);
+            }
+        },
+        limits: {
+            fileSize: 10 * 1024 * 1024 // 10MB limit
         }
-    },
-    limits: {
-        fileSize: 10 * 1024 * 1024 // 10MB limit
-    }
-});
+    });
+}
+
+// Middleware for a single uploaded file
+function uploadFile(field) {
+    return (req, res, next) => {
+        if (!upload) upload = createUpload();
+        upload.single(field)(req, res, next);
+    };
+}
+
+// Student rosters (CSV/XLSX) are parsed straight from memory
+let rosterUpload = null;
+
+function uploadRoster(field) {
+    return (req, res, next) => {
+        if (!rosterUpload) {
+            const multer = require('multer');
+            rosterUpload = multer({
+                storage: multer.memoryStorage(),
+                fileFilter: (req, file, cb) => {
+                    // Checked by name: browsers send CSV as several different types
+                    if (/\.(csv|xlsx)$/i.test(file.originalname)) {
+                        cb(null, true);
+                    } else {
+                        cb(new Error('Only CSV and XLSX files are allowed!'), false);
+                    }
+                },
+                limits: {
+                    fileSize: 5 * 1024 * 1024 // 5MB limit
+                }
+            });
+        }
+        rosterUpload.single(field)(req, res, (error) => {
+            if (error) return res.status(400).json({ error: error.message });
+            next();
+        });
+    };
+}
 
 // Data paths
 const DATA_DIR = path.join(__dirname, 'data');
 const SUBJECTS_FILE = path.join(DATA_DIR, 'subjects.json');
 const QUESTIONS_FILE = path.join(DATA_DIR, 'questions.json');
 const STUDENTS_FILE = path.join(DATA_DIR, 'students.json');
-const RESULTS_FILE = path.join(DATA_DIR, 'results.json');
+const RESULTS_FILE = path.join(DATA_DIR, 'results.json'); // Legacy, read until migrated
+const RESULTS_DIR = path.join(DATA_DIR, 'results');
 const ADMIN_FILE = path.join(DATA_DIR, 'admin.json');
+const CHECKPOINTS_DIR = path.join(DATA_DIR, 'checkpoints');
+const SNAPSHOTS_DIR = path.join(DATA_DIR, 'snapshots');
+const VERSIONS_DIR = path.join(DATA_DIR, 'question-versions');
+const PROFILES_DIR = path.join(DATA_DIR, 'profiles');
+const IMAGES_DIR = path.join(DATA_DIR, 'images');
 
-// Question parsing functions
+// Append-only results log (see results-store.js)
+const resultsStore = owner ? new ResultsClient(owner, RESULTS_DIR, RESULTS_FILE) : new ResultsStore(RESULTS_DIR, RESULTS_FILE);
 
-// Function to normalize Hindi text from different fonts/encodings
-function normalizeHindiText(text) {
-    if (!text) return '';
-    
-    // Ensure the text is properly decoded as UTF-8
-    // This helps with Mangal, Devanagari Unicode fonts
-    try {
-        // Normalize Unicode characters (NFC normalization)
-        text = text.normalize('NFC');
-        
-        // Remove any zero-width characters that might cause issues
-        text = text.replace(/[\u200B-\u200D\uFEFF]/g, '');
-        
-        // Normalize common Hindi punctuation variations
-        text = text.replace(/।/g, '।'); // Devanagari Danda
-        text = text.replace(/॥/g, '॥'); // Devanagari Double Danda
-        
-        // Handle any BOMs or special markers
-        text = text.replace(/^\uFEFF/, '');
-        
-        // Normalize whitespace but preserve structure
-        text = text.replace(/\r\n/g, '\n');
-        text = text.replace(/\r/g, '\n');
-        
-        // Remove excessive spaces but keep single spaces
-        text = text.replace(/[ \t]+/g, ' ');
-        
-        // Preserve line breaks for structure
-        text = text.replace(/\n{3,}/g, '\n\n');
-        
-    } catch (error) {
-        console.error('Text normalization error:', error);
-    }
-    
-    return text;
-}
+// Question bank versions that results are graded against (see
+// question-versions.js)
+const questionVersions = owner ? new VersionsClient(owner, VERSIONS_DIR) : new QuestionVersions(VERSIONS_DIR);
 
-function parseNumberedQuestions(text, language) {
-    const questions = [];
-    
-    // Strategy: Split text into segments by question numbers
-    // Handle both multi-line and inline formats
-    
-    // First, normalize the text - replace common inline separators
-    let normalizedText = text
-        .replace(/Answer:\s*[A-D]/gi, '') // Remove Answer: A/B/C/D markers
-        .replace(/\r\n/g, '\n')
-        .replace(/\r/g, '\n');
-    
-    // Split by question numbers (1. 2. 3. etc.)
-    const questionSegments = normalizedText.split(/(?=\d+[\.\)]\s)/);
-    
-    for (let segment of questionSegments) {
-        segment = segment.trim();
-        if (segment.length < 10) continue;
-        
-        // Extract question number and text
-        const questionMatch = segment.match(/^(\d+)[\.\)]\s*(.+)$/s);
-        if (!questionMatch) continue;
-        
-        const questionNumber = questionMatch[1];
-        let remainingText = questionMatch[2].trim();
-        
-        // Try to extract options from the text
-        // Pattern: A) text B) text C) text D) text
-        // Or: A. text B. text C. text D. text
-        // Or even: AतextBतextCतextDtext (no separators)
-        
-        const options = [];
-        let questionText = '';
-        
-        // Try to split by the pattern A) B) C) D)
-        // Look for: A) text B) text C) text D) text
-        const optionSplitPattern = /([A-D])\s*\)\s*/gi;
-        
-        // First, find where options start
-        const firstOptionMatch = remainingText.match(/([A-D])\s*\)/i);
-        
-        if (firstOptionMatch) {
-            const firstOptionIndex = remainingText.indexOf(firstOptionMatch[0]);
-            
-            // Everything before first option is question text
-            if (firstOptionIndex > 0) {
-                questionText = remainingText.substring(0, firstOptionIndex).trim();
-                // Ensure question ends with ?
-                if (!questionText.endsWith('?')) {
-                    questionText += '?';
-                }
-            }
-            
-            // Get the options part
-            const optionsText = remainingText.substring(firstOptionIndex);
-            
-            // Split by option markers A) B) C) D)
-            const optionParts = optionsText.split(/[A-D]\s*\)/i);
-            
-            // Skip first part (empty) and collect next 4 parts
-            for (let j = 1; j < optionParts.length && options.length < 4; j++) {
-                let optText = optionParts[j].trim();
-                
-                // Remove "Answer: X" markers
-                optText = optText.replace(/Answer\s*:\s*[A-D].*$/i, '').trim();
-                
-                // Stop at next question number
-                const nextQMatch = optText.match(/\d+[\.\)]\s/);
-                if (nextQMatch) {
-                    optText = optText.substring(0, optText.indexOf(nextQMatch[0])).trim();
-                }
-                
-                if (optText.length > 0 && optText.length < 300) {
-                    options.push(optText);
-                }
-            }
-        } else {
-            // No options found, just use text as question
-            questionText = remainingText.split('\n')[0].trim();
-            if (!questionText.endsWith('?')) {
-                questionText += '?';
-            }
-        }
-        
-        // Create question if we have valid data
-        if (questionText.length > 5 && options.length === 4) {
-            questions.push({
-                id: questions.length + 1,
-                question: language === 'en' ? 
-                    { hi: questionText, en: questionText } : 
-                    { hi: questionText, en: questionText },
-                options: language === 'en' ? 
-                    { hi: options, en: options } : 
-                    { hi: options, en: options },
-                correct: 0,
-                marks: 1,
-                difficulty: 'medium'
-            });
-            console.log(`✅ Extracted Q${questionNumber}: ${questionText.substring(0, 50)}... with ${options.length} options`);
-        } else {
-            console.log(`⚠️  Question ${questionNumber}: Incomplete - text=${questionText.length}chars, options=${options.length}`);
-        }
-    }
-    
-    return questions;
-}
-
-
-function parseQuestionsFromText(text, language = 'hi') {
-    const questions = [];
-    
-    // Clean and normalize text
-    text = text.replace(/\r\n/g, '\n').replace(/\r/g, '\n');
-    
-    // Try multiple parsing strategies
-    
-    // Strategy 1: Look for "Q1:" or "Q1." patterns followed by numbered questions with options
-    const qBlocks = text.split(/Q\d+:/i);
-    
-    for (let i = 1; i < qBlocks.length; i++) {
-        const block = qBlocks[i].trim();
-        if (block.length < 10) continue;
-        
-        // Parse this Q block which may contain multiple numbered questions
-        const numberedQuestions = parseNumberedQuestions(block, language);
-        questions.push(...numberedQuestions);
-    }
-    
-    // Strategy 2: If no Q blocks found, split by question numbers (1., 2., etc.)
-    if (questions.length === 0) {
-        const numberedQuestions = parseNumberedQuestions(text, language);
-        questions.push(...numberedQuestions);
-    }
-    
-    // Strategy 3: If no questions found, try splitting by double newlines
-    if (questions.length === 0) {
-        const blocks = text.split(/\n\s*\n/);
-        for (let i = 0; i < blocks.length; i++) {
-            const block = blocks[i].trim();
-            if (block.length < 20) continue;
-            
-            const questionData = extractQuestionParts(block, i + 1, language);
-            if (questionData) {
-                questions.push(questionData);
-            }
-        }
-    }
-    
-    // Strategy 4: If still no questions, try line-by-line with option detection
-    if (questions.length === 0) {
-        const lines = text.split('\n');
-        let currentQuestion = '';
-        let currentOptions = [];
-        let questionCount = 0;
-        
-        for (let i = 0; i < lines.length; i++) {
-            const line = lines[i].trim();
-            if (!line) continue;
-            
-            // Check if line is an option (A), B), a), etc.)
-            const optionMatch = line.match(/^[(\[]?([A-Da-d])[\])][\.\):]?\s*(.+)$/);
-            if (optionMatch && currentQuestion) {
-                currentOptions.push(optionMatch[2].trim());
-                
-                // If we have 4 options, create a question
-                if (currentOptions.length === 4) {
-                    questionCount++;
-                    questions.push({
-                        id: questionCount,
-                        question: language === 'en' ? 
-                            { hi: currentQuestion, en: currentQuestion } : 
-                            { hi: currentQuestion, en: currentQuestion },
-                        options: language === 'en' ? 
-                            { hi: currentOptions, en: currentOptions } : 
-                            { hi: currentOptions, en: currentOptions },
-                        correct: 0,
-                        marks: 1,
-                        difficulty: 'medium'
-                    });
-                    currentQuestion = '';
-                    currentOptions = [];
-                }
-            } else if (line.length > 10 && !optionMatch) {
-                // This might be a question text
-                if (currentQuestion) {
-                    currentQuestion += ' ' + line;
-                } else {
-                    currentQuestion = line;
-                }
-            }
-        }
-    }
-    
-    return questions;
-}
+// Per-subject and per-question aggregates, updated on every submit
+const resultsAnalytics = new ResultsAnalytics({ details: result => questionVersions.details(result) });
+resultsStore.on('append', (result) => resultsAnalytics.add(result));
 
-function extractQuestionParts(text, id, language) {
-    // Clean the text - remove question number prefix
-    text = text.replace(/^(?:Q|à¤ªà¥à¤°|à¤ªà¥à¤°à¤¶à¥à¤¨|Question)?\s*[\.\):]?\s*\d+[\.\):]?\s*/i, '').trim();
-    
-    // Extended option patterns to match more formats
-    // Extended option patterns to match more formats
-    // Support for Devanagari, Mangal, Kruti Dev, and all Hindi fonts
-    const optionPatterns = [
-        /^([A-D])\)\s*([^\n]+)/gm,                    // A) Option
-        /^\(([A-D])\)\s*([^\n]+)/gm,                  // (A) Option
-        /^\[([A-D])\]\s*([^\n]+)/gm,                  // [A] Option
-        /^\{([A-D])\}\s*([^\n]+)/gm,                  // {A} Option
-        /^([A-D])[\.\:]\s*([^\n]+)/gm,                // A. Option or A: Option
-        /^([abcd])\)\s*([^\n]+)/gm,                   // a) Option
-        /^\(([abcd])\)\s*([^\n]+)/gm,                 // (a) Option
-        /^([०-९१-४])\)\s*([^\n]+)/gm,                 // Hindi numerals (Devanagari)
-        /^([१-४])\)\s*([^\n]+)/gm,                    // Hindi numerals 1-4
-        /^विकल्प\s*([A-D])[:\.\)]\s*([^\n]+)/gm,       // विकल्प A) Option
-        /^Option\s*([A-D])[:\.\)]\s*([^\n]+)/gm,      // Option A) text
-        /^([A-D])[\)\.\:][\s\u00A0\u200B]+([^\n]+)/gm // With special spaces
-    ];
-    
-    let questionText = '';
-    let options = [];
-    let correctAnswer = 0;
-    
-    // Try each pattern
-    for (const pattern of optionPatterns) {
-        pattern.lastIndex = 0; // Reset regex
-        const optionMatches = [...text.matchAll(pattern)];
-        
-        if (optionMatches.length >= 2) {
-            // Find where first option starts
-            const firstOptionIndex = text.search(pattern);
-            questionText = text.substring(0, firstOptionIndex).trim();
-            
-            // Extract option texts
-            options = optionMatches.map(match => match[2].trim());
-            
-            // Look for answer indication (more flexible patterns)
-            const answerPatterns = [
-                /(?:à¤‰à¤¤à¥à¤¤à¤°|Answer|Ans|Correct|à¤¸à¤¹à¥€ à¤‰à¤¤à¥à¤¤à¤°)[\s:]*([A-Da-dà¥§-à¥ª])/i,
-                /(?:Answer|à¤‰à¤¤à¥à¤¤à¤°)[\s:]*[\(\[]?([A-Da-d])[\)\]]?/i,
-                /\*\*([A-Da-d])\*\*/,  // **A** format
-                /\b([A-D])\s*(?:is|à¤¹à¥ˆ)\s*(?:correct|à¤¸à¤¹à¥€)/i
-            ];
-            
-            for (const ansPattern of answerPatterns) {
-                const answerMatch = text.match(ansPattern);
-                if (answerMatch) {
-                    let answerLetter = answerMatch[1].toUpperCase();
-                    // Handle Hindi numerals
-                    if (answerLetter === 'à¥§') answerLetter = 'A';
-                    else if (answerLetter === 'à¥¨') answerLetter = 'B';
-                    else if (answerLetter === 'à¥©') answerLetter = 'C';
-                    else if (answerLetter === 'à¥ª') answerLetter = 'D';
-                    
-                    correctAnswer = Math.min(answerLetter.charCodeAt(0) - 'A'.charCodeAt(0), options.length - 1);
-                    break;
-                }
-            }
-            
-            break;
-        }
-    }
-    
-    // Fallback: If no structured options found, try line-by-line
-    if (options.length === 0) {
-        const lines = text.split('\n').map(line => line.trim()).filter(line => line.length > 0);
-        if (lines.length >= 3) {
-            questionText = lines[0];
-            // Take next lines as options (up to 4)
-            for (let i = 1; i < lines.length && options.length < 4; i++) {
-                const line = lines[i];
-                // Skip lines that look like metadata
-                if (line.length > 3 && line.length < 200 && 
-                    !line.match(/^(?:Answer|à¤‰à¤¤à¥à¤¤à¤°|Marks|à¤…à¤‚à¤•|Difficulty)/i)) {
-                    // Remove any leading symbols/numbers
-                    const cleanLine = line.replace(/^[\d\.\)\(\[\]]+\s*/, '').trim();
-                    if (cleanLine.length > 2) {
-                        options.push(cleanLine);
-                    }
-                }
-            }
-        }
-    }
-    
-    // Validate we have minimum required parts
-    if (!questionText || questionText.length < 5 || options.length < 2) {
-        return null;
-    }
-    
-    // Create question object with bilingual support
-    const questionObj = {
-        id: id,
-        question: language === 'en' ? 
-            { hi: questionText, en: questionText } : 
-            { hi: questionText, en: questionText },
-        options: language === 'en' ? 
-            { hi: options, en: options } : 
-            { hi: options, en: options },
-        correct: correctAnswer,
-        marks: 1,
-        difficulty: 'medium'
-    };
-    
-    return questionObj;
-}
+// Answers saved while an exam is in progress (see checkpoint-store.js)
+const checkpoints = owner ? new CheckpointClient(owner) : new CheckpointStore(CHECKPOINTS_DIR);
 
 // Initialize data files if they don't exist
 function initializeData() {
     if (!fs.existsSync(DATA_DIR)) {
         fs.mkdirSync(DATA_DIR, { recursive: true });
     }
+    dataStore.recover(DATA_DIR);
 
     // Default subjects
     const defaultSubjects = [
@@ -516,7 +266,7 @@ function initializeData() {
             {
                 id: 1,
                 question: {
-                    hi: "à¤•à¤‚à¤ªà¥à¤¯à¥‚à¤Ÿà¤° à¤•à¤¾ à¤ªà¥‚à¤°à¤¾ à¤¨à¤¾à¤® à¤•à¥à¤¯à¤¾ à¤¹à¥ˆ?",
+                    hi: "कंप्यूटर का पूरा नाम क्या है?",
                     en: "What is the full form of COMPUTER?"
                 },
                 options: {
@@ -540,7 +290,7 @@ function initializeData() {
             {
                 id: 2,
                 question: {
-                    hi: "MS Word à¤®à¥‡à¤‚ à¤•à¤¿à¤¸ shortcut key à¤¸à¥‡ Save à¤•à¤°à¤¤à¥‡ à¤¹à¥ˆà¤‚?",
+                    hi: "MS Word में किस shortcut key से Save करते हैं?",
                     en: "Which shortcut key is used to Save in MS Word?"
                 },
                 options: {
@@ -553,7 +303,7 @@ function initializeData() {
             },
             {
                 id: 3,
-                question: "Internet à¤®à¥‡à¤‚ WWW à¤•à¤¾ à¤ªà¥‚à¤°à¤¾ à¤¨à¤¾à¤® à¤•à¥à¤¯à¤¾ à¤¹à¥ˆ?",
+                question: "Internet में WWW का पूरा नाम क्या है?",
                 options: [
                     "World Wide Web",
                     "World Wide Website", 
@@ -568,12 +318,12 @@ function initializeData() {
         'language-skill': [
             {
                 id: 1,
-                question: "à¤¨à¤¿à¤®à¥à¤¨à¤²à¤¿à¤–à¤¿à¤¤ à¤®à¥‡à¤‚ à¤¸à¥‡ à¤•à¥Œà¤¨ à¤¸à¤¾ à¤µà¤¾à¤•à¥à¤¯ à¤¶à¥à¤¦à¥à¤§ à¤¹à¥ˆ?",
+                question: "निम्नलिखित में से कौन सा वाक्य शुद्ध है?",
                 options: [
-                    "à¤®à¥ˆà¤‚ à¤ªà¤¾à¤¨à¥€ à¤ªà¥€à¤¤à¤¾ à¤¹à¥‚à¤",
-                    "à¤®à¥ˆà¤‚ à¤ªà¤¾à¤¨à¥€ à¤ªà¥€à¤¤à¤¾ à¤¹à¥ˆ", 
-                    "à¤®à¥ˆà¤‚ à¤ªà¤¾à¤¨à¥€ à¤ªà¥€à¤¤à¥€ à¤¹à¥‚à¤",
-                    "à¤®à¥ˆà¤‚ à¤ªà¤¾à¤¨à¥€ à¤ªà¥€à¤¤à¥‡ à¤¹à¥ˆà¤‚"
+                    "मैं पानी पीता हूँ",
+                    "मैं पानी पीता है", 
+                    "मैं पानी पीती हूँ",
+                    "मैं पानी पीते हैं"
                 ],
                 correct: 0,
                 marks: 1,
@@ -581,8 +331,8 @@ function initializeData() {
             },
             {
                 id: 2,
-                question: "'à¤…à¤¨à¥à¤°à¤¾à¤—' à¤¶à¤¬à¥à¤¦ à¤•à¤¾ à¤µà¤¿à¤²à¥‹à¤® à¤•à¥à¤¯à¤¾ à¤¹à¥ˆ?",
-                options: ["à¤ªà¥à¤°à¥‡à¤®", "à¤µà¤¿à¤°à¤¾à¤—", "à¤¸à¥à¤¨à¥‡à¤¹", "à¤­à¤•à¥à¤¤à¤¿"],
+                question: "'अनुराग' शब्द का विलोम क्या है?",
+                options: ["प्रेम", "विराग", "स्नेह", "भक्ति"],
                 correct: 1,
                 marks: 1,
                 difficulty: 'medium'
@@ -591,12 +341,12 @@ function initializeData() {
         'soft-skills': [
             {
                 id: 1,
-                question: "Communication Skills à¤•à¤¾ à¤®à¤¤à¤²à¤¬ à¤•à¥à¤¯à¤¾ à¤¹à¥ˆ?",
+                question: "Communication Skills का मतलब क्या है?",
                 options: [
-                    "à¤¬à¤¾à¤¤à¤šà¥€à¤¤ à¤•à¤°à¤¨à¤¾",
-                    "à¤¸à¤‚à¤µà¤¾à¤¦ à¤•à¥Œà¤¶à¤²", 
-                    "à¤«à¥‹à¤¨ à¤ªà¤° à¤¬à¤¾à¤¤ à¤•à¤°à¤¨à¤¾",
-                    "à¤šà¤¿à¤Ÿà¥à¤ à¥€ à¤²à¤¿à¤–à¤¨à¤¾"
+                    "बातचीत करना",
+                    "संवाद कौशल", 
+                    "फोन पर बात करना",
+                    "चिट्ठी लिखना"
                 ],
                 correct: 1,
                 marks: 1,
@@ -604,12 +354,12 @@ function initializeData() {
             },
             {
                 id: 2,
-                question: "Team Work à¤®à¥‡à¤‚ à¤¸à¤¬à¤¸à¥‡ à¤®à¤¹à¤¤à¥à¤µà¤ªà¥‚à¤°à¥à¤£ à¤šà¥€à¤œ à¤•à¥à¤¯à¤¾ à¤¹à¥ˆ?",
+                question: "Team Work में सबसे महत्वपूर्ण चीज क्या है?",
                 options: [
-                    "à¤…à¤•à¥‡à¤²à¥‡ à¤•à¤¾à¤® à¤•à¤°à¤¨à¤¾",
-                    "à¤¸à¤¹à¤¯à¥‹à¤— à¤•à¤°à¤¨à¤¾", 
-                    "à¤•à¥‡à¤µà¤² à¤…à¤ªà¤¨à¤¾ à¤•à¤¾à¤® à¤•à¤°à¤¨à¤¾",
-                    "à¤¦à¥‚à¤¸à¤°à¥‹à¤‚ à¤ªà¤° à¤¨à¤¿à¤°à¥à¤­à¤° à¤°à¤¹à¤¨à¤¾"
+                    "अकेले काम करना",
+                    "सहयोग करना", 
+                    "केवल अपना काम करना",
+                    "दूसरों पर निर्भर रहना"
                 ],
                 correct: 1,
                 marks: 1,
@@ -620,15 +370,15 @@ function initializeData() {
             {
                 id: 1,
                 question: {
-                    hi: "Accounting à¤®à¥‡à¤‚ Debit à¤•à¤¾ à¤®à¤¤à¤²à¤¬ à¤•à¥à¤¯à¤¾ à¤¹à¥ˆ?",
+                    hi: "Accounting में Debit का मतलब क्या है?",
                     en: "What does Debit mean in Accounting?"
                 },
                 options: {
                     hi: [
-                        "à¤¨à¤¾à¤®à¥‡ (à¤¬à¤¾à¤à¤‚ à¤¤à¤°à¤« à¤•à¥€ entry)",
-                        "à¤œà¤®à¤¾ (à¤¦à¤¾à¤à¤‚ à¤¤à¤°à¤« à¤•à¥€ entry)",
-                        "à¤•à¥‡à¤µà¤² à¤–à¤°à¥à¤š",
-                        "à¤•à¥‡à¤µà¤² à¤†à¤¯"
+                        "नामे (बाएं तरफ की entry)",
+                        "जमा (दाएं तरफ की entry)",
+                        "केवल खर्च",
+                        "केवल आय"
                     ],
                     en: [
                         "Left side entry", 
@@ -644,7 +394,7 @@ function initializeData() {
             {
                 id: 2,
                 question: {
-                    hi: "Balance Sheet à¤®à¥‡à¤‚ Assets à¤”à¤° Liabilities à¤•à¤¾ à¤•à¥à¤¯à¤¾ relation à¤¹à¥ˆ?",
+                    hi: "Balance Sheet में Assets और Liabilities का क्या relation है?",
                     en: "What is the relation between Assets and Liabilities in Balance Sheet?"
                 },
                 options: {
@@ -668,14 +418,14 @@ function initializeData() {
             {
                 id: 3,
                 question: {
-                    hi: "Cash Book à¤®à¥‡à¤‚ à¤•à¥Œà¤¨ à¤¸à¥‡ transactions record à¤¹à¥‹à¤¤à¥‡ à¤¹à¥ˆà¤‚?",
+                    hi: "Cash Book में कौन से transactions record होते हैं?",
                     en: "Which transactions are recorded in Cash Book?"
                 },
                 options: {
                     hi: [
-                        "à¤•à¥‡à¤µà¤² cash transactions",
-                        "à¤•à¥‡à¤µà¤² bank transactions",
-                        "Cash à¤”à¤° Bank à¤¦à¥‹à¤¨à¥‹à¤‚ transactions", 
+                        "केवल cash transactions",
+                        "केवल bank transactions",
+                        "Cash और Bank दोनों transactions", 
                         "Credit transactions"
                     ],
                     en: [
@@ -692,15 +442,15 @@ function initializeData() {
             {
                 id: 4,
                 question: {
-                    hi: "Trial Balance à¤¬à¤¨à¤¾à¤¨à¥‡ à¤•à¤¾ à¤®à¥à¤–à¥à¤¯ à¤‰à¤¦à¥à¤¦à¥‡à¤¶à¥à¤¯ à¤•à¥à¤¯à¤¾ à¤¹à¥ˆ?",
+                    hi: "Trial Balance बनाने का मुख्य उद्देश्य क्या है?",
                     en: "What is the main purpose of preparing Trial Balance?"
                 },
                 options: {
                     hi: [
-                        "Profit calculate à¤•à¤°à¤¨à¤¾",
-                        "Accounting errors check à¤•à¤°à¤¨à¤¾",
-                        "Tax calculate à¤•à¤°à¤¨à¤¾",
-                        "Salary calculate à¤•à¤°à¤¨à¤¾"
+                        "Profit calculate करना",
+                        "Accounting errors check करना",
+                        "Tax calculate करना",
+                        "Salary calculate करना"
                     ],
                     en: [
                         "To calculate profit",
@@ -716,7 +466,7 @@ function initializeData() {
             {
                 id: 5,
                 question: {
-                    hi: "GST à¤•à¤¾ à¤ªà¥‚à¤°à¤¾ à¤¨à¤¾à¤® à¤•à¥à¤¯à¤¾ à¤¹à¥ˆ?",
+                    hi: "GST का पूरा नाम क्या है?",
                     en: "What is the full form of GST?"
                 },
                 options: {
@@ -753,39 +503,109 @@ function initializeData() {
         fs.writeFileSync(STUDENTS_FILE, JSON.stringify([], null, 2));
     }
 
-    if (!fs.existsSync(RESULTS_FILE)) {
-        fs.writeFileSync(RESULTS_FILE, JSON.stringify([], null, 2));
-    }
+    resultsStore.open();
+    checkpoints.open();
+    serverLogs.open();
+    snapshots.open();
 }
 
+// Data files are owned by the storage layer (see storage.js): reads come from
+// memory, writes are coalesced and flushed atomically in the background
+const dataStore = owner ? new ClusterStorage(owner) : new JSONStorage();
+const storageMetrics = metricsLib.storageMetrics(metrics, dataStore);
+
 // Helper functions
 function readJSONFile(filepath) {
-    try {
-        const data = fs.readFileSync(filepath, 'utf8');
-        return JSON.parse(data);
-    } catch (error) {
-        console.error('Error reading file:', filepath, error);
-        return null;
-    }
+    storageMetrics.read(filepath);
+    return dataStore.read(filepath);
 }
 
+// Resolves true once the new document is safely on disk
 function writeJSONFile(filepath, data) {
-    try {
-        fs.writeFileSync(filepath, JSON.stringify(data, null, 2), 'utf8');
-        return true;
-    } catch (error) {
-        console.error('Error writing file:', filepath, error);
-        return false;
-    }
+    return storageMetrics.write(filepath, dataStore.write(filepath, data));
+}
+
+// Adds one item to an array file; resolves true once it is on disk
+function appendJSONFile(filepath, item) {
+    return storageMetrics.write(filepath, dataStore.append(filepath, item));
 }
 
-function shuffleArray(array) {
-    const shuffled = [...array];
-    for (let i = shuffled.length - 1; i > 0; i--) {
-        const j = Math.floor(Math.random() * (i + 1));
-        [shuffled[i], shuffled[j]] = [shuffled[j], shuffled[i]];
+// Adds several items in one write
+function appendAllJSONFile(filepath, items) {
+    return storageMetrics.write(filepath, dataStore.appendAll(filepath, items));
+}
+
+// Student and result ids (see id-generator.js)
+const ids = new IdGenerator(processNode());
+
+// Incremental backups of the data files (see snapshot-store.js)
+const snapshots = owner ? new SnapshotClient(owner, SNAPSHOTS_DIR) : new SnapshotStore(SNAPSHOTS_DIR, {
+    storage: dataStore,
+    documents: { subjects: SUBJECTS_FILE, questions: QUESTIONS_FILE, students: STUDENTS_FILE },
+    resultsDir: RESULTS_DIR,
+    legacyResultsFile: RESULTS_FILE,
+    versionsDir: VERSIONS_DIR
+});
+
+dataStore.on('change', (filepath, data) => {
+    if (filepath === QUESTIONS_FILE) {
+        questionBank.invalidate();
+        paperSets.invalidate();
+        questionSearch.update(data);
+        schedulePaperBuild();
+    } else if (filepath === STUDENTS_FILE) {
+        studentIndex.changed(data);
     }
-    return shuffled;
+});
+
+// In-memory question bank, reloaded after any write to questions.json
+const questionBank = new QuestionBank(() => readJSONFile(QUESTIONS_FILE));
+
+// Seeded, precompressed question papers (see paper-sets.js)
+const paperSets = new PaperSets(questionBank);
+
+// Admin search over the question bank (see question-search.js)
+const questionSearch = new QuestionSearch(() => readJSONFile(QUESTIONS_FILE));
+
+// studentId, email and mobile -> student, kept up to date with students.json
+const studentIndex = new StudentIndex(() => readJSONFile(STUDENTS_FILE));
+
+// Papers and compressed pages kept from the previous run (see
+// boot-cache.js); in cluster mode the first worker writes it
+const bootCache = new BootCache(path.join(DATA_DIR, 'boot-cache.bin'));
+const writesBootCache = !owner || require('cluster').worker.id === 1;
+
+// Milliseconds from process start to each startup step
+const startupTimes = { bootCache: null, listening: null, papers: null, staticFiles: null };
+
+metrics.gauge('kyp_startup_seconds', 'Time from process start to each startup step', () =>
+    Object.entries(startupTimes)
+        .filter(([, ms]) => ms !== null)
+        .map(([step, ms]) => ({ labels: { step }, value: ms / 1000 })));
+
+// Rebuild the papers once a burst of question edits is over
+let paperBuildTimer = null;
+function schedulePaperBuild() {
+    clearTimeout(paperBuildTimer);
+    paperBuildTimer = setTimeout(() => {
+        const started = Date.now();
+        paperSets.warm()
+            .then(async sets => {
+                console.log(`📝 ${sets.filter(Boolean).length} question paper sets ready (${Date.now() - started}ms)`);
+                if (startupTimes.papers === null) startupTimes.papers = performance.now();
+                if (!writesBootCache) return;
+                const papers = await paperSets.exportSets();
+                const saved = bootCache.papers();
+                if (!saved || saved.key !== papers.key) await bootCache.save({ papers });
+            })
+            .catch(error => console.error('Error building question papers:', error));
+    }, 500);
+}
+
+// Correct options are only shown on the exam page for subjects that allow it
+function showsAnswers(subjectId) {
+    const subject = (readJSONFile(SUBJECTS_FILE) || []).find(s => s.id === subjectId);
+    return Boolean(subject) && subject.showAnswers !== false;
 }
 
 // Routes
@@ -832,7 +652,7 @@ app.get('/api/admin/security-question', (req, res) => {
 });
 
 // Reset password using security answer
-app.post('/api/admin/reset-password', (req, res) => {
+app.post('/api/admin/reset-password', async (req, res) => {
     try {
         const { securityAnswer, newPassword } = req.body;
         const adminData = readJSONFile(ADMIN_FILE);
@@ -859,7 +679,7 @@ app.post('/api/admin/reset-password', (req, res) => {
         
         if (isCorrect) {
             adminData.password = newPassword;
-            writeJSONFile(ADMIN_FILE, adminData);
+            await writeJSONFile(ADMIN_FILE, adminData);
             res.json({ success: true, message: 'Password reset successfully' });
         } else {
             res.status(401).json({ success: false, error: 'Incorrect security answer' });
@@ -871,7 +691,7 @@ app.post('/api/admin/reset-password', (req, res) => {
 });
 
 // Change password (requires current password)
-app.post('/api/admin/change-password', (req, res) => {
+app.post('/api/admin/change-password', async (req, res) => {
     try {
         const { currentPassword, newPassword } = req.body;
         const adminData = readJSONFile(ADMIN_FILE);
@@ -882,7 +702,7 @@ app.post('/api/admin/change-password', (req, res) => {
         
         if (currentPassword === adminData.password) {
             adminData.password = newPassword;
-            writeJSONFile(ADMIN_FILE, adminData);
+            await writeJSONFile(ADMIN_FILE, adminData);
             res.json({ success: true, message: 'Password changed successfully' });
         } else {
             res.status(401).json({ success: false, error: 'Current password is incorrect' });
@@ -894,7 +714,7 @@ app.post('/api/admin/change-password', (req, res) => {
 });
 
 // Update security question
-app.post('/api/admin/update-security', (req, res) => {
+app.post('/api/admin/update-security', async (req, res) => {
     try {
         const { currentPassword, securityQuestion, securityAnswer } = req.body;
         const adminData = readJSONFile(ADMIN_FILE);
@@ -906,7 +726,7 @@ app.post('/api/admin/update-security', (req, res) => {
         if (currentPassword === adminData.password) {
             adminData.securityQuestion = securityQuestion;
             adminData.securityAnswer = securityAnswer;
-            writeJSONFile(ADMIN_FILE, adminData);
+            await writeJSONFile(ADMIN_FILE, adminData);
             res.json({ success: true, message: 'Security question updated successfully' });
         } else {
             res.status(401).json({ success: false, error: 'Current password is incorrect' });
@@ -928,7 +748,7 @@ app.get('/api/subjects', (req, res) => {
 });
 
 // Add new subject
-app.post('/admin/subjects', (req, res) => {
+app.post('/admin/subjects', async (req, res) => {
     const { name, duration, description, showAnswers } = req.body;
     
     if (!name || !duration) {
@@ -957,7 +777,7 @@ app.post('/admin/subjects', (req, res) => {
     
     subjects.push(newSubject);
     
-    if (writeJSONFile(SUBJECTS_FILE, subjects)) {
+    if (await writeJSONFile(SUBJECTS_FILE, subjects)) {
         res.json({ success: true, message: 'Subject added successfully', subject: newSubject });
     } else {
         res.status(500).json({ error: 'Failed to save subject' });
@@ -965,7 +785,7 @@ app.post('/admin/subjects', (req, res) => {
 });
 
 // Update subject
-app.put('/admin/subjects/:id', (req, res) => {
+app.put('/admin/subjects/:id', async (req, res) => {
     const { id } = req.params;
     const { name, duration, description, showAnswers } = req.body;
     
@@ -995,7 +815,7 @@ app.put('/admin/subjects/:id', (req, res) => {
         };
     }
     
-    if (writeJSONFile(SUBJECTS_FILE, subjects)) {
+    if (await writeJSONFile(SUBJECTS_FILE, subjects)) {
         res.json({ success: true, message: 'Subject updated successfully', subject: subjects[subjectIndex] });
     } else {
         res.status(500).json({ error: 'Failed to update subject' });
@@ -1003,7 +823,7 @@ app.put('/admin/subjects/:id', (req, res) => {
 });
 
 // Delete subject
-app.delete('/admin/subjects/:id', (req, res) => {
+app.delete('/admin/subjects/:id', async (req, res) => {
     const { id } = req.params;
     
     const subjects = readJSONFile(SUBJECTS_FILE) || [];
@@ -1020,10 +840,10 @@ app.delete('/admin/subjects/:id', (req, res) => {
     const allQuestions = readJSONFile(QUESTIONS_FILE) || {};
     if (allQuestions[id]) {
         delete allQuestions[id];
-        writeJSONFile(QUESTIONS_FILE, allQuestions);
+        await writeJSONFile(QUESTIONS_FILE, allQuestions);
     }
     
-    if (writeJSONFile(SUBJECTS_FILE, subjects)) {
+    if (await writeJSONFile(SUBJECTS_FILE, subjects)) {
         res.json({ success: true, message: 'Subject deleted successfully', subject: deletedSubject });
     } else {
         res.status(500).json({ error: 'Failed to delete subject' });
@@ -1031,71 +851,88 @@ app.delete('/admin/subjects/:id', (req, res) => {
 });
 
 // Get questions for a subject (shuffled)
-app.get('/api/questions/:subjectId', (req, res) => {
+// The student's paper: questions and options in the order of their
+// variant, without the answers
+app.get('/api/questions/:subjectId', async (req, res) => {
     const { subjectId } = req.params;
-    const { lang = 'hi' } = req.query; // Default to Hindi
-    const allQuestions = readJSONFile(QUESTIONS_FILE);
-    
-    if (allQuestions && allQuestions[subjectId]) {
-        // Filter questions by language if 'language' field exists
-        let subjectQuestions = allQuestions[subjectId];
-        
-        // Filter by language tag if present
-        const languageFilteredQuestions = subjectQuestions.filter(q => {
-            // If question has a language field, only include matching language
-            if (q.language) {
-                return q.language === lang;
-            }
-            // If no language field, include all (bilingual questions)
-            return true;
-        });
-        
-        const questions = shuffleArray(languageFilteredQuestions);
-        // Remove correct answers from response for security and apply language
-        const questionsForClient = questions.map(q => {
-            // Handle both old format (string) and new format (object with languages)
-            let question, options;
-            
-            if (typeof q.question === 'object' && q.question !== null) {
-                // Bilingual format
-                question = q.question[lang] || q.question.hi || q.question.en || 'Question text not available';
-            } else {
-                // Old format - plain string
-                question = q.question;
-            }
-            
-            if (typeof q.options === 'object' && !Array.isArray(q.options) && q.options !== null) {
-                // Bilingual format - options is an object with lang keys
-                options = q.options[lang] || q.options.hi || q.options.en || [];
-            } else if (Array.isArray(q.options)) {
-                // Old format - options is already an array
-                options = q.options;
-            } else {
-                options = [];
-            }            return {
-                id: q.id,
-                question: question,
-                options: options,
-                marks: q.marks,
-                correct: q.correct
-            };
-        });
-        res.json(questionsForClient);
-    } else {
-        res.status(404).json({ error: 'Subject not found or no questions available' });
+    const { lang = 'hi', student } = req.query; // Default to Hindi
+
+    if (!student) {
+        return res.status(400).json({ error: 'studentId is required' });
+    }
+
+    try {
+        const paper = await paperSets.getPaper(subjectId, String(lang), String(student));
+        if (paper) {
+            paperSets.send(req, res, paper);
+        } else {
+            res.status(404).json({ error: 'Subject not found or no questions available' });
+        }
+    } catch (error) {
+        console.error('Error preparing question paper:', error);
+        res.status(500).json({ error: 'Failed to load questions' });
     }
 });
 
+// An earlier registration of the same student (same email and mobile) to
+// carry on with: { session } for an unfinished exam in this subject, e.g.
+// one started on a lab PC that crashed, or { student } for an imported
+// roster entry that has not taken this exam yet
+async function findRegistration(email, mobile, subjectId) {
+    const students = studentIndex.findByContact(email, mobile);
+    let preRegistered = null;
+
+    // Newest registrations first
+    for (let i = students.length - 1; i >= 0; i--) {
+        const student = students[i];
+        const session = await checkpoints.get(student.id, subjectId);
+        if (session && !session.sealed) {
+            return { session };
+        }
+        if (!session && !preRegistered && student.preRegistered &&
+            (!student.subject || student.subject === subjectId) &&
+            !resultsAnalytics.submitted(student.id, subjectId)) {
+            preRegistered = student;
+        }
+    }
+    return preRegistered ? { student: preRegistered } : null;
+}
+
 // Register student
-app.post('/api/register', (req, res) => {
-    const { name, email, mobile, subject } = req.body;
+app.post('/api/register', async (req, res) => {
+    const { name, email, mobile, subject, fresh } = req.body;
     
     if (!name || !email || !mobile || !subject) {
         return res.status(400).json({ error: 'All fields are required' });
     }
 
-    const students = readJSONFile(STUDENTS_FILE) || [];
-    const studentId = Date.now().toString();
+    // Offer the saved answers instead of a new registration ("fresh": the
+    // student chose to start over); students on an imported roster start
+    // with their own id and nothing is written
+    if (!fresh) {
+        try {
+            const { session, student } = await findRegistration(email, mobile, subject) || {};
+            if (student) {
+                return res.json({ success: true, studentId: student.id, message: 'Registration successful' });
+            }
+            if (session) {
+                return res.json({
+                    success: true,
+                    studentId: session.studentId,
+                    resume: {
+                        answered: session.answered,
+                        timeSpent: session.timeSpent,
+                        updatedAt: session.updatedAt
+                    },
+                    message: 'Unfinished exam found'
+                });
+            }
+        } catch (error) {
+            console.error('Error looking up saved answers:', error);
+        }
+    }
+
+    const studentId = ids.next();
     
     const newStudent = {
         id: studentId,
@@ -1106,63 +943,137 @@ app.post('/api/register', (req, res) => {
         registrationTime: new Date().toISOString()
     };
 
-    students.push(newStudent);
-    
-    if (writeJSONFile(STUDENTS_FILE, students)) {
+    if (await appendJSONFile(STUDENTS_FILE, newStudent)) {
+        liveEvents.publish('registration', { student: newStudent });
         res.json({ success: true, studentId, message: 'Registration successful' });
     } else {
         res.status(500).json({ error: 'Failed to register student' });
     }
 });
 
-// Submit exam
-app.post('/api/submit', (req, res) => {
+// Language of a student's paper (?lang= or "lang" of the request), which
+// its option order depends on
+function paperLanguage(lang) {
+    return PAPER_LANGUAGES.includes(lang) ? lang : PAPER_LANGUAGES[0];
+}
+
+// Answers saved so far for an exam session, to resume it on any PC. Answers
+// (and correct options, where the subject shows them) are positions on the
+// student's paper in ?lang=.
+app.get('/api/checkpoints/:studentId/:subjectId', async (req, res) => {
+    const { studentId, subjectId } = req.params;
+    const lang = paperLanguage(req.query.lang);
+    try {
+        const session = await checkpoints.get(studentId, subjectId);
+        if (!session) {
+            return res.status(404).json({ error: 'No saved answers for this exam' });
+        }
+        const answers = paperSets.toPaper(subjectId, studentId, session.answers, lang);
+        const correct = showsAnswers(subjectId) ? paperSets.answerKey(subjectId, studentId, Object.keys(answers), lang) : undefined;
+        res.json({ success: true, ...session, answers, correct });
+    } catch (error) {
+        console.error('Error reading saved answers:', error);
+        res.status(500).json({ error: 'Failed to read saved answers' });
+    }
+});
+
+// Save the answers locked since the last save:
+// { answers: { questionId: paper position }, seq, timeSpent, lang }
+// Questions already answered keep their saved answer. Where the subject
+// shows answers, the reply carries the correct option of each question
+// answered by this save, and of no other.
+app.put('/api/checkpoints/:studentId/:subjectId', async (req, res) => {
+    const { studentId, subjectId } = req.params;
+    const { answers, seq, timeSpent } = req.body || {};
+    const lang = paperLanguage(req.body && req.body.lang);
+
+    if (!studentIndex.get(studentId)) {
+        return res.status(404).json({ error: 'Student not found' });
+    }
+    if (!questionBank.getGradingTable(subjectId)) {
+        return res.status(404).json({ error: 'Questions not found' });
+    }
+    // Submitted long enough ago for its checkpoint to be forgotten
+    if (resultsAnalytics.submitted(studentId, subjectId)) {
+        return res.status(409).json({ error: 'Exam already submitted' });
+    }
+
+    try {
+        const session = await checkpoints.save(studentId, subjectId, {
+            answers: paperSets.toBank(subjectId, studentId, answers, lang),
+            seq: Number.isInteger(seq) ? seq : null,
+            timeSpent: Number.isFinite(timeSpent) ? timeSpent : null
+        });
+        const correct = showsAnswers(subjectId) ?
+            paperSets.answerKey(subjectId, studentId, session.locked, lang) : undefined;
+        res.json({ success: true, seq: session.seq, answered: session.answered, ignored: Boolean(session.ignored), correct });
+    } catch (error) {
+        if (error.code === 'SEALED') {
+            return res.status(409).json({ error: 'Exam already submitted' });
+        }
+        console.error('Error saving answers:', error);
+        res.status(500).json({ error: 'Failed to save answers' });
+    }
+});
+
+// Submit exam. Answers already saved with PUT /api/checkpoints don't need to
+// be sent again (and can't be changed); `answers` only has to hold the ones
+// locked since. Answers are positions on the student's paper and graded
+// through its variant.
+app.post('/api/submit', async (req, res) => {
     const { studentId, subjectId, answers, timeSpent } = req.body;
+    const lang = paperLanguage(req.body.lang);
     
-    if (!studentId || !subjectId || !answers) {
+    if (!studentId || !subjectId) {
         return res.status(400).json({ error: 'Missing required data' });
     }
 
-    const students = readJSONFile(STUDENTS_FILE) || [];
-    const student = students.find(s => s.id === studentId);
+    const student = studentIndex.get(studentId);
     
     if (!student) {
         return res.status(404).json({ error: 'Student not found' });
     }
 
-    const allQuestions = readJSONFile(QUESTIONS_FILE);
-    if (!allQuestions || !allQuestions[subjectId]) {
+    const gradingTable = questionBank.getGradingTable(subjectId);
+    if (!gradingTable) {
         return res.status(404).json({ error: 'Questions not found' });
     }
+    if (resultsAnalytics.submitted(studentId, subjectId)) {
+        return res.status(409).json({ error: 'Exam already submitted' });
+    }
 
-    const questions = allQuestions[subjectId];
-    let correctAnswers = 0;
-    let totalMarks = 0;
-    let obtainedMarks = 0;
-    
-    const resultDetails = questions.map(question => {
-        const userAnswer = answers[question.id];
-        const isCorrect = userAnswer !== undefined && userAnswer === question.correct;
-        
-        totalMarks += question.marks;
-        if (isCorrect) {
-            correctAnswers++;
-            obtainedMarks += question.marks;
+    // Merge the last answers into the saved ones and close the session
+    const resultId = ids.next();
+    let session;
+    try {
+        session = await checkpoints.seal(studentId, subjectId, {
+            answers: paperSets.toBank(subjectId, studentId, answers, lang),
+            timeSpent: Number.isFinite(timeSpent) ? timeSpent : null,
+            resultId
+        });
+    } catch (error) {
+        if (error.code === 'SEALED') {
+            return res.status(409).json({ error: 'Exam already submitted' });
         }
+        console.error('Error saving answers:', error);
+        return res.status(500).json({ error: 'Failed to save result' });
+    }
 
-        return {
-            questionId: question.id,
-            question: question.question,
-            userAnswer: userAnswer !== undefined ? question.options[userAnswer] : 'Not Answered',
-            correctAnswer: question.options[question.correct],
-            isCorrect,
-            marks: isCorrect ? question.marks : 0,
-            totalMarks: question.marks
-        };
-    });
+    const grade = gradeAnswers(gradingTable, session.answers);
+
+    let bank;
+    try {
+        bank = await questionVersions.save(subjectId, gradingTable);
+    } catch (error) {
+        console.error('Error saving question version:', error);
+        await checkpoints.reopen(studentId, subjectId).catch(() => {});
+        return res.status(500).json({ error: 'Failed to save result' });
+    }
 
+    // Only the chosen options are stored; the details are rebuilt from the
+    // question version when needed
     const result = {
-        id: Date.now().toString(),
+        id: resultId,
         studentId,
         student: {
             name: student.name,
@@ -1170,29 +1081,42 @@ app.post('/api/submit', (req, res) => {
             mobile: student.mobile
         },
         subjectId,
-        correctAnswers,
-        totalQuestions: questions.length,
-        obtainedMarks,
-        totalMarks,
-        percentage: Math.round((obtainedMarks / totalMarks) * 100),
-        timeSpent,
+        correctAnswers: grade.correctAnswers,
+        totalQuestions: grade.totalQuestions,
+        obtainedMarks: grade.obtainedMarks,
+        totalMarks: grade.totalMarks,
+        percentage: grade.percentage,
+        timeSpent: timeSpent !== undefined ? timeSpent : session.timeSpent,
         submissionTime: new Date().toISOString(),
-        details: resultDetails
+        bank,
+        answers: grade.answers
     };
 
-    const results = readJSONFile(RESULTS_FILE) || [];
-    results.push(result);
-
-    if (writeJSONFile(RESULTS_FILE, results)) {
-        res.json({ success: true, result });
-    } else {
+    try {
+        await resultsStore.append(result);
+        // The saved answers are in the result now
+        checkpoints.release(studentId, subjectId).catch(error => {
+            console.error('Error releasing saved answers:', error);
+        });
+        // The score without the answers, and the subject's updated summary
+        const { bank: _bank, answers: _answers, ...score } = result;
+        liveEvents.publish('submission', {
+            result: score,
+            summary: resultsAnalytics.subjectOverview(subjectId),
+            totals: resultsAnalytics.totals()
+        });
+        res.json({ success: true, result: { ...result, details: grade.details } });
+    } catch (error) {
+        console.error('Error saving result:', error);
+        // Let the student submit again
+        await checkpoints.reopen(studentId, subjectId).catch(() => {});
         res.status(500).json({ error: 'Failed to save result' });
     }
 });
 
 // Admin page route
 app.get('/admin', (req, res) => {
-    res.sendFile(path.join(__dirname, 'public', 'admin.html'));
+    sendPublicFile(req, res, 'admin.html');
 });
 
 // Serve format guide
@@ -1248,7 +1172,7 @@ app.get('/format-guide', (req, res) => {
 </head>
 <body>
     <div class="container">
-        <a href="/admin" class="back-btn">â† Back to Admin Panel</a>
+        <a href="/admin" class="back-btn">← Back to Admin Panel</a>
         <pre>${guideContent}</pre>
     </div>
 </body>
@@ -1259,109 +1183,93 @@ app.get('/format-guide', (req, res) => {
     }
 });
 
-// File upload and question extraction endpoint
-app.post('/api/admin/upload-questions', upload.single('questionFile'), async (req, res) => {
+// Near-duplicate check for uploads (loaded with the first upload)
+const duplicateIndex = new DuplicateIndex(path.join(DATA_DIR, 'question-index.json'));
+
+// Save the questions parsed by an ingest job (runs on the main thread, see
+// ingest-pool.js). Returns the preview list shown after an upload.
+async function commitIngestedQuestions(job) {
+    // Load existing questions
+    const allQuestions = readJSONFile(QUESTIONS_FILE) || {};
+    const preview = addUploadedQuestions(allQuestions, job.subjectId, job.language, job.questions, duplicateIndex);
+    
+    // Save questions
+    if (!await writeJSONFile(QUESTIONS_FILE, allQuestions)) {
+        throw new Error('Failed to save questions to database');
+    }
     try {
-        if (!req.file) {
-            return res.status(400).json({ error: 'No file uploaded' });
-        }
-        
-        const { subjectId, language = 'hi' } = req.body;
-        if (!subjectId) {
-            return res.status(400).json({ error: 'Subject ID is required' });
-        }
-        
-        let extractedText = '';
-        const filePath = req.file.path;
-        const fileExtension = path.extname(req.file.originalname).toLowerCase();
-        
-        // Extract text based on file type
-        if (fileExtension === '.pdf') {
-            const dataBuffer = fs.readFileSync(filePath);
-            const pdfData = await pdfParse(dataBuffer);
-            extractedText = pdfData.text;
-        } else if (fileExtension === '.docx' || fileExtension === '.doc') {
-            // Use mammoth with options to preserve formatting and handle all Unicode
-            const result = await mammoth.extractRawText({ 
-                path: filePath,
-                convertImage: mammoth.images.inline(function(element) {
-                    return element.read("base64").then(function(imageBuffer) {
-                        return {
-                            src: "data:" + element.contentType + ";base64," + imageBuffer
-                        };
-                    });
-                })
+        duplicateIndex.save();
+    } catch (error) {
+        console.error('Error saving question index:', error); // Rebuilt by the next sync
+    }
+    return preview;
+}
+
+// PDF/DOCX parsing runs on worker threads (see ingest-pool.js), on the
+// storage owner in cluster mode
+const ingestPool = owner ? new IngestClient(owner) : new IngestPool({ commit: commitIngestedQuestions, imagesDir: IMAGES_DIR });
+
+// In cluster mode results are saved and uploads parsed by the owner, which
+// keeps these metrics and publishes the job updates itself
+if (!owner) {
+    metricsLib.resultsMetrics(metrics, resultsStore);
+    metricsLib.ingestMetrics(metrics, ingestPool);
+    ingestPool.on('update', (job) => liveEvents.publish('ingest', ingestPool.summary(job)));
+}
+
+function submitIngestJob(req, res) {
+    if (!req.file) {
+        res.status(400).json({ error: 'No file uploaded' });
+        return null;
+    }
+    
+    const { subjectId, language = 'hi' } = req.body;
+    if (!subjectId) {
+        fs.unlinkSync(req.file.path);
+        res.status(400).json({ error: 'Subject ID is required' });
+        return null;
+    }
+
+    return ingestPool.submit({
+        filePath: req.file.path,
+        originalName: req.file.originalname,
+        subjectId,
+        language,
+        size: req.file.size
+    });
+}
+
+// File upload and question extraction endpoint (waits for the job to finish)
+app.post('/api/admin/upload-questions', uploadFile('questionFile'), async (req, res) => {
+    try {
+        const submitted = await submitIngestJob(req, res);
+        if (!submitted) return;
+
+        const job = await ingestPool.wait(submitted.id);
+
+        if (job.status === 'done') {
+            return res.json({
+                success: true,
+                message: `Successfully imported ${job.questionsAdded} questions`,
+                questionsAdded: job.questionsAdded,
+                questions: job.result
             });
-            extractedText = result.value;
-            
-            // Normalize text to handle different encodings (Kruti Dev, Mangal, etc.)
-            extractedText = normalizeHindiText(extractedText);
-        } else {
-            // Clean up uploaded file
-            fs.unlinkSync(filePath);
-            return res.status(400).json({ error: 'Unsupported file format' });
         }
-        
-        // Log extracted text for debugging (first 500 chars)
-        console.log('Extracted text preview:', extractedText.substring(0, 500));
-        
-        // Parse questions from extracted text
-        const parsedQuestions = parseQuestionsFromText(extractedText, language);
-        
-        if (parsedQuestions.length === 0) {
-            // Clean up uploaded file
-            fs.unlinkSync(filePath);
+
+        if (job.error.code === 'NO_QUESTIONS') {
             return res.status(400).json({ 
-                error: 'No questions found in the document. Please check the format.',
-                extractedText: extractedText.substring(0, 500) + '...' // First 500 chars for debugging
+                error: job.error.message,
+                extractedText: job.textPreview + '...' // First 500 chars for debugging
             });
         }
-        
-        // Load existing questions
-        const allQuestions = readJSONFile(QUESTIONS_FILE) || {};
-        if (!allQuestions[subjectId]) {
-            allQuestions[subjectId] = [];
-        }
-        
-        // Add new questions with unique IDs
-        const maxId = allQuestions[subjectId].length > 0 ? 
-            Math.max(...allQuestions[subjectId].map(q => q.id)) : 0;
-        
-        parsedQuestions.forEach((question, index) => {
-            question.id = maxId + index + 1;
-            // Add language tag based on selected language
-            question.language = language;
-            allQuestions[subjectId].push(question);
-        });
-        
-        // Save questions
-        if (writeJSONFile(QUESTIONS_FILE, allQuestions)) {
-            // Clean up uploaded file
-            fs.unlinkSync(filePath);
-            
-            res.json({
-                success: true,
-                message: `Successfully imported ${parsedQuestions.length} questions`,
-                questionsAdded: parsedQuestions.length,
-                questions: parsedQuestions.map(q => ({
-                    id: q.id,
-                    question: typeof q.question === 'object' ? q.question[language] : q.question,
-                    optionsCount: Array.isArray(q.options) ? q.options.length : 
-                                  (typeof q.options === 'object' ? q.options[language]?.length || 0 : 0)
-                }))
-            });
-        } else {
-            // Clean up uploaded file
-            fs.unlinkSync(filePath);
-            res.status(500).json({ error: 'Failed to save questions to database' });
+        if (job.error.code === 'UNSUPPORTED_FORMAT') {
+            return res.status(400).json({ error: job.error.message });
         }
+
+        console.error('Question upload error:', job.error.message);
+        res.status(500).json({ error: 'Failed to process file: ' + job.error.message });
         
     } catch (error) {
-        // Clean up uploaded file if it exists
-        if (req.file && fs.existsSync(req.file.path)) {
-            fs.unlinkSync(req.file.path);
-        }
-        
         console.error('Question upload error:', error);
         res.status(500).json({ 
             error: 'Failed to process file: ' + error.message,
@@ -1370,6 +1278,72 @@ app.post('/api/admin/upload-questions', upload.single('questionFile'), async (re
     }
 });
 
+// Start a background ingest job; poll or stream it with the routes below
+app.post('/api/admin/ingest-jobs', uploadFile('questionFile'), async (req, res) => {
+    try {
+        const job = await submitIngestJob(req, res);
+        if (job) {
+            res.status(202).json({ success: true, jobId: job.id, job: ingestPool.summary(job) });
+        }
+    } catch (error) {
+        console.error('Error starting ingest job:', error);
+        res.status(500).json({ error: 'Failed to start import: ' + error.message });
+    }
+});
+
+// Status of all recent ingest jobs
+app.get('/api/admin/ingest-jobs', (req, res) => {
+    res.json(ingestPool.list().map(job => ingestPool.summary(job)));
+});
+
+// Status and progress of one ingest job
+app.get('/api/admin/ingest-jobs/:jobId', (req, res) => {
+    const job = ingestPool.get(req.params.jobId);
+    if (!job) {
+        return res.status(404).json({ error: 'Job not found' });
+    }
+    res.json({ ...ingestPool.summary(job), questions: job.status === 'done' ? job.result : undefined });
+});
+
+// Parsed questions as newline-delimited JSON while the job runs:
+// { type: 'question', question } lines, then one { type: 'status', job } line
+app.get('/api/admin/ingest-jobs/:jobId/questions', (req, res) => {
+    const job = ingestPool.get(req.params.jobId);
+    if (!job) {
+        return res.status(404).json({ error: 'Job not found' });
+    }
+
+    res.setHeader('Content-Type', 'application/x-ndjson; charset=utf-8');
+    res.setHeader('Cache-Control', 'no-cache');
+
+    const sendQuestions = (questions) => {
+        for (const question of questions) {
+            res.write(JSON.stringify({ type: 'question', question }) + '\n');
+        }
+    };
+    const onQuestions = (updated, questions) => {
+        if (updated === job) sendQuestions(questions);
+    };
+    const onUpdate = (updated) => {
+        if (updated !== job || (job.status !== 'done' && job.status !== 'failed')) return;
+        stop();
+        res.end(JSON.stringify({ type: 'status', job: ingestPool.summary(job) }) + '\n');
+    };
+    const stop = () => {
+        ingestPool.off('questions', onQuestions);
+        ingestPool.off('update', onUpdate);
+    };
+
+    sendQuestions(job.questions);
+    if (job.status === 'done' || job.status === 'failed') {
+        return res.end(JSON.stringify({ type: 'status', job: ingestPool.summary(job) }) + '\n');
+    }
+
+    ingestPool.on('questions', onQuestions);
+    ingestPool.on('update', onUpdate);
+    req.on('close', stop);
+});
+
 // Admin routes
 
 // Get all questions (admin only)
@@ -1382,8 +1356,33 @@ app.get('/api/admin/questions', (req, res) => {
     }
 });
 
+// Search the question bank, one page at a time (admin only)
+// ?q=&subjectId=&language=hi|en&difficulty=&limit=&cursor=
+app.get('/api/admin/questions/search', (req, res) => {
+    const { q, subjectId, language, difficulty, limit, cursor } = req.query;
+    try {
+        const started = process.hrtime.bigint();
+        const page = questionSearch.query({ q, subjectId, language, difficulty, limit, cursor });
+        res.json({
+            success: true,
+            total: page.total,
+            count: page.questions.length,
+            nextCursor: page.nextCursor,
+            questions: page.questions,
+            counts: page.counts,
+            tookMs: Number(process.hrtime.bigint() - started) / 1e6
+        });
+    } catch (error) {
+        if (error.code === 'INVALID_CURSOR') {
+            return res.status(400).json({ error: error.message });
+        }
+        console.error('Error searching questions:', error);
+        res.status(500).json({ error: 'Failed to search questions' });
+    }
+});
+
 // Add question
-app.post('/api/admin/questions', (req, res) => {
+app.post('/api/admin/questions', async (req, res) => {
     const { subjectId, question, options, correct, marks, difficulty } = req.body;
     
     logToConsole('info', `[ADD QUESTION] Adding question to exam: ${subjectId}`);
@@ -1412,7 +1411,7 @@ app.post('/api/admin/questions', (req, res) => {
     allQuestions[subjectId].push(newQuestion);
     const totalQuestions = allQuestions[subjectId].length;
 
-    if (writeJSONFile(QUESTIONS_FILE, allQuestions)) {
+    if (await writeJSONFile(QUESTIONS_FILE, allQuestions)) {
         logToConsole('success', `[ADD QUESTION] Question added successfully. Total questions for ${subjectId}: ${totalQuestions}`);
         res.json({ success: true, message: 'Question added successfully' });
     } else {
@@ -1422,7 +1421,7 @@ app.post('/api/admin/questions', (req, res) => {
 });
 
 // Update/Edit question
-app.put('/api/admin/questions/:subjectId/:questionId(\\d+)', (req, res) => {
+app.put('/api/admin/questions/:subjectId/:questionId(\\d+)', async (req, res) => {
     const { subjectId, questionId } = req.params;
     const updatedQuestion = req.body;
     const allQuestions = readJSONFile(QUESTIONS_FILE) || {};
@@ -1443,7 +1442,7 @@ app.put('/api/admin/questions/:subjectId/:questionId(\\d+)', (req, res) => {
         id: parseInt(questionId)
     };
     
-    if (writeJSONFile(QUESTIONS_FILE, allQuestions)) {
+    if (await writeJSONFile(QUESTIONS_FILE, allQuestions)) {
         res.json({ success: true, message: 'Question updated successfully', question: allQuestions[subjectId][questionIndex] });
     } else {
         res.status(500).json({ error: 'Failed to update question' });
@@ -1451,62 +1450,46 @@ app.put('/api/admin/questions/:subjectId/:questionId(\\d+)', (req, res) => {
 });
 
 // Delete all questions for a subject (MUST BE BEFORE single question delete!)
-app.delete('/api/admin/questions/:subjectId/delete-all', (req, res) => {
+app.delete('/api/admin/questions/:subjectId/delete-all', async (req, res) => {
     const { subjectId } = req.params;
     
-    logToConsole('delete', `[DELETE ALL] Request received for subject: ${subjectId}`);
-    console.log(`[DELETE ALL] ==========================================`);
-    console.log(`[DELETE ALL] Request received for subject: ${subjectId}`);
-    console.log(`[DELETE ALL] Full URL: ${req.url}`);
-    console.log(`[DELETE ALL] Params:`, req.params);
+    logToConsole('delete', `[DELETE ALL] Request received for subject: ${subjectId}`, { url: req.url, params: req.params });
     
     const allQuestions = readJSONFile(QUESTIONS_FILE) || {};
-    console.log(`[DELETE ALL] Available subjects:`, Object.keys(allQuestions));
 
     if (!allQuestions[subjectId]) {
-        logToConsole('error', `[DELETE ALL] Subject not found: ${subjectId}`);
-        console.log(`[DELETE ALL] Subject not found: ${subjectId}`);
-        console.log(`[DELETE ALL] Looking for '${subjectId}' but only have:`, Object.keys(allQuestions));
+        logToConsole('error', `[DELETE ALL] Subject not found: ${subjectId}`, { available: Object.keys(allQuestions) });
         return res.status(404).json({ error: 'Subject not found' });
     }
 
     const deletedCount = allQuestions[subjectId].length;
     logToConsole('info', `[DELETE ALL] Found ${deletedCount} questions to delete`);
-    console.log(`[DELETE ALL] Found ${deletedCount} questions to delete`);
     
     if (deletedCount === 0) {
         logToConsole('info', `[DELETE ALL] No questions to delete for ${subjectId}`);
-        console.log(`[DELETE ALL] No questions to delete for ${subjectId}`);
         return res.json({ success: true, message: 'No questions to delete', deletedCount: 0 });
     }
 
     // Create backup before deleting
-    const backupFile = QUESTIONS_FILE + '.backup';
     try {
-        fs.copyFileSync(QUESTIONS_FILE, backupFile);
-        logToConsole('success', `[DELETE ALL] Backup created`);
-        console.log(`[DELETE ALL] Backup created at ${backupFile}`);
+        const snapshot = await snapshots.create({ label: `before deleting all questions of ${subjectId}`, reason: 'delete' });
+        logToConsole('success', `[DELETE ALL] Backup created: snapshot ${snapshot.id}`);
     } catch (backupError) {
         logToConsole('warn', `[DELETE ALL] Could not create backup: ${backupError.message}`);
-        console.warn(`[DELETE ALL] Could not create backup: ${backupError.message}`);
     }
     
     // Clear all questions for this subject
     allQuestions[subjectId] = [];
     
     logToConsole('info', `[DELETE ALL] Writing updated questions to file...`);
-    console.log(`[DELETE ALL] Writing updated questions to file...`);
-    console.log(`[DELETE ALL] Questions remaining in memory: ${JSON.stringify(Object.keys(allQuestions).map(key => ({subject: key, count: allQuestions[key].length})))}`);
 
-    if (writeJSONFile(QUESTIONS_FILE, allQuestions)) {
+    if (await writeJSONFile(QUESTIONS_FILE, allQuestions)) {
         logToConsole('success', `[DELETE ALL] Successfully deleted ${deletedCount} questions from ${subjectId}`);
-        console.log(`[DELETE ALL] Successfully deleted ${deletedCount} questions from ${subjectId}`);
         
         // Verify the file was written correctly
         const verifyRead = readJSONFile(QUESTIONS_FILE);
         const actualCount = verifyRead && verifyRead[subjectId] ? verifyRead[subjectId].length : 0;
-        logToConsole('info', `[DELETE ALL] Verification: ${actualCount} questions remaining`);
-        console.log(`[DELETE ALL] Verification: ${actualCount} questions remaining for ${subjectId}`);
+        logToConsole('info', `[DELETE ALL] Verification: ${actualCount} questions remaining for ${subjectId}`);
         
         res.json({ 
             success: true, 
@@ -1516,20 +1499,19 @@ app.delete('/api/admin/questions/:subjectId/delete-all', (req, res) => {
         });
     } else {
         logToConsole('error', `[DELETE ALL] Failed to write to file for ${subjectId}`);
-        console.error(`[DELETE ALL] Failed to write to file for ${subjectId}`);
         res.status(500).json({ error: 'Failed to delete questions' });
     }
 });
 
 // Delete single question (MUST BE AFTER delete-all to avoid route conflict!)
-app.delete('/api/admin/questions/:subjectId/:questionId(\\d+)', (req, res) => {
+app.delete('/api/admin/questions/:subjectId/:questionId(\\d+)', async (req, res) => {
     const { subjectId, questionId } = req.params;
     const allQuestions = readJSONFile(QUESTIONS_FILE) || {};
     
     if (allQuestions[subjectId]) {
         allQuestions[subjectId] = allQuestions[subjectId].filter(q => q.id != questionId);
         
-        if (writeJSONFile(QUESTIONS_FILE, allQuestions)) {
+        if (await writeJSONFile(QUESTIONS_FILE, allQuestions)) {
             res.json({ success: true, message: 'Question deleted successfully' });
         } else {
             res.status(500).json({ error: 'Failed to delete question' });
@@ -1540,19 +1522,63 @@ app.delete('/api/admin/questions/:subjectId/:questionId(\\d+)', (req, res) => {
 });
 
 // Get all results
+// Without details; GET /api/admin/results/:resultId has them. Streamed from
+// the log, so a big log never stalls the exam traffic.
+async function* resultsJSON() {
+    yield '[';
+    let count = 0;
+    for await (const { details, ...result } of resultsStore.stream()) {
+        yield (count++ > 0 ? ',' : '') + JSON.stringify(result);
+    }
+    yield ']';
+}
+
 app.get('/api/admin/results', (req, res) => {
-    const results = readJSONFile(RESULTS_FILE);
-    if (results) {
-        res.json(results);
-    } else {
-        res.status(500).json({ error: 'Failed to load results' });
+    res.setHeader('Content-Type', 'application/json; charset=utf-8');
+    pipeline(Readable.from(batched(resultsJSON())), res, (error) => {
+        if (error && error.code !== 'ERR_STREAM_PREMATURE_CLOSE') {
+            console.error('Error reading results:', error);
+        }
+    });
+});
+
+// One result with its per-question details
+app.get('/api/admin/results/:resultId', async (req, res) => {
+    try {
+        let found = null;
+        for await (const result of resultsStore.stream()) {
+            if (String(result.id) === req.params.resultId) {
+                found = result;
+                break;
+            }
+        }
+        if (!found) {
+            return res.status(404).json({ error: 'Result not found' });
+        }
+        res.json(questionVersions.expand(found));
+    } catch (error) {
+        console.error('Error reading result:', error);
+        res.status(500).json({ error: 'Failed to load result' });
     }
 });
 
+// Results summary: totals, pass rates, score histograms per subject
+app.get('/api/admin/analytics', (req, res) => {
+    res.json(resultsAnalytics.summary());
+});
+
+// One subject's summary with per-question difficulty and distractors
+app.get('/api/admin/analytics/:subjectId', (req, res) => {
+    const analytics = resultsAnalytics.subject(req.params.subjectId);
+    if (!analytics) {
+        return res.status(404).json({ error: 'No results for this subject' });
+    }
+    res.json(analytics);
+});
+
 // Export surprise test results to Excel
 app.get('/api/admin/export-surprise-test', async (req, res) => {
     try {
-        const results = readJSONFile(RESULTS_FILE) || [];
         const subjects = readJSONFile(SUBJECTS_FILE) || [];
         
         // Filter only surprise test results
@@ -1561,69 +1587,90 @@ app.get('/api/admin/export-surprise-test', async (req, res) => {
             return res.status(404).json({ error: 'Surprise test subject not found' });
         }
         
-        const surpriseResults = results.filter(r => r.subjectId === surpriseSubject.id);
+        // Rows are streamed from the results log into the download
+        const count = await streamResultsWorkbook(res, resultsStore.stream(), {
+            filename: `Surprise_Test_Results_${Date.now()}.xlsx`,
+            sheetName: 'Surprise Test Results',
+            columns: [
+                { header: 'Student ID', key: 'studentId', width: 15 },
+                { header: 'Name', key: 'name', width: 25 },
+                { header: 'Email', key: 'email', width: 30 },
+                { header: 'Mobile', key: 'mobile', width: 15 },
+                { header: 'Score', key: 'score', width: 12 },
+                { header: 'Percentage', key: 'percentage', width: 12 },
+                { header: 'Exam Date', key: 'examDate', width: 20 }
+            ],
+            filter: result => result.subjectId === surpriseSubject.id,
+            toRow: result => {
+                // Handle both old and new result formats
+                const examDate = result.timestamp || result.submissionTime || new Date().toISOString();
+
+                return {
+                    studentId: result.studentId || 'N/A',
+                    name: studentField(result, 'name', 'N/A'),
+                    email: studentField(result, 'email', 'N/A'),
+                    mobile: studentField(result, 'mobile', 'N/A'),
+                    score: `${result.obtainedMarks}/${result.totalMarks}`,
+                    percentage: `${result.percentage}%`,
+                    examDate: new Date(examDate).toLocaleString('en-IN', { 
+                        dateStyle: 'medium', 
+                        timeStyle: 'medium' 
+                    })
+                };
+            }
+        });
         
-        if (surpriseResults.length === 0) {
+        if (count === 0) {
             return res.status(404).json({ error: 'No surprise test results found' });
         }
         
-        // Create Excel workbook
-        const workbook = new ExcelJS.Workbook();
-        const worksheet = workbook.addWorksheet('Surprise Test Results');
-        
-        // Add headers
-        worksheet.columns = [
-            { header: 'Student ID', key: 'studentId', width: 15 },
-            { header: 'Name', key: 'name', width: 25 },
-            { header: 'Email', key: 'email', width: 30 },
-            { header: 'Mobile', key: 'mobile', width: 15 },
-            { header: 'Score', key: 'score', width: 12 },
-            { header: 'Percentage', key: 'percentage', width: 12 },
-            { header: 'Exam Date', key: 'examDate', width: 20 }
-        ];
-        
-        // Style header row
-        worksheet.getRow(1).font = { bold: true };
-        worksheet.getRow(1).fill = {
-            type: 'pattern',
-            pattern: 'solid',
-            fgColor: { argb: 'FF4472C4' }
-        };
-        worksheet.getRow(1).font = { color: { argb: 'FFFFFFFF' }, bold: true };
-        
-        // Add data rows
-        surpriseResults.forEach(result => {
-            // Handle both old and new result formats
-            const studentName = result.studentName || result.student?.name || 'N/A';
-            const studentEmail = result.studentEmail || result.student?.email || 'N/A';
-            const studentMobile = result.studentMobile || result.student?.mobile || 'N/A';
-            const examDate = result.timestamp || result.submissionTime || new Date().toISOString();
-            
-            worksheet.addRow({
-                studentId: result.studentId || 'N/A',
-                name: studentName,
-                email: studentEmail,
-                mobile: studentMobile,
-                score: `${result.obtainedMarks}/${result.totalMarks}`,
-                percentage: `${result.percentage}%`,
-                examDate: new Date(examDate).toLocaleString('en-IN', { 
-                    dateStyle: 'medium', 
-                    timeStyle: 'medium' 
-                })
-            });
+    } catch (error) {
+        console.error('Excel export error:', error);
+        if (res.headersSent) {
+            res.destroy(error);
+        } else {
+            res.status(500).json({ error: 'Failed to export results: ' + error.message });
+        }
+    }
+});
+
+// Export results to Excel, optionally for one subject and/or a date range
+// (?subjectId=...&from=YYYY-MM-DD&to=YYYY-MM-DD)
+app.get('/api/admin/export-results', async (req, res) => {
+    let filter;
+    try {
+        filter = parseResultFilter(req.query);
+    } catch (error) {
+        return res.status(400).json({ error: error.message });
+    }
+
+    try {
+        const subjects = readJSONFile(SUBJECTS_FILE) || [];
+        const subjectNames = new Map(subjects.map(s => [s.id, s.name]));
+
+        if (filter.subjectId && !subjectNames.has(filter.subjectId)) {
+            return res.status(404).json({ error: 'Subject not found' });
+        }
+
+        const label = filter.subjectId ? filter.subjectId.replace(/[^\w-]+/g, '_') : 'All';
+        const count = await streamResultsWorkbook(res, resultsStore.stream(), {
+            filename: `KYP_${label}_Results_${new Date().toISOString().slice(0, 10)}.xlsx`,
+            sheetName: 'Results',
+            columns: RESULT_COLUMNS,
+            filter: result => matchesFilter(result, filter),
+            toRow: result => resultRow(result, subjectNames)
         });
-        
-        // Set response headers
-        res.setHeader('Content-Type', 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet');
-        res.setHeader('Content-Disposition', `attachment; filename=Surprise_Test_Results_${Date.now()}.xlsx`);
-        
-        // Write to response
-        await workbook.xlsx.write(res);
-        res.end();
-        
+
+        if (count === 0) {
+            return res.status(404).json({ error: 'No results found for this selection' });
+        }
     } catch (error) {
         console.error('Excel export error:', error);
-        res.status(500).json({ error: 'Failed to export results: ' + error.message });
+        if (res.headersSent) {
+            res.destroy(error);
+        } else {
+            res.status(500).json({ error: 'Failed to export results: ' + error.message });
+        }
     }
 });
 
@@ -1639,11 +1686,53 @@ app.get('/api/admin/students', (req, res) => {
     }
 });
 
+// Register a whole roster (CSV/XLSX, see roster-import.js) in one write.
+// Form fields: rosterFile, and optionally subject for rows without one.
+app.post('/api/admin/students/import', uploadRoster('rosterFile'), async (req, res) => {
+    if (!req.file) {
+        return res.status(400).json({ error: 'No roster file uploaded' });
+    }
+
+    const subjects = readJSONFile(SUBJECTS_FILE) || [];
+    const defaultSubject = req.body.subject || '';
+    if (defaultSubject && !subjects.some(s => s.id === defaultSubject)) {
+        return res.status(400).json({ error: 'Subject not found' });
+    }
+
+    try {
+        const rows = await readRoster(req.file.buffer, req.file.originalname);
+        const { students, skipped } = planImport(rows, {
+            index: studentIndex,
+            subjects,
+            defaultSubject,
+            nextId: () => ids.next()
+        });
+
+        if (students.length > 0 && !(await appendAllJSONFile(STUDENTS_FILE, students))) {
+            return res.status(500).json({ error: 'Failed to save students' });
+        }
+
+        logToConsole('success', `[ROSTER] ${req.file.originalname}: ${students.length} students added, ${skipped.length} rows skipped`);
+        res.json({
+            success: true,
+            message: `${students.length} students added, ${skipped.length} rows skipped`,
+            added: students.length,
+            skipped
+        });
+    } catch (error) {
+        if (error.code === 'BAD_ROSTER') {
+            return res.status(400).json({ error: error.message });
+        }
+        console.error('Error importing roster:', error);
+        res.status(500).json({ error: 'Failed to import roster: ' + error.message });
+    }
+});
+
 // Delete all students (must be before :studentId route)
-app.delete('/api/admin/students/delete-all/confirm', (req, res) => {
+app.delete('/api/admin/students/delete-all/confirm', async (req, res) => {
     const emptyStudents = [];
     
-    if (writeJSONFile(STUDENTS_FILE, emptyStudents)) {
+    if (await writeJSONFile(STUDENTS_FILE, emptyStudents)) {
         res.json({ 
             success: true, 
             message: 'All students deleted successfully',
@@ -1655,7 +1744,7 @@ app.delete('/api/admin/students/delete-all/confirm', (req, res) => {
 });
 
 // Delete a specific student
-app.delete('/api/admin/students/:studentId', (req, res) => {
+app.delete('/api/admin/students/:studentId', async (req, res) => {
     const { studentId } = req.params;
     
     const students = readJSONFile(STUDENTS_FILE);
@@ -1670,7 +1759,7 @@ app.delete('/api/admin/students/:studentId', (req, res) => {
         return res.status(404).json({ error: 'Student not found' });
     }
     
-    if (writeJSONFile(STUDENTS_FILE, filteredStudents)) {
+    if (await writeJSONFile(STUDENTS_FILE, filteredStudents)) {
         res.json({ 
             success: true, 
             message: 'Student deleted successfully',
@@ -1682,7 +1771,7 @@ app.delete('/api/admin/students/:studentId', (req, res) => {
 });
 
 // Add new subject
-app.post('/api/admin/subjects', (req, res) => {
+app.post('/api/admin/subjects', async (req, res) => {
     const { name, duration, description } = req.body;
     
     if (!name || !duration) {
@@ -1706,11 +1795,11 @@ app.post('/api/admin/subjects', (req, res) => {
     
     subjects.push(newSubject);
     
-    if (writeJSONFile(SUBJECTS_FILE, subjects)) {
+    if (await writeJSONFile(SUBJECTS_FILE, subjects)) {
         // Also initialize empty questions array for this subject
         const allQuestions = readJSONFile(QUESTIONS_FILE) || {};
         allQuestions[newId] = [];
-        writeJSONFile(QUESTIONS_FILE, allQuestions);
+        await writeJSONFile(QUESTIONS_FILE, allQuestions);
         
         res.json({ 
             success: true, 
@@ -1723,7 +1812,7 @@ app.post('/api/admin/subjects', (req, res) => {
 });
 
 // Update subject
-app.put('/api/admin/subjects/:subjectId', (req, res) => {
+app.put('/api/admin/subjects/:subjectId', async (req, res) => {
     const { subjectId } = req.params;
     const { name, duration, description, showAnswers } = req.body;
     
@@ -1756,7 +1845,7 @@ app.put('/api/admin/subjects/:subjectId', (req, res) => {
         };
     }
     
-    if (writeJSONFile(SUBJECTS_FILE, subjects)) {
+    if (await writeJSONFile(SUBJECTS_FILE, subjects)) {
         res.json({ 
             success: true, 
             message: 'Subject updated successfully',
@@ -1768,7 +1857,7 @@ app.put('/api/admin/subjects/:subjectId', (req, res) => {
 });
 
 // Delete subject
-app.delete('/api/admin/subjects/:subjectId', (req, res) => {
+app.delete('/api/admin/subjects/:subjectId', async (req, res) => {
     const { subjectId } = req.params;
     
     logToConsole('delete', `[DELETE EXAM] Request received for exam: ${subjectId}`);
@@ -1797,7 +1886,7 @@ app.delete('/api/admin/subjects/:subjectId', (req, res) => {
     
     logToConsole('info', `[DELETE EXAM] Also deleting ${questionsCount} questions for this exam`);
     
-    if (writeJSONFile(SUBJECTS_FILE, filteredSubjects) && writeJSONFile(QUESTIONS_FILE, allQuestions)) {
+    if (await writeJSONFile(SUBJECTS_FILE, filteredSubjects) && await writeJSONFile(QUESTIONS_FILE, allQuestions)) {
         logToConsole('success', `[DELETE EXAM] Successfully deleted exam "${deletedSubject?.name}" and ${questionsCount} questions`);
         res.json({ 
             success: true, 
@@ -1810,41 +1899,154 @@ app.delete('/api/admin/subjects/:subjectId', (req, res) => {
     }
 });
 
-// Export data
-app.get('/api/admin/export', (req, res) => {
-    const subjects = readJSONFile(SUBJECTS_FILE);
-    const questions = readJSONFile(QUESTIONS_FILE);
-    const students = readJSONFile(STUDENTS_FILE);
-    const results = readJSONFile(RESULTS_FILE);
-
-    const exportData = {
-        subjects,
-        questions,
-        students,
-        results,
-        exportDate: new Date().toISOString()
+// Snapshots (see snapshot-store.js)
+app.get('/api/admin/snapshots', async (req, res) => {
+    try {
+        res.json(await snapshots.list());
+    } catch (error) {
+        console.error('Error listing snapshots:', error);
+        res.status(500).json({ error: 'Failed to list snapshots' });
+    }
+});
+
+app.post('/api/admin/snapshots', async (req, res) => {
+    try {
+        const snapshot = await snapshots.create({ label: req.body && req.body.label });
+        logToConsole('success', `[SNAPSHOT] ${snapshot.id}: ${snapshot.stats.newChunks} new chunks, ${snapshot.stats.newBytes} bytes`);
+        res.json(snapshot);
+    } catch (error) {
+        console.error('Error taking snapshot:', error);
+        res.status(500).json({ error: 'Failed to take snapshot' });
+    }
+});
+
+app.get('/api/admin/snapshots/:id', async (req, res) => {
+    try {
+        const manifest = await snapshots.get(req.params.id);
+        if (!manifest) {
+            return res.status(404).json({ error: 'Snapshot not found' });
+        }
+        res.json(snapshots.summary(manifest));
+    } catch (error) {
+        console.error('Error reading snapshot:', error);
+        res.status(500).json({ error: 'Failed to read snapshot' });
+    }
+});
+
+// What changed from ?against= (default: the snapshot before) to this one
+app.get('/api/admin/snapshots/:id/diff', async (req, res) => {
+    try {
+        const to = await snapshots.get(req.params.id);
+        if (!to) {
+            return res.status(404).json({ error: 'Snapshot not found' });
+        }
+        const ids = snapshots.ids();
+        const againstId = req.query.against || ids[ids.indexOf(to.id) - 1];
+        const from = againstId ? await snapshots.get(againstId) : null;
+        if (!from) {
+            return res.status(404).json({ error: 'No snapshot to compare with' });
+        }
+        res.json(await snapshots.diff(from, to));
+    } catch (error) {
+        console.error('Error comparing snapshots:', error);
+        res.status(500).json({ error: 'Failed to compare snapshots' });
+    }
+});
+
+// Put subjects, questions and/or students back as they were in a snapshot.
+// The current data is snapshotted first, so a restore can be undone.
+app.post('/api/admin/snapshots/:id/restore', async (req, res) => {
+    const collections = (req.body && req.body.collections) || ['subjects', 'questions', 'students'];
+    const files = { subjects: SUBJECTS_FILE, questions: QUESTIONS_FILE, students: STUDENTS_FILE };
+    if (!Array.isArray(collections) || collections.some(name => !files[name])) {
+        return res.status(400).json({
+            error: 'collections must be a list of subjects, questions, students (results are restored offline with snapshots.py)'
+        });
+    }
+
+    try {
+        const manifest = await snapshots.get(req.params.id);
+        if (!manifest) {
+            return res.status(404).json({ error: 'Snapshot not found' });
+        }
+        const backup = await snapshots.create({ label: `before restoring ${manifest.id}`, reason: 'restore' });
+        const documents = await snapshots.documentsOf(manifest, collections);
+
+        const saved = await Promise.all(Object.entries(documents).map(([name, doc]) => writeJSONFile(files[name], doc)));
+        if (saved.includes(false)) {
+            logToConsole('error', `[RESTORE] Failed to write files from snapshot ${manifest.id}`);
+            return res.status(500).json({ error: 'Failed to restore snapshot', backup: backup.id });
+        }
+        logToConsole('success', `[RESTORE] ${Object.keys(documents).join(', ')} restored from snapshot ${manifest.id}`, { backup: backup.id });
+        res.json({ success: true, restored: Object.keys(documents), backup: backup.id });
+    } catch (error) {
+        console.error('Error restoring snapshot:', error);
+        res.status(500).json({ error: 'Failed to restore snapshot' });
+    }
+});
+
+// Export data: ?snapshot= (default: a snapshot of the data now), streamed
+// as ?format=json (one document, as before), ndjson or tar (the snapshot's
+// chunks, for snapshots.py)
+app.get('/api/admin/export', async (req, res) => {
+    const formats = {
+        json: { type: 'application/json', extension: 'json', write: manifest => snapshots.exportJSON(manifest) },
+        ndjson: { type: 'application/x-ndjson', extension: 'ndjson', write: manifest => snapshots.exportNDJSON(manifest) },
+        tar: { type: 'application/x-tar', extension: 'tar', write: manifest => snapshots.exportTar(manifest) }
     };
+    const format = formats[req.query.format || 'json'];
+    if (!format) {
+        return res.status(400).json({ error: 'format must be json, ndjson or tar' });
+    }
 
-    res.setHeader('Content-Type', 'application/json');
-    res.setHeader('Content-Disposition', 'attachment; filename=kyp-exam-data.json');
-    res.json(exportData);
+    let manifest;
+    try {
+        if (req.query.snapshot) {
+            manifest = await snapshots.get(req.query.snapshot);
+            if (!manifest) {
+                return res.status(404).json({ error: 'Snapshot not found' });
+            }
+        } else {
+            const snapshot = await snapshots.create({ label: 'export', reason: 'auto', skipUnchanged: true });
+            manifest = await snapshots.get(snapshot.id);
+        }
+    } catch (error) {
+        console.error('Error preparing export:', error);
+        return res.status(500).json({ error: 'Failed to export data' });
+    }
+
+    res.setHeader('Content-Type', format.type);
+    res.setHeader('Content-Disposition', `attachment; filename=kyp-exam-data-${manifest.id}.${format.extension}`);
+    pipeline(Readable.from(batched(format.write(manifest))), res, (error) => {
+        if (error && error.code !== 'ERR_STREAM_PREMATURE_CLOSE') {
+            console.error('Error streaming export:', error);
+        }
+    });
 });
 
-// Import data
-app.post('/api/admin/import', (req, res) => {
+// Import data (subjects and questions); the data it replaces is snapshotted first
+app.post('/api/admin/import', async (req, res) => {
     const { subjects, questions } = req.body;
     
     if (!subjects || !questions) {
         return res.status(400).json({ error: 'Invalid data format' });
     }
 
-    const success = writeJSONFile(SUBJECTS_FILE, subjects) && 
-                   writeJSONFile(QUESTIONS_FILE, questions);
+    let backup;
+    try {
+        backup = await snapshots.create({ label: 'before import', reason: 'import' });
+    } catch (error) {
+        console.error('Error taking snapshot before import:', error);
+        return res.status(500).json({ error: 'Failed to back up data before import' });
+    }
+
+    const success = await writeJSONFile(SUBJECTS_FILE, subjects) && 
+                   await writeJSONFile(QUESTIONS_FILE, questions);
 
     if (success) {
-        res.json({ success: true, message: 'Data imported successfully' });
+        res.json({ success: true, message: 'Data imported successfully', backup: backup.id });
     } else {
-        res.status(500).json({ error: 'Failed to import data' });
+        res.status(500).json({ error: 'Failed to import data', backup: backup.id });
     }
 });
 
@@ -1880,33 +2082,33 @@ const languages = {
         students: "Students"
     },
     hi: {
-        title: "à¤•à¥‡à¤µà¤¾à¤ˆà¤ªà¥€ à¤…à¤­à¥à¤¯à¤¾à¤¸ à¤ªà¤°à¥€à¤•à¥à¤·à¤¾",
-        subtitle: "à¤•à¥à¤¶à¤² à¤¯à¥à¤µà¤¾ à¤•à¤¾à¤°à¥à¤¯à¤•à¥à¤°à¤® - à¤…à¤­à¥à¤¯à¤¾à¤¸ à¤ªà¤°à¥€à¤•à¥à¤·à¤¾",
-        organization: "à¤®à¤¿à¤¥à¤¿à¤²à¤¾ à¤¶à¤¿à¤•à¥à¤·à¤¾ à¤à¤µà¤‚ à¤•à¤²à¥à¤¯à¤¾à¤£ à¤¸à¤®à¤¿à¤¤à¤¿",
-        selectLanguage: "à¤­à¤¾à¤·à¤¾ à¤šà¥à¤¨à¥‡à¤‚",
-        studentInfo: "à¤›à¤¾à¤¤à¥à¤° à¤•à¥€ à¤œà¤¾à¤¨à¤•à¤¾à¤°à¥€",
-        fullName: "à¤ªà¥‚à¤°à¤¾ à¤¨à¤¾à¤®",
-        rollNumber: "à¤°à¥‹à¤² à¤¨à¤‚à¤¬à¤°",
-        selectSubject: "à¤µà¤¿à¤·à¤¯ à¤šà¥à¤¨à¥‡à¤‚",
-        startExam: "à¤ªà¤°à¥€à¤•à¥à¤·à¤¾ à¤¶à¥à¤°à¥‚ à¤•à¤°à¥‡à¤‚",
-        timeRemaining: "à¤¬à¤šà¤¾ à¤¸à¤®à¤¯",
-        question: "à¤ªà¥à¤°à¤¶à¥à¤¨",
-        submitAnswer: "à¤‰à¤¤à¥à¤¤à¤° à¤œà¤®à¤¾ à¤•à¤°à¥‡à¤‚",
-        submitExam: "à¤ªà¤°à¥€à¤•à¥à¤·à¤¾ à¤œà¤®à¤¾ à¤•à¤°à¥‡à¤‚",
-        examResults: "à¤ªà¤°à¥€à¤•à¥à¤·à¤¾ à¤ªà¤°à¤¿à¤£à¤¾à¤®",
-        score: "à¤†à¤ªà¤•à¤¾ à¤¸à¥à¤•à¥‹à¤°",
-        correctAnswers: "à¤¸à¤¹à¥€ à¤‰à¤¤à¥à¤¤à¤°",
-        totalQuestions: "à¤•à¥à¤² à¤ªà¥à¤°à¤¶à¥à¤¨",
-        percentage: "à¤ªà¥à¤°à¤¤à¤¿à¤¶à¤¤",
-        backToHome: "à¤¹à¥‹à¤® à¤ªà¤° à¤µà¤¾à¤ªà¤¸ à¤œà¤¾à¤à¤‚",
-        adminPanel: "à¤ªà¥à¤°à¤¶à¤¾à¤¸à¤¨ à¤ªà¥ˆà¤¨à¤²",
-        login: "à¤²à¥‰à¤—à¤¿à¤¨",
-        username: "à¤‰à¤ªà¤¯à¥‹à¤—à¤•à¤°à¥à¤¤à¤¾ à¤¨à¤¾à¤®",
-        password: "à¤ªà¤¾à¤¸à¤µà¤°à¥à¤¡",
-        dashboard: "à¤¡à¥ˆà¤¶à¤¬à¥‹à¤°à¥à¤¡",
-        questionManagement: "à¤ªà¥à¤°à¤¶à¥à¤¨ à¤ªà¥à¤°à¤¬à¤‚à¤§à¤¨",
-        results: "à¤ªà¤°à¤¿à¤£à¤¾à¤®",
-        students: "à¤›à¤¾à¤¤à¥à¤°"
+        title: "केवाईपी अभ्यास परीक्षा",
+        subtitle: "कुशल युवा कार्यक्रम - अभ्यास परीक्षा",
+        organization: "मिथिला शिक्षा एवं कल्याण समिति",
+        selectLanguage: "भाषा चुनें",
+        studentInfo: "छात्र की जानकारी",
+        fullName: "पूरा नाम",
+        rollNumber: "रोल नंबर",
+        selectSubject: "विषय चुनें",
+        startExam: "परीक्षा शुरू करें",
+        timeRemaining: "बचा समय",
+        question: "प्रश्न",
+        submitAnswer: "उत्तर जमा करें",
+        submitExam: "परीक्षा जमा करें",
+        examResults: "परीक्षा परिणाम",
+        score: "आपका स्कोर",
+        correctAnswers: "सही उत्तर",
+        totalQuestions: "कुल प्रश्न",
+        percentage: "प्रतिशत",
+        backToHome: "होम पर वापस जाएं",
+        adminPanel: "प्रशासन पैनल",
+        login: "लॉगिन",
+        username: "उपयोगकर्ता नाम",
+        password: "पासवर्ड",
+        dashboard: "डैशबोर्ड",
+        questionManagement: "प्रश्न प्रबंधन",
+        results: "परिणाम",
+        students: "छात्र"
     }
 };
 
@@ -1925,6 +2127,21 @@ app.get('/api/languages/:lang', (req, res) => {
     }
 });
 
+// Pictures of uploaded papers (see image-store.js). A name always means the
+// same bytes, so browsers keep them for good.
+const imageStore = new ImageStore(IMAGES_DIR);
+
+function sendImage(req, res, thumb) {
+    const filepath = imageStore.file(req.params.name, thumb);
+    if (!filepath) {
+        return res.status(404).json({ error: 'Image not found' });
+    }
+    res.sendFile(filepath, { maxAge: '1y', immutable: true });
+}
+
+app.get('/images/thumbs/:name', (req, res) => sendImage(req, res, true));
+app.get('/images/:name', (req, res) => sendImage(req, res, false));
+
 // Get server info
 app.get('/api/info', (req, res) => {
     const os = require('os');
@@ -1945,77 +2162,218 @@ app.get('/api/info', (req, res) => {
         port: PORT,
         clientURL: `http://${serverIP}:${PORT}`,
         uptime: process.uptime(),
+        startup: startupTimes,
         startTime: new Date(Date.now() - process.uptime() * 1000).toISOString()
     });
 });
 
 // API endpoint to get server logs
-app.get('/api/admin/logs', (req, res) => {
+app.get('/api/admin/logs', async (req, res) => {
     const limit = parseInt(req.query.limit) || 100;
     const type = req.query.type; // filter by type
-    
-    let logs = [...serverLogs];
-    
-    // Filter by type if specified
-    if (type && type !== 'all') {
-        logs = logs.filter(log => log.type === type);
+
+    // Optional time range: ISO dates or ms timestamps
+    const parseTime = (value) => {
+        if (!value) return null;
+        const time = /^\d+$/.test(value) ? Number(value) : Date.parse(value);
+        return Number.isNaN(time) ? undefined : time;
+    };
+    const from = parseTime(req.query.from);
+    const to = parseTime(req.query.to);
+    if (from === undefined || to === undefined) {
+        return res.status(400).json({ error: 'Invalid from/to time' });
     }
     
-    // Return last N logs (newest first)
-    const recentLogs = logs.slice(-limit).reverse();
-    
-    res.json({
-        success: true,
-        count: recentLogs.length,
-        total: serverLogs.length,
-        logs: recentLogs
-    });
+    try {
+        // Newest first
+        const report = await serverLogs.report({
+            type: type && type !== 'all' ? type : null,
+            from,
+            to,
+            limit
+        });
+        
+        res.json({
+            success: true,
+            count: report.logs.length,
+            total: report.total,
+            types: report.types,
+            logs: report.logs
+        });
+    } catch (error) {
+        console.error('Error reading logs:', error);
+        res.status(500).json({ error: 'Failed to read logs' });
+    }
 });
 
 // API endpoint to clear logs
-app.delete('/api/admin/logs', (req, res) => {
-    const cleared = serverLogs.length;
-    serverLogs.length = 0;
-    logToConsole('info', `Cleared ${cleared} log entries`);
-    res.json({ success: true, message: `Cleared ${cleared} logs` });
+app.delete('/api/admin/logs', async (req, res) => {
+    try {
+        const cleared = await serverLogs.clearAll();
+        logToConsole('info', `Cleared ${cleared} log entries`);
+        res.json({ success: true, message: `Cleared ${cleared} logs` });
+    } catch (error) {
+        console.error('Error clearing logs:', error);
+        res.status(500).json({ error: 'Failed to clear logs' });
+    }
+});
+
+// Live registrations, submissions, upload jobs and log entries as
+// Server-Sent Events; resumes after the Last-Event-ID header (or
+// ?lastEventId=). ?types=submission,log limits the event types.
+app.get('/api/admin/events', (req, res) => {
+    const lastEventId = req.get('Last-Event-ID') || req.query.lastEventId || null;
+    const types = typeof req.query.types === 'string' && req.query.types ?
+        req.query.types.split(',') : null;
+    liveEvents.subscribe(req, res, { lastEventId, types });
+});
+
+// Metrics of this server (of every process in cluster mode) in the
+// Prometheus text format
+app.get('/api/admin/metrics', async (req, res) => {
+    try {
+        const families = owner ?
+            await owner.call('metrics.gather') :
+            metrics.collect();
+        res.setHeader('Content-Type', 'text/plain; version=0.0.4; charset=utf-8');
+        res.send(metricsLib.render(families));
+    } catch (error) {
+        console.error('Error collecting metrics:', error);
+        res.status(500).json({ error: 'Failed to collect metrics' });
+    }
+});
+
+if (owner) {
+    owner.on('metrics.request', ({ id }) => {
+        owner.notify('metrics.reply', id, metrics.collect());
+    });
+}
+
+// Record a CPU profile for ?seconds= (default 10) into data/profiles. Only
+// with KYP_PROFILING=1; ?process=owner profiles the cluster's storage owner.
+app.post('/api/admin/profile', async (req, res) => {
+    if (process.env.KYP_PROFILING !== '1') {
+        return res.status(403).json({ error: 'CPU profiling is disabled (start the server with KYP_PROFILING=1)' });
+    }
+    const seconds = parseInt(req.query.seconds) || 10;
+    if (seconds < 1 || seconds > 60) {
+        return res.status(400).json({ error: 'seconds must be between 1 and 60' });
+    }
+
+    try {
+        const file = owner && req.query.process === 'owner' ?
+            await owner.call('profile', seconds) :
+            await metricsLib.captureCpuProfile(PROFILES_DIR, seconds);
+        logToConsole('info', `CPU profile saved: ${path.basename(file)}`);
+        res.json({ success: true, file: path.relative(__dirname, file), seconds });
+    } catch (error) {
+        if (error.code === 'PROFILE_RUNNING') {
+            return res.status(409).json({ error: error.message });
+        }
+        console.error('Error recording CPU profile:', error);
+        res.status(500).json({ error: 'Failed to record CPU profile' });
+    }
 });
 
 // Root route - serve index.html
 app.get('/', (req, res) => {
-    res.sendFile(path.join(__dirname, 'public', 'index.html'));
+    sendPublicFile(req, res, 'index.html');
 });
 
 // Catch-all route for SPA
 app.get('*', (req, res) => {
-    res.sendFile(path.join(__dirname, 'public', 'index.html'));
+    sendPublicFile(req, res, 'index.html');
 });
 
 // Initialize and start server
 initializeData();
 
-app.listen(PORT, '0.0.0.0', () => {
-    const os = require('os');
-    const networkInterfaces = os.networkInterfaces();
-    
-    console.log('\nðŸŽ“ KYP Exam System Server Started!');
-    console.log('==========================================');
-    console.log(`ðŸ–¥ï¸  Server running on port: ${PORT}`);
-    console.log(`ðŸŒ Local access: http://localhost:${PORT}`);
-    
-    // Show all available IP addresses
-    console.log('\nðŸ“¡ Network Access URLs:');
-    for (const name of Object.keys(networkInterfaces)) {
-        for (const net of networkInterfaces[name]) {
-            if (net.family === 'IPv4' && !net.internal) {
-                console.log(`   ðŸŒ http://${net.address}:${PORT}`);
+const bootCacheLoad = bootCache.load();
+startupTimes.bootCache = performance.now();
+if (bootCacheLoad) {
+    console.log(`♻️  Boot cache loaded: ${Math.round(bootCacheLoad.bytes / 1024)}KB (${Math.round(bootCacheLoad.ms)}ms)`);
+}
+
+// Compress the pages once; express.static serves them until this is done
+staticAssets.build(bootCache.assets())
+    .then(stats => {
+        console.log(`📦 ${stats.files} static files ready: ${Math.round(stats.rawBytes / 1024)}KB -> ${Math.round(stats.sentBytes / 1024)}KB compressed, ${stats.reused} from the boot cache (${stats.ms}ms)`);
+        startupTimes.staticFiles = performance.now();
+        if (writesBootCache && stats.compressed > 0) {
+            return bootCache.save({ assets: staticAssets.compressed() });
+        }
+    })
+    .catch(error => console.error('Error preparing static files:', error));
+
+// Cluster workers first take the owner's copy of the data files
+const dataReady = owner ?
+    Promise.all([
+        dataStore.preload([SUBJECTS_FILE, QUESTIONS_FILE, STUDENTS_FILE, ADMIN_FILE]),
+        liveEvents.preload()
+    ]) :
+    Promise.resolve();
+
+dataReady.then(() => {
+    // Papers of an unchanged question bank are ready without being built
+    const restoredSets = paperSets.restore(bootCache.papers());
+    if (restoredSets > 0) startupTimes.papers = performance.now();
+    schedulePaperBuild();
+    if (!owner) scheduleSnapshots(snapshots);
+
+    // Build the analytics from the stored results in the background
+    resultsAnalytics.load(resultsStore.stream())
+        .then(count => console.log(`📊 Results analytics ready (${count} results)`))
+        .catch(error => console.error('Error loading results analytics:', error));
+
+    app.listen(PORT, '0.0.0.0', () => {
+        startupTimes.listening = performance.now();
+        const ready = `${Math.round(startupTimes.listening)}ms after start, ${restoredSets} paper sets from the boot cache`;
+
+        // Only the first cluster worker prints the welcome banner
+        if (owner && require('cluster').worker.id !== 1) {
+            console.log(`👷 Worker ${process.pid} ready on port ${PORT} (${ready})`);
+            return;
+        }
+
+        const os = require('os');
+        const networkInterfaces = os.networkInterfaces();
+        
+        console.log('\n🎓 KYP Exam System Server Started!');
+        console.log('==========================================');
+        console.log(`🖥️  Server running on port: ${PORT}`);
+        console.log(`🌐 Local access: http://localhost:${PORT}`);
+        console.log(`⚡ Ready for exams ${ready}`);
+        
+        // Show all available IP addresses
+        console.log('\n📡 Network Access URLs:');
+        for (const name of Object.keys(networkInterfaces)) {
+            for (const net of networkInterfaces[name]) {
+                if (net.family === 'IPv4' && !net.internal) {
+                    console.log(`   🌐 http://${net.address}:${PORT}`);
+                }
             }
         }
-    }
-    
-    console.log('\nðŸ“‹ Admin Panel: /admin');
-    console.log('ðŸ”‘ Default Admin: admin / admin123');
-    console.log('\nðŸ’¡ Share the Network URL with all client PCs');
-    console.log('==========================================\n');
+        
+        console.log('\n📋 Admin Panel: /admin');
+        console.log('🔑 Default Admin: admin / admin123');
+        console.log('\n💡 Share the Network URL with all client PCs');
+        console.log('==========================================\n');
+    });
+}).catch(error => {
+    console.error('Error loading data from the storage owner:', error);
+    process.exit(1);
+});
+
+// Finish pending writes before exiting
+let shuttingDown = false;
+['SIGINT', 'SIGTERM'].forEach(signal => {
+    process.on(signal, async () => {
+        if (shuttingDown) return;
+        shuttingDown = true;
+        if (!owner) console.log('\nSaving pending data before shutdown...');
+        await Promise.all([dataStore.flushAll(), resultsStore.drain(), checkpoints.drain(), serverLogs.drain()]);
+        process.exit(0);
+    });
 });
 
 module.exports = app;
@@ -0,0 +1,740 @@
+const crypto = require('crypto');
+const fs = require('fs');
+const path = require('path');
+
+// Incremental, content-addressed snapshots of the data files
+//
+// A snapshot stores every collection (subjects, questions, students, the
+// results log and the question versions results are graded against) as
+// chunks of NDJSON records, one compact JSON record per line.
+// A chunk is saved once, under the SHA-256 of its bytes, in
+// data/snapshots/objects/; a snapshot itself is a manifest in
+// data/snapshots/manifests/ listing the chunks of each collection in order.
+// A record ends a chunk when the hash of its line is 0 modulo
+// AVERAGE_RECORDS, so chunk boundaries move with the content: adding or
+// editing a student changes the chunk around it and leaves every other chunk
+// (and its file) as it was.
+//
+// Taking a snapshot only does work for what changed since the last one:
+//   - a document that has not been written since (the storage 'change'
+//     event) reuses its chunk list without being serialized
+//   - results are read from the log segments, starting after the last
+//     complete chunk of each segment, so a snapshot mid-exam reads and
+//     stores the results submitted since the previous one
+//   - question versions (question-versions.js) never change once saved, so
+//     their chunks are reused until a new version file appears
+//
+// Snapshots are taken on demand (POST /api/admin/snapshots, before imports,
+// restores and deletes, for every export) and every KYP_SNAPSHOT_MINUTES
+// (default 15, 0 turns it off) while the data changes; the newest
+// KYP_SNAPSHOT_KEEP of those timed snapshots are kept.
+//
+// The results log and question versions can only be restored offline
+// (snapshots.py restore, with the server stopped); the server restores the
+// JSON documents.
+// snapshots.py reads and writes the same layout; keep the two in step.
+
+const SNAPSHOT_VERSION = 1;
+const AVERAGE_RECORDS = 64;          // Records per chunk on average
+const MAX_CHUNK_BYTES = 256 * 1024;  // Cut a chunk here even without a boundary
+const CACHE_FILE = 'results-cache.json';
+const PREFIX_BYTES = 4096;           // Checked to tell an appended segment from a replaced one
+const ID_PATTERN = /^[0-9]{8}-[0-9]{9}(-[0-9]+)?$/;
+const VERSION_FILE = /^[0-9a-f]{64}\.json$/;
+const MAX_DIFF_IDS = 20;             // Record ids listed per change type in a diff
+const NEWLINE = Buffer.from('\n');
+const AUTO_MINUTES = process.env.KYP_SNAPSHOT_MINUTES !== undefined ? parseFloat(process.env.KYP_SNAPSHOT_MINUTES) || 0 : 15;
+const AUTO_KEEP = Math.max(1, parseInt(process.env.KYP_SNAPSHOT_KEEP) || 96);
+
+function sha256(buffer) {
+    return crypto.createHash('sha256').update(buffer).digest('hex');
+}
+
+function sha1(buffer) {
+    return crypto.createHash('sha1').update(buffer).digest();
+}
+
+function isBoundary(line) {
+    return sha1(line).readUInt32LE(0) % AVERAGE_RECORDS === 0;
+}
+
+// "20261018-024000123" (UTC), sorts by time
+function snapshotId(date) {
+    return date.toISOString().replace(/[-:T]/g, '').replace('.', '').replace('Z', '').replace(/^(\d{8})/, '$1-');
+}
+
+// Splits a stream of record lines into chunks; chunks are [hash, records, bytes]
+class Chunker {
+    constructor(store) {
+        this.store = store;
+        this.lines = [];
+        this.bytes = 0;
+        this.chunks = [];
+    }
+
+    // Returns true when the line completed a chunk
+    push(line) {
+        this.lines.push(line);
+        this.bytes += line.length + 1;
+        if (isBoundary(line) || this.bytes >= MAX_CHUNK_BYTES) {
+            this.cut();
+            return true;
+        }
+        return false;
+    }
+
+    cut() {
+        if (this.lines.length === 0) return;
+        const body = Buffer.concat(this.lines.flatMap(line => [line, NEWLINE]));
+        this.chunks.push(this.store.putChunk(body, this.lines.length));
+        this.lines = [];
+        this.bytes = 0;
+    }
+
+    end() {
+        this.cut();
+        return this.chunks;
+    }
+}
+
+async function writeFileDurable(filepath, data) {
+    const tmpFile = filepath + '.tmp';
+    const handle = await fs.promises.open(tmpFile, 'w');
+    try {
+        await handle.writeFile(data);
+        await handle.sync();
+    } finally {
+        await handle.close();
+    }
+    await fs.promises.rename(tmpFile, filepath);
+}
+
+// Whole lines of a file between two offsets (a half-written last line is left
+// for the next read)
+async function readLines(filepath, start, end) {
+    if (end <= start) return [];
+    const handle = await fs.promises.open(filepath, 'r');
+    try {
+        const buffer = Buffer.alloc(end - start);
+        const { bytesRead } = await handle.read(buffer, 0, buffer.length, start);
+        const lines = [];
+        let from = 0;
+        for (let i = 0; i < bytesRead; i++) {
+            if (buffer[i] === 0x0a) {
+                lines.push(buffer.subarray(from, i));
+                from = i + 1;
+            }
+        }
+        return lines;
+    } finally {
+        await handle.close();
+    }
+}
+
+// SHA-1 of the first bytes of a file (up to PREFIX_BYTES of `length`)
+async function prefixHash(filepath, length) {
+    const size = Math.min(length, PREFIX_BYTES);
+    if (size === 0) return '';
+    const handle = await fs.promises.open(filepath, 'r');
+    try {
+        const buffer = Buffer.alloc(size);
+        await handle.read(buffer, 0, size, 0);
+        return sha1(buffer).toString('hex');
+    } finally {
+        await handle.close();
+    }
+}
+
+// One ustar header block
+function tarHeader(name, size, mtime) {
+    const header = Buffer.alloc(512);
+    const slash = name.lastIndexOf('/');
+    if (Buffer.byteLength(name) > 100 && slash > 0) {
+        header.write(name.slice(slash + 1), 0, 100);
+        header.write(name.slice(0, slash), 345, 155);
+    } else {
+        header.write(name, 0, 100);
+    }
+    header.write('0000644\0', 100);
+    header.write('0000000\0', 108);
+    header.write('0000000\0', 116);
+    header.write(size.toString(8).padStart(11, '0') + '\0', 124);
+    header.write(Math.floor(mtime / 1000).toString(8).padStart(11, '0') + '\0', 136);
+    header.write('        ', 148);
+    header.write('0', 156);
+    header.write('ustar\0' + '00', 257);
+    let checksum = 0;
+    for (const byte of header) checksum += byte;
+    header.write(checksum.toString(8).padStart(6, '0') + '\0 ', 148);
+    return header;
+}
+
+function tarPadding(size) {
+    return Buffer.alloc((512 - (size % 512)) % 512);
+}
+
+class SnapshotStore {
+    // storage: JSONStorage (or null to only read snapshots); documents:
+    // { collection: filepath } of the JSON documents to include
+    constructor(dir, { storage = null, documents = {}, resultsDir = null, legacyResultsFile = null, versionsDir = null } = {}) {
+        this.dir = dir;
+        this.objectsDir = path.join(dir, 'objects');
+        this.manifestsDir = path.join(dir, 'manifests');
+        this.storage = storage;
+        this.documents = documents;
+        this.resultsDir = resultsDir;
+        this.legacyResultsFile = legacyResultsFile;
+        this.versionsDir = versionsDir;
+
+        this.parts = new Map();   // collection -> { kind, parts } of the last snapshot, until changed
+        this.cache = { legacy: null, segments: {} }; // Where the last snapshot stopped reading results
+        this.pending = null;      // hash -> chunk bytes to write with the running snapshot
+        this.creating = Promise.resolve();
+
+        if (storage) {
+            const byFile = new Map(Object.entries(documents).map(([name, filepath]) => [filepath, name]));
+            storage.on('change', (filepath) => {
+                if (byFile.has(filepath)) this.parts.delete(byFile.get(filepath));
+            });
+        }
+    }
+
+    open() {
+        fs.mkdirSync(this.objectsDir, { recursive: true });
+        fs.mkdirSync(this.manifestsDir, { recursive: true });
+        try {
+            const cacheFile = path.join(this.dir, CACHE_FILE);
+            if (fs.existsSync(cacheFile)) {
+                this.cache = JSON.parse(fs.readFileSync(cacheFile, 'utf8'));
+            }
+        } catch (error) {
+            console.error('Error reading snapshot cache, results are read again:', error.message);
+        }
+    }
+
+    objectPath(hash) {
+        return path.join(this.objectsDir, hash.slice(0, 2), hash);
+    }
+
+    // Chunk bytes -> [hash, records, bytes]; saved with the snapshot unless
+    // an earlier snapshot has it already
+    putChunk(body, records) {
+        const hash = sha256(body);
+        if (!this.pending.has(hash) && !fs.existsSync(this.objectPath(hash))) {
+            this.pending.set(hash, body);
+        }
+        return [hash, records, body.length];
+    }
+
+    readChunk(hash) {
+        return fs.promises.readFile(this.objectPath(hash));
+    }
+
+    chunkRecords(records) {
+        const chunker = new Chunker(this);
+        for (const record of records) {
+            chunker.push(Buffer.from(JSON.stringify(record), 'utf8'));
+        }
+        return chunker.end();
+    }
+
+    // A JSON document as { kind, parts }: arrays are one part, objects of
+    // arrays (questions.json) one part per key
+    documentCollection(name) {
+        if (this.parts.has(name)) {
+            return this.parts.get(name);
+        }
+        const doc = this.storage.read(this.documents[name]);
+        let collection;
+        if (doc && typeof doc === 'object' && !Array.isArray(doc)) {
+            collection = {
+                kind: 'object',
+                parts: Object.entries(doc).map(([key, list]) => ({
+                    key,
+                    chunks: this.chunkRecords(Array.isArray(list) ? list : [])
+                }))
+            };
+        } else {
+            collection = { kind: 'array', parts: [{ chunks: this.chunkRecords(Array.isArray(doc) ? doc : []) }] };
+        }
+        this.parts.set(name, collection);
+        return collection;
+    }
+
+    // Chunks of the results log; returns { chunks, cache } (cache is kept once
+    // the snapshot is saved)
+    async resultsCollection() {
+        const chunks = [];
+        const cache = { legacy: null, segments: {} };
+
+        if (this.legacyResultsFile && fs.existsSync(this.legacyResultsFile)) {
+            const stat = await fs.promises.stat(this.legacyResultsFile);
+            const stamp = `${stat.size}:${stat.mtimeMs}`;
+            if (this.cache.legacy && this.cache.legacy.stamp === stamp) {
+                cache.legacy = this.cache.legacy;
+            } else {
+                const text = (await fs.promises.readFile(this.legacyResultsFile, 'utf8')).replace(/^\uFEFF/, '');
+                const records = JSON.parse(text);
+                cache.legacy = { stamp, chunks: this.chunkRecords(Array.isArray(records) ? records : []) };
+            }
+            chunks.push(...cache.legacy.chunks);
+        }
+
+        const names = fs.existsSync(this.resultsDir) ?
+            fs.readdirSync(this.resultsDir).filter(name => /^segment-\d{6}\.jsonl$/.test(name)).sort() : [];
+        for (const name of names) {
+            const filepath = path.join(this.resultsDir, name);
+            const stat = await fs.promises.stat(filepath);
+            let closed = [];
+            let start = 0;
+
+            // An appended segment continues after its last complete chunk; a
+            // compacted or replaced one is read again
+            const previous = this.cache.segments[name];
+            if (previous && previous.ino === stat.ino && previous.start <= stat.size &&
+                previous.prefix === await prefixHash(filepath, previous.start)) {
+                closed = previous.closed;
+                start = previous.start;
+            }
+
+            const chunker = new Chunker(this);
+            let offset = start;
+            let end = start;
+            let cut = 0;
+            for (const line of await readLines(filepath, start, stat.size)) {
+                offset += line.length + 1;
+                if (line.length === 0) continue;
+                if (chunker.push(line)) {
+                    cut = chunker.chunks.length;
+                    end = offset;
+                }
+            }
+            const read = chunker.end();
+            closed = closed.concat(read.slice(0, cut));
+
+            cache.segments[name] = { ino: stat.ino, start: end, prefix: await prefixHash(filepath, end), closed };
+            chunks.push(...closed, ...read.slice(cut));
+        }
+        return { chunks, cache };
+    }
+
+    // Chunks of the question versions: one record per file, its bytes as
+    // they are (a version is one line of compact JSON). Every file there was
+    // saved for a result. Returns { chunks, cache } like resultsCollection().
+    async versionsCollection() {
+        const names = this.versionsDir && fs.existsSync(this.versionsDir) ?
+            fs.readdirSync(this.versionsDir).filter(name => VERSION_FILE.test(name)).sort() : [];
+        const previous = this.cache.versions;
+        if (previous && previous.names.length === names.length && previous.names.every((name, i) => name === names[i])) {
+            return { chunks: previous.chunks, cache: previous };
+        }
+
+        const chunker = new Chunker(this);
+        for (const name of names) {
+            const body = await fs.promises.readFile(path.join(this.versionsDir, name));
+            if (body.length > 0) chunker.push(body);
+        }
+        const chunks = chunker.end();
+        return { chunks, cache: { names, chunks } };
+    }
+
+    // Take a snapshot (one at a time). With skipUnchanged, nothing is saved
+    // when the data is the same as in the last snapshot, and that one is
+    // returned with unchanged: true.
+    create(options = {}) {
+        return this.queue(() => this.createNow(options));
+    }
+
+    // Snapshots and prunes run one at a time, so a prune never deletes the
+    // chunks of a snapshot that is still being written
+    queue(task) {
+        const run = this.creating.then(task);
+        this.creating = run.catch(() => {});
+        return run;
+    }
+
+    async createNow({ label = '', reason = 'manual', skipUnchanged = false } = {}) {
+        const started = process.hrtime.bigint();
+        this.pending = new Map();
+        try {
+            // The documents are taken in one go, before anything is awaited
+            const collections = {};
+            for (const name of Object.keys(this.documents)) {
+                collections[name] = this.documentCollection(name);
+            }
+            const results = await this.resultsCollection();
+            collections.results = { kind: 'log', parts: [{ chunks: results.chunks }] };
+            const versions = await this.versionsCollection();
+            collections.versions = { kind: 'files', parts: [{ chunks: versions.chunks }] };
+            results.cache.versions = versions.cache;
+
+            const latest = await this.latest();
+            if (skipUnchanged && latest && JSON.stringify(latest.collections) === JSON.stringify(collections)) {
+                this.cache = results.cache;
+                return { ...this.summary(latest), unchanged: true };
+            }
+
+            let newBytes = 0;
+            for (const [hash, body] of this.pending) {
+                await fs.promises.mkdir(path.dirname(this.objectPath(hash)), { recursive: true });
+                await writeFileDurable(this.objectPath(hash), body);
+                newBytes += body.length;
+            }
+
+            const now = new Date();
+            let id = snapshotId(now);
+            for (let n = 2; fs.existsSync(this.manifestPath(id)); n++) {
+                id = `${snapshotId(now)}-${n}`;
+            }
+            const records = {};
+            let bytes = 0;
+            for (const [name, collection] of Object.entries(collections)) {
+                records[name] = 0;
+                for (const part of collection.parts) {
+                    for (const [, count, size] of part.chunks) {
+                        records[name] += count;
+                        bytes += size;
+                    }
+                }
+            }
+            const manifest = {
+                version: SNAPSHOT_VERSION,
+                id,
+                createdAt: now.toISOString(),
+                label: String(label || '').slice(0, 200),
+                reason,
+                stats: {
+                    records,
+                    bytes,
+                    newChunks: this.pending.size,
+                    newBytes,
+                    durationMs: Math.round(Number(process.hrtime.bigint() - started) / 1e5) / 10
+                },
+                collections
+            };
+            await writeFileDurable(this.manifestPath(id), JSON.stringify(manifest));
+            this.cache = results.cache;
+            this.latestManifest = manifest;
+            await writeFileDurable(path.join(this.dir, CACHE_FILE), JSON.stringify(this.cache));
+            return this.summary(manifest);
+        } finally {
+            this.pending = null;
+        }
+    }
+
+    manifestPath(id) {
+        return path.join(this.manifestsDir, id + '.json');
+    }
+
+    // Snapshot ids, oldest first
+    ids() {
+        if (!fs.existsSync(this.manifestsDir)) return [];
+        return fs.readdirSync(this.manifestsDir)
+            .filter(name => name.endsWith('.json'))
+            .map(name => name.slice(0, -5))
+            .filter(id => ID_PATTERN.test(id))
+            .sort();
+    }
+
+    // The manifest of a snapshot, or null
+    async get(id) {
+        if (!ID_PATTERN.test(String(id))) return null;
+        try {
+            return JSON.parse(await fs.promises.readFile(this.manifestPath(id), 'utf8'));
+        } catch (error) {
+            if (error.code === 'ENOENT') return null;
+            throw error;
+        }
+    }
+
+    async latest() {
+        const ids = this.ids();
+        if (ids.length === 0) return null;
+        const id = ids[ids.length - 1];
+        if (this.latestManifest && this.latestManifest.id === id) {
+            return this.latestManifest;
+        }
+        return this.get(id);
+    }
+
+    summary(manifest) {
+        const { collections, ...summary } = manifest;
+        return summary;
+    }
+
+    // Summaries of every snapshot, newest first
+    async list() {
+        const summaries = [];
+        for (const id of this.ids().reverse()) {
+            const manifest = await this.get(id);
+            if (manifest) summaries.push(this.summary(manifest));
+        }
+        return summaries;
+    }
+
+    // Record lines of a collection in order: yields { key, line } (key: the
+    // subject of a questions.json record, undefined otherwise)
+    async *records(manifest, name) {
+        const collection = manifest.collections[name];
+        if (!collection) return;
+        for (const part of collection.parts) {
+            for await (const line of this.partLines(part)) {
+                yield { key: part.key, line };
+            }
+        }
+    }
+
+    async *partLines(part) {
+        for (const [hash] of part.chunks) {
+            const body = (await this.readChunk(hash)).toString('utf8');
+            yield* body.split('\n').slice(0, -1);
+        }
+    }
+
+    // Rebuild JSON documents of a snapshot: { subjects: [...], questions: {...} }
+    async documentsOf(manifest, names) {
+        const documents = {};
+        for (const name of names) {
+            const collection = manifest.collections[name];
+            if (!collection || collection.kind === 'log' || collection.kind === 'files') continue;
+            if (collection.kind === 'object') {
+                const doc = {};
+                collection.parts.forEach(part => { doc[part.key] = []; });
+                for await (const { key, line } of this.records(manifest, name)) {
+                    doc[key].push(JSON.parse(line));
+                }
+                documents[name] = doc;
+            } else {
+                const list = [];
+                for await (const { line } of this.records(manifest, name)) {
+                    list.push(JSON.parse(line));
+                }
+                documents[name] = list;
+            }
+        }
+        return documents;
+    }
+
+    // Records that differ between two snapshots, per collection:
+    // { added, removed, changed, ids: { added: [...], ... } }. Only chunks
+    // that are not in both snapshots are read. Question versions go by
+    // their hash (the name of their file).
+    async diff(from, to) {
+        const changes = {};
+        const names = [...new Set([...Object.keys(from.collections), ...Object.keys(to.collections)])];
+        for (const name of names) {
+            const before = this.partsByKey(from.collections[name]);
+            const after = this.partsByKey(to.collections[name]);
+            const collection = from.collections[name] || to.collections[name];
+            const byHash = collection.kind === 'files';
+            const change = { added: 0, removed: 0, changed: 0, ids: { added: [], removed: [], changed: [] } };
+            const note = (type, key, id) => {
+                change[type]++;
+                if (change.ids[type].length < MAX_DIFF_IDS) {
+                    change.ids[type].push(key === undefined ? id : `${key}/${id}`);
+                }
+            };
+
+            for (const key of new Set([...before.keys(), ...after.keys()])) {
+                const oldChunks = before.get(key) || [];
+                const newChunks = after.get(key) || [];
+                const oldHashes = new Set(oldChunks.map(([hash]) => hash));
+                const newHashes = new Set(newChunks.map(([hash]) => hash));
+                const oldRecords = await this.recordsById(oldChunks.filter(([hash]) => !newHashes.has(hash)), byHash);
+                const newRecords = await this.recordsById(newChunks.filter(([hash]) => !oldHashes.has(hash)), byHash);
+                const partKey = key === '' ? undefined : key;
+
+                for (const [id, line] of oldRecords) {
+                    if (!newRecords.has(id)) {
+                        note('removed', partKey, id);
+                    } else if (newRecords.get(id) !== line) {
+                        note('changed', partKey, id);
+                    }
+                }
+                for (const id of newRecords.keys()) {
+                    if (!oldRecords.has(id)) note('added', partKey, id);
+                }
+            }
+            changes[name] = change;
+        }
+        return { from: from.id, to: to.id, changes };
+    }
+
+    partsByKey(collection) {
+        const parts = new Map();
+        for (const part of (collection && collection.parts) || []) {
+            parts.set(part.key === undefined ? '' : part.key, part.chunks);
+        }
+        return parts;
+    }
+
+    // id -> record line of some chunks (records without an id go by their
+    // text; byHash: every record goes by the SHA-256 of its line)
+    async recordsById(chunks, byHash = false) {
+        const records = new Map();
+        for (const [hash] of chunks) {
+            const body = (await this.readChunk(hash)).toString('utf8');
+            for (const line of body.split('\n')) {
+                if (!line) continue;
+                if (byHash) {
+                    records.set(sha256(Buffer.from(line, 'utf8')), line);
+                    continue;
+                }
+                let id;
+                try {
+                    id = JSON.parse(line).id;
+                } catch (error) {
+                    id = undefined;
+                }
+                records.set(id === undefined || id === null ? line : String(id), line);
+            }
+        }
+        return records;
+    }
+
+    // The same document as the old /api/admin/export, built from the chunks
+    async *exportJSON(manifest) {
+        yield '{';
+        let first = true;
+        for (const [name, collection] of Object.entries(manifest.collections)) {
+            yield `${first ? '' : ','}${JSON.stringify(name)}:`;
+            first = false;
+            if (collection.kind === 'object') {
+                yield '{';
+                for (const [i, part] of collection.parts.entries()) {
+                    yield `${i > 0 ? ',' : ''}${JSON.stringify(part.key)}:[`;
+                    let count = 0;
+                    for await (const line of this.partLines(part)) {
+                        yield (count++ > 0 ? ',' : '') + line;
+                    }
+                    yield ']';
+                }
+                yield '}';
+            } else {
+                yield '[';
+                let count = 0;
+                for await (const { line } of this.records(manifest, name)) {
+                    yield (count++ > 0 ? ',' : '') + line;
+                }
+                yield ']';
+            }
+        }
+        yield `,"exportDate":${JSON.stringify(manifest.createdAt)},"snapshot":${JSON.stringify(manifest.id)}}`;
+    }
+
+    // One line per record: { collection, key?, record }, after a header line
+    async *exportNDJSON(manifest) {
+        yield JSON.stringify({ snapshot: this.summary(manifest) }) + '\n';
+        for (const name of Object.keys(manifest.collections)) {
+            const prefix = `{"collection":${JSON.stringify(name)},`;
+            for await (const { key, line } of this.records(manifest, name)) {
+                yield `${prefix}${key === undefined ? '' : `"key":${JSON.stringify(key)},`}"record":${line}}\n`;
+            }
+        }
+    }
+
+    // A tar archive with the manifest and every chunk it uses, which
+    // snapshots.py can verify, import and restore
+    async *exportTar(manifest) {
+        const root = `kyp-snapshot-${manifest.id}`;
+        const mtime = Date.parse(manifest.createdAt);
+        const text = Buffer.from(JSON.stringify(manifest), 'utf8');
+        yield tarHeader(`${root}/manifest.json`, text.length, mtime);
+        yield text;
+        yield tarPadding(text.length);
+
+        const written = new Set();
+        for (const collection of Object.values(manifest.collections)) {
+            for (const part of collection.parts) {
+                for (const [hash] of part.chunks) {
+                    if (written.has(hash)) continue;
+                    written.add(hash);
+                    const body = await this.readChunk(hash);
+                    yield tarHeader(`${root}/objects/${hash}`, body.length, mtime);
+                    yield body;
+                    yield tarPadding(body.length);
+                }
+            }
+        }
+        yield Buffer.alloc(1024);
+    }
+
+    // Keep the newest `keep` snapshots taken for `reason` (and every other
+    // snapshot), then delete chunks no snapshot uses any more
+    prune(reason, keep) {
+        return this.queue(() => this.pruneNow(reason, keep));
+    }
+
+    async pruneNow(reason, keep) {
+        const manifests = [];
+        for (const id of this.ids()) {
+            const manifest = await this.get(id);
+            if (manifest) manifests.push(manifest);
+        }
+        const matching = manifests.filter(manifest => manifest.reason === reason);
+        const doomed = new Set(matching.slice(0, Math.max(0, matching.length - keep)).map(manifest => manifest.id));
+        if (doomed.size === 0) return 0;
+
+        const used = new Set();
+        for (const manifest of manifests) {
+            if (doomed.has(manifest.id)) continue;
+            for (const collection of Object.values(manifest.collections)) {
+                collection.parts.forEach(part => part.chunks.forEach(([hash]) => used.add(hash)));
+            }
+        }
+        // Chunks the next snapshot reuses without looking at them again
+        for (const collection of this.parts.values()) {
+            collection.parts.forEach(part => part.chunks.forEach(([hash]) => used.add(hash)));
+        }
+        Object.values(this.cache.segments).forEach(segment => segment.closed.forEach(([hash]) => used.add(hash)));
+        (this.cache.legacy ? this.cache.legacy.chunks : []).forEach(([hash]) => used.add(hash));
+        (this.cache.versions ? this.cache.versions.chunks : []).forEach(([hash]) => used.add(hash));
+
+        for (const id of doomed) {
+            await fs.promises.unlink(this.manifestPath(id));
+        }
+        for (const dir of await fs.promises.readdir(this.objectsDir)) {
+            for (const hash of await fs.promises.readdir(path.join(this.objectsDir, dir))) {
+                if (!used.has(hash)) {
+                    await fs.promises.unlink(path.join(this.objectsDir, dir, hash));
+                }
+            }
+        }
+        return doomed.size;
+    }
+}
+
+// Joins the many small strings of an export into larger writes
+async function* batched(source, size = 64 * 1024) {
+    let buffered = [];
+    let length = 0;
+    for await (const piece of source) {
+        buffered.push(typeof piece === 'string' ? Buffer.from(piece, 'utf8') : piece);
+        length += buffered[buffered.length - 1].length;
+        if (length >= size) {
+            yield Buffer.concat(buffered);
+            buffered = [];
+            length = 0;
+        }
+    }
+    if (length > 0) yield Buffer.concat(buffered);
+}
+
+// Timed snapshots (skipped while nothing changes), on the process that owns the data
+function scheduleSnapshots(store, minutes = AUTO_MINUTES, keep = AUTO_KEEP) {
+    if (!(minutes > 0)) return null;
+    const timer = setInterval(() => {
+        store.create({ reason: 'auto', skipUnchanged: true })
+            .then(async snapshot => {
+                if (snapshot.unchanged) return;
+                const { newChunks, newBytes, durationMs } = snapshot.stats;
+                console.log(`📸 Snapshot ${snapshot.id}: ${newChunks} new chunks, ${Math.round(newBytes / 1024)}KB (${durationMs}ms)`);
+                await store.prune('auto', keep);
+            })
+            .catch(error => console.error('Error taking snapshot:', error));
+    }, minutes * 60 * 1000);
+    timer.unref();
+    return timer;
+}
+
+module.exports = { SnapshotStore, batched, scheduleSnapshots };
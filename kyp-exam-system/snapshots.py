@@ -0,0 +1,500 @@
+"""Create, check and restore data snapshots offline.
+
+Snapshots are the server's incremental backups (see snapshot-store.js):
+each collection (subjects, questions, students, results, and the question
+versions results are graded against) is stored as chunks of NDJSON records under the SHA-256 of their bytes in
+data/snapshots/objects/, and a snapshot is a manifest in
+data/snapshots/manifests/ listing its chunks. Chunks are cut where a
+record's hash says so, so a new snapshot only stores the chunks around what
+changed. This tool reads and writes the same layout.
+
+Restore and prune with the server stopped: restoring writes the data files
+directly, including the results log (the current data is snapshotted before
+anything is replaced), and the server's next snapshot reuses chunks of its
+last one without checking that they are still there. Restoring results also
+puts back the question versions they need; versions are only ever added.
+
+Usage:
+    python snapshots.py list
+    python snapshots.py create --label "before exam"
+    python snapshots.py verify                      # every snapshot
+    python snapshots.py diff 20261018-090000000 20261018-120000000
+    python snapshots.py restore 20261018-090000000 --collections questions
+    python snapshots.py export 20261018-090000000 --format tar -o backup.tar
+    python snapshots.py import backup.tar
+    python snapshots.py prune --keep 20
+"""
+import argparse
+import hashlib
+import io
+import json
+import os
+import re
+import sys
+import tarfile
+import time
+from datetime import datetime, timezone
+
+from kyp_data import (DATA_DIR, RESULTS_DIR, RESULTS_FILE, VERSIONS_DIR, atomic_write, dump_json,
+                      iter_json_array, list_segments, load_json, recover_compaction, replace_segments,
+                      segment_name)
+
+# Must match snapshot-store.js
+SNAPSHOT_VERSION = 1
+AVERAGE_RECORDS = 64
+MAX_CHUNK_BYTES = 256 * 1024
+ID_PATTERN = re.compile(r'^[0-9]{8}-[0-9]{9}(-[0-9]+)?$')
+DOCUMENTS = {'subjects': 'subjects.json', 'questions': 'questions.json', 'students': 'students.json'}
+VERSION_FILE = re.compile(r'^[0-9a-f]{64}\.json$')
+
+
+def record_line(record):
+    """A record as the server writes it: compact JSON, UTF-8."""
+    return json.dumps(record, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+
+
+def is_boundary(line):
+    return int.from_bytes(hashlib.sha1(line).digest()[:4], 'little') % AVERAGE_RECORDS == 0
+
+
+class Store:
+    def __init__(self, data_dir):
+        self.data_dir = data_dir
+        self.dir = os.path.join(data_dir, 'snapshots')
+        self.objects_dir = os.path.join(self.dir, 'objects')
+        self.manifests_dir = os.path.join(self.dir, 'manifests')
+        self.new_chunks = 0
+        self.new_bytes = 0
+
+    def object_path(self, digest):
+        return os.path.join(self.objects_dir, digest[:2], digest)
+
+    def manifest_path(self, snapshot_id):
+        return os.path.join(self.manifests_dir, snapshot_id + '.json')
+
+    def ids(self):
+        if not os.path.isdir(self.manifests_dir):
+            return []
+        return sorted(name[:-5] for name in os.listdir(self.manifests_dir)
+                      if name.endswith('.json') and ID_PATTERN.match(name[:-5]))
+
+    def get(self, snapshot_id):
+        if not ID_PATTERN.match(snapshot_id) or not os.path.exists(self.manifest_path(snapshot_id)):
+            print(f"❌ No snapshot {snapshot_id}")
+            sys.exit(1)
+        return load_json(self.manifest_path(snapshot_id))
+
+    def read_chunk(self, digest):
+        with open(self.object_path(digest), 'rb') as f:
+            return f.read()
+
+    def put_chunk(self, body, records):
+        digest = hashlib.sha256(body).hexdigest()
+        path = self.object_path(digest)
+        if not os.path.exists(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            atomic_write(path, lambda f: f.write(body), mode='wb')
+            self.new_chunks += 1
+            self.new_bytes += len(body)
+        return [digest, records, len(body)]
+
+    def chunk_lines(self, lines):
+        """Chunks ([hash, records, bytes]) of an iterable of record lines."""
+        chunks = []
+        pending = []
+        size = 0
+        for line in lines:
+            pending.append(line)
+            size += len(line) + 1
+            if is_boundary(line) or size >= MAX_CHUNK_BYTES:
+                chunks.append(self.put_chunk(b''.join(l + b'\n' for l in pending), len(pending)))
+                pending, size = [], 0
+        if pending:
+            chunks.append(self.put_chunk(b''.join(l + b'\n' for l in pending), len(pending)))
+        return chunks
+
+    def lines(self, part):
+        for digest, _, _ in part['chunks']:
+            yield from self.read_chunk(digest).split(b'\n')[:-1]
+
+    def records(self, manifest, name):
+        """(key, line) of a collection in order; key is the subject of a
+        questions.json record, None otherwise."""
+        for part in manifest['collections'].get(name, {}).get('parts', []):
+            for line in self.lines(part):
+                yield part.get('key'), line
+
+
+def segment_lines(path):
+    with open(path, 'rb') as f:
+        for line in f:
+            # A half-written last line is left out, like the server does
+            if line.endswith(b'\n') and line.strip():
+                yield line.rstrip(b'\r\n')
+
+
+def result_chunks(store):
+    """Chunks of the results log, oldest first. The legacy results.json and
+    each segment are chunked on their own, as the server does."""
+    chunks = []
+    legacy = os.path.join(store.data_dir, RESULTS_FILE)
+    if os.path.exists(legacy):
+        chunks += store.chunk_lines(record_line(record) for record in iter_json_array(legacy))
+    results_dir = os.path.join(store.data_dir, RESULTS_DIR)
+    for seq in list_segments(results_dir):
+        chunks += store.chunk_lines(segment_lines(os.path.join(results_dir, segment_name(seq))))
+    return chunks
+
+
+def version_chunks(store):
+    """Chunks of the question versions: one record per file, its bytes as
+    they are, in file name order, as the server does."""
+    versions_dir = os.path.join(store.data_dir, VERSIONS_DIR)
+    names = sorted(name for name in os.listdir(versions_dir) if VERSION_FILE.match(name)) \
+        if os.path.isdir(versions_dir) else []
+
+    def lines():
+        for name in names:
+            with open(os.path.join(versions_dir, name), 'rb') as f:
+                body = f.read()
+            if body:
+                yield body
+    return store.chunk_lines(lines())
+
+
+def snapshot_id(now):
+    return now.strftime('%Y%m%d-%H%M%S') + f'{now.microsecond // 1000:03d}'
+
+
+def create(store, label='', reason='manual'):
+    started = time.perf_counter()
+    os.makedirs(store.manifests_dir, exist_ok=True)
+    recover_compaction(store.data_dir)
+
+    collections = {}
+    for name, filename in DOCUMENTS.items():
+        path = os.path.join(store.data_dir, filename)
+        doc = load_json(path) if os.path.exists(path) else []
+        if isinstance(doc, dict):
+            collections[name] = {'kind': 'object', 'parts': [
+                {'key': key, 'chunks': store.chunk_lines(record_line(r) for r in (items if isinstance(items, list) else []))}
+                for key, items in doc.items()]}
+        else:
+            items = doc if isinstance(doc, list) else []
+            collections[name] = {'kind': 'array', 'parts': [{'chunks': store.chunk_lines(record_line(r) for r in items)}]}
+    collections['results'] = {'kind': 'log', 'parts': [{'chunks': result_chunks(store)}]}
+    collections['versions'] = {'kind': 'files', 'parts': [{'chunks': version_chunks(store)}]}
+
+    now = datetime.now(timezone.utc)
+    new_id = snapshot_id(now)
+    n = 2
+    while os.path.exists(store.manifest_path(new_id)):
+        new_id = f'{snapshot_id(now)}-{n}'
+        n += 1
+    records = {name: sum(c[1] for p in col['parts'] for c in p['chunks']) for name, col in collections.items()}
+    manifest = {
+        'version': SNAPSHOT_VERSION,
+        'id': new_id,
+        'createdAt': now.isoformat(timespec='milliseconds').replace('+00:00', 'Z'),
+        'label': label[:200],
+        'reason': reason,
+        'stats': {
+            'records': records,
+            'bytes': sum(c[2] for col in collections.values() for p in col['parts'] for c in p['chunks']),
+            'newChunks': store.new_chunks,
+            'newBytes': store.new_bytes,
+            'durationMs': round((time.perf_counter() - started) * 1000, 1),
+        },
+        'collections': collections,
+    }
+    atomic_write(store.manifest_path(new_id),
+                 lambda f: json.dump(manifest, f, ensure_ascii=False, separators=(',', ':')))
+    return manifest
+
+
+def describe(manifest):
+    stats = manifest.get('stats', {})
+    counts = ', '.join(f'{count} {name}' for name, count in stats.get('records', {}).items())
+    label = f" \"{manifest['label']}\"" if manifest.get('label') else ''
+    return f"{manifest['id']}  {manifest.get('reason', ''):<8}{label}  {counts}"
+
+
+def verify(store, ids):
+    checked = set()
+    problems = 0
+    for snapshot_id_ in ids:
+        manifest = store.get(snapshot_id_)
+        bad = 0
+        for name, collection in manifest['collections'].items():
+            for part in collection['parts']:
+                for digest, records, size in part['chunks']:
+                    if digest in checked:
+                        continue
+                    path = store.object_path(digest)
+                    if not os.path.exists(path):
+                        print(f"  ❌ {manifest['id']} {name}: chunk {digest[:12]} is missing")
+                        bad += 1
+                        continue
+                    body = store.read_chunk(digest)
+                    lines = body.split(b'\n')[:-1]
+                    if hashlib.sha256(body).hexdigest() != digest or len(body) != size or len(lines) != records:
+                        print(f"  ❌ {manifest['id']} {name}: chunk {digest[:12]} is damaged")
+                        bad += 1
+                        continue
+                    try:
+                        for line in lines:
+                            json.loads(line)
+                    except ValueError:
+                        print(f"  ❌ {manifest['id']} {name}: chunk {digest[:12]} has an unreadable record")
+                        bad += 1
+                        continue
+                    checked.add(digest)
+        print(f"{'✅' if bad == 0 else '❌'} {describe(manifest)}")
+        problems += bad
+    return problems
+
+
+def records_by_id(store, chunks, by_hash=False):
+    """id -> record line; with by_hash (question versions) every record goes
+    by the SHA-256 of its line."""
+    records = {}
+    for digest, _, _ in chunks:
+        for line in store.read_chunk(digest).split(b'\n')[:-1]:
+            if by_hash:
+                records[hashlib.sha256(line).hexdigest()] = line
+                continue
+            try:
+                record_id = json.loads(line).get('id')
+            except (ValueError, AttributeError):
+                record_id = None
+            records[line if record_id is None else str(record_id)] = line
+    return records
+
+
+def diff(store, before, after):
+    """Same comparison as SnapshotStore.diff(): only chunks that are not in
+    both snapshots are read, question versions go by their hash."""
+    for name in dict.fromkeys(list(before['collections']) + list(after['collections'])):
+        old_parts = {p.get('key') or '': p['chunks'] for p in before['collections'].get(name, {}).get('parts', [])}
+        new_parts = {p.get('key') or '': p['chunks'] for p in after['collections'].get(name, {}).get('parts', [])}
+        by_hash = (before['collections'].get(name) or after['collections'].get(name))['kind'] == 'files'
+        changes = {'added': [], 'removed': [], 'changed': []}
+        for key in dict.fromkeys(list(old_parts) + list(new_parts)):
+            old_chunks, new_chunks = old_parts.get(key, []), new_parts.get(key, [])
+            old_hashes = {c[0] for c in old_chunks}
+            new_hashes = {c[0] for c in new_chunks}
+            old = records_by_id(store, [c for c in old_chunks if c[0] not in new_hashes], by_hash)
+            new = records_by_id(store, [c for c in new_chunks if c[0] not in old_hashes], by_hash)
+            label = (lambda record_id: f'{key}/{record_id}') if key else str
+            for record_id, line in old.items():
+                if record_id not in new:
+                    changes['removed'].append(label(record_id))
+                elif new[record_id] != line:
+                    changes['changed'].append(label(record_id))
+            changes['added'].extend(label(record_id) for record_id in new if record_id not in old)
+
+        summary = ', '.join(f'{len(ids)} {kind}' for kind, ids in changes.items() if ids) or 'no changes'
+        print(f"{name}: {summary}")
+        for kind, ids in changes.items():
+            if ids:
+                shown = ', '.join(str(i) if not isinstance(i, bytes) else '(record without id)' for i in ids[:10])
+                print(f"   {kind}: {shown}{' …' if len(ids) > 10 else ''}")
+
+
+def restore(store, manifest, names, dry_run):
+    for name in names:
+        count = sum(c[1] for p in manifest['collections'].get(name, {}).get('parts', []) for c in p['chunks'])
+        print(f"  {name}: {count} records")
+    if dry_run:
+        print("Dry run: nothing restored")
+        return
+
+    backup = create(store, label=f"before restoring {manifest['id']}", reason='restore')
+    print(f"💾 Current data saved as snapshot {backup['id']}")
+
+    for name in names:
+        collection = manifest['collections'].get(name)
+        if collection is None:
+            print(f"⚠️  {name} is not in this snapshot, left as it is")
+            continue
+        if name == 'results':
+            results_dir = os.path.join(store.data_dir, RESULTS_DIR)
+            os.makedirs(results_dir, exist_ok=True)
+            recover_compaction(store.data_dir)
+            legacy = os.path.exists(os.path.join(store.data_dir, RESULTS_FILE))
+
+            def write(f):
+                for _, line in store.records(manifest, 'results'):
+                    f.write(line.decode('utf-8') + '\n')
+            # The whole log becomes segment 0 (history), the server starts a new one after it
+            replace_segments(store.data_dir, 0, list_segments(results_dir), write, legacy=legacy)
+        elif name == 'versions':
+            # A version file is named by the hash of its bytes; existing ones are kept
+            versions_dir = os.path.join(store.data_dir, VERSIONS_DIR)
+            os.makedirs(versions_dir, exist_ok=True)
+            for _, line in store.records(manifest, 'versions'):
+                path = os.path.join(versions_dir, hashlib.sha256(line).hexdigest() + '.json')
+                if not os.path.exists(path):
+                    atomic_write(path, lambda f: f.write(line), mode='wb')
+        elif collection['kind'] == 'object':
+            doc = {part['key']: [] for part in collection['parts']}
+            for key, line in store.records(manifest, name):
+                doc[key].append(json.loads(line))
+            dump_json(os.path.join(store.data_dir, DOCUMENTS[name]), doc)
+        else:
+            dump_json(os.path.join(store.data_dir, DOCUMENTS[name]),
+                      [json.loads(line) for _, line in store.records(manifest, name)])
+        print(f"✅ Restored {name}")
+
+
+def export(store, manifest, fmt, output):
+    if fmt == 'tar':
+        root = f"kyp-snapshot-{manifest['id']}"
+        with tarfile.open(output, 'w', format=tarfile.USTAR_FORMAT) as tar:
+            def add(name, data):
+                info = tarfile.TarInfo(f'{root}/{name}')
+                info.size = len(data)
+                info.mtime = int(time.time())
+                tar.addfile(info, io.BytesIO(data))
+            add('manifest.json', json.dumps(manifest, ensure_ascii=False, separators=(',', ':')).encode('utf-8'))
+            written = set()
+            for collection in manifest['collections'].values():
+                for part in collection['parts']:
+                    for digest, _, _ in part['chunks']:
+                        if digest not in written:
+                            written.add(digest)
+                            add(f'objects/{digest}', store.read_chunk(digest))
+        return
+
+    summary = {k: v for k, v in manifest.items() if k != 'collections'}
+    with open(output, 'w', encoding='utf-8', newline='\n') as f:
+        f.write(json.dumps({'snapshot': summary}, ensure_ascii=False) + '\n')
+        for name in manifest['collections']:
+            for key, line in store.records(manifest, name):
+                prefix = f'{{"collection":{json.dumps(name)},'
+                if key is not None:
+                    prefix += f'"key":{json.dumps(key, ensure_ascii=False)},'
+                f.write(prefix + '"record":' + line.decode('utf-8') + '}\n')
+
+
+def import_archive(store, archive):
+    """Add the snapshot in a tar export to this data directory."""
+    with tarfile.open(archive, 'r') as tar:
+        manifest = None
+        added = 0
+        for member in tar.getmembers():
+            if not member.isfile():
+                continue
+            data = tar.extractfile(member).read()
+            name = member.name.rsplit('/', 2)
+            if name[-1] == 'manifest.json':
+                manifest = json.loads(data)
+            elif len(name) >= 2 and name[-2] == 'objects':
+                digest = name[-1]
+                if hashlib.sha256(data).hexdigest() != digest:
+                    print(f"❌ {member.name} is damaged")
+                    sys.exit(1)
+                if not os.path.exists(store.object_path(digest)):
+                    os.makedirs(os.path.dirname(store.object_path(digest)), exist_ok=True)
+                    atomic_write(store.object_path(digest), lambda f: f.write(data), mode='wb')
+                    added += 1
+    if manifest is None or not ID_PATTERN.match(manifest.get('id', '')):
+        print("❌ No snapshot manifest in the archive")
+        sys.exit(1)
+    os.makedirs(store.manifests_dir, exist_ok=True)
+    if not os.path.exists(store.manifest_path(manifest['id'])):
+        atomic_write(store.manifest_path(manifest['id']),
+                     lambda f: json.dump(manifest, f, ensure_ascii=False, separators=(',', ':')))
+    print(f"✅ Imported {describe(manifest)} ({added} new chunks)")
+
+
+def prune(store, keep, reason):
+    manifests = [load_json(store.manifest_path(i)) for i in store.ids()]
+    matching = [m for m in manifests if reason is None or m.get('reason') == reason]
+    doomed = {m['id'] for m in matching[:max(0, len(matching) - keep)]}
+    used = {c[0] for m in manifests if m['id'] not in doomed
+            for col in m['collections'].values() for p in col['parts'] for c in p['chunks']}
+    for snapshot_id_ in doomed:
+        os.remove(store.manifest_path(snapshot_id_))
+    freed = 0
+    if os.path.isdir(store.objects_dir):
+        for folder in os.listdir(store.objects_dir):
+            for digest in os.listdir(os.path.join(store.objects_dir, folder)):
+                if digest not in used:
+                    path = os.path.join(store.objects_dir, folder, digest)
+                    freed += os.path.getsize(path)
+                    os.remove(path)
+    print(f"🗑️  Removed {len(doomed)} snapshots, {freed / 1024:.0f}KB of chunks no snapshot uses")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='KYP data snapshots')
+    parser.add_argument('--data-dir', default=DATA_DIR, help='data directory (default: ./data)')
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    commands.add_parser('list', help='list snapshots, newest first')
+    p = commands.add_parser('create', help='snapshot the data files now')
+    p.add_argument('--label', default='')
+    p = commands.add_parser('verify', help='check that snapshots are complete and undamaged')
+    p.add_argument('ids', nargs='*', help='snapshot ids (default: all)')
+    p = commands.add_parser('diff', help='records changed between two snapshots')
+    p.add_argument('before')
+    p.add_argument('after', nargs='?', help='default: the newest snapshot')
+    p = commands.add_parser('restore', help='put the data back as it was in a snapshot (server stopped)')
+    p.add_argument('id')
+    p.add_argument('--collections', default='subjects,questions,students,results,versions',
+                   help='comma-separated (default: all)')
+    p.add_argument('--dry-run', action='store_true')
+    p = commands.add_parser('export', help='write a snapshot as NDJSON or a tar archive')
+    p.add_argument('id')
+    p.add_argument('--format', choices=['ndjson', 'tar'], default='tar')
+    p.add_argument('-o', '--output', required=True)
+    p = commands.add_parser('import', help='add a snapshot from a tar export')
+    p.add_argument('archive')
+    p = commands.add_parser('prune', help='delete old snapshots and the chunks only they use')
+    p.add_argument('--keep', type=int, required=True, help='snapshots to keep (newest)')
+    p.add_argument('--reason', help='only prune snapshots taken for this reason (e.g. auto)')
+    args = parser.parse_args()
+
+    store = Store(args.data_dir)
+
+    if args.command == 'list':
+        ids = store.ids()
+        for snapshot_id_ in reversed(ids):
+            print(describe(store.get(snapshot_id_)))
+        print(f"{len(ids)} snapshots")
+    elif args.command == 'create':
+        manifest = create(store, label=args.label)
+        stats = manifest['stats']
+        print(f"✅ Snapshot {manifest['id']}: {stats['newChunks']} new chunks, "
+              f"{stats['newBytes'] / 1024:.0f}KB new of {stats['bytes'] / 1024:.0f}KB ({stats['durationMs']}ms)")
+    elif args.command == 'verify':
+        problems = verify(store, args.ids or store.ids())
+        if problems:
+            print(f"❌ {problems} damaged or missing chunks")
+            sys.exit(1)
+    elif args.command == 'diff':
+        after = args.after or (store.ids() or [None])[-1]
+        diff(store, store.get(args.before), store.get(after))
+    elif args.command == 'restore':
+        names = [name.strip() for name in args.collections.split(',') if name.strip()]
+        unknown = [name for name in names if name not in DOCUMENTS and name not in ('results', 'versions')]
+        if unknown:
+            print(f"❌ Unknown collections: {', '.join(unknown)}")
+            sys.exit(1)
+        if 'results' in names and 'versions' not in names:
+            names.append('versions')  # Results are shown through their versions
+        manifest = store.get(args.id)
+        print(f"Restoring {describe(manifest)}")
+        restore(store, manifest, names, args.dry_run)
+    elif args.command == 'export':
+        export(store, store.get(args.id), args.format, args.output)
+        print(f"✅ Wrote {args.output}")
+    elif args.command == 'import':
+        import_archive(store, args.archive)
+    elif args.command == 'prune':
+        prune(store, args.keep, args.reason)
+
+
+if __name__ == '__main__':
+    main()
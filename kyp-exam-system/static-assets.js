@@ -0,0 +1,252 @@
+const fs = require('fs');
+const path = require('path');
+const zlib = require('zlib');
+const crypto = require('crypto');
+const { promisify } = require('util');
+
+const gzip = promisify(zlib.gzip);
+const brotliCompress = promisify(zlib.brotliCompress);
+
+// Static files of public/ (the exam and admin pages)
+//
+// build() reads every file once at startup, and for text files prepares
+// gzip and brotli versions, so a page load at the start of an exam costs a
+// memory copy instead of a disk read plus compression per browser. Each
+// response carries the right Content-Type, a content-hash ETag and
+// Vary: Accept-Encoding, and a browser that already has the file gets a 304.
+// HTML is revalidated on every load (no-cache); other assets are cached for
+// a day.
+//
+// When a minified copy sits next to a file (admin.min.html next to
+// admin.html, app.min.js next to app.js) it is served under the normal name.
+//
+// Compressed copies from the previous run (the boot cache, see
+// boot-cache.js) are reused for files whose content hash is unchanged.
+//
+// Files are not watched: restart the server after changing public/. Until
+// build() has finished, and for files too large to keep in memory, requests
+// fall through to express.static.
+
+const MAX_CACHED_BYTES = 2 * 1024 * 1024; // Larger files are streamed from disk
+const MIN_COMPRESS_BYTES = 1024;
+
+const MIME_TYPES = {
+    '.html': 'text/html; charset=utf-8',
+    '.htm': 'text/html; charset=utf-8',
+    '.css': 'text/css; charset=utf-8',
+    '.js': 'application/javascript; charset=utf-8',
+    '.json': 'application/json; charset=utf-8',
+    '.md': 'text/plain; charset=utf-8',
+    '.txt': 'text/plain; charset=utf-8',
+    '.svg': 'image/svg+xml',
+    '.png': 'image/png',
+    '.jpg': 'image/jpeg',
+    '.jpeg': 'image/jpeg',
+    '.gif': 'image/gif',
+    '.webp': 'image/webp',
+    '.ico': 'image/x-icon',
+    '.pdf': 'application/pdf',
+    '.woff': 'font/woff',
+    '.woff2': 'font/woff2',
+    '.ttf': 'font/ttf'
+};
+const COMPRESSIBLE = new Set(['.html', '.htm', '.css', '.js', '.json', '.md', '.txt', '.svg']);
+
+function mimeType(filePath) {
+    return MIME_TYPES[path.extname(filePath).toLowerCase()] || 'application/octet-stream';
+}
+
+// "admin.min.html" -> "admin.html"
+function unminifiedName(name) {
+    const match = /^(.*)\.min(\.[^.]+)$/.exec(name);
+    return match ? match[1] + match[2] : null;
+}
+
+// Does an If-None-Match header match this ETag?
+function etagMatches(header, etag) {
+    if (!header) return false;
+    if (header.trim() === '*') return true;
+    return header.split(',').some(tag => tag.trim().replace(/^W\//, '') === etag);
+}
+
+// Content codings listed in an Accept-Encoding header (without q=0 ones)
+function acceptedEncodings(header) {
+    const accepted = new Set();
+    if (!header) return accepted;
+    for (const part of header.split(',')) {
+        const [name, ...params] = part.trim().toLowerCase().split(';');
+        const q = params.find(p => p.trim().startsWith('q='));
+        if (q && parseFloat(q.trim().slice(2)) === 0) continue;
+        accepted.add(name.trim());
+    }
+    return accepted;
+}
+
+// Send a prepared { type, etag, identity, gzip, br } body: brotli if the
+// client takes it, else gzip, else the plain bytes, or a 304 when the
+// client already has it
+function sendAsset(req, res, asset, cacheControl) {
+    const accepted = acceptedEncodings(req.headers['accept-encoding']);
+    let contentEncoding = null;
+    if (asset.br && accepted.has('br')) {
+        contentEncoding = 'br';
+    } else if (asset.gzip && (accepted.has('gzip') || accepted.has('*'))) {
+        contentEncoding = 'gzip';
+    }
+    const body = contentEncoding ? asset[contentEncoding] : asset.identity;
+    // Each encoding is a different representation, so it gets its own ETag
+    const etag = contentEncoding ? asset.etag.slice(0, -1) + '-' + contentEncoding + '"' : asset.etag;
+
+    res.setHeader('Content-Type', asset.type);
+    res.setHeader('ETag', etag);
+    res.setHeader('Cache-Control', cacheControl);
+    if (asset.gzip || asset.br) {
+        res.setHeader('Vary', 'Accept-Encoding');
+    }
+
+    if (etagMatches(req.headers['if-none-match'], etag)) {
+        res.statusCode = 304;
+        res.end();
+        return;
+    }
+
+    if (contentEncoding) {
+        res.setHeader('Content-Encoding', contentEncoding);
+    }
+    res.setHeader('Content-Length', body.length);
+    res.statusCode = 200;
+    res.end(req.method === 'HEAD' ? undefined : body);
+}
+
+class StaticAssets {
+    constructor(rootDir) {
+        this.rootDir = rootDir;
+        this.assets = new Map(); // URL path -> asset
+        this.ready = false;
+    }
+
+    listFiles(dir = this.rootDir) {
+        const files = [];
+        for (const entry of fs.readdirSync(dir, { withFileTypes: true })) {
+            const fullPath = path.join(dir, entry.name);
+            if (entry.isDirectory()) {
+                files.push(...this.listFiles(fullPath));
+            } else if (entry.isFile()) {
+                files.push(fullPath);
+            }
+        }
+        return files;
+    }
+
+    urlPath(filePath) {
+        return '/' + path.relative(this.rootDir, filePath).split(path.sep).join('/');
+    }
+
+    // Read and compress everything under rootDir; previous: content hash
+    // (ETag) -> { gzip, br } of files compressed before (compressed())
+    async build(previous = new Map()) {
+        const started = Date.now();
+        const files = this.listFiles();
+        const names = new Set(files);
+        const assets = new Map();
+        let rawBytes = 0;
+        let sentBytes = 0;
+        let compressed = 0;  // Files compressed now
+        let reused = 0;      // Files whose compressed copies were given
+
+        for (const filePath of files) {
+            const dir = path.dirname(filePath);
+            const plain = unminifiedName(path.basename(filePath));
+            const servedAs = plain ? path.join(dir, plain) : filePath;
+
+            // The plain file gives way to its minified copy
+            if (!plain) {
+                const ext = path.extname(filePath);
+                const minified = filePath.slice(0, filePath.length - ext.length) + '.min' + ext;
+                if (names.has(minified)) continue;
+            }
+
+            const stat = fs.statSync(filePath);
+            if (stat.size > MAX_CACHED_BYTES) continue;
+
+            const body = fs.readFileSync(filePath);
+            const hash = crypto.createHash('sha1').update(body).digest('hex').slice(0, 16);
+            const ext = path.extname(servedAs).toLowerCase();
+            const asset = {
+                type: mimeType(servedAs),
+                html: ext === '.html' || ext === '.htm',
+                etag: `"${hash}"`,
+                identity: body,
+                gzip: null,
+                br: null
+            };
+
+            const saved = previous.get(asset.etag);
+            if (saved) {
+                asset.gzip = saved.gzip;
+                asset.br = saved.br;
+                reused++;
+            } else if (COMPRESSIBLE.has(ext) && body.length >= MIN_COMPRESS_BYTES) {
+                const [gz, br] = await Promise.all([
+                    gzip(body, { level: zlib.constants.Z_BEST_COMPRESSION }),
+                    brotliCompress(body, {
+                        params: {
+                            [zlib.constants.BROTLI_PARAM_QUALITY]: zlib.constants.BROTLI_MAX_QUALITY,
+                            [zlib.constants.BROTLI_PARAM_MODE]: zlib.constants.BROTLI_MODE_TEXT,
+                            [zlib.constants.BROTLI_PARAM_SIZE_HINT]: body.length
+                        }
+                    })
+                ]);
+                // Only keep a variant that is actually smaller
+                if (gz.length < body.length) asset.gzip = gz;
+                if (br.length < body.length) asset.br = br;
+                compressed++;
+            }
+
+            assets.set(this.urlPath(servedAs), asset);
+            rawBytes += body.length;
+            sentBytes += (asset.br || asset.gzip || body).length;
+        }
+
+        this.assets = assets;
+        this.ready = true;
+        return { files: assets.size, rawBytes, sentBytes, compressed, reused, ms: Date.now() - started };
+    }
+
+    // Content hash (ETag) -> { gzip, br } of the built files, for build()
+    // after a restart
+    compressed() {
+        const compressed = new Map();
+        for (const asset of this.assets.values()) {
+            if (asset.gzip || asset.br) {
+                compressed.set(asset.etag, { gzip: asset.gzip, br: asset.br });
+            }
+        }
+        return compressed;
+    }
+
+    // Send a built asset; returns false if there is none for urlPath
+    send(req, res, urlPath) {
+        const asset = this.assets.get(urlPath);
+        if (!asset) return false;
+        sendAsset(req, res, asset, asset.html ? 'no-cache' : 'public, max-age=86400');
+        return true;
+    }
+
+    // Express middleware for GET/HEAD requests of files under rootDir
+    middleware() {
+        return (req, res, next) => {
+            if (req.method !== 'GET' && req.method !== 'HEAD') return next();
+            let urlPath;
+            try {
+                urlPath = decodeURIComponent(req.path);
+            } catch (error) {
+                return next();
+            }
+            if (urlPath.endsWith('/')) urlPath += 'index.html';
+            if (!this.send(req, res, urlPath)) next();
+        };
+    }
+}
+
+module.exports = { StaticAssets, mimeType, sendAsset };
@@ -0,0 +1,191 @@
+const fs = require('fs');
+const path = require('path');
+const { EventEmitter } = require('events');
+
+// In-memory owner of the JSON data files
+//
+// Each file is parsed once and then served from memory. A write replaces the
+// in-memory document immediately (so every later read sees it) and queues the
+// file for a flush. Writes that arrive while a flush is pending or running
+// are coalesced: the file is written once with the latest document, as
+// compact JSON, to a temp file that is fsync'd and renamed over the original
+// on the libuv thread pool instead of the event loop.
+//
+// write() resolves only after the flush that contains it is on disk, so a
+// handler that awaits it before responding never acknowledges a change that
+// a crash could lose, and a crash mid-flush leaves the previous complete
+// file in place.
+//
+// 'load' is emitted when a file is parsed from disk and 'flush' after every
+// write, both with the size and time taken (see metrics.js).
+
+const DEFAULT_FLUSH_DELAY = 20; // ms to wait for more writes before flushing
+
+class JSONStorage extends EventEmitter {
+    constructor(options = {}) {
+        super();
+        this.flushDelay = options.flushDelay !== undefined ? options.flushDelay : DEFAULT_FLUSH_DELAY;
+        this.files = new Map();
+    }
+
+    entry(filepath) {
+        let entry = this.files.get(filepath);
+        if (!entry) {
+            entry = {
+                loaded: false,
+                data: null,
+                version: 0,        // Bumped on every write
+                flushedVersion: 0, // Last version known to be on disk
+                timer: null,
+                flushing: null,    // Promise of the running flush
+                waiters: []        // { version, resolve }
+            };
+            this.files.set(filepath, entry);
+        }
+        return entry;
+    }
+
+    // Remove temp files left by a crash during a flush. The rename never
+    // happened, so the original file is still the last acknowledged state.
+    recover(dir) {
+        if (!fs.existsSync(dir)) return;
+        for (const name of fs.readdirSync(dir)) {
+            if (name.endsWith('.json.tmp')) {
+                fs.unlinkSync(path.join(dir, name));
+                console.warn(`Storage: removed unfinished write ${name}`);
+            }
+        }
+    }
+
+    read(filepath) {
+        const entry = this.entry(filepath);
+        if (!entry.loaded) {
+            try {
+                const started = process.hrtime.bigint();
+                const text = fs.readFileSync(filepath, 'utf8').replace(/^\uFEFF/, '');
+                entry.data = JSON.parse(text);
+                entry.loaded = true;
+                this.emit('load', {
+                    filepath,
+                    bytes: Buffer.byteLength(text),
+                    durationMs: Number(process.hrtime.bigint() - started) / 1e6
+                });
+            } catch (error) {
+                console.error('Error reading file:', filepath, error);
+                return null;
+            }
+        }
+        return entry.data;
+    }
+
+    // Replace a document. Resolves true once it is durable, false on failure.
+    write(filepath, data) {
+        const entry = this.entry(filepath);
+        entry.data = data;
+        entry.loaded = true;
+        entry.version++;
+        this.emit('change', filepath, data);
+
+        const promise = new Promise(resolve => {
+            entry.waiters.push({ version: entry.version, resolve });
+        });
+        this.schedule(filepath, entry);
+        return promise;
+    }
+
+    // Read-modify-write in one step; `mutate` may change the document in
+    // place or return a replacement
+    update(filepath, mutate) {
+        const current = this.read(filepath);
+        const result = mutate(current);
+        return this.write(filepath, result === undefined ? current : result);
+    }
+
+    // Add one item to an array document (e.g. a registration to students.json)
+    append(filepath, item) {
+        return this.update(filepath, list => {
+            const items = Array.isArray(list) ? list : [];
+            items.push(item);
+            return items;
+        });
+    }
+
+    // Add several items in one write (e.g. an imported student roster)
+    appendAll(filepath, items) {
+        return this.update(filepath, list => {
+            const all = Array.isArray(list) ? list : [];
+            for (const item of items) all.push(item);
+            return all;
+        });
+    }
+
+    schedule(filepath, entry) {
+        if (entry.timer || entry.flushing) return; // Picked up by the pending/running flush
+        entry.timer = setTimeout(() => {
+            entry.timer = null;
+            const version = entry.version;
+            entry.flushing = this.flush(filepath, entry).finally(() => {
+                entry.flushing = null;
+                // Written again while flushing; a failed flush is retried by the next write
+                if (entry.version > version) {
+                    this.schedule(filepath, entry);
+                }
+            });
+        }, this.flushDelay);
+    }
+
+    async flush(filepath, entry) {
+        const version = entry.version;
+        const tmpFile = filepath + '.tmp';
+        const started = process.hrtime.bigint();
+        let ok = true;
+        let bytes = 0;
+
+        try {
+            const text = JSON.stringify(entry.data);
+            bytes = Buffer.byteLength(text);
+            const handle = await fs.promises.open(tmpFile, 'w');
+            try {
+                await handle.writeFile(text, 'utf8');
+                await handle.sync();
+            } finally {
+                await handle.close();
+            }
+            await fs.promises.rename(tmpFile, filepath);
+            entry.flushedVersion = version;
+        } catch (error) {
+            ok = false;
+            console.error('Error writing file:', filepath, error);
+        }
+
+        this.emit('flush', {
+            filepath,
+            bytes,
+            ok,
+            durationMs: Number(process.hrtime.bigint() - started) / 1e6
+        });
+
+        // Settle everyone whose write is covered by this flush
+        const settled = entry.waiters.filter(w => w.version <= version);
+        entry.waiters = entry.waiters.filter(w => w.version > version);
+        settled.forEach(w => w.resolve(ok));
+    }
+
+    // Flush everything now (used on shutdown)
+    async flushAll() {
+        for (const [filepath, entry] of this.files) {
+            if (entry.flushing) {
+                await entry.flushing;
+            }
+            if (entry.timer) {
+                clearTimeout(entry.timer);
+                entry.timer = null;
+            }
+            if (entry.version > entry.flushedVersion) {
+                await this.flush(filepath, entry);
+            }
+        }
+    }
+}
+
+module.exports = { JSONStorage };
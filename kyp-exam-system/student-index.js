@@ -0,0 +1,105 @@
+// studentId, email and mobile -> student lookups over students.json
+//
+// Built on first use, so finding a student on submit, spotting a returning
+// student on registration or a duplicate in a roster import is a Map lookup
+// instead of a scan of the roster. Registrations appended to the roster are
+// added to the maps as they arrive (changed()); any other write (deleting
+// students, clearing the list) rebuilds them on the next lookup.
+//
+// Emails are compared without case, mobiles without spaces or dashes, the
+// same way for typed-in registrations and imported rosters.
+
+function normalizeEmail(email) {
+    return String(email === undefined || email === null ? '' : email).trim().toLowerCase();
+}
+
+function normalizeMobile(mobile) {
+    return String(mobile === undefined || mobile === null ? '' : mobile).replace(/[\s-]/g, '');
+}
+
+function addTo(map, key, student) {
+    if (!key) return;
+    const list = map.get(key);
+    if (list) {
+        list.push(student);
+    } else {
+        map.set(key, [student]);
+    }
+}
+
+class StudentIndex {
+    constructor(load) {
+        this.load = load; // () => parsed students.json (or null)
+        this.invalidate();
+    }
+
+    invalidate() {
+        this.byId = null;
+        this.byEmail = null;
+        this.byMobile = null;
+        this.source = null;  // The array indexed so far
+        this.indexed = 0;    // How many of its items
+    }
+
+    // students.json was written: index the items appended to the same list,
+    // or start over
+    changed(students) {
+        if (this.byId !== null && students === this.source && students.length >= this.indexed) {
+            this.addFrom(this.indexed);
+        } else {
+            this.invalidate();
+        }
+    }
+
+    build() {
+        const students = this.load() || [];
+        this.byId = new Map();
+        this.byEmail = new Map();
+        this.byMobile = new Map();
+        this.source = students;
+        this.indexed = 0;
+        this.addFrom(0);
+    }
+
+    addFrom(start) {
+        const students = this.source;
+        for (let i = start; i < students.length; i++) {
+            const student = students[i];
+            this.byId.set(String(student.id), student);
+            addTo(this.byEmail, normalizeEmail(student.email), student);
+            addTo(this.byMobile, normalizeMobile(student.mobile), student);
+        }
+        this.indexed = students.length;
+    }
+
+    ensure() {
+        if (this.byId === null) {
+            this.build();
+        }
+    }
+
+    get(studentId) {
+        this.ensure();
+        return this.byId.get(String(studentId)) || null;
+    }
+
+    // Registrations with this email and mobile, oldest first
+    findByContact(email, mobile) {
+        this.ensure();
+        const wantedEmail = normalizeEmail(email);
+        const list = this.byMobile.get(normalizeMobile(mobile)) || [];
+        return list.filter(student => normalizeEmail(student.email) === wantedEmail);
+    }
+
+    hasEmail(email) {
+        this.ensure();
+        return this.byEmail.has(normalizeEmail(email));
+    }
+
+    hasMobile(mobile) {
+        this.ensure();
+        return this.byMobile.has(normalizeMobile(mobile));
+    }
+}
+
+module.exports = { StudentIndex, normalizeEmail, normalizeMobile };
@@ -0,0 +1,111 @@
+// Checks of the question parser's option and answer markers
+//
+// Usage: node test-question-parser.js   (exits non-zero on a failure)
+
+const assert = require('assert');
+const { parseQuestionsFromText } = require('./question-parser');
+
+function quietly(fn) {
+    const log = console.log;
+    console.log = () => {};
+    try {
+        return fn();
+    } finally {
+        console.log = log;
+    }
+}
+
+function parse(text) {
+    return quietly(() => parseQuestionsFromText(text)).map(question => ({
+        question: question.question.hi,
+        options: question.options.hi,
+        correct: question.correct
+    }));
+}
+
+const checks = [];
+function check(name, fn) {
+    checks.push({ name, fn });
+}
+
+check('Devanagari letter options on their own lines', () => {
+    const [question] = parse([
+        '1. कंप्यूटर का जनक किसे कहा जाता है?',
+        'क) चार्ल्स बैबेज',
+        'ख) बिल गेट्स',
+        'ग) स्टीव जॉब्स',
+        'घ) एलन ट्यूरिंग',
+        'उत्तर: क'
+    ].join('\n'));
+    assert.deepStrictEqual(question.options, ['चार्ल्स बैबेज', 'बिल गेट्स', 'स्टीव जॉब्स', 'एलन ट्यूरिंग']);
+    assert.strictEqual(question.correct, 0);
+});
+
+check('Bracketed Devanagari letters and "सही उत्तर"', () => {
+    const [question] = parse([
+        '2. RAM का पूरा नाम क्या है?',
+        '(क) Read Access Memory',
+        '(ख) Random Access Memory',
+        '(ग) Run Access Memory',
+        '(घ) Rapid Access Memory',
+        'सही उत्तर: ख'
+    ].join('\n'));
+    assert.strictEqual(question.options.length, 4);
+    assert.strictEqual(question.options[1], 'Random Access Memory');
+    assert.strictEqual(question.correct, 1);
+});
+
+check('Devanagari letter options flattened onto one line', () => {
+    const [question] = parse('3. पिता (जनक) को क्या कहते हैं? क) पापा ख) माता ग) भाई घ) बहन उत्तर: ग');
+    assert.strictEqual(question.question, 'पिता (जनक) को क्या कहते हैं?');
+    assert.deepStrictEqual(question.options, ['पापा', 'माता', 'भाई', 'बहन']);
+    assert.strictEqual(question.correct, 2);
+});
+
+check('A word starting with क after "उत्तर:" is not an answer', () => {
+    const [question] = parse([
+        '4. इनपुट डिवाइस कौन सा है?',
+        'A) कीबोर्ड',
+        'B) मॉनिटर',
+        'C) प्रिंटर',
+        'D) स्पीकर',
+        'उत्तर: कीबोर्ड'
+    ].join('\n'));
+    assert.strictEqual(question.options.length, 4);
+    assert.strictEqual(question.correct, 0); // Default, not taken from "कीबोर्ड"
+});
+
+check('Latin and Devanagari digit markers still work', () => {
+    const questions = parse([
+        '5. CPU का पूरा नाम क्या है?',
+        'A) Central Processing Unit',
+        'B) Control Processing Unit',
+        'C) Computer Processing Unit',
+        'D) Central Program Unit',
+        'Answer: A',
+        '',
+        '6. 1 KB में कितने बाइट होते हैं?',
+        '१) 1000',
+        '२) 1024',
+        '३) 100',
+        '४) 512',
+        'उत्तर: २'
+    ].join('\n'));
+    assert.strictEqual(questions.length, 2);
+    assert.strictEqual(questions[0].correct, 0);
+    assert.deepStrictEqual(questions[1].options, ['1000', '1024', '100', '512']);
+    assert.strictEqual(questions[1].correct, 1);
+});
+
+let failed = 0;
+for (const { name, fn } of checks) {
+    try {
+        fn();
+        console.log(`✅ ${name}`);
+    } catch (error) {
+        failed++;
+        console.log(`❌ ${name}\n   ${error.message.split('\n').join('\n   ')}`);
+    }
+}
+console.log(`\n${checks.length - failed}/${checks.length} passed`);
+process.exitCode = failed ? 1 : 0;
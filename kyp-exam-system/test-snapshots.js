@@ -0,0 +1,145 @@
+// Checks that snapshots keep the question versions results are graded on:
+// taken by the server (snapshot-store.js), exported, and restored offline
+// with snapshots.py
+//
+// Usage: node test-snapshots.js   (exits non-zero on a failure; needs Python)
+
+const assert = require('assert');
+const fs = require('fs');
+const os = require('os');
+const path = require('path');
+const { spawnSync } = require('child_process');
+const { SnapshotStore } = require('./snapshot-store');
+const { ResultsStore } = require('./results-store');
+const { QuestionVersions } = require('./question-versions');
+
+const PYTHON = process.env.PYTHON || (process.platform === 'win32' ? 'python' : 'python3');
+
+function snapshotsPy(dataDir, ...args) {
+    const run = spawnSync(PYTHON, [path.join(__dirname, 'snapshots.py'), '--data-dir', dataDir, ...args], { encoding: 'utf8' });
+    assert.strictEqual(run.status, 0, `snapshots.py ${args.join(' ')} failed:\n${run.stdout}${run.stderr}`);
+    return run.stdout;
+}
+
+// A data directory with two subjects' versions and a result graded on each
+async function setUp() {
+    const dataDir = fs.mkdtempSync(path.join(os.tmpdir(), 'kyp-snapshots-'));
+    const versions = new QuestionVersions(path.join(dataDir, 'question-versions'));
+    const results = new ResultsStore(path.join(dataDir, 'results'), path.join(dataDir, 'results.json'));
+    const hashes = [];
+
+    for (const subjectId of ['bs-cit', 'bs-cls']) {
+        const questions = [1, 2, 3].map(id => ({
+            id,
+            question: { hi: `प्रश्न ${id} (${subjectId})`, en: `Question ${id}` },
+            options: { hi: ['क', 'ख', 'ग', 'घ'], en: ['A', 'B', 'C', 'D'] },
+            correct: id % 4,
+            marks: 1
+        }));
+        const bank = await versions.save(subjectId, { questions });
+        hashes.push(bank);
+        await results.append({ id: `r-${subjectId}`, studentId: 's1', subjectId, bank, answers: [1, 2, -1] });
+    }
+    await results.drain();
+    results.close();
+
+    const store = new SnapshotStore(path.join(dataDir, 'snapshots'), {
+        resultsDir: path.join(dataDir, 'results'),
+        legacyResultsFile: path.join(dataDir, 'results.json'),
+        versionsDir: path.join(dataDir, 'question-versions')
+    });
+    store.open();
+    const snapshot = await store.create({ label: 'test' });
+    const manifest = await store.get(snapshot.id);
+    return { dataDir, store, manifest, hashes, versions };
+}
+
+async function collect(source) {
+    const pieces = [];
+    for await (const piece of source) pieces.push(piece);
+    return pieces.join('');
+}
+
+const checks = [];
+function check(name, fn) {
+    checks.push({ name, fn });
+}
+
+check('A snapshot lists every question version', async () => {
+    const { manifest } = await setUp();
+    assert.strictEqual(manifest.collections.versions.kind, 'files');
+    assert.strictEqual(manifest.stats.records.versions, 2);
+    assert.strictEqual(manifest.stats.records.results, 2);
+});
+
+check('The JSON export carries the versions', async () => {
+    const { store, manifest, hashes } = await setUp();
+    const exported = JSON.parse(await collect(store.exportJSON(manifest)));
+    assert.strictEqual(exported.versions.length, 2);
+    assert.deepStrictEqual(exported.versions.map(version => version.subjectId).sort(), ['bs-cit', 'bs-cls']);
+    assert.deepStrictEqual(exported.results.map(result => result.bank).sort(), [...hashes].sort());
+});
+
+check('snapshots.py chunks the versions the way the server does', async () => {
+    const { dataDir, store, manifest } = await setUp();
+    snapshotsPy(dataDir, 'create', '--label', 'python');
+    const ids = store.ids();
+    const python = await store.get(ids[ids.length - 1]);
+    assert.notStrictEqual(python.id, manifest.id);
+    assert.deepStrictEqual(python.collections.versions, manifest.collections.versions);
+});
+
+check('A diff names added question versions by their hash', async () => {
+    const { dataDir, store, manifest, hashes, versions } = await setUp();
+    const questions = [{ id: 1, question: { hi: 'नया प्रश्न', en: 'New question' }, options: ['A', 'B'], correct: 1, marks: 2 }];
+    const added = await versions.save('bs-cit', { questions });
+    const later = await store.get((await store.create({ label: 'new version' })).id);
+
+    const { changes } = await store.diff(manifest, later);
+    assert.deepStrictEqual(changes.versions.ids.added, [added]);
+    assert.strictEqual(changes.versions.removed, 0);
+    assert.ok(!hashes.includes(added));
+
+    const python = snapshotsPy(dataDir, 'diff', manifest.id, later.id);
+    assert.ok(python.includes(`added: ${added}`), python);
+});
+
+check('Restoring results puts back the versions they need', async () => {
+    const { dataDir, manifest, hashes } = await setUp();
+    const versionsDir = path.join(dataDir, 'question-versions');
+    const before = hashes.map(hash => fs.readFileSync(path.join(versionsDir, hash + '.json')));
+    fs.rmSync(versionsDir, { recursive: true });
+    fs.rmSync(path.join(dataDir, 'results'), { recursive: true });
+
+    snapshotsPy(dataDir, 'restore', manifest.id, '--collections', 'results');
+
+    hashes.forEach((hash, i) => {
+        assert.ok(fs.readFileSync(path.join(versionsDir, hash + '.json')).equals(before[i]), `version ${hash} differs`);
+    });
+    const restored = [];
+    for await (const result of new ResultsStore(path.join(dataDir, 'results'), path.join(dataDir, 'results.json')).stream()) {
+        restored.push(result);
+    }
+    const versions = new QuestionVersions(versionsDir);
+    assert.strictEqual(restored.length, 2);
+    for (const result of restored) {
+        const details = versions.details(result);
+        assert.ok(details, `no details for ${result.id}`);
+        assert.strictEqual(details.length, 3);
+    }
+});
+
+(async () => {
+    let failed = 0;
+    for (const { name, fn } of checks) {
+        try {
+            await fn();
+            console.log(`✅ ${name}`);
+        } catch (error) {
+            failed++;
+            console.log(`❌ ${name}\n   ${error.message.split('\n').join('\n   ')}`);
+        }
+    }
+    console.log(`\n${checks.length - failed}/${checks.length} passed`);
+    process.exitCode = failed ? 1 : 0;
+})();